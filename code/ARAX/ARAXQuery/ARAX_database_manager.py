@@ -18,6 +18,10 @@ pathlist = os.path.realpath(__file__).split(os.path.sep)
 RTXindex = pathlist.index("RTX")
 sys.path.append(os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code']))
 from RTXConfiguration import RTXConfiguration  # noqa: E402
+sys.path.append(os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code', 'ARAX', 'ARAXQuery', 'Overlay']))
+from curie_pmid_index import build_curie_pmid_index_from_sqlite, get_curie_pmid_index_path  # noqa: E402
+sys.path.append(os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code', 'ARAX', 'ARAXQuery', 'Infer', 'scripts']))
+from xdtd_score_store import XDTDScoreStore, build_score_store_from_db, get_score_store_dir  # noqa: E402
 
 knowledge_sources_filepath = os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code', 'ARAX', 'KnowledgeSources'])
 versions_path = os.path.sep.join([knowledge_sources_filepath, 'db_versions.json'])
@@ -195,6 +199,10 @@ class ARAXDatabaseManager:
                         if debug:
                             eprint("Download successful. Removing local version...")
                         if os.path.exists(local_versions[database_name]['path']):
+                            if database_name == 'curie_to_pmids' and not os.path.islink(local_versions[database_name]['path']):
+                                _run_cmd_in_shell_chk_status(f"rm -rf {shlex.quote(get_curie_pmid_index_path(local_versions[database_name]['path']))}")
+                            if database_name == 'explainable_dtd_db' and not os.path.islink(local_versions[database_name]['path']):
+                                _run_cmd_in_shell_chk_status(f"rm -rf {shlex.quote(get_score_store_dir(local_versions[database_name]['path']))}")
                             _run_cmd_in_shell_chk_status(f"rm {shlex.quote(local_versions[database_name]['path'])}") 
                     else:
                         if debug:
@@ -223,6 +231,20 @@ class ARAXDatabaseManager:
                     if response is not None:
                         response.debug(f"Re-extracting tarball for {database_name}...")
                     self._extract_tarball(local_path, debug=debug)
+                # NGD database is present but the PMID index built from it is missing
+                elif database_name == 'curie_to_pmids' and not os.path.isdir(get_curie_pmid_index_path(local_path)):
+                    if debug:
+                        eprint(f"{database_name}: PMID index for {local_path} is missing, building it...")
+                    if response is not None:
+                        response.debug(f"Building the PMID index for {database_name}...")
+                    self._build_curie_pmid_index(local_path, debug=debug)
+                # xDTD database is present but the score store built from it is missing
+                elif database_name == 'explainable_dtd_db' and not XDTDScoreStore.exists(get_score_store_dir(local_path)):
+                    if debug:
+                        eprint(f"{database_name}: score store for {local_path} is missing, building it...")
+                    if response is not None:
+                        response.debug(f"Building the score store for {database_name}...")
+                    self._build_xdtd_score_store(local_path, debug=debug)
                 else:
                     if debug:
                         eprint(f"Local version of {database_name} ({local_path}) matches the remote version, skipping...")
@@ -355,6 +377,38 @@ class ARAXDatabaseManager:
         if local_destination_path.endswith('.tar.gz') and os.path.exists(local_destination_path):
             self._extract_tarball(local_destination_path, debug=debug)
 
+        # for the NGD database, also build the memory-mapped PMID index that NGD is computed from
+        if local_destination_path == self.local_paths['curie_to_pmids'] and os.path.exists(local_destination_path):
+            self._build_curie_pmid_index(local_destination_path, debug=debug)
+
+        # for the xDTD database, also build the columnar score store that top drug/disease lookups read
+        if local_destination_path == self.local_paths['explainable_dtd_db'] and os.path.exists(local_destination_path):
+            self._build_xdtd_score_store(local_destination_path, debug=debug)
+
+    def _build_curie_pmid_index(self, curie_to_pmids_path, debug=False):
+        # the index goes next to the real database file (so on docker hosts, next to the central copy)
+        index_path = get_curie_pmid_index_path(curie_to_pmids_path)
+        if os.path.isdir(index_path):
+            eprint(f"Looks like we have previously built the PMID index: {index_path}")
+            return
+        if debug:
+            eprint(f"Building PMID index {index_path} from {curie_to_pmids_path}...")
+        num_curies = build_curie_pmid_index_from_sqlite(curie_to_pmids_path, index_path)
+        if debug:
+            eprint(f"Built PMID index for {num_curies} curies")
+
+    def _build_xdtd_score_store(self, explainable_dtd_db_path, debug=False):
+        # the store goes next to the real database file (so on docker hosts, next to the central copy)
+        store_dir = get_score_store_dir(explainable_dtd_db_path)
+        if XDTDScoreStore.exists(store_dir):
+            eprint(f"Looks like we have previously built the xDTD score store: {store_dir}")
+            return
+        if debug:
+            eprint(f"Building xDTD score store {store_dir} from {explainable_dtd_db_path}...")
+        num_rows = build_score_store_from_db(explainable_dtd_db_path, store_dir)
+        if debug:
+            eprint(f"Built xDTD score store with {num_rows} scores")
+
     def _extract_tarball(self, tarball_path, debug=False):
         # follow the symlink to the real archive so extraction lands next to the
         # docker-central tarball,
@@ -622,7 +622,8 @@ class ARAXExpander:
                 log.debug(f"Deleting {qedge_key} from the QG because no edges fulfill it anymore")
                 del message.query_graph.edges[qedge_key]
 
-        # Convert message knowledge graph back to standard TRAPI
+        # Convert message knowledge graph back to standard TRAPI (which empties overarching_kg)
+        printable_counts_by_qg_id = eu.get_printable_counts_by_qg_id(overarching_kg)
         message.knowledge_graph = eu.convert_qg_organized_kg_to_standard_kg(overarching_kg)
 
         log.debug(f"unbound_kg node count: {len(unbound_kg.nodes)}; "
@@ -634,10 +635,10 @@ class ARAXExpander:
 
         for edge_id, edge in unbound_kg.edges.items():
             if edge_id not in kg.edges:
-                kg.edges[edge_id] = edge
+                kg.edges[edge_id] = eu.to_trapi_model(edge)
         for node_id, node in unbound_kg.nodes.items():
             if node_id not in kg.nodes:
-                kg.nodes[node_id] = node
+                kg.nodes[node_id] = eu.to_trapi_model(node)
 
         log.debug(f"message KG node count after merging unbound KG: {len(kg.nodes)}; "
                   f"message KG edge count after merging unbound KG: {len(kg.edges)}")
@@ -690,7 +691,7 @@ class ARAXExpander:
 
         # Return the response and done
         log.info(f"After Expand, the KG has {len(kg.nodes)} nodes and {len(kg.edges)} edges "
-                 f"({eu.get_printable_counts_by_qg_id(overarching_kg)})")
+                 f"({printable_counts_by_qg_id})")
 
         return response
 
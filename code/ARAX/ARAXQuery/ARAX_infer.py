@@ -534,13 +534,19 @@ chemical_gene_regulation_graph_expansion predicts the regulation relationship be
 
         # --- Query the ExplainableDTD database ---
         try:
-            top_scores = XDTD.get_score_table(drug_curie_ids=preferred_drug_curie, disease_curie_ids=preferred_disease_curie)
+            if preferred_drug_curie and preferred_disease_curie:
+                n_top_scores = None
+            elif preferred_drug_curie:
+                n_top_scores = parameters['n_diseases']
+            else:
+                n_top_scores = parameters['n_drugs']
+            top_scores = XDTD.get_top_scores(drug_curie_id=preferred_drug_curie, disease_curie_id=preferred_disease_curie, n=n_top_scores)
             top_paths = XDTD.get_top_path(drug_curie_ids=preferred_drug_curie, disease_curie_ids=preferred_disease_curie)
         except Exception as e:
             self.response.warning(f"Database query failed for drug={preferred_drug_curie}, disease={preferred_disease_curie}: {e}")
             return self.response
 
-        # Validate results and apply N limits
+        # Validate results
         if preferred_drug_curie and preferred_disease_curie:
             if len(top_scores) == 0:
                 self.response.warning(f"No predicted scores for drug={preferred_drug_curie}, disease={preferred_disease_curie}. "
@@ -557,14 +563,12 @@ chemical_gene_regulation_graph_expansion predicts the regulation relationship be
             if len(top_paths) == 0:
                 self.response.warning(f"No predicted paths for drug={preferred_drug_curie}." 
                                       "Likely the model considers there is no reasonable path for this drug.")
-            top_scores = top_scores.iloc[:parameters['n_diseases'], :].reset_index(drop=True)
         elif preferred_disease_curie:
             if len(top_scores) == 0:
                 self.response.warning(f"No predicted drugs for disease={preferred_disease_curie}.")
                 return self.response
             if len(top_paths) == 0:
                 self.response.warning(f"No predicted paths for disease={preferred_disease_curie}.")
-            top_scores = top_scores.iloc[:parameters['n_drugs'], :].reset_index(drop=True)
 
         # Limit paths per drug-disease pair to n_paths
         top_paths = {
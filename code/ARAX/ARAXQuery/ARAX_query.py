@@ -20,6 +20,7 @@ from ARAX_ranker import ARAXRanker
 from operation_to_ARAXi import WorkflowToARAXi
 from ARAX_query_tracker import ARAXQueryTracker
 from result_transformer import ResultTransformer
+from trapi_json_encoder import iter_trapi_json_chunks
 # Imported here instead of inside execute_processing_plan, which runs in
 # per-query threads. See ARAX issue 2794.
 from ARAX_expander import ARAXExpander
@@ -54,16 +55,51 @@ def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
 ARAXResponse.output = 'STDERR'
 
 null_context_manager = contextlib.nullcontext()
+stream_keepalive_interval = 180.0  # seconds without news after which a streamed query says it's still progressing
+stream_chunk_size = 1 << 20  # (characters) the final envelope of a streamed query is sent in chunks of about this size
+stream_json_encoder = json.JSONEncoder(allow_nan=False)  # (shared, instead of json.dumps() making one per message)
 
 
 class response_locking(ARAXResponse):
-    def __init__(self, lock: threading.Lock):
+    """
+    The response of a streamed query: every change to its log or query plan is made holding the query's condition,
+    which is then notified, so that query_return_stream() can wait for changes instead of polling for them
+    """
+    def __init__(self, lock: threading.Condition):
         self.lock = lock
         super().__init__()
+        self.changed_query_plan_entries = set()  # (qedge_key, provider) entries changed since the stream last sent them
 
-    def __add_message(self, message, level, code=None):
+    def _add_message(self, message, level, code=None):
         with self.lock:
             super()._add_message(message, level, code)
+            self.lock.notify_all()
+
+    def merge(self, response_to_merge):
+        with self.lock:
+            super().merge(response_to_merge)
+            self.lock.notify_all()
+
+    def update_query_plan(self, qedge_key, provider, status, description, query=None):
+        with self.lock:
+            super().update_query_plan(qedge_key, provider, status, description, query=query)
+            self.changed_query_plan_entries.add((qedge_key, provider))
+            self.lock.notify_all()
+
+    def pop_query_plan_changes(self):
+        """
+        Returns the JSON of a query plan holding just the entries changed since the last call (or None if there are
+        none); the caller must hold the lock
+        """
+        if not self.changed_query_plan_entries:
+            return None
+        query_plan_changes = {'qedge_keys': {}, 'counter': self.query_plan['counter']}
+        for qedge_key, provider in self.changed_query_plan_entries:
+            query_plan_changes['qedge_keys'].setdefault(qedge_key, {})[provider] = \
+                self.query_plan['qedge_keys'][qedge_key][provider]
+        self.changed_query_plan_entries = set()
+        return json.dumps(query_plan_changes, allow_nan=False, sort_keys=True)
+
 
 class ARAXQuery:
 
@@ -90,80 +126,71 @@ class ARAXQuery:
 
 
     def query_return_stream(self, query, mode='ARAX'):
+        """
+        Runs the query in another thread and yields its progress as newline-delimited JSON (one object per line):
+          - log messages (LogEntry objects, with timestamp, level, code, and message), as the query logs them; after
+            stream_keepalive_interval seconds without news, a DEBUG one with message "Query is still progressing..."
+          - once, an object with the pid and authorization of the process (for the query's cancel link)
+          - query plan updates: {"qedge_keys": {qedge_key: {provider: entry}}, "counter": n}, each holding only the
+            (qedge_key, provider) entries that changed since the previous update (so a client keeps its own copy of
+            the query plan, starts it empty, and replaces the entries each update holds); counter is that of the full
+            query plan at the time
+          - finally, the TRAPI Response
+        """
 
         main_query_thread = threading.Thread(target=self.asynchronous_query, args=(query,mode,))
-        self.lock = threading.Lock()
+        self.lock = threading.Condition()
         main_query_thread.start()
 
-        if self.response is None or "DONE" not in self.response.status:
-
-            # Sleep until a response object has been created
-            have_response = False
-            while not have_response:
-                with self.lock:
-                    have_response = (self.response is not None)
-                if not have_response:
-                    time.sleep(0.1)
+        # Wait until a response object has been created
+        with self.lock:
+            self.lock.wait_for(lambda: self.response is not None)
 
+        if "DONE" not in self.response.status:
+            i_message = 0
             try:
-                i_message = 0
-                with self.lock:
-                    n_messages = len(self.response.messages)
-                query_plan_counter = 0
-                idle_ticks = 0.0
-                pid = None
-
                 self.response.debug("In query_return_stream")
+                pid = os.getpid()
+                authorization = str(hash('Pickles' + str(pid)))
+                sent_pid = False
 
+                # Send new log messages and query plan changes as soon as the query thread makes them (it notifies
+                # self.lock), instead of polling for them
                 response_status_says_done = False
                 while not response_status_says_done:
                     with self.lock:
+                        have_news = self.lock.wait_for(lambda: (len(self.response.messages) > i_message or
+                                                                self.response.changed_query_plan_entries or
+                                                                "DONE" in self.response.status),
+                                                       timeout=stream_keepalive_interval)
                         response_status_says_done = ("DONE" in self.response.status)
-                    if response_status_says_done:
-                        break
-                    with self.lock:
-                        n_messages = len(self.response.messages)
-                    while i_message < n_messages:
-                        with self.lock:
-                            i_message_obj = self.response.messages[i_message].copy()
-                        yield(json.dumps(i_message_obj, allow_nan=False) + "\n")
-                        i_message += 1
-                        idle_ticks = 0.0
-
-                    if pid is None:
-                        pid = os.getpid()
-                        authorization = str(hash('Pickles' + str(pid)))
-                        yield(json.dumps( { "pid": pid, "authorization": authorization } )+"\n")
-
-                    #### Also emit any updates to the query_plan
-                    with self.lock:
-                        self_query_plan_counter = self.response.query_plan['counter']
-                    if query_plan_counter < self_query_plan_counter:
-                        query_plan_counter = self_query_plan_counter
-                        with self.lock:
-                            self_response_query_plan = self.response.query_plan.copy()
-                        yield(json.dumps(self_response_query_plan, allow_nan=False, sort_keys=True) + "\n")
-                        idle_ticks = 0.0
-                    time.sleep(0.2)
-                    idle_ticks += 0.2
-                    if idle_ticks > 180.0:
+                        if response_status_says_done:
+                            break  # (anything new is sent below)
+                        new_messages = self.response.messages[i_message:]
+                        query_plan_changes = self.response.pop_query_plan_changes()
+                    i_message += len(new_messages)
+                    if not have_news:
                         timestamp = str(datetime.now().isoformat())
-                        yield json.dumps({ 'timestamp': timestamp, 'level': 'DEBUG', 'code': '', 'message': 'Query is still progressing...' }) + "\n"
-                        idle_ticks = 0.0
+                        yield stream_json_encoder.encode({ 'timestamp': timestamp, 'level': 'DEBUG', 'code': '', 'message': 'Query is still progressing...' }) + "\n"
+                        continue
+                    if new_messages:
+                        yield "".join(stream_json_encoder.encode(message) + "\n" for message in new_messages)
+                    if not sent_pid:
+                        yield(json.dumps( { "pid": pid, "authorization": authorization } )+"\n")
+                        sent_pid = True
+                    if query_plan_changes is not None:
+                        yield query_plan_changes + "\n"
             except MemoryError as e:
                 self.handle_memory_error(e)
 
-                # #### If there are any more logging messages in the queue, send them first
-            n_messages = len(self.response.messages)
-            while i_message < n_messages:
-                yield(json.dumps(self.response.messages[i_message], allow_nan=False) + "\n")
-                i_message += 1
-
-            #### Also emit any updates to the query_plan
-            self_response_query_plan_counter = self.response.query_plan['counter']
-            if query_plan_counter < self_response_query_plan_counter:
-                query_plan_counter = self_response_query_plan_counter
-                yield(json.dumps(self.response.query_plan, allow_nan=False, sort_keys=True) + "\n")
+            #### If there are any more logging messages or query plan changes, send them first
+            with self.lock:
+                new_messages = self.response.messages[i_message:]
+                query_plan_changes = self.response.pop_query_plan_changes()
+            if new_messages:
+                yield "".join(stream_json_encoder.encode(message) + "\n" for message in new_messages)
+            if query_plan_changes is not None:
+                yield query_plan_changes + "\n"
 
             # Remove the little DONE flag the other thread used to signal this thread that it is done
             self.response.status = re.sub('DONE,', '', self.response.status)
@@ -172,22 +199,8 @@ class ARAXQuery:
             if self.response.envelope.status == 'OK':
                 self.response.envelope.status = 'Success'
 
-            # Stream the resulting message back to the client
-            try:
-                msg_str = json.dumps(self.response.envelope.to_dict(),
-                                     allow_nan=False,
-                                     sort_keys=True) + "\n"
-            except ValueError as v:
-                self.response.envelope.message.results = []
-                self.response.envelope.message.auxiliary_graphs = None
-                self.response.envelope.message.knowledge_graph = {'edges': dict(), 'nodes': dict()}
-                self.response.envelope.status = 'ERROR'
-                error_message_str = f"error dumping result to JSON: {str(v)}"
-                self.response.error(error_message_str)
-                eprint(error_message_str)
-                msg_str = json.dumps(self.response.envelope.to_dict(),
-                                     sort_keys=True) + "\n"
-            yield msg_str
+            # Stream the resulting message back to the client, a chunk at a time instead of as one giant string
+            yield from self._get_envelope_json_chunks()
 
         # Wait until both threads rejoin here and the return
         main_query_thread.join()
@@ -195,6 +208,21 @@ class ARAXQuery:
         return
 
 
+    def _get_envelope_json_chunks(self):
+        """
+        Yields the JSON of the response envelope (plus a newline) in chunks of about stream_chunk_size characters,
+        encoded straight from the model objects. An attribute with a NaN or infinite value is left out, and any other
+        such value is sent as null, rather than failing the whole response.
+        """
+        non_finite_float_paths = []
+        yield from iter_trapi_json_chunks(self.response.envelope, chunk_size=stream_chunk_size,
+                                          on_non_finite_float=non_finite_float_paths.append)
+        yield "\n"
+        if non_finite_float_paths:
+            eprint(f"WARNING: {len(non_finite_float_paths)} NaN/infinite value(s) of the response were left out (if in an "
+                   f"attribute) or sent as null (e.g., {non_finite_float_paths[0]})")
+
+
     def asynchronous_query(self,query, mode='ARAX'):
 
         try:
@@ -205,6 +233,7 @@ class ARAXQuery:
                 new_response = response_locking(self.lock)
                 with self.lock:
                     self.response = new_response
+                    self.lock.notify_all()
 
             self.response.debug("in asynchronous_query")
 
@@ -218,6 +247,7 @@ class ARAXQuery:
         # Insert a little flag into the response status to denote that this thread is done
         with self.lock:
             self.response.status = f"DONE,{self.response.status}"
+            self.lock.notify_all()
 
         return
 
@@ -1,4 +1,6 @@
 #!/bin/env python3
+import collections
+import itertools
 import math
 import os
 import networkx as nx
@@ -22,6 +24,10 @@ from openapi_server.models.edge import Edge
 
 
 edge_confidence_manual_agent = 0.90
+edge_default_base = 0.5  # base confidence of edges from data sources without a weight of their own
+# Max flow is computed by enumerating all s-t cuts of the query graph (2^(num qnodes - 2) per node pair); past this many
+# qnodes, the (per-result) networkx max flow is used instead
+max_qnodes_for_max_flow_by_cuts = 12
 
 
 def _get_query_graph_networkx_from_query_graph(query_graph: QueryGraph) -> nx.MultiDiGraph:
@@ -44,6 +50,58 @@ def _calculate_final_individual_edge_confidence(base_score: float, attribute_sco
     return W_r
 
 
+def _calculate_final_individual_edge_confidences(base_scores: npt.NDArray[np.float64],
+                                                 edge_indexes: npt.NDArray[np.int64],
+                                                 attribute_scores: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """
+    _calculate_final_individual_edge_confidence for all edges at once: attribute_scores[i] is a score for edge
+    edge_indexes[i]. Each edge's scores are folded in from highest to lowest (i.e., in the same order, so to the same
+    result), all edges' first scores at once, then all second ones, and so on.
+    """
+    W_r = base_scores.copy()
+    if len(attribute_scores) == 0:
+        return W_r
+    order = np.lexsort((-attribute_scores, edge_indexes))
+    edge_indexes = edge_indexes[order]
+    attribute_scores = attribute_scores[order]
+    edge_starts = np.flatnonzero(np.r_[True, edge_indexes[1:] != edge_indexes[:-1]])
+    ranks = np.arange(len(edge_indexes)) - np.repeat(edge_starts, np.diff(np.r_[edge_starts, len(edge_indexes)]))
+    for rank in range(ranks.max() + 1):
+        is_at_rank = ranks == rank
+        rank_edge_indexes = edge_indexes[is_at_rank]
+        W_r[rank_edge_indexes] = W_r[rank_edge_indexes] + (1 - W_r[rank_edge_indexes]) * attribute_scores[is_at_rank]
+    return W_r
+
+
+def _update_score_stats(score_stats: dict[str, dict], attribute_name: str, values: list[float]) -> bool:
+    """
+    Updates the minimum/maximum of an edge attribute in score_stats with the given values, ignoring inf, -inf and NaN.
+    This gives the same stats as comparing the values one at a time in the original order, where a minimum/maximum of
+    0 counts as not set yet. Returns whether there was any finite value.
+    """
+    if attribute_name not in score_stats:
+        score_stats[attribute_name] = {'minimum': None, 'maximum': None}  # FIXME: doesn't handle the case when all values are inf|NaN
+    stats = score_stats[attribute_name]
+    values = np.array(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return False
+    if stats['minimum'] is None and stats['maximum'] is None and np.all(values != 0):
+        stats['minimum'] = float(values.min())
+        stats['maximum'] = float(values.max())
+    else:
+        for value in values.tolist():
+            if not stats['minimum']:
+                stats['minimum'] = value
+            if not stats['maximum']:
+                stats['maximum'] = value
+            if value > stats['maximum']:
+                stats['maximum'] = value
+            if value < stats['minimum']:
+                stats['minimum'] = value
+    return True
+
+
 def _calculate_final_result_score(all_edge_scores: list[float]) -> float:
     """
     Calculate the final result score for a given edge binding list considering the individual base edge confidence scores. The looping aglorithm is used:
@@ -98,14 +156,9 @@ def _process_valid_edge_ids(valid_edge_id_info: dict[str, Dict], kg_edge_id_to_e
     return results
 
 
-def _get_weighted_graph_networkx_from_result_graph(kg_edge_id_to_edge: dict[str, Edge],
-                                                   qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
-                                                   result: Result) -> Union[nx.MultiDiGraph,
-                                                                            nx.MultiGraph]:
-    res_graph = qg_nx.copy()
-    qg_edge_tuples = tuple(qg_nx.edges(keys=True, data=True))
-    qg_edge_key_to_edge_tuple = {edge_tuple[2]: edge_tuple for edge_tuple in qg_edge_tuples}
-    
+def _get_qedge_weights_for_result(kg_edge_id_to_edge: dict[str, Edge],
+                                  qg_edge_key_to_edge_tuple: dict[str, tuple],
+                                  result: Result) -> dict[str, tuple[tuple, float]]:
     # Get all valid edge ids from the edge binding list
     valid_edge_id_info = {}
     for analysis in result.analyses:  # For now we only ever have one Analysis per Result
@@ -119,12 +172,24 @@ def _get_weighted_graph_networkx_from_result_graph(kg_edge_id_to_edge: dict[str,
                 
     # Process all valid edge ids (possibly combine multiple duplicate edges into one)
     processed_valid_edge_ids = _process_valid_edge_ids(valid_edge_id_info, kg_edge_id_to_edge)
-                
-    for qedge_key, edge_info in processed_valid_edge_ids.items():
-        qedge_tuple = edge_info['edge_tuple']
-        scores = edge_info['scores']
-        res_graph[qedge_tuple[0]][qedge_tuple[1]][qedge_tuple[2]]['weight'] = _calculate_final_result_score(scores)
-                
+
+    return {qedge_key: (edge_info['edge_tuple'], _calculate_final_result_score(edge_info['scores']))
+            for qedge_key, edge_info in processed_valid_edge_ids.items()}
+
+
+def _get_weighted_graph_networkx_from_result_graph(kg_edge_id_to_edge: dict[str, Edge],
+                                                   qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                                                   result: Result) -> Union[nx.MultiDiGraph,
+                                                                            nx.MultiGraph]:
+    res_graph = qg_nx.copy()
+    qg_edge_tuples = tuple(qg_nx.edges(keys=True, data=True))
+    qg_edge_key_to_edge_tuple = {edge_tuple[2]: edge_tuple for edge_tuple in qg_edge_tuples}
+
+    for qedge_key, (qedge_tuple, weight) in _get_qedge_weights_for_result(kg_edge_id_to_edge,
+                                                                          qg_edge_key_to_edge_tuple,
+                                                                          result).items():
+        res_graph[qedge_tuple[0]][qedge_tuple[1]][qedge_tuple[2]]['weight'] = weight
+
     return res_graph
 
 
@@ -234,6 +299,120 @@ def _score_result_graphs_by_networkx_graph_scorer(kg_edge_id_to_edge: dict[str,
     return nx_graph_scorer(result_graphs_nx)
 
 
+def _get_weight_matrix_from_result_graphs(kg_edge_id_to_edge: dict[str, Edge],
+                                          qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                                          results: list[Result]) -> npt.NDArray[np.float64]:
+    """
+    Returns the weight that each result gives each qedge (as in _get_weighted_graph_networkx_from_result_graph), as a
+    (number of results) x (number of qedges) matrix, with qedges in the order of qg_nx.edges.
+    """
+    qg_edge_tuples = tuple(qg_nx.edges(keys=True, data=True))
+    qg_edge_key_to_edge_tuple = {edge_tuple[2]: edge_tuple for edge_tuple in qg_edge_tuples}
+    qg_edge_key_to_index = {edge_tuple[2]: edge_index for edge_index, edge_tuple in enumerate(qg_edge_tuples)}
+    weight_matrix = np.zeros((len(results), len(qg_edge_tuples)))
+    for result_index, result in enumerate(results):
+        for qedge_key, (_, weight) in _get_qedge_weights_for_result(kg_edge_id_to_edge,
+                                                                     qg_edge_key_to_edge_tuple,
+                                                                     result).items():
+            weight_matrix[result_index, qg_edge_key_to_index[qedge_key]] = weight
+    return weight_matrix
+
+
+def _combine_scores_by_row(score_matrix: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    # Same as _calculate_final_individual_edge_confidence(0, row), for each row at once
+    combined_scores = np.zeros(score_matrix.shape[0])
+    for scores in (-np.sort(-score_matrix, axis=1)).T:
+        combined_scores = combined_scores + (1 - combined_scores) * scores
+    return combined_scores
+
+
+def _get_longest_shortest_path_pairs(qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph]) -> tuple[int, list[tuple[str, str]]]:
+    # The node pairs that are farthest apart in the query graph (which the max flow and longest path scores look at)
+    apsp_dict = dict(nx.algorithms.shortest_paths.unweighted.all_pairs_shortest_path_length(qg_nx))
+    path_len_with_pairs_list = [(node_i, node_j, path_len) for node_i, node_i_dict in apsp_dict.items() for node_j, path_len in node_i_dict.items()]
+    max_path_len = max(path_len for _, _, path_len in path_len_with_pairs_list)
+    return max_path_len, [(node_i, node_j) for node_i, node_j, path_len in path_len_with_pairs_list if path_len == max_path_len]
+
+
+def _get_adjacency_matrices(qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                            weight_matrix: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    # Stacked (weighted) adjacency matrices, one per result, each like nx.to_numpy_array() of its result graph
+    map_node_name_to_index = {node_id: node_index for node_index, node_id in enumerate(qg_nx.nodes)}
+    subject_indexes = [map_node_name_to_index[edge_tuple[0]] for edge_tuple in qg_nx.edges]
+    object_indexes = [map_node_name_to_index[edge_tuple[1]] for edge_tuple in qg_nx.edges]
+    adj_matrices = np.zeros((weight_matrix.shape[0], len(qg_nx), len(qg_nx)))
+    for edge_index, (subject_index, object_index) in enumerate(zip(subject_indexes, object_indexes)):
+        adj_matrices[:, subject_index, object_index] += weight_matrix[:, edge_index]
+    return adj_matrices
+
+
+def _score_weight_matrix_by_max_flow(qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                                     weight_matrix: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """
+    Vectorized version of _score_networkx_graphs_by_max_flow. Since all result graphs have the query graph's
+    topology, the max flow between two nodes is, for every result, the minimum over the same set of s-t cuts of the
+    total weight of the edges crossing the cut, so the cuts are enumerated once and applied to all results.
+    """
+    if len(qg_nx) <= 1:
+        return np.ones(weight_matrix.shape[0])
+    _, pairs_with_max_path_len = _get_longest_shortest_path_pairs(qg_nx)
+    node_ids = list(qg_nx.nodes)
+    edge_tuples = list(qg_nx.edges)
+    max_flow_values_for_node_pairs = []
+    for source_node_id, target_node_id in pairs_with_max_path_len:
+        other_node_ids = [node_id for node_id in node_ids if node_id not in {source_node_id, target_node_id}]
+        # One column per cut (the nodes on the source side of it), saying which edges go across it
+        cut_matrix = np.zeros((len(edge_tuples), 2 ** len(other_node_ids)))
+        for cut_index in range(2 ** len(other_node_ids)):
+            source_side_node_ids = {source_node_id}.union(node_id for bit, node_id in enumerate(other_node_ids)
+                                                          if cut_index >> bit & 1)
+            for edge_index, edge_tuple in enumerate(edge_tuples):
+                if edge_tuple[0] in source_side_node_ids and edge_tuple[1] not in source_side_node_ids:
+                    cut_matrix[edge_index, cut_index] = 1.0
+        max_flow_values_for_node_pairs.append((weight_matrix @ cut_matrix).min(axis=1))
+    return _combine_scores_by_row(np.column_stack(max_flow_values_for_node_pairs))
+
+
+def _score_weight_matrix_by_longest_path(qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                                         weight_matrix: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    # Vectorized version of _score_networkx_graphs_by_longest_path
+    max_path_len, pairs_with_max_path_len = _get_longest_shortest_path_pairs(qg_nx)
+    map_node_name_to_index = {node_id: node_index for node_index, node_id in enumerate(qg_nx.nodes)}
+    adj_matrix_powers = np.linalg.matrix_power(_get_adjacency_matrices(qg_nx, weight_matrix), max_path_len) / math.factorial(max_path_len)
+    score_matrix = np.column_stack([adj_matrix_powers[:, map_node_name_to_index[node_i], map_node_name_to_index[node_j]]
+                                    for node_i, node_j in pairs_with_max_path_len])
+    return _combine_scores_by_row(score_matrix)
+
+
+def _score_weight_matrix_by_frobenius_norm(qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                                           weight_matrix: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    # Vectorized version of _score_networkx_graphs_by_frobenius_norm
+    return np.linalg.norm(_get_adjacency_matrices(qg_nx, weight_matrix), ord='fro', axis=(1, 2))
+
+
+def _score_result_graphs(kg_edge_id_to_edge: dict[str, Edge],
+                         qg_nx: Union[nx.MultiDiGraph, nx.MultiGraph],
+                         results: list[Result]) -> list[list[float]]:
+    """
+    Scores all results by max flow, longest path and Frobenius norm (in that order). Every result graph has the same
+    (query graph) topology and differs only in its edge weights, so the results' edge weights are stacked into one
+    matrix and each score is computed for all results at once.
+    """
+    if not results:
+        return [[], [], []]
+    weight_matrix = _get_weight_matrix_from_result_graphs(kg_edge_id_to_edge, qg_nx, results)
+    if len(qg_nx) > max_qnodes_for_max_flow_by_cuts or \
+            (len(qg_nx) > 1 and _get_longest_shortest_path_pairs(qg_nx)[0] == 0):
+        # Too many cuts to enumerate (or the qnodes aren't connected at all, which networkx will complain about)
+        max_flow_scores = _score_result_graphs_by_networkx_graph_scorer(kg_edge_id_to_edge, qg_nx, results,
+                                                                        _score_networkx_graphs_by_max_flow)
+    else:
+        max_flow_scores = list(_score_weight_matrix_by_max_flow(qg_nx, weight_matrix))
+    return [max_flow_scores,
+            list(_score_weight_matrix_by_longest_path(qg_nx, weight_matrix)),
+            list(_score_weight_matrix_by_frobenius_norm(qg_nx, weight_matrix))]
+
+
 def _break_ties_and_preserve_order(scores):
     adjusted_scores = scores.copy()
     n = len(scores)
@@ -291,6 +470,9 @@ class ARAXRanker:
                                          'infores:drugbank': 0.99
                                          # we can define the more customized weights for other data sources here later if needed.
         }
+        # the method that normalizes each of the edge attributes (which works on single values or NumPy arrays of them)
+        self.attribute_normalizers = {attribute_name: getattr(self, '_' + self.__class__.__name__ + '__normalize_' + re.sub(r'[- \:]', '_', attribute_name))
+                                      for attribute_name in self.known_attributes_to_trust}
 
         self.virtual_edge_types = {}
         self.score_stats = dict()  # dictionary that stores that max's and min's of the edge attribute values
@@ -330,9 +512,9 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         Eventually we will want
         1. To weight different attributes by different amounts
         2. Figure out what to do with edges that have no attributes
+        (aggregate_scores_dmk scores all KG edges at once with get_edge_confidences, which gives the same confidences)
         """
         
-        edge_default_base = 0.5
         edge_attribute_score_list = []
         
         #  Retrieve edge data source
@@ -407,10 +589,8 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
                 return 0.
             # else it's all good to proceed
             else:
-                # Fix hyphens or spaces to underscores in names
-                edge_attribute_name = re.sub(r'[- \:]','_',edge_attribute_name)
-                # then dispatch to the appropriate function that does the score normalizing to get it to be in [0, 1] with 1 better
-                return getattr(self, '_' + self.__class__.__name__ + '__normalize_' + edge_attribute_name)(value=edge_attribute_value)
+                # dispatch to the appropriate function that does the score normalizing to get it to be in [0, 1] with 1 better
+                return float(self.attribute_normalizers[edge_attribute_name](value=edge_attribute_value))
 
     def edge_attribute_publication_normalizer(self, attribute_type_id: str, edge_attribute_value) -> float:
         """
@@ -426,15 +606,17 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         else:
             return -1 # this means the data format storing publications has changed.
         
-        n_publications = len(set(publications))
-        if n_publications == 0:
-            pub_value = 0.0001
-        else:
-            pub_value = np.log(n_publications)
-            max_value = 1.0
-            curve_steepness = 3.16993
-            logistic_midpoint = 1.60943 # log(5) = 1.60943 meaning having 5 publications is a mid point
-            normalized_value = max_value / float(1 + np.exp(-curve_steepness * (pub_value - logistic_midpoint)))
+        return float(self.__normalize_publication_count(len(set(publications))))
+
+    def __normalize_publication_count(self, n_publications):
+        """
+        Normalize the number of (distinct) publications of an edge, on a log scale
+        """
+        pub_value = np.where(n_publications == 0, 0.0001, np.log(np.maximum(n_publications, 1)))
+        max_value = 1.0
+        curve_steepness = 3.16993
+        logistic_midpoint = 1.60943 # log(5) = 1.60943 meaning having 5 publications is a mid point
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (pub_value - logistic_midpoint)))
         return normalized_value
 
     def __normalize_probability_treats(self, value):
@@ -461,7 +643,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1
         curve_steepness = 15
         logistic_midpoint = 0.60
-        normalized_value = max_value / float(1+np.exp(-curve_steepness*(value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness*(value - logistic_midpoint)))
         # TODO: if "near" to the min value, set to zero (maybe one std dev from the min value of the logistic curve?)
         # TODO: make sure max value can be obtained
         return normalized_value
@@ -473,7 +655,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1
         curve_steepness = -9
         logistic_midpoint = 0.60
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         # TODO: if "near" to the min value, set to zero (maybe one std dev from the min value of the logistic curve?)
         # TODO: make sure max value can be obtained
         return normalized_value
@@ -487,7 +669,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1
         curve_steepness = 20
         logistic_midpoint = 0.8
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         # TODO: if "near" to the min value, set to zero (maybe one std dev from the min value of the logistic curve?)
         # TODO: make sure max value can be obtained
         return normalized_value
@@ -517,7 +699,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1
         curve_steepness = 2000  # really steep since the max values I've ever seen are quite small (eg .03)
         logistic_midpoint = 0.002  # seems like an ok mid point, but....
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         # TODO: if "near" to the min value, set to zero (maybe one std dev from the min value of the logistic curve?)
         # TODO: make sure max value can be obtained
         # print(f"value: {value}, normalized: {normalized_value}")
@@ -530,7 +712,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1
         curve_steepness = 2  # Todo: need to fiddle with this as it's not quite weighting things enough
         logistic_midpoint = 2  # Exp[2] more likely than chance
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         # TODO: if "near" to the min value, set to zero (maybe one std dev from the min value of the logistic curve?)
         # TODO: make sure max value can be obtained
         # print(f"value: {value}, normalized: {normalized_value}")
@@ -554,7 +736,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1
         curve_steepness = 0.03
         logistic_midpoint = 200
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         # TODO: if "near" to the min value, set to zero (maybe one std dev from the min value of the logistic curve?)
         # TODO: make sure max value can be obtained
         # print(f"value: {value}, normalized: {normalized_value}")
@@ -573,7 +755,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1.0
         curve_steepness = 0.849
         logistic_midpoint = 4.97
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         return normalized_value
 
     def __normalize_pValue(self, value):
@@ -586,7 +768,7 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         max_value = 1.0
         curve_steepness = 0.849
         logistic_midpoint = 4.97
-        normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
         return normalized_value
 
 
@@ -609,17 +791,13 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         # normalized_value = 1-value
 
         # option 2:
-        try:
-            if value <= np.finfo(float).eps:
-                normalized_value = 1.
-            else:
-                value = -np.log(value)
-                max_value = 1.0
-                curve_steepness = 3
-                logistic_midpoint = 2.7
-                normalized_value = max_value / float(1 + np.exp(-curve_steepness * (value - logistic_midpoint)))
-        except RuntimeWarning:  # this is the case when value is 0 (or nearly so), so should award the max value
-            normalized_value = 1.
+        # when value is 0 (or nearly so), should award the max value
+        is_zero = value <= np.finfo(float).eps
+        value = -np.log(np.where(is_zero, 1., value))
+        max_value = 1.0
+        curve_steepness = 3
+        logistic_midpoint = 2.7
+        normalized_value = np.where(is_zero, 1., max_value / (1 + np.exp(-curve_steepness * (value - logistic_midpoint))))
 
         return normalized_value
 
@@ -631,13 +809,133 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         return value
 
     def __normalize_feature_coefficient(self, value):
-        log_abs_value = np.log(abs(value))
+        log_abs_value = np.log(np.abs(value))
         max_value = 1
         curve_steepness = 2.75
         logistic_midpoint = 0.15
-        normalized_value = max_value / float(1+np.exp(-curve_steepness*(log_abs_value - logistic_midpoint)))
+        normalized_value = max_value / (1 + np.exp(-curve_steepness*(log_abs_value - logistic_midpoint)))
         return normalized_value
 
+    def get_edge_attribute_columns(self, edges: dict[str, Edge]) -> dict:
+        """
+        Goes through the attributes of the given edges once, pulling out everything edge scoring needs into flat columns:
+        - 'stats_values': attribute name -> the numeric values of that known attribute (for score_stats)
+        - 'normalizer_columns': known attribute name -> (edge index, value, trust) of each value to normalize with it
+        - 'publication_column': (edge index, publication count, trust) of each SemMedDB publication list
+        - 'base_scores': each edge's base confidence, from its data source
+        - 'given_confidences': each edge's confidence if it is given outright (by a 'confidence' attribute or because
+          the edge was curated by a person), else None
+        Edges are numbered in the order of `edges`. "no value!" values of known attributes are set to 0 (in place).
+        """
+        known_attributes_to_trust = self.known_attributes_to_trust
+        data_source_base_weights = self.data_source_base_weights
+        stats_values = collections.defaultdict(list)
+        normalizer_columns = collections.defaultdict(list)
+        publication_column = []
+        base_scores = [0.] * len(edges)
+        given_confidences = [None] * len(edges)
+        for edge_index, (edge_key, edge) in enumerate(edges.items()):
+            data_source = edge_key.rpartition('--')[2]
+            if data_source in data_source_base_weights:
+                base_scores[edge_index] = data_source_base_weights[data_source]
+            elif 'infores' in data_source:  # default score for other data sources
+                base_scores[edge_index] = edge_default_base
+            edge_attributes = edge.attributes
+            if edge_attributes is None:
+                continue
+            is_semmeddb_edge = data_source == "infores:semmeddb"
+            is_manual_agent_edge = False
+            for edge_attribute in edge_attributes:
+                original_attribute_name = edge_attribute.original_attribute_name
+                attribute_type_id = edge_attribute.attribute_type_id
+                attribute_value = edge_attribute.value
+
+                # get the numeric value of known attributes (to keep stats on)
+                value = None
+                is_known_original_attribute_name = original_attribute_name in known_attributes_to_trust
+                is_known_attribute_type_id = attribute_type_id in known_attributes_to_trust
+                if is_known_original_attribute_name or is_known_attribute_type_id:
+                    if attribute_value == "no value!":
+                        edge_attribute.value = attribute_value = 0
+                        value = 0.
+                    else:
+                        try:
+                            value = float(attribute_value)
+                        except (ValueError, TypeError):
+                            pass
+                    if value is not None:
+                        if is_known_original_attribute_name:
+                            stats_values[original_attribute_name].append(value)
+                        if is_known_attribute_type_id and attribute_type_id != original_attribute_name:
+                            stats_values[attribute_type_id].append(value)
+
+                if original_attribute_name == "confidence":
+                    given_confidences[edge_index] = attribute_value
+                if attribute_type_id == "biolink:agent_type" and attribute_value == "manual_agent":
+                    is_manual_agent_edge = True
+
+                # figure out how (and how much) this attribute counts towards the edge confidence
+                is_semmeddb_publications = is_semmeddb_edge and attribute_type_id == "biolink:publications"
+                trust = known_attributes_to_trust.get(original_attribute_name, None)
+                if trust:
+                    normalizer_name = original_attribute_name
+                else:
+                    trust = known_attributes_to_trust.get(attribute_type_id, None)
+                    normalizer_name = attribute_type_id if original_attribute_name is None else None
+                    if not trust:
+                        if not is_semmeddb_publications:
+                            continue  # we have no current normalization of this kind of attribute
+                        trust = 1.
+                if is_semmeddb_publications:
+                    # only publications from semmeddb are used to calculate the confidence in this way
+                    if isinstance(attribute_value, str):
+                        publication_column.append((edge_index, 1, trust))
+                    elif isinstance(attribute_value, list):
+                        publication_column.append((edge_index, len(set(attribute_value)), trust))
+                    # else the data format storing publications has changed
+                elif normalizer_name is not None and value is not None and value == value:  # (NaN != NaN)
+                    normalizer_columns[normalizer_name].append((edge_index, value, trust))
+            if is_manual_agent_edge:
+                given_confidences[edge_index] = edge_confidence_manual_agent
+        return {'stats_values': dict(stats_values),
+                'normalizer_columns': dict(normalizer_columns),
+                'publication_column': publication_column,
+                'base_scores': np.array(base_scores),
+                'given_confidences': given_confidences}
+
+    def get_edge_confidences(self, edge_attribute_columns: dict) -> npt.NDArray[np.float64]:
+        """
+        Combines the attribute scores of each edge into a single confidence, like edge_attribute_score_combiner but for
+        all edges (as extracted by get_edge_attribute_columns) at once: each normalizer is run once on all the values
+        it applies to. Needs score_stats to be filled in already. Edges whose confidence is given outright are not
+        scored (they just get their base score here).
+        """
+        is_scored_edge = np.array([not given_confidence for given_confidence in edge_attribute_columns['given_confidences']],
+                                  dtype=bool)
+        edge_indexes = []
+        attribute_scores = []
+        columns = [(self.attribute_normalizers[normalizer_name], normalizer_column)
+                   for normalizer_name, normalizer_column in edge_attribute_columns['normalizer_columns'].items()]
+        columns.append((self.__normalize_publication_count, edge_attribute_columns['publication_column']))
+        with np.errstate(all='ignore'):
+            for normalizer, column in columns:
+                column = np.fromiter(itertools.chain.from_iterable(column), dtype=float, count=3 * len(column)).reshape(-1, 3)
+                column = column[is_scored_edge[column[:, 0].astype(int)]]
+                if len(column) == 0:
+                    continue
+                normalized_values = np.broadcast_to(normalizer(column[:, 1]), (len(column),)).astype(float)
+                is_used = normalized_values > 0
+                edge_indexes.append(column[is_used, 0].astype(int))
+                attribute_scores.append(normalized_values[is_used] * column[is_used, 2])
+        if edge_indexes:
+            edge_indexes = np.concatenate(edge_indexes)
+            attribute_scores = np.concatenate(attribute_scores)
+        else:
+            edge_indexes = np.zeros(0, dtype=int)
+            attribute_scores = np.zeros(0)
+        return _calculate_final_individual_edge_confidences(edge_attribute_columns['base_scores'], edge_indexes,
+                                                            attribute_scores)
+
     def aggregate_scores_dmk(self, response):
         """
         Take in a message,
@@ -666,65 +964,32 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         #    4. Auto-thresholding of values (eg. if chi_square <0.05, penalize the most, if probability_treats < 0.8, penalize the most, etc.)
         #    5. Allow for ranked answers (eg. observed_expected can have a single, huge value, skewing the rest of them
 
-        # #### Iterate through all the edges in the knowledge graph to:
+        # #### Go through all the edges in the knowledge graph once to:
         # #### 1) Create a dict of all edges by id
-        # #### 2) Collect some min,max stats for edge_attributes that we may need later
+        # #### 2) Pull out the attribute values we need, to collect some min,max stats for them and to score the edges
         kg_edge_id_to_edge = self.kg_edge_id_to_edge
+        kg_edge_id_to_edge.update(message.knowledge_graph.edges)
+        edge_attribute_columns = self.get_edge_attribute_columns(message.knowledge_graph.edges)
         score_stats = self.score_stats
         no_non_inf_float_flag = True
-        for edge_key, edge in message.knowledge_graph.edges.items():
-            kg_edge_id_to_edge[edge_key] = edge
-            if edge.attributes is not None:
-                for edge_attribute in edge.attributes:
-                    for attribute_name in self.known_attributes_to_trust:
-                        if edge_attribute.original_attribute_name == attribute_name or edge_attribute.attribute_type_id == attribute_name:
-                            if edge_attribute.value == "no value!":
-                                edge_attribute.value = 0
-                                value = 0
-                            else:
-                                try:
-                                    value = float(edge_attribute.value)
-                                except ValueError:
-                                    continue
-                                except TypeError:
-                                    continue
-                            # initialize if not None already
-                            if attribute_name not in score_stats:
-                                score_stats[attribute_name] = {'minimum': None, 'maximum': None}  # FIXME: doesn't handle the case when all values are inf|NaN
-                            if not np.isinf(value) and not np.isinf(-value) and not np.isnan(value):  # Ignore inf, -inf, and nan
-                                no_non_inf_float_flag = False
-                                if not score_stats[attribute_name]['minimum']:
-                                    score_stats[attribute_name]['minimum'] = value
-                                if not score_stats[attribute_name]['maximum']:
-                                    score_stats[attribute_name]['maximum'] = value
-                                if value > score_stats[attribute_name]['maximum']:
-                                    score_stats[attribute_name]['maximum'] = value
-                                if value < score_stats[attribute_name]['minimum']:
-                                    score_stats[attribute_name]['minimum'] = value
+        for attribute_name, values in edge_attribute_columns['stats_values'].items():
+            if _update_score_stats(score_stats, attribute_name, values):
+                no_non_inf_float_flag = False
 
         if no_non_inf_float_flag:
             response.warning(
                         "No non-infinite value was encountered in any edge attribute in the knowledge graph.")
         response.info(f"Summary of available edge metrics: {score_stats}")
 
-        edge_ids_manual_agent = set()
-        # Loop over the entire KG and normalize and combine the score of each edge, place that information in the confidence attribute of the edge
-        for edge_key, edge in message.knowledge_graph.edges.items():
-            if edge.attributes is not None:
-                edge_attributes = {x.original_attribute_name:x.value for x in edge.attributes}
-                for edge_attribute in edge.attributes:
-                    if edge_attribute.attribute_type_id == "biolink:agent_type" and edge_attribute.value == "manual_agent":
-                        edge_attributes['confidence'] = edge_confidence_manual_agent
-                        edge.confidence = edge_confidence_manual_agent
-                        edge_ids_manual_agent.add(edge_key)
-                        break
+        # Normalize and combine the scores of all edges in the KG, place that information in the confidence attribute of the edge
+        edge_confidences = self.get_edge_confidences(edge_attribute_columns)
+        for edge, given_confidence, edge_confidence in zip(message.knowledge_graph.edges.values(),
+                                                           edge_attribute_columns['given_confidences'],
+                                                           edge_confidences.tolist()):
+            if given_confidence:
+                edge.confidence = given_confidence
             else:
-                edge_attributes = {}
-
-            if edge_attributes.get("confidence", None):
-                edge.confidence = edge_attributes['confidence']
-            else:                
-                edge.confidence = self.edge_attribute_score_combiner(edge_key, edge)
+                edge.confidence = edge_confidence
 
         # Now that each edge has a confidence attached to it based on it's attributes, we can now:
         # 1. consider edge types of the results
@@ -738,16 +1003,8 @@ and [frobenius norm](https://en.wikipedia.org/wiki/Matrix_norm#Frobenius_norm).
         # now we can loop over all the results, and combine their edge confidences (now populated)
         qg_nx = _get_query_graph_networkx_from_query_graph(message.query_graph)
         kg_edge_id_to_edge = self.kg_edge_id_to_edge
-        kg_edge_id_to_edge = self.kg_edge_id_to_edge
 
-        ranks_list = list(map(_quantile_rank_list,
-                              map(lambda scorer_func: _score_result_graphs_by_networkx_graph_scorer(kg_edge_id_to_edge,
-                                                                                                    qg_nx,
-                                                                                                    results,
-                                                                                                    scorer_func),
-                                  [_score_networkx_graphs_by_max_flow,
-                                   _score_networkx_graphs_by_longest_path,
-                                   _score_networkx_graphs_by_frobenius_norm])))
+        ranks_list = list(map(_quantile_rank_list, _score_result_graphs(kg_edge_id_to_edge, qg_nx, results)))
 
         result_scores = sum(ranks_list)/float(len(ranks_list))
 
@@ -20,7 +20,7 @@ import copy
 import math
 import os
 import sys
-from typing import Union, Iterable, cast, Optional, DefaultDict, Any
+from typing import Union, Iterable, Iterator, cast, Optional, DefaultDict, Any
 import collections.abc
 from ARAX_response import ARAXResponse
 
@@ -484,7 +484,7 @@ def analyze_message_get_referenced_IDs(
 
 
 class ARAXResultify:
-    ALLOWED_PARAMETERS = {'debug', 'ignore_edge_direction'}
+    ALLOWED_PARAMETERS = {'debug', 'ignore_edge_direction', 'incremental'}
 
     def __init__(self):
         self.response = None
@@ -509,7 +509,13 @@ relationships like `(protein)-[involved_in]->(pathway)` even though the
 underlying KG only contains directional edges of the form
 `(protein)<-[involved_in]-(pathway)`.  Note that this command will successfully
 execute given an arbitrary query graph and knowledge graph provided by the
-automated reasoning system, not just ones generated by Team ARA Expander."""
+automated reasoning system, not just ones generated by Team ARA Expander.
+- `resultify(incremental=true)` Keeps the result graphs on the response so that
+a later `resultify(incremental=true)` in the same workflow (e.g., after
+`overlay` adds virtual edges or `filter_kg` removes nodes/edges) only updates
+the results affected by those changes, instead of recomputing all of them. If
+the query graph changed in any other way (or nodes/edges were added to the
+knowledge graph), results are recomputed from scratch."""
         command_definition = {
             "dsl_command": "resultify()",
             "description": full_description,
@@ -524,6 +530,15 @@ automated reasoning system, not just ones generated by Team ARA Expander."""
                     "type": "boolean",
                     "description": "Whether to ignore (vs. obey) edge directions in the query graph when identifying "
                                    "paths that fulfill it.",
+                },
+                "incremental": {
+                    "is_required": False,
+                    "examples": ["true", "false"],
+                    "enum": ["true", "false", "True", "False", "t", "f", "T", "F"],
+                    "default": "false",
+                    "type": "boolean",
+                    "description": "Whether to keep the result graphs on the response and update them (vs. recompute "
+                                   "them from scratch) in later `resultify(incremental=true)` calls.",
                 }
             }
         }
@@ -683,6 +698,11 @@ automated reasoning system, not just ones generated by Team ARA Expander."""
             order to require that an edge in a subgraph of the KG will only
             match an edge in the QG if both have the same direction (taking into
             account the source/target node mapping). Optional.
+            incremental: a parameter of type `bool` indicating whether to keep
+            the result graphs on the response and, in a later incremental call,
+            only update them for nodes/edges removed from the KG and qedges
+            added to the QG since. By default, this parameter is `false`.
+            Optional.
 
         """
         assert self.response is not None
@@ -740,6 +760,18 @@ automated reasoning system, not just ones generated by Team ARA Expander."""
                 else:
                     raise e
 
+        incremental = parameters.get('incremental', None)
+        if incremental is not None:
+            try:
+                incremental = _parse_boolean_case_insensitive(incremental)
+            except ValueError as e:
+                error_string = "parameter value is not allowed in ARAXResultify: " + str(incremental)
+                if not debug_mode:
+                    response.error(error_string)
+                    return set(), set()
+                else:
+                    raise e
+
         nodes_bound = {node_id: node for node_id, node in kg.nodes.items() \
                        if (getattr(node, "qnode_keys", None) or [])}
         edges_bound = {edge_id: edge for edge_id, edge in kg.edges.items() \
@@ -752,7 +784,8 @@ automated reasoning system, not just ones generated by Team ARA Expander."""
                                             qg,
                                             mode,
                                             ignore_edge_direction,
-                                            response)
+                                            response,
+                                            bool(incremental))
         message_code = 'OK'
         code_description = 'Result list computed from KG and QG'
 
@@ -946,10 +979,11 @@ def _get_results_for_kg_by_qg(kg: KnowledgeGraph,              # all nodes *must
                               qg: QueryGraph,
                               mode: str = "ARAX",
                               ignore_edge_direction: bool = True,
-                              log: ARAXResponse = ARAXResponse()) -> list[Result]:
+                              log: ARAXResponse = ARAXResponse(),
+                              incremental: bool = False) -> list[Result]:
 
     if ignore_edge_direction is None:
-        return _get_results_for_kg_by_qg(kg, qg, mode, log=log)
+        return _get_results_for_kg_by_qg(kg, qg, mode, log=log, incremental=incremental)
 
     kg_node_keys_without_qnode_key = [node_key for node_key, node in kg.nodes.items() \
                                       if not hasattr(node, 'qnode_keys') or not node.qnode_keys]
@@ -1106,6 +1140,8 @@ def _get_results_for_kg_by_qg(kg: KnowledgeGraph,              # all nodes *must
         edge_keys_by_subject_collapsed: DefaultDict[str, DefaultDict[str, set[str]]] = collections.defaultdict(lambda: collections.defaultdict(lambda: set()))
         edge_keys_by_object_collapsed: DefaultDict[str, DefaultDict[str, set[str]]] = collections.defaultdict(lambda: collections.defaultdict(lambda: set()))
         edge_keys_by_node_pair_collapsed: DefaultDict[str, DefaultDict[tuple[str, str], set[str]]] = collections.defaultdict(lambda: collections.defaultdict(lambda: set()))
+        # Record which (qedge, subject, object) each edge fulfills, so that a later incremental run can spot KG deltas
+        qedge_fulfillments_by_edge_key: DefaultDict[str, set[tuple[str, str, str]]] = collections.defaultdict(set)
         for edge_key, edge in kg.edges.items():
             for qedge_id in (getattr(edge, 'qedge_keys', None) or []):
                 qedge = qg.edges[qedge_id]
@@ -1117,19 +1153,13 @@ def _get_results_for_kg_by_qg(kg: KnowledgeGraph,              # all nodes *must
                 edge_keys_by_object_collapsed[qedge_id][edge_object].add(edge_key)
                 edge_keys_by_node_pair_collapsed[qedge_id][(edge_subject, edge_object)].add(edge_key)
                 edge_keys_by_node_pair[qedge_id][(edge.subject, edge.object)].add(edge_key)
+                if incremental:
+                    qedge_fulfillments_by_edge_key[edge_key].add((qedge_id, edge_subject, edge_object))
                 if ignore_edge_direction:
                     edge_keys_by_node_pair_collapsed[qedge_id][(edge_object, edge_subject)].add(edge_key)
                     edge_keys_by_node_pair[qedge_id][(edge.object, edge.subject)].add(edge_key)
 
-        # Create results off the "required" portion of the QG (excluding any qnodes/qedges belong to an "option group")
-        log.info("Creating result graphs for required portion of QG")
-        result_graphs_required = _create_result_graphs(required_qg, kg_node_keys_by_qg_key_collapsed,
-                                                       edge_keys_by_subject_collapsed, edge_keys_by_object_collapsed,
-                                                       edge_keys_by_node_pair_collapsed,
-                                                       ignore_edge_direction, log)
-        log.debug(f"Created {len(result_graphs_required)} required result graphs")
-
-        # Then create results for each of the 'option groups' in the QG (including the 'required' portion with each)
+        # Figure out the 'option groups' in the QG (each of which gets its own results, on top of the 'required' ones)
         subclass_self_qedge_groups = {qedge.option_group_id for qedge_key, qedge in qg.edges.items()
                                       if _is_subclass_self_qedge(qedge)}
         option_groups_in_qg = {qedge.option_group_id for qedge in qg.edges.values()
@@ -1137,39 +1167,80 @@ def _get_results_for_kg_by_qg(kg: KnowledgeGraph,              # all nodes *must
         # NOTE: We ignore subclass self-qedge option groups and instead process those in a different way
         if option_groups_in_qg:
             log.info(f"Distinct option groups detected in the QG are: {option_groups_in_qg}")
-        option_group_results_dict = dict()
+        option_group_qgs = dict()
         for option_group_id in option_groups_in_qg:
             # Include qnodes/qedges that are either required or belong to this option group in our QG for this run
-            option_group_qg = QueryGraph(nodes={qnode_key: qnode for qnode_key, qnode in qg.nodes.items()
-                                                if qnode.option_group_id == option_group_id or not qnode.option_group_id},
-                                         edges={qedge_key: qedge for qedge_key, qedge in qg.edges.items()
-                                                if qedge.option_group_id == option_group_id or not qedge.option_group_id})
-            log.debug(f"For option group {option_group_id}, qnodes are {set(option_group_qg.nodes)}, "
-                      f"qedges are {set(option_group_qg.edges)}")
-            # Check whether this option group has been fulfilled at all
-            unfulfilled_qnodes = {qnode_key for qnode_key in option_group_qg.nodes
-                                  if not kg_node_keys_by_qg_key_collapsed.get(qnode_key)}
-            unfulfilled_qedges = {qedge_key for qedge_key in option_group_qg.edges
-                                  if not kg_edge_keys_by_qg_key.get(qedge_key)}
-            if unfulfilled_qnodes or unfulfilled_qedges:
-                log.info(f"No results found for option group {option_group_id}. Unfulfilled qnode(s): "
-                         f"{unfulfilled_qnodes}. Unfulfilled qedge(s): {unfulfilled_qedges}")
-                result_graphs_for_option_group = []
-            else:
-                qg_is_disconnected = _qg_is_disconnected(option_group_qg)
-                if qg_is_disconnected:
-                    log.error(f"Required + option group {option_group_id} portion of the QG is disconnected. "
-                              f"This isn't allowed! 'Required'/group {option_group_id} qnode IDs are: "
-                              f"{[qnode_key for qnode_key in option_group_qg.nodes]}", error_code="DisconnectedQG")
-                    return []
-                log.info(f"Creating result graphs for option group {option_group_id}")
-                result_graphs_for_option_group = _create_result_graphs(option_group_qg, kg_node_keys_by_qg_key_collapsed,
-                                                                       edge_keys_by_subject_collapsed, edge_keys_by_object_collapsed,
-                                                                       edge_keys_by_node_pair_collapsed,
-                                                                       ignore_edge_direction, log,
-                                                                       base_result_graphs=copy.deepcopy(result_graphs_required))
-                log.debug(f"Created {len(result_graphs_for_option_group)} option group {option_group_id} result graphs")
-            option_group_results_dict[option_group_id] = result_graphs_for_option_group
+            option_group_qgs[option_group_id] = QueryGraph(nodes={qnode_key: qnode for qnode_key, qnode in qg.nodes.items()
+                                                                  if qnode.option_group_id == option_group_id or not qnode.option_group_id},
+                                                           edges={qedge_key: qedge for qedge_key, qedge in qg.edges.items()
+                                                                  if qedge.option_group_id == option_group_id or not qedge.option_group_id})
+
+        # In incremental mode, try to just update the result graphs from the last resultify() call for what changed
+        qg_signature = _get_qg_signature(qg) if incremental else None
+        updated_result_graphs = None
+        if incremental:
+            updated_result_graphs = _update_result_graphs_for_kg_deltas(getattr(log, "resultify_index", None),
+                                                                        qg_signature, required_qg, option_group_qgs,
+                                                                        kg_node_keys_by_qg_key,
+                                                                        kg_node_keys_by_qg_key_collapsed,
+                                                                        kg_edge_keys_by_qg_key,
+                                                                        qedge_fulfillments_by_edge_key,
+                                                                        child_to_parent_map,
+                                                                        edge_keys_by_subject_collapsed,
+                                                                        edge_keys_by_object_collapsed,
+                                                                        edge_keys_by_node_pair_collapsed,
+                                                                        ignore_edge_direction, log)
+        if updated_result_graphs is not None:
+            result_graphs_required, option_group_results_dict = updated_result_graphs
+        else:
+            # Create results off the "required" portion of the QG (excluding any qnodes/qedges belong to an "option group")
+            log.info("Creating result graphs for required portion of QG")
+            result_graphs_required = _create_result_graphs(required_qg, kg_node_keys_by_qg_key_collapsed,
+                                                           edge_keys_by_subject_collapsed, edge_keys_by_object_collapsed,
+                                                           edge_keys_by_node_pair_collapsed,
+                                                           ignore_edge_direction, log)
+            log.debug(f"Created {len(result_graphs_required)} required result graphs")
+
+            # Then create results for each of the 'option groups' in the QG (including the 'required' portion with each)
+            option_group_results_dict = dict()
+            for option_group_id, option_group_qg in option_group_qgs.items():
+                log.debug(f"For option group {option_group_id}, qnodes are {set(option_group_qg.nodes)}, "
+                          f"qedges are {set(option_group_qg.edges)}")
+                # Check whether this option group has been fulfilled at all
+                unfulfilled_qnodes = {qnode_key for qnode_key in option_group_qg.nodes
+                                      if not kg_node_keys_by_qg_key_collapsed.get(qnode_key)}
+                unfulfilled_qedges = {qedge_key for qedge_key in option_group_qg.edges
+                                      if not kg_edge_keys_by_qg_key.get(qedge_key)}
+                if unfulfilled_qnodes or unfulfilled_qedges:
+                    log.info(f"No results found for option group {option_group_id}. Unfulfilled qnode(s): "
+                             f"{unfulfilled_qnodes}. Unfulfilled qedge(s): {unfulfilled_qedges}")
+                    result_graphs_for_option_group = []
+                else:
+                    qg_is_disconnected = _qg_is_disconnected(option_group_qg)
+                    if qg_is_disconnected:
+                        log.error(f"Required + option group {option_group_id} portion of the QG is disconnected. "
+                                  f"This isn't allowed! 'Required'/group {option_group_id} qnode IDs are: "
+                                  f"{[qnode_key for qnode_key in option_group_qg.nodes]}", error_code="DisconnectedQG")
+                        return []
+                    log.info(f"Creating result graphs for option group {option_group_id}")
+                    result_graphs_for_option_group = _create_result_graphs(option_group_qg, kg_node_keys_by_qg_key_collapsed,
+                                                                           edge_keys_by_subject_collapsed, edge_keys_by_object_collapsed,
+                                                                           edge_keys_by_node_pair_collapsed,
+                                                                           ignore_edge_direction, log,
+                                                                           base_result_graphs=copy.deepcopy(result_graphs_required))
+                    log.debug(f"Created {len(result_graphs_for_option_group)} option group {option_group_id} result graphs")
+                option_group_results_dict[option_group_id] = result_graphs_for_option_group
+
+        if incremental:
+            # Keep copies of the result graphs for the next resultify() call, so nothing done to them below (like
+            # separating children from parents, which adds nodes to them) can change the index
+            result_graphs_required_to_keep = _copy_result_graphs(result_graphs_required)
+            option_group_results_dict_to_keep = {option_group_id: _copy_result_graphs(result_graphs)
+                                                 for option_group_id, result_graphs in option_group_results_dict.items()}
+            log.resultify_index = _ResultGraphIndex(qg_signature, ignore_edge_direction, kg_node_keys_by_qg_key,
+                                                    kg_node_keys_by_qg_key_collapsed, qedge_fulfillments_by_edge_key,
+                                                    child_to_parent_map, result_graphs_required_to_keep,
+                                                    option_group_results_dict_to_keep)
 
         # Organize our results for the 'required' portion of the QG by the IDs of their is_set=False nodes
         required_non_set_qnode_keys = [qnode_key for qnode_key, qnode in required_qg.nodes.items() if not qnode.is_set]
@@ -1215,6 +1286,8 @@ def _get_results_for_kg_by_qg(kg: KnowledgeGraph,              # all nodes *must
     qnodes_with_ids = {qnode_key for qnode_key, qnode in qg.nodes.items() if qnode.ids}
 
     resource_id = "infores:rtx-kg2" if mode == "RTXKG2" else "infores:arax"
+    essence_qnode_key = _get_essence_node_for_qg(qg)
+    essence_qnode = qg.nodes.get(essence_qnode_key)
     results = []
     for result_graph in final_result_graphs:
         node_bindings = dict()
@@ -1231,8 +1304,6 @@ def _get_results_for_kg_by_qg(kg: KnowledgeGraph,              # all nodes *must
                                                                         edge_bindings=edge_bindings)])
 
         # Fill out the essence for the result
-        essence_qnode_key = _get_essence_node_for_qg(qg)
-        essence_qnode = qg.nodes.get(essence_qnode_key)
         essence_kg_node_key_set = result_graph['nodes'].get(essence_qnode_key, set())
         if len(essence_kg_node_key_set) == 0:
             result.essence = cast(str, None)
@@ -1477,17 +1548,6 @@ def _is_subclass_self_qedge(qedge: QEdge) -> bool:
     return qedge.subject == qedge.object and qedge.predicates == ["biolink:subclass_of"]
 
 
-def _get_all_adjacent_nodes(kg_node_keys: set[str], start_qnode_key: str, target_qnode_key: str,
-                            kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]]) -> set[str]:
-    """
-    This function returns all nodes adjacent to a set of nodes (kg_node_keys) that fulfill the target_qnode_key. The
-    start_qnode_key is the qnode ID that the set of input nodes fulfill. Being adjacent to the set of nodes means that
-    the node is connected to ANY of the individual input nodes in the set (not ALL).
-    """
-    connections = [kg_node_adj_map_by_qg_key[start_qnode_key][kg_node_key][target_qnode_key] for kg_node_key in kg_node_keys]
-    return {node_key for node_key_set in connections for node_key in node_key_set}
-
-
 def _find_qnode_connected_to_sub_qg(qnode_keys_to_connect_to: set[str], qnode_keys_to_choose_from: set[str],
                                     qg: QueryGraph) -> tuple[str, set[str]]:
     """
@@ -1521,15 +1581,6 @@ def _get_qg_adj_map_undirected(qg: QueryGraph) -> dict[str, set[str]]:
     return qg_adj_map
 
 
-def _extract_sub_qg_adj_map(qg_adj_map: dict[str, set[str]], allowed_qnode_keys: set[str]) -> dict[str, set[str]]:
-    """
-    This function extracts the node adjacency info for a "subgraph" of the query graph (represented by
-    allowed_qnode_keys). Example of qg_adj_map: {"n0": {"n1"}, "n1": {"n0"}}
-    """
-    return {qnode_key: neighbor_qnode_keys.intersection(allowed_qnode_keys)
-            for qnode_key, neighbor_qnode_keys in qg_adj_map.items() if qnode_key in allowed_qnode_keys}
-
-
 def _get_subclass_clusters(kg_edge_keys_by_qg_key: dict[str, set[str]], kg_node_keys_by_qg_key: dict[str, set[str]],
                            kg: KnowledgeGraph, qg: QueryGraph,
                            log: ARAXResponse) -> tuple[dict[str, dict[str, set[str]]], dict[str, dict[str, str]]]:
@@ -1580,144 +1631,154 @@ def _get_best_parent_id(parent_ids: Iterable[str]) -> str:
     return list(sorted(list(parent_ids)))[0]
 
 
-def _clean_up_dead_ends(result_graph: dict[str, DefaultDict[str, set[str]]],
-                        sub_qg_adj_map: dict[str, set[str]],
-                        kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]],
-                        log: ARAXResponse) -> dict[str, DefaultDict[str, set[str]]]:
+def _get_qg_adj_map_without_self_qedges(qg: QueryGraph) -> dict[str, set[str]]:
+    # Self-qedges don't constrain which nodes are connected to which, so pruning dead ends leaves them out
+    return {qnode_key: neighbor_qnode_keys.difference({qnode_key})
+            for qnode_key, neighbor_qnode_keys in _get_qg_adj_map_undirected(qg).items()}
+
+
+def _prune_dead_ends_from_node_sets(node_sets: dict[str, set[str]],
+                                    changed_qnode_keys: Iterable[str],
+                                    qg_adj_map: dict[str, set[str]],
+                                    kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]]) -> bool:
     """
-    This function iteratively removes "dead ends" from a result graph until no more dead ends can be found. Dead ends
-    can be thought of as intermediate nodes (typically for is_set=True qnodes) that connect to only a subset of the
-    nodes they should be connected to according to the query graph. Only the part of the result graph that has been
-    "fulfilled" so far during the result construction process is evaluated here: the sub_qg_adj_map must contain only
-    info for qnodes fulfilled thus far.
+    This function iteratively removes "dead ends" from a set of candidate KG nodes per qnode: nodes that are not
+    connected to any of the nodes in some neighboring qnode's set. Only
+    qnodes neighboring the ones whose sets changed (changed_qnode_keys) are rechecked, and then only as far as
+    removals cascade. Sets in node_sets are replaced rather than modified, so they can be shared between results.
+    Returns False if any qnode ends up with no nodes (i.e., no result can be formed from these node sets).
     """
-    fulfilled_qnode_keys = set(sub_qg_adj_map)
-    found_dead_ends = True
-    while found_dead_ends:
-        found_dead_ends = False
-        nodes_to_remove: dict[str, set[str]] = dict()
-        # Go through each qnode "role" in our result graph, and check the nodes corresponding to that qnode
-        for qnode_key in fulfilled_qnode_keys:
-            corresponding_node_keys = result_graph["nodes"][qnode_key]
-            required_neighbor_qnode_keys = sub_qg_adj_map[qnode_key]
-            # Make sure each node for this qnode ID is connected to at LEAST one node fulfilling each neighbor qnode ID
-            for corresponding_node_key in corresponding_node_keys:
-                for neighbor_qnode_key in required_neighbor_qnode_keys:
-                    # Look for at least one node in the result graph in this neighbor spot that this node is linked to
-                    neighbors_in_kg = kg_node_adj_map_by_qg_key[qnode_key][corresponding_node_key][neighbor_qnode_key]
-                    if not neighbors_in_kg.intersection(result_graph["nodes"][neighbor_qnode_key]):
-                        # Mark this node for removal from this result graph since it's lacking a neighbor here
-                        found_dead_ends = True
-                        if qnode_key not in nodes_to_remove:
-                            nodes_to_remove[qnode_key] = set()
-                        nodes_to_remove[qnode_key].add(corresponding_node_key)
-        # Actually go through and remove our nodes marked for removal
-        for qnode_key, node_keys in nodes_to_remove.items():
-            result_graph["nodes"][qnode_key] = result_graph["nodes"][qnode_key].difference(node_keys)
-    return result_graph
+    arcs_to_check = collections.deque((qnode_key, changed_qnode_key) for changed_qnode_key in changed_qnode_keys
+                                      for qnode_key in qg_adj_map[changed_qnode_key])
+    arcs_queued = set(arcs_to_check)
+    while arcs_to_check:
+        arc = arcs_to_check.popleft()
+        arcs_queued.remove(arc)
+        qnode_key, neighbor_qnode_key = arc
+        node_keys = node_sets[qnode_key]
+        neighbor_node_keys = node_sets[neighbor_qnode_key]
+        # Look up connections from whichever side has fewer nodes (connections are recorded in both directions)
+        if len(neighbor_node_keys) < len(node_keys):
+            neighbor_adj_map = kg_node_adj_map_by_qg_key[neighbor_qnode_key]
+            connected_node_keys = set().union(*(neighbor_adj_map[neighbor_node_key][qnode_key]
+                                                for neighbor_node_key in neighbor_node_keys))
+            remaining_node_keys = node_keys.intersection(connected_node_keys)
+        else:
+            adj_map = kg_node_adj_map_by_qg_key[qnode_key]
+            remaining_node_keys = {node_key for node_key in node_keys
+                                   if not adj_map[node_key][neighbor_qnode_key].isdisjoint(neighbor_node_keys)}
+        if len(remaining_node_keys) < len(node_keys):
+            if not remaining_node_keys:
+                return False
+            node_sets[qnode_key] = remaining_node_keys
+            # Nodes for the other neighbors of this qnode may have just lost their only connection
+            for other_qnode_key in qg_adj_map[qnode_key]:
+                other_arc = (other_qnode_key, qnode_key)
+                if other_qnode_key != neighbor_qnode_key and other_arc not in arcs_queued:
+                    arcs_to_check.append(other_arc)
+                    arcs_queued.add(other_arc)
+    return True
 
 
-def _create_result_graphs(qg: QueryGraph,
-                          kg_node_keys_by_qg_key: dict[str, set[str]],
-                          edge_keys_by_subject: DefaultDict[str, DefaultDict[str, set[str]]],
-                          edge_keys_by_object: DefaultDict[str, DefaultDict[str, set[str]]],
-                          edge_keys_by_node_pair: DefaultDict[str, DefaultDict[tuple[str, str], set[str]]],
-                          ignore_edge_direction: bool = True,
-                          log: Optional[ARAXResponse] = None,
-                          base_result_graphs: Optional[list[dict]] = None) -> list[dict]:
-    if log is None:
-        log = ARAXResponse()
-    kg_node_adj_map_by_qg_key = _get_kg_node_adj_map_by_qg_key(kg_node_keys_by_qg_key, edge_keys_by_node_pair, qg, log)
-    qg_adj_map = _get_qg_adj_map_undirected(qg)
-
-    # Iteratively construct "result graphs" (initially containing only nodes, not edges) by walking through all qnodes
-    log.debug("Constructing result graphs qnode by qnode")
+def _enumerate_result_node_sets(node_sets: dict[str, set[str]],
+                                unassigned_qnode_keys: set[str],
+                                qg_adj_map: dict[str, set[str]],
+                                kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]]) -> Iterator[dict[str, set[str]]]:
+    """
+    This function yields the node sets for each result that can be formed from the given (dead end-free) node sets
+    by picking a single node for each of the unassigned_qnode_keys (the is_set=False qnodes). It branches on the
+    qnode with the fewest candidate nodes first, and prunes dead ends after each pick, which cuts off branches that
+    can't lead to a result right away.
+    """
+    if not unassigned_qnode_keys:
+        yield node_sets
+        return
+    qnode_key = min(unassigned_qnode_keys, key=lambda unassigned_qnode_key: (len(node_sets[unassigned_qnode_key]),
+                                                                              unassigned_qnode_key))
+    remaining_qnode_keys = unassigned_qnode_keys.difference({qnode_key})
+    if len(node_sets[qnode_key]) == 1:
+        # Nothing to choose (or prune) here
+        yield from _enumerate_result_node_sets(node_sets, remaining_qnode_keys, qg_adj_map, kg_node_adj_map_by_qg_key)
+        return
+    for node_key in node_sets[qnode_key]:
+        node_sets_for_node = dict(node_sets)
+        node_sets_for_node[qnode_key] = {node_key}
+        if _prune_dead_ends_from_node_sets(node_sets_for_node, [qnode_key], qg_adj_map, kg_node_adj_map_by_qg_key):
+            yield from _enumerate_result_node_sets(node_sets_for_node, remaining_qnode_keys, qg_adj_map,
+                                                   kg_node_adj_map_by_qg_key)
+
+
+def _assign_result_graph_nodes_by_join(qg: QueryGraph,
+                                       kg_node_keys_by_qg_key: dict[str, set[str]],
+                                       kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]],
+                                       log: ARAXResponse,
+                                       base_result_graphs: Optional[list[dict]] = None) -> list[dict]:
+    """
+    This function constructs "result graphs" (containing only nodes, not edges) as a join over the QG. Each result
+    graph has a single KG node for each is_set=False qnode and, for each is_set=True qnode, all KG nodes that are
+    (after iteratively removing dead ends) connected to the result's nodes for every neighboring qnode. Results come
+    out the same as with the original qnode-by-qnode walk (kept in code/ARAX/Testing/benchmark_resultify_join.py),
+    but without copying and re-cleaning a partial result graph for every candidate node along the way: KG nodes that
+    can't be part of any result are pruned up front for the whole QG, and the is_set=False qnodes are then filled in
+    order of their number of candidate nodes, pruning after each choice (see _enumerate_result_node_sets). If base
+    result graphs are given (for option group processing), only the qnodes they don't already cover are filled in.
+    """
+    qg_adj_map = _get_qg_adj_map_without_self_qedges(qg)
     if base_result_graphs:
-        # We'll build off of the 'base' result graphs rather than start anew (saves time for option group processing)
-        result_graphs = base_result_graphs
-        qnode_keys_already_handled = set(result_graphs[0]["nodes"])
+        qnode_keys_already_handled = set(base_result_graphs[0]["nodes"])
         qnode_keys_remaining = set(qg.nodes).difference(qnode_keys_already_handled)
+        if not qnode_keys_remaining:
+            return base_result_graphs
     else:
-        result_graphs = []
+        base_result_graphs = []
         qnode_keys_already_handled = set()
         qnode_keys_remaining = set(qg.nodes)
     log.debug(f"Qnode keys already handled are: {qnode_keys_already_handled}")
-    while qnode_keys_remaining:
-        # Start with a random qnode if this is our first iteration
-        if not qnode_keys_already_handled:
-            current_qnode_key = list(qnode_keys_remaining)[0]
-            prior_qnode_connections: set[str] = set()
-        # Otherwise find a yet unhandled qnode ID that connects somehow to the part of the QG we've already handled
-        else:
-            current_qnode_key, prior_qnode_connections = _find_qnode_connected_to_sub_qg(qnode_keys_already_handled, qnode_keys_remaining, qg)
-            log.debug(f"Next qnode chosen is: {current_qnode_key}")
-        current_qnode = qg.nodes[current_qnode_key]
-
-        # Initialize our result graphs if this is our first iteration
-        if not result_graphs:
-            log.debug(f"Initiating result graphs with nodes for {current_qnode_key} (is_set={current_qnode.is_set})")
-            all_node_keys_in_kg_for_this_qnode_key = kg_node_keys_by_qg_key.get(current_qnode_key)
-            assert all_node_keys_in_kg_for_this_qnode_key is not None, \
-                f"unexpected None state for all_node_keys_in_kg_for_this_qnode_key; current_qnode_key: {current_qnode_key}"
-
-            # We'll start with one result graph with ALL corresponding nodes in the KG in this spot if is_set=True
-            if current_qnode.is_set:
-                log.debug(f"Starting with one result graph because is_set=True for {current_qnode_key}")
-                new_result_graph = _create_new_empty_result_graph()
-                new_result_graph["nodes"][current_qnode_key] = all_node_keys_in_kg_for_this_qnode_key  # Parents included already
-                result_graphs.append(new_result_graph)
-            # Otherwise, we'll start with a result graph for EACH corresponding node in the KG
-            else:
-                log.debug(f'Starting with a result graph for each {current_qnode_key} node')
-                for node_key in all_node_keys_in_kg_for_this_qnode_key:
-                    new_result_graph = _create_new_empty_result_graph()
-                    new_result_graph["nodes"][current_qnode_key] = {node_key}
-                    result_graphs.append(new_result_graph)
-        # Otherwise fan out our existing result graphs, filling out this qnode spot in them based on prior contents
-        else:
-            log.debug(f"Adding a layer to each result graph for qnode {current_qnode_key} (is_set={current_qnode.is_set})")
-            new_result_graphs = []
-            sub_qg_adj_map = _extract_sub_qg_adj_map(qg_adj_map, qnode_keys_already_handled.union({current_qnode_key}))
-            for result_graph in result_graphs:
-                # Figure out which KG nodes could fulfill the current qnode in this result
-                prior_qnodes_kg_nodes = {prior_qnode_key: result_graph["nodes"][prior_qnode_key] for prior_qnode_key in prior_qnode_connections}
-                current_kg_node_possibilities = [_get_all_adjacent_nodes(corresponding_kg_nodes, prior_qnode_key, current_qnode_key, kg_node_adj_map_by_qg_key)
-                                                 for prior_qnode_key, corresponding_kg_nodes in prior_qnodes_kg_nodes.items()]
-                # Only keep connections that have links to KG nodes in ALL prior connected qnode roles
-                final_connected_kg_nodes = set.intersection(*current_kg_node_possibilities)
-
-                # Fan out or add to result graphs as appropriate
-                if final_connected_kg_nodes:
-                    if current_qnode.is_set:
-                        # Replace this result graph with a new one with all valid connections listed under this qnode
-                        new_result_graph = _copy_result_graph(result_graph)
-                        new_result_graph["nodes"][current_qnode_key] = final_connected_kg_nodes
-                        pruned_result_graph = _clean_up_dead_ends(result_graph=new_result_graph,
-                                                                  sub_qg_adj_map=sub_qg_adj_map,
-                                                                  kg_node_adj_map_by_qg_key=kg_node_adj_map_by_qg_key,
-                                                                  log=log)
-                        new_result_graphs.append(pruned_result_graph)
-                    else:
-                        # Create a new result graph for each new valid connected node
-                        for connected_node_key in final_connected_kg_nodes:
-                            new_result_graph = _copy_result_graph(result_graph)
-                            new_result_graph["nodes"][current_qnode_key] = {connected_node_key}
-                            pruned_result_graph = _clean_up_dead_ends(result_graph=new_result_graph,
-                                                                      sub_qg_adj_map=sub_qg_adj_map,
-                                                                      kg_node_adj_map_by_qg_key=kg_node_adj_map_by_qg_key,
-                                                                      log=log)
-                            new_result_graphs.append(pruned_result_graph)
-
-            result_graphs = new_result_graphs
-        log.debug(f"Current count of result graphs is {len(result_graphs)}")
-
-        # Update our records about which qnodes we've already processed
-        qnode_keys_remaining.remove(current_qnode_key)
-        qnode_keys_already_handled.add(current_qnode_key)
-    log.debug("Done assigning nodes to result graphs.")
 
-    # Then add edges to our result graphs as appropriate (note, we DON'T add subclass self-qedges for now)
-    log.debug("Adding edges to result graphs")
+    # First prune KG nodes that can't be part of any result (those with no connection to a neighboring qnode's nodes)
+    node_sets = {qnode_key: kg_node_keys_by_qg_key[qnode_key] for qnode_key in qg.nodes}
+    if not all(node_sets.values()) or \
+            not _prune_dead_ends_from_node_sets(node_sets, qg.nodes, qg_adj_map, kg_node_adj_map_by_qg_key):
+        log.debug("No KG nodes can be connected across the whole QG; no result graphs")
+        return []
+    log.debug(f"Candidate KG nodes per qnode after pruning dead ends: "
+              f"{ {qnode_key: len(node_keys) for qnode_key, node_keys in node_sets.items()} }")
+
+    non_set_qnode_keys = {qnode_key for qnode_key in qnode_keys_remaining if not qg.nodes[qnode_key].is_set}
+    result_graphs = []
+    for base_result_graph in base_result_graphs or [None]:
+        start_node_sets = dict(node_sets)
+        if base_result_graph:
+            for qnode_key in qnode_keys_already_handled:
+                start_node_sets[qnode_key] = node_sets[qnode_key].intersection(base_result_graph["nodes"][qnode_key])
+            if not all(start_node_sets.values()) or \
+                    not _prune_dead_ends_from_node_sets(start_node_sets, qnode_keys_already_handled, qg_adj_map,
+                                                        kg_node_adj_map_by_qg_key):
+                continue
+        for result_node_sets in _enumerate_result_node_sets(start_node_sets, non_set_qnode_keys, qg_adj_map,
+                                                            kg_node_adj_map_by_qg_key):
+            # Give each result graph its own sets, since they're modified later on
+            new_result_graph = _create_new_empty_result_graph()
+            for qnode_key, node_keys in result_node_sets.items():
+                new_result_graph["nodes"][qnode_key] = set(node_keys)
+            if base_result_graph:
+                for qedge_key, edge_keys in base_result_graph["edges"].items():
+                    new_result_graph["edges"][qedge_key] = set(edge_keys)
+            result_graphs.append(new_result_graph)
+    log.debug(f"Current count of result graphs is {len(result_graphs)}")
+    return result_graphs
+
+
+def _add_edges_to_result_graphs(result_graphs: list[dict],
+                                qg: QueryGraph,
+                                edge_keys_by_subject: DefaultDict[str, DefaultDict[str, set[str]]],
+                                edge_keys_by_object: DefaultDict[str, DefaultDict[str, set[str]]],
+                                edge_keys_by_node_pair: DefaultDict[str, DefaultDict[tuple[str, str], set[str]]],
+                                ignore_edge_direction: bool = True):
+    """
+    This function fills in the edges for each qedge in each of the given result graphs: all KG edges fulfilling the
+    qedge that connect a node for its subject qnode to a node for its object qnode in the result graph.
+    """
     for result_graph in result_graphs:
         for qedge_key, qedge in qg.edges.items():
             qedge_source_node_ids = result_graph['nodes'][qedge.subject]
@@ -1743,7 +1804,247 @@ def _create_result_graphs(qg: QueryGraph,
                                                  for edge_key in edge_keys_by_object[qedge_key][source_node]}
                     result_graph['edges'][qedge_key].update(edges_with_reverse_subject.intersection(edges_with_reverse_object))
 
+
+def _create_result_graphs(qg: QueryGraph,
+                          kg_node_keys_by_qg_key: dict[str, set[str]],
+                          edge_keys_by_subject: DefaultDict[str, DefaultDict[str, set[str]]],
+                          edge_keys_by_object: DefaultDict[str, DefaultDict[str, set[str]]],
+                          edge_keys_by_node_pair: DefaultDict[str, DefaultDict[tuple[str, str], set[str]]],
+                          ignore_edge_direction: bool = True,
+                          log: Optional[ARAXResponse] = None,
+                          base_result_graphs: Optional[list[dict]] = None) -> list[dict]:
+    if log is None:
+        log = ARAXResponse()
+    kg_node_adj_map_by_qg_key = _get_kg_node_adj_map_by_qg_key(kg_node_keys_by_qg_key, edge_keys_by_node_pair, qg, log)
+
+    result_graphs = _assign_result_graph_nodes_by_join(qg, kg_node_keys_by_qg_key, kg_node_adj_map_by_qg_key,
+                                                       log, base_result_graphs)
+    log.debug("Done assigning nodes to result graphs.")
+
+    # Then add edges to our result graphs as appropriate (note, we DON'T add subclass self-qedges for now)
+    log.debug("Adding edges to result graphs")
+    _add_edges_to_result_graphs(result_graphs, qg, edge_keys_by_subject, edge_keys_by_object, edge_keys_by_node_pair,
+                                ignore_edge_direction)
+
     # Filter out any results for which not every qnode/qedge is fulfilled (with the exception of subclass self-qedges)
     final_result_graphs = [result_graph for result_graph in result_graphs if _result_graph_is_fulfilled(result_graph, qg)]
     log.debug(f"After pruning out result graphs missing edges, there are {len(final_result_graphs)} result graphs")
     return final_result_graphs
+
+
+class _ResultGraphIndex:
+    """
+    This is what incremental resultify() keeps on the response in between calls: a snapshot of the QG and the (bound)
+    KG that the last results were computed from, along with that call's result graphs (for the required portion of
+    the QG and for each option group, as they were before being merged and having children separated from parents).
+    Nothing in here is modified after it's created.
+    """
+    def __init__(self,
+                 qg_signature: tuple[dict, dict],
+                 ignore_edge_direction: bool,
+                 kg_node_keys_by_qg_key: dict[str, set[str]],
+                 kg_node_keys_by_qg_key_collapsed: dict[str, set[str]],
+                 qedge_fulfillments_by_edge_key: dict[str, set[tuple[str, str, str]]],
+                 child_to_parent_map: dict[str, dict[str, str]],
+                 result_graphs_required: list[dict],
+                 option_group_results_dict: dict[str, list[dict]]):
+        self.qg_signature = qg_signature
+        self.ignore_edge_direction = ignore_edge_direction
+        self.kg_node_keys_by_qg_key = kg_node_keys_by_qg_key
+        self.kg_node_keys_by_qg_key_collapsed = kg_node_keys_by_qg_key_collapsed
+        self.qedge_fulfillments_by_edge_key = qedge_fulfillments_by_edge_key
+        self.child_to_parent_map = child_to_parent_map
+        self.result_graphs_required = result_graphs_required
+        self.option_group_results_dict = option_group_results_dict
+
+
+def _copy_result_graphs(result_graphs: list[dict]) -> list[dict]:
+    # Much faster than deepcopy-ing the result graphs, which only ever contain sets of node/edge keys
+    result_graphs_copy = []
+    for result_graph in result_graphs:
+        result_graph_copy = _create_new_empty_result_graph()
+        for qnode_key, node_keys in result_graph["nodes"].items():
+            result_graph_copy["nodes"][qnode_key] = set(node_keys)
+        for qedge_key, edge_keys in result_graph["edges"].items():
+            result_graph_copy["edges"][qedge_key] = set(edge_keys)
+        result_graphs_copy.append(result_graph_copy)
+    return result_graphs_copy
+
+
+def _get_qg_signature(qg: QueryGraph) -> tuple[dict, dict]:
+    # Captures everything about the QG's shape that result graphs depend on
+    qnode_signatures = {qnode_key: (bool(qnode.is_set), qnode.option_group_id) for qnode_key, qnode in qg.nodes.items()}
+    qedge_signatures = {qedge_key: (qedge.subject, qedge.object, qedge.option_group_id, _is_subclass_self_qedge(qedge))
+                        for qedge_key, qedge in qg.edges.items()}
+    return qnode_signatures, qedge_signatures
+
+
+def _get_reason_kg_deltas_are_not_applicable(index: _ResultGraphIndex,
+                                             qg_signature: tuple[dict, dict],
+                                             option_group_ids: set[str],
+                                             kg_node_keys_by_qg_key: dict[str, set[str]],
+                                             kg_node_keys_by_qg_key_collapsed: dict[str, set[str]],
+                                             qedge_fulfillments_by_edge_key: dict[str, set[tuple[str, str, str]]],
+                                             child_to_parent_map: dict[str, dict[str, str]],
+                                             ignore_edge_direction: bool) -> Optional[str]:
+    """
+    This function checks whether the changes since the last resultify() call are ones that can only take away from
+    its results: removed KG nodes/edges, and new qedges between existing qnodes (e.g., virtual edges from Overlay)
+    that the KG's edges are checked against. It returns the reason a full recomputation is needed if not.
+    """
+    qnode_signatures, qedge_signatures = qg_signature
+    old_qnode_signatures, old_qedge_signatures = index.qg_signature
+    if ignore_edge_direction != index.ignore_edge_direction:
+        return "ignore_edge_direction changed"
+    if qnode_signatures != old_qnode_signatures:
+        return "the QG's qnodes changed"
+    if any(qedge_signatures.get(qedge_key) != qedge_signature
+           for qedge_key, qedge_signature in old_qedge_signatures.items()):
+        return "qedges were changed or removed from the QG"
+    added_qedge_keys = set(qedge_signatures).difference(old_qedge_signatures)
+    if any(qedge_signatures[qedge_key][0] == qedge_signatures[qedge_key][1] for qedge_key in added_qedge_keys):
+        return "self-qedges were added to the QG"
+    if option_group_ids != set(index.option_group_results_dict):
+        return "the QG's option groups changed"
+    for qnode_key, node_keys in kg_node_keys_by_qg_key.items():
+        if not node_keys.issubset(index.kg_node_keys_by_qg_key.get(qnode_key, set())) or \
+                not kg_node_keys_by_qg_key_collapsed[qnode_key].issubset(index.kg_node_keys_by_qg_key_collapsed.get(qnode_key, set())):
+            return f"KG nodes fulfilling {qnode_key} were added"
+    for qnode_key, parent_map in child_to_parent_map.items():
+        old_parent_map = index.child_to_parent_map.get(qnode_key, dict())
+        if any(old_parent_map.get(child_key) != parent_key for child_key, parent_key in parent_map.items()):
+            return f"subclass relationships for {qnode_key} changed"
+    for edge_key, qedge_fulfillments in qedge_fulfillments_by_edge_key.items():
+        new_qedge_fulfillments = qedge_fulfillments.difference(index.qedge_fulfillments_by_edge_key.get(edge_key, set()))
+        if any(qedge_key not in added_qedge_keys for qedge_key, _, _ in new_qedge_fulfillments):
+            return "KG edges fulfilling existing qedges were added"
+    return None
+
+
+def _update_result_graphs_for_kg_deltas(index: Optional[_ResultGraphIndex],
+                                        qg_signature: tuple[dict, dict],
+                                        required_qg: QueryGraph,
+                                        option_group_qgs: dict[str, QueryGraph],
+                                        kg_node_keys_by_qg_key: dict[str, set[str]],
+                                        kg_node_keys_by_qg_key_collapsed: dict[str, set[str]],
+                                        kg_edge_keys_by_qg_key: dict[str, set[str]],
+                                        qedge_fulfillments_by_edge_key: dict[str, set[tuple[str, str, str]]],
+                                        child_to_parent_map: dict[str, dict[str, str]],
+                                        edge_keys_by_subject: DefaultDict[str, DefaultDict[str, set[str]]],
+                                        edge_keys_by_object: DefaultDict[str, DefaultDict[str, set[str]]],
+                                        edge_keys_by_node_pair: DefaultDict[str, DefaultDict[tuple[str, str], set[str]]],
+                                        ignore_edge_direction: bool,
+                                        log: ARAXResponse) -> Optional[tuple[list[dict], dict[str, list[dict]]]]:
+    """
+    This function updates the result graphs from the last (incremental) resultify() call for what has changed in the
+    KG/QG since, returning the required and option group result graphs, or None if they need to be recomputed from
+    scratch. Removing KG nodes/edges and adding qedges can only shrink each result graph (or drop it altogether), so
+    only result graphs that contain a removed node, a removed edge's nodes, or that an added qedge applies to are
+    redone, by pruning dead ends from their old nodes; all other result graphs are kept as is.
+    """
+    if index is None:
+        log.debug("No result graphs from an earlier resultify() call to update; will compute results from scratch")
+        return None
+    reason = _get_reason_kg_deltas_are_not_applicable(index, qg_signature, set(option_group_qgs), kg_node_keys_by_qg_key,
+                                                      kg_node_keys_by_qg_key_collapsed, qedge_fulfillments_by_edge_key,
+                                                      child_to_parent_map, ignore_edge_direction)
+    if reason:
+        log.info(f"Can't reuse result graphs from the last resultify() call because {reason}; will compute results "
+                 f"from scratch")
+        return None
+
+    # Figure out which (collapsed) nodes and node pairs were removed
+    added_qedge_keys = set(qg_signature[1]).difference(index.qg_signature[1])
+    removed_node_keys = {node_key for qnode_key, old_node_keys in index.kg_node_keys_by_qg_key_collapsed.items()
+                         for node_key in old_node_keys.difference(kg_node_keys_by_qg_key_collapsed.get(qnode_key, set()))}
+    removed_node_pair_map = collections.defaultdict(set)
+    for edge_key, old_qedge_fulfillments in index.qedge_fulfillments_by_edge_key.items():
+        for _, subject_key, object_key in old_qedge_fulfillments.difference(qedge_fulfillments_by_edge_key.get(edge_key, set())):
+            removed_node_pair_map[subject_key].add(object_key)
+            removed_node_pair_map[object_key].add(subject_key)
+    log.info(f"Updating result graphs from the last resultify() call for {len(removed_node_keys)} removed nodes, "
+             f"{len(removed_node_pair_map)} nodes with removed edges, and added qedges {added_qedge_keys}")
+
+    def result_graph_is_affected(result_graph: dict) -> bool:
+        node_keys = {node_key for node_keys_for_qnode in result_graph["nodes"].values() for node_key in node_keys_for_qnode}
+        return not removed_node_keys.isdisjoint(node_keys) or \
+            any(not removed_node_pair_map[node_key].isdisjoint(node_keys)
+                for node_key in node_keys if node_key in removed_node_pair_map)
+
+    def update_result_graphs(result_graphs: list[dict], sub_qg: QueryGraph,
+                             base_result_graphs_by_key: Optional[dict[str, dict]] = None,
+                             updated_base_result_keys: Optional[set[str]] = None) -> list[dict]:
+        base_qnode_keys = set(required_qg.nodes) if base_result_graphs_by_key is not None else set()
+        required_non_set_qnode_keys = [qnode_key for qnode_key in base_qnode_keys if not required_qg.nodes[qnode_key].is_set]
+        if any(not kg_node_keys_by_qg_key_collapsed.get(qnode_key) for qnode_key in sub_qg.nodes) or \
+                any(not kg_edge_keys_by_qg_key.get(qedge_key) for qedge_key in sub_qg.edges):
+            return []
+        all_affected = bool(added_qedge_keys.intersection(sub_qg.edges))
+        kept_result_graphs = []
+        node_sets_to_redo = []
+        for result_graph in result_graphs:
+            base_result_graph = None
+            if base_result_graphs_by_key is not None:
+                result_key = _get_result_graph_key(result_graph, required_non_set_qnode_keys, log)
+                base_result_graph = base_result_graphs_by_key.get(result_key)
+                if base_result_graph is None:
+                    continue  # Its 'required' result graph is gone
+                if result_key not in updated_base_result_keys and not all_affected and \
+                        not result_graph_is_affected(result_graph):
+                    kept_result_graphs.append(result_graph)
+                    continue
+            elif not all_affected and not result_graph_is_affected(result_graph):
+                kept_result_graphs.append(result_graph)
+                continue
+            node_sets = {qnode_key: result_graph["nodes"][qnode_key].intersection(kg_node_keys_by_qg_key_collapsed[qnode_key])
+                         for qnode_key in sub_qg.nodes}
+            for qnode_key in base_qnode_keys:
+                node_sets[qnode_key] = node_sets[qnode_key].intersection(base_result_graph["nodes"][qnode_key])
+            node_sets_to_redo.append((node_sets, base_result_graph))
+
+        redone_result_graphs = []
+        if node_sets_to_redo:
+            qg_adj_map = _get_qg_adj_map_without_self_qedges(sub_qg)
+            # Only the nodes in result graphs being redone need to be in the adjacency map
+            node_keys_to_redo_by_qg_key = {qnode_key: {node_key for node_sets, _ in node_sets_to_redo
+                                                       for node_key in node_sets[qnode_key]}
+                                           for qnode_key in sub_qg.nodes}
+            kg_node_adj_map_by_qg_key = _get_kg_node_adj_map_by_qg_key(node_keys_to_redo_by_qg_key,
+                                                                       edge_keys_by_node_pair, sub_qg, log)
+            # Like _assign_result_graph_nodes_by_join, leave the nodes from the 'required' result graphs as they are for
+            # option groups that don't add any qnodes (their result graphs just get the option group's edges added)
+            adds_qnodes = bool(set(sub_qg.nodes).difference(base_qnode_keys))
+            for node_sets, base_result_graph in node_sets_to_redo:
+                if all(node_sets.values()) and \
+                        (not adds_qnodes or
+                         _prune_dead_ends_from_node_sets(node_sets, sub_qg.nodes, qg_adj_map, kg_node_adj_map_by_qg_key)):
+                    redone_result_graph = _create_new_empty_result_graph()
+                    redone_result_graph["nodes"].update(node_sets)
+                    if base_result_graph:
+                        for qedge_key, edge_keys in base_result_graph["edges"].items():
+                            redone_result_graph["edges"][qedge_key] = set(edge_keys)
+                    redone_result_graphs.append(redone_result_graph)
+            _add_edges_to_result_graphs(redone_result_graphs, sub_qg, edge_keys_by_subject, edge_keys_by_object,
+                                        edge_keys_by_node_pair, ignore_edge_direction)
+            redone_result_graphs = [result_graph for result_graph in redone_result_graphs
+                                    if _result_graph_is_fulfilled(result_graph, sub_qg)]
+        log.debug(f"Kept {len(kept_result_graphs)} result graphs as is; redid {len(node_sets_to_redo)} result graphs, "
+                  f"{len(redone_result_graphs)} of which still fulfill the QG")
+        return kept_result_graphs + redone_result_graphs
+
+    result_graphs_required = update_result_graphs(index.result_graphs_required, required_qg)
+    option_group_results_dict = dict()
+    if option_group_qgs:
+        required_non_set_qnode_keys = [qnode_key for qnode_key, qnode in required_qg.nodes.items() if not qnode.is_set]
+        required_result_graphs_by_key = {_get_result_graph_key(result_graph, required_non_set_qnode_keys, log): result_graph
+                                         for result_graph in result_graphs_required}
+        kept_required_result_graph_ids = {id(result_graph) for result_graph in index.result_graphs_required}
+        updated_required_result_keys = {result_key for result_key, result_graph in required_result_graphs_by_key.items()
+                                        if id(result_graph) not in kept_required_result_graph_ids}
+        for option_group_id, option_group_qg in option_group_qgs.items():
+            option_group_results_dict[option_group_id] = update_result_graphs(index.option_group_results_dict[option_group_id],
+                                                                              option_group_qg,
+                                                                              required_result_graphs_by_key,
+                                                                              updated_required_result_keys)
+    log.debug(f"Have {len(result_graphs_required)} required result graphs after updating")
+    return result_graphs_required, option_group_results_dict
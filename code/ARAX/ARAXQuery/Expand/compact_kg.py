@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""
+Compact, slotted stand-ins for the TRAPI KG models (Node, Edge, Attribute, RetrievalSource, Qualifier)
+that Expand uses while it accumulates KP answers in QGOrganizedKnowledgeGraphs.
+
+The generated OpenAPI model classes are heavyweight: on top of its own __dict__, every instance carries
+its own copies of the `openapi_types` and `attribute_map` dicts, so an edge with a handful of attributes
+and sources is a dozen or so dicts. A multi-hop query can hold millions of these before Expand prunes
+its answers. The records here have the same field names as the models (so Expand's code reads and
+mutates them the same way), but use __slots__, and the strings that repeat across a KG (CURIEs,
+predicates, categories, attribute type IDs, infores curies, ...) are interned as records are built.
+
+Records are converted to the real TRAPI models (with to_trapi_model()) when Expand turns its
+QGOrganizedKnowledgeGraph into the message's KnowledgeGraph (see
+expand_utilities.convert_qg_organized_kg_to_standard_kg), so nothing downstream of Expand ever sees them.
+"""
+
+import sys
+import os
+from typing import Any, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../../UI/OpenAPI/python-flask-server/")
+from openapi_server.models.attribute import Attribute  # noqa: E402
+from openapi_server.models.base_model_ import Model  # noqa: E402
+from openapi_server.models.edge import Edge  # noqa: E402
+from openapi_server.models.node import Node  # noqa: E402
+from openapi_server.models.qualifier import Qualifier  # noqa: E402
+from openapi_server.models.retrieval_source import RetrievalSource  # noqa: E402
+
+def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
+
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(item) if isinstance(item, str) else item for item in value]
+    return value
+
+
+_model_templates: dict[type[Model], dict[str, Any]] = {}
+
+
+def _get_model_template(model_class: type[Model]) -> dict[str, Any]:
+    """
+    Returns the instance dict of a default-constructed model. The generated constructors build fresh
+    `openapi_types`/`attribute_map` dicts for every instance; models made from this template share
+    them instead (nothing modifies them), which makes building them several times faster and smaller.
+    """
+    if model_class not in _model_templates:
+        _model_templates[model_class] = vars(model_class())
+    return _model_templates[model_class]
+
+
+_UNSET = object()
+_model_fields: dict[type, tuple[tuple[str, str, bool], ...]] = {}
+
+
+def _get_model_fields(record_class: type['CompactRecord']) -> tuple[tuple[str, str, bool], ...]:
+    """Returns (record field, model __dict__ key, is a list of nested records) for a record class."""
+    if record_class not in _model_fields:
+        _model_fields[record_class] = \
+            tuple((field, f"_{field}", field in record_class.nested_fields) for field in record_class.fields) + \
+            tuple((field, field, False) for field in record_class.extra_fields)
+    return _model_fields[record_class]
+
+
+class CompactRecord:
+    """
+    Base class for the compact records. Subclasses declare their TRAPI fields (in the order of the
+    model's constructor arguments) and which of them are required, interned, or lists of nested records.
+    """
+    __slots__ = ()
+    trapi_class: type[Model] = Model
+    fields: tuple[str, ...] = ()
+    defaults: dict[str, Any] = {}
+    required_fields: frozenset[str] = frozenset()
+    interned_fields: frozenset[str] = frozenset()
+    nested_fields: dict[str, type['CompactRecord']] = {}
+    # Non-TRAPI properties ARAX tacks onto the models (left unset until assigned, as on the models)
+    extra_fields: tuple[str, ...] = ()
+
+    def __init__(self, **kwargs):
+        for field in self.fields:
+            setattr(self, field, kwargs.get(field, self.defaults.get(field)))
+        for field in self.extra_fields:
+            if field in kwargs:
+                setattr(self, field, kwargs[field])
+
+    @classmethod
+    def from_dict(cls, dikt: dict):
+        """
+        Builds a record from a (JSON) TRAPI dict, raising ValueError for the same invalid values the
+        OpenAPI model's from_dict() would.
+        """
+        record = cls.__new__(cls)
+        for field in cls.fields:
+            if field not in dikt:
+                setattr(record, field, cls.defaults.get(field))
+                continue
+            value = dikt[field]
+            if value is None:
+                if field in cls.required_fields:
+                    raise ValueError(f"Invalid value for `{field}`, must not be `None`")
+            elif field in cls.nested_fields:
+                nested_class = cls.nested_fields[field]
+                value = [nested_class.from_dict(item) for item in value]
+            elif field in cls.interned_fields:
+                value = _intern(value)
+            setattr(record, field, value)
+        return record
+
+    def to_trapi(self) -> Model:
+        """Returns the TRAPI model equivalent of this record."""
+        model_dict = dict(_get_model_template(self.trapi_class))
+        for field, model_field, is_nested in _get_model_fields(type(self)):
+            value = getattr(self, field, _UNSET)
+            if value is _UNSET:
+                continue
+            if is_nested and value is not None:
+                value = [item.to_trapi() if isinstance(item, CompactRecord) else item for item in value]
+            model_dict[model_field] = value
+        model = self.trapi_class.__new__(self.trapi_class)
+        model.__dict__ = model_dict
+        return model
+
+    def to_dict(self) -> dict:
+        return self.to_trapi().to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{field}={getattr(self, field)!r}' for field in self.fields)})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and \
+            all(getattr(self, field) == getattr(other, field) for field in self.fields)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None  # Mutable, like the models
+
+
+class CompactAttribute(CompactRecord):
+    __slots__ = ('attribute_type_id', 'original_attribute_name', 'value', 'value_type_id', 'attribute_source',
+                 'value_url', 'description', 'attributes')
+    trapi_class = Attribute
+    fields = __slots__
+    required_fields = frozenset({'attribute_type_id', 'value'})
+    interned_fields = frozenset({'attribute_type_id', 'original_attribute_name', 'value_type_id', 'attribute_source'})
+
+
+CompactAttribute.nested_fields = {'attributes': CompactAttribute}
+
+
+class CompactRetrievalSource(CompactRecord):
+    __slots__ = ('resource_id', 'resource_role', 'upstream_resource_ids', 'source_record_urls')
+    trapi_class = RetrievalSource
+    fields = __slots__
+    required_fields = frozenset({'resource_id', 'resource_role'})
+    interned_fields = frozenset({'resource_id', 'resource_role', 'upstream_resource_ids'})
+
+
+class CompactQualifier(CompactRecord):
+    __slots__ = ('qualifier_type_id', 'qualifier_value')
+    trapi_class = Qualifier
+    fields = __slots__
+    required_fields = frozenset(__slots__)
+    interned_fields = frozenset(__slots__)
+
+
+class CompactNode(CompactRecord):
+    __slots__ = ('name', 'categories', 'attributes', 'is_set', 'query_ids', 'qnode_keys')
+    trapi_class = Node
+    fields = ('name', 'categories', 'attributes', 'is_set')
+    defaults = {'is_set': False}
+    interned_fields = frozenset({'categories'})
+    nested_fields = {'attributes': CompactAttribute}
+    extra_fields = ('query_ids', 'qnode_keys')
+
+
+class CompactEdge(CompactRecord):
+    __slots__ = ('predicate', 'subject', 'object', 'attributes', 'qualifiers', 'sources', 'qedge_keys')
+    trapi_class = Edge
+    fields = ('predicate', 'subject', 'object', 'attributes', 'qualifiers', 'sources')
+    required_fields = frozenset({'predicate', 'subject', 'object', 'sources'})
+    interned_fields = frozenset({'predicate', 'subject', 'object'})
+    nested_fields = {'attributes': CompactAttribute,
+                     'qualifiers': CompactQualifier,
+                     'sources': CompactRetrievalSource}
+    extra_fields = ('qedge_keys',)
+
+    @classmethod
+    def from_dict(cls, dikt: dict):
+        if dikt.get('sources') == []:
+            raise ValueError("Invalid value for `sources`, number of items must be greater than or equal to `1`")
+        return super().from_dict(dikt)
+
+
+def to_trapi_model(item: Optional[Any]) -> Optional[Any]:
+    """
+    Converts a compact record into its TRAPI model; anything else (e.g., something that already is a
+    TRAPI model) is returned as is. (Duck-typed, since this module can get imported both as
+    `compact_kg` and as `Expand.compact_kg`.)
+    """
+    return item.to_trapi() if hasattr(item, 'to_trapi') else item
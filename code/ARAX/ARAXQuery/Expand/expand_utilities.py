@@ -21,6 +21,7 @@ from ARAX_resultify import ARAXResultify
 from ARAX_overlay import ARAXOverlay
 from ARAX_ranker import ARAXRanker
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from compact_kg import to_trapi_model
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../../NodeSynonymizer/")
 from node_synonymizer import NodeSynonymizer
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../../BiolinkHelper/")
@@ -273,25 +274,32 @@ def convert_standard_kg_to_qg_organized_kg(standard_kg: KnowledgeGraph) -> QGOrg
 
 
 def convert_qg_organized_kg_to_standard_kg(organized_kg: QGOrganizedKnowledgeGraph) -> KnowledgeGraph:
+    # Any compact records (see compact_kg.py) are converted into TRAPI models here. The organized KG is emptied as
+    # this goes, so that each record can be freed as soon as its model is made (rather than holding all the records
+    # and all the models at once); its items are taken in insertion order, so the standard KG keeps the same order.
     standard_kg = KnowledgeGraph(nodes=dict(), edges=dict())
     for qnode_key, nodes_for_this_qnode_key in organized_kg.nodes_by_qg_id.items():
-        for node_key, node in nodes_for_this_qnode_key.items():
+        for node_key in list(nodes_for_this_qnode_key):
+            node = nodes_for_this_qnode_key.pop(node_key)
             if node_key in standard_kg.nodes:
                 standard_kg.nodes[node_key].qnode_keys.append(qnode_key)
             else:
+                node = to_trapi_model(node)
                 node.qnode_keys = [qnode_key]
                 standard_kg.nodes[node_key] = node
     for qedge_key, edges_for_this_qedge_key in organized_kg.edges_by_qg_id.items():
-        for edge_key, edge in edges_for_this_qedge_key.items():
+        for edge_key in list(edges_for_this_qedge_key):
+            edge = edges_for_this_qedge_key.pop(edge_key)
             if edge_key in standard_kg.edges:
                 standard_kg.edges[edge_key].qedge_keys.append(qedge_key)
             else:
+                edge = to_trapi_model(edge)
                 edge.qedge_keys = [qedge_key]
                 standard_kg.edges[edge_key] = edge
-    for node_key, node in organized_kg.unbound_nodes.items():
-        standard_kg.nodes[node_key] = node
-    for edge_key, edge in organized_kg.unbound_edges.items():
-        standard_kg.edges[edge_key] = edge
+    for node_key in list(organized_kg.unbound_nodes):
+        standard_kg.nodes[node_key] = to_trapi_model(organized_kg.unbound_nodes.pop(node_key))
+    for edge_key in list(organized_kg.unbound_edges):
+        standard_kg.edges[edge_key] = to_trapi_model(organized_kg.unbound_edges.pop(edge_key))
     return standard_kg
 
 
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+"""
+KPConnectionPool: A process-wide, pooled aiohttp session for POSTing TRAPI
+queries to KPs.
+
+Expand creates a new asyncio event loop for every qedge it expands, and an
+aiohttp session is bound to the loop it was created in. So rather than
+opening a new session (and paying for DNS, TCP and TLS setup) for every KP
+query, the pool runs its own event loop in a daemon thread and owns a single
+keep-alive session there. Callers in any event loop submit their requests to
+the pool loop and await the result. The pool is recreated automatically after
+an os.fork() (since the pool thread does not survive the fork) and closed
+cleanly at interpreter shutdown.
+"""
+
+import asyncio
+import atexit
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
+
+# Constants
+KP_POOL_MAX_CONNECTIONS = 200
+KP_POOL_MAX_CONNECTIONS_PER_HOST = 20
+KP_POOL_KEEPALIVE_SECONDS = 60
+KP_POOL_DNS_CACHE_SECONDS = 300
+KP_POOL_SHUTDOWN_TIMEOUT_SECONDS = 5
+
+
+class KPConnectionPool:
+    """
+    Owns a single keep-alive aiohttp.ClientSession (with per-host connection
+    limits and a DNS cache) that is shared by all KP queries in this process,
+    and keeps per-KP statistics about connection reuse.
+    """
+
+    def __init__(self,
+                 limit: int = KP_POOL_MAX_CONNECTIONS,
+                 limit_per_host: int = KP_POOL_MAX_CONNECTIONS_PER_HOST,
+                 keepalive_timeout: float = KP_POOL_KEEPALIVE_SECONDS):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats: dict[str, dict[str, Any]] = {}
+
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """
+        Starts the pool's event loop thread if it is not already running in
+        this process, and returns the pool's event loop.
+        """
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self._loop
+
+            # Either never started, or we are a forked child whose pool thread did not survive the fork
+            self._pid = os.getpid()
+            self._session = None
+            self._stats = {}
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever,
+                                            name="KPConnectionPool",
+                                            daemon=True)
+            self._thread.start()
+            return self._loop
+
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared session, creating it on first use. Must only be
+        called from within the pool's event loop.
+        """
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self._on_request_start)
+            trace_config.on_request_end.append(self._on_request_end)
+            trace_config.on_request_exception.append(self._on_request_end)
+            trace_config.on_connection_create_end.append(self._on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+            connector = aiohttp.TCPConnector(ssl=False,
+                                             limit=self.limit,
+                                             limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout,
+                                             ttl_dns_cache=KP_POOL_DNS_CACHE_SECONDS)
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+        return self._session
+
+
+    def _get_kp_stats(self, kp_curie: str) -> dict[str, Any]:
+        with self._lock:
+            if kp_curie not in self._stats:
+                self._stats[kp_curie] = {'n_requests': 0,
+                                         'n_in_flight_requests': 0,
+                                         'n_new_connections': 0,
+                                         'n_reused_connections': 0,
+                                         'hosts': set()}
+            return self._stats[kp_curie]
+
+    async def _on_request_start(self, session, trace_config_ctx, params):
+        kp_stats = self._get_kp_stats(trace_config_ctx.trace_request_ctx.kp_curie)
+        kp_stats['n_requests'] += 1
+        kp_stats['n_in_flight_requests'] += 1
+        kp_stats['hosts'].add(params.url.host)
+
+    async def _on_request_end(self, session, trace_config_ctx, params):
+        self._get_kp_stats(trace_config_ctx.trace_request_ctx.kp_curie)['n_in_flight_requests'] -= 1
+
+    async def _on_connection_create_end(self, session, trace_config_ctx, params):
+        self._get_kp_stats(trace_config_ctx.trace_request_ctx.kp_curie)['n_new_connections'] += 1
+
+    async def _on_connection_reuseconn(self, session, trace_config_ctx, params):
+        self._get_kp_stats(trace_config_ctx.trace_request_ctx.kp_curie)['n_reused_connections'] += 1
+
+
+    async def _post_in_pool_loop(self, url: str, payload: Any, timeout: float, kp_curie: str) -> tuple:
+        session = self._get_session()
+        async with session.post(url,
+                                json=payload,
+                                timeout=aiohttp.ClientTimeout(total=timeout),
+                                headers={'accept': 'application/json'},
+                                trace_request_ctx=SimpleNamespace(kp_curie=kp_curie)) as response:
+            response.raise_for_status()
+            # Only read the raw body here; decoding happens in the caller's thread so that one large
+            # response does not stall the I/O of every other in-flight KP query
+            body = await response.read()
+            return body, response.status
+
+
+    async def post(self, url: str, payload: Any, timeout: float, kp_curie: Optional[str] = None) -> tuple:
+        """
+        POSTs a JSON payload through the shared session. Can be awaited from
+        any event loop in this process.
+
+        :param url: The URL to POST to.
+        :param payload: The (JSON-serializable) request body.
+        :param timeout: Total request timeout in seconds.
+        :param kp_curie: The infores curie of the KP, used to key the pool statistics.
+        :return: A tuple of (raw_response_body, http_status_code)
+        :raises aiohttp.ClientResponseError: for 4xx/5xx responses
+        :raises aiohttp.ClientError: for connection errors
+        :raises asyncio.TimeoutError: if the request times out
+        """
+        if kp_curie is None:
+            kp_curie = urlsplit(url).netloc
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._post_in_pool_loop(url, payload, timeout, kp_curie), loop)
+        return await asyncio.wrap_future(future)
+
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Returns per-KP statistics about the connections used by this process,
+        including how often a keep-alive connection was reused rather than
+        having to set up a new one.
+        """
+        stats = {}
+        with self._lock:
+            for kp_curie, kp_stats in self._stats.items():
+                n_connections_used = kp_stats['n_new_connections'] + kp_stats['n_reused_connections']
+                stats[kp_curie] = {'n_requests': kp_stats['n_requests'],
+                                   'n_in_flight_requests': kp_stats['n_in_flight_requests'],
+                                   'n_new_connections': kp_stats['n_new_connections'],
+                                   'n_reused_connections': kp_stats['n_reused_connections'],
+                                   'reuse_ratio': round(kp_stats['n_reused_connections'] / n_connections_used, 3)
+                                                  if n_connections_used else None,
+                                   'hosts': sorted(kp_stats['hosts'])}
+        return stats
+
+
+    def close(self):
+        """
+        Closes the shared session and stops the pool's event loop thread.
+        """
+        with self._lock:
+            loop, thread, session = self._loop, self._thread, self._session
+            owned_by_this_process = self._pid == os.getpid()
+            self._loop, self._thread, self._session, self._pid = None, None, None, None
+        if loop is None or not owned_by_this_process or not thread.is_alive():
+            return
+
+        if session is not None and not session.closed:
+            try:
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=KP_POOL_SHUTDOWN_TIMEOUT_SECONDS)
+            except Exception as e:
+                eprint(f"WARNING: KPConnectionPool: error closing the shared session: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=KP_POOL_SHUTDOWN_TIMEOUT_SECONDS)
+        loop.close()
+
+
+_kp_connection_pool = KPConnectionPool()
+atexit.register(_kp_connection_pool.close)
+
+
+def get_kp_connection_pool() -> KPConnectionPool:
+    """
+    Returns the process-wide KP connection pool.
+    """
+    return _kp_connection_pool
+
+
+############################################ Main ############################################################
+#### If this module is run from the command line, allow some basic testing of the pool
+def main():
+    import argparse
+    import json
+    argparser = argparse.ArgumentParser(description='CLI testing of the KPConnectionPool class')
+    argparser.add_argument('--url', action='store', default='https://kg2cploverdb.ci.transltr.io/query',
+                           help='The TRAPI /query URL to POST the test query to')
+    argparser.add_argument('--n_queries', action='store', type=int, default=5,
+                           help='Number of sequential test queries to send')
+    params = argparser.parse_args()
+
+    trapi_query = {
+        "message": {
+            "query_graph": {
+                "nodes": {"n0": {"ids": ["MONDO:0005148"]}, "n1": {"categories": ["biolink:ChemicalEntity"]}},
+                "edges": {"e01": {"subject": "n1", "object": "n0", "predicates": ["biolink:treats"]}}
+            }
+        }
+    }
+
+    async def run_queries():
+        pool = get_kp_connection_pool()
+        for i_query in range(params.n_queries):
+            start_time = time.time()
+            _, status = await pool.post(params.url, trapi_query, timeout=30, kp_curie='test')
+            print(f"Query {i_query + 1}: HTTP {status} in {time.time() - start_time:.3f} seconds")
+
+    asyncio.run(run_queries())
+    print(json.dumps(get_kp_connection_pool().get_stats(), indent=2))
+
+
+if __name__ == "__main__": main()
@@ -9,6 +9,7 @@ import pickle
 import requests
 import requests_cache
 import sys
+import threading
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -19,9 +20,15 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../../")
 from RTXConfiguration import RTXConfiguration
 from ARAX_response import ARAXResponse
 from smartapi import SmartAPI
+from meta_map_index import MetaMapIndex
 
 def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
 
+# The KP info caches this process last loaded (along with the meta map index built from them), which are reused until
+# the cache file changes, instead of unpickling the file and rebuilding the index for every KPSelector
+_loaded_kp_info_caches = None
+_loaded_kp_info_caches_lock = threading.Lock()
+
 
 class KPInfoCacher:
 
@@ -125,8 +132,10 @@ class KPInfoCacher:
         caches need to be used (i.e., by KPSelector).  Other modules should
         NEVER try to load the caches directly! They should only load them via
         this method.  It ensures that caches are up to date and that they don't
-        become corrupted while refreshing.
+        become corrupted while refreshing. The returned caches are shared
+        (within this process), so they must not be modified.
         """
+        global _loaded_kp_info_caches
 
         # At this point the KP info caches must NOT be in the process of being
         # refreshed, so we create/update if needed.  In particular, this ensures
@@ -144,15 +153,30 @@ class KPInfoCacher:
         except Exception as e:
             log.error(f"Unable to load KP info caches: {e}")
 
-        # The caches MUST be up to date at this point, so we just load them
-        log.debug("Loading cached Smart API and meta map info")
-        with open(self.smart_api_and_meta_map_cache, "rb") as cache:
-            cache = pickle.load(cache)
-            smart_api_info = cache['smart_api_cache']
-            meta_map = cache['meta_map_cache']
-
-
-        return smart_api_info, meta_map
+        # The caches MUST be up to date at this point, so we just load them (unless we already have)
+        cache_stat = smart_api_and_meta_map_pathlib_path.stat()
+        cache_signature = (self.smart_api_and_meta_map_cache, cache_stat.st_ino, cache_stat.st_mtime_ns, cache_stat.st_size)
+        with _loaded_kp_info_caches_lock:
+            if _loaded_kp_info_caches is None or _loaded_kp_info_caches["signature"] != cache_signature:
+                log.debug("Loading cached Smart API and meta map info")
+                with open(self.smart_api_and_meta_map_cache, "rb") as cache:
+                    cache = pickle.load(cache)
+                _loaded_kp_info_caches = {"signature": cache_signature,
+                                          "smart_api_info": cache['smart_api_cache'],
+                                          "meta_map": cache['meta_map_cache'],
+                                          "meta_map_index": MetaMapIndex(cache['meta_map_cache'])}
+            loaded_kp_info_caches = _loaded_kp_info_caches
+
+        return loaded_kp_info_caches["smart_api_info"], loaded_kp_info_caches["meta_map"]
+
+    def get_meta_map_index(self, meta_map: dict) -> MetaMapIndex:
+        """
+        Returns the index of a meta map returned by load_kp_info_caches() (which was built when the caches were loaded)
+        """
+        loaded_kp_info_caches = _loaded_kp_info_caches
+        if loaded_kp_info_caches is not None and loaded_kp_info_caches["meta_map"] is meta_map:
+            return loaded_kp_info_caches["meta_map_index"]
+        return MetaMapIndex(meta_map)
 
     # --------------------------------- METHODS FOR BUILDING META MAP ----------------------------------------------- #
     # --- Note: These methods can't go in KPSelector because it would create a circular dependency with this class -- #
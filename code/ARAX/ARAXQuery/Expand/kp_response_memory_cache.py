@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+"""
+KPResponseMemoryCache: A bounded, in-process LRU tier that sits in front of the
+KPQueryCacher's on-disk store of compressed KP responses.
+
+Entries are kept as uncompressed serialized payloads (in the format of the
+cacher's codec, see kp_response_codecs.py), so a memory hit skips the database
+lookup of the file, the file read, and the decompression; and every hit
+deserializes a fresh copy of the response, so callers are free to mutate what
+they get back. The cache is capped by total bytes, entries expire after a TTL
+that can be set per KP infores curie, and eviction/hit metrics are kept for
+reporting alongside the other KP query cache statistics.
+
+Since ARAX forks a child process for every query, entries loaded into the
+parent process (e.g., by KPQueryCacher.warm_memory_cache() at server start-up)
+are inherited by every query's child process.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
+
+# Constants
+KP_MEMORY_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+KP_MEMORY_CACHE_MAX_ENTRY_FRACTION = 0.25  # Never let one response take up more than this fraction of the cache
+KP_MEMORY_CACHE_DEFAULT_TTL_SECONDS = 30 * 60
+KP_MEMORY_CACHE_TTL_SECONDS = {
+    'infores:rtx-kg2': 6 * 60 * 60,  # KG2 only changes with a new build, and KPQueryCacher refreshes every 6 hours anyway
+    'PathFinder': 6 * 60 * 60,
+    'xDTD': 6 * 60 * 60,
+}
+
+
+class KPResponseMemoryCache:
+    """
+    A thread-safe LRU cache of serialized KP responses, keyed by the KPQueryCacher query hash.
+    """
+
+    def __init__(self,
+                 max_bytes: int = KP_MEMORY_CACHE_MAX_BYTES,
+                 ttl_seconds: Optional[dict[str, float]] = None,
+                 default_ttl_seconds: float = KP_MEMORY_CACHE_DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = dict(KP_MEMORY_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds)
+        self.default_ttl_seconds = default_ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[str, int, bytes, float]] = OrderedDict()
+        self._n_bytes = 0
+        self._metrics = self._get_empty_metrics()
+
+
+    @staticmethod
+    def _get_empty_metrics() -> dict[str, int]:
+        return {'n_hits': 0,
+                'n_misses': 0,
+                'n_puts': 0,
+                'n_expirations': 0,
+                'n_evictions': 0,
+                'n_evicted_bytes': 0,
+                'n_invalidations': 0,
+                'n_rejected_too_large': 0}
+
+
+    def get_ttl(self, kp_curie: str) -> float:
+        """
+        Returns the number of seconds that a response from the given KP may be served from memory.
+        """
+        return self.ttl_seconds.get(kp_curie, self.default_ttl_seconds)
+
+
+    def get(self, query_hash: str) -> Optional[tuple[str, int, bytes]]:
+        """
+        Looks up a query hash in the cache.
+
+        :param query_hash: The KPQueryCacher hash of the query.
+        :return: A tuple of (kp_curie, http_status_code, payload) or None if not cached (or expired)
+        """
+        with self._lock:
+            entry = self._entries.get(query_hash)
+            if entry is None:
+                self._metrics['n_misses'] += 1
+                return None
+
+            kp_curie, http_code, payload, expiration_time = entry
+            if time.time() > expiration_time:
+                self._remove(query_hash)
+                self._metrics['n_expirations'] += 1
+                self._metrics['n_misses'] += 1
+                return None
+
+            self._entries.move_to_end(query_hash)
+            self._metrics['n_hits'] += 1
+            return kp_curie, http_code, payload
+
+
+    def put(self, query_hash: str, kp_curie: str, http_code: int, payload: bytes) -> bool:
+        """
+        Adds (or replaces) a response in the cache, evicting the least-recently used entries as needed.
+
+        :param query_hash: The KPQueryCacher hash of the query.
+        :param kp_curie: CURIE of the Knowledge Provider, which determines the TTL of the entry.
+        :param http_code: The HTTP status code that goes with the response.
+        :param payload: The uncompressed serialized payload of the response object.
+        :return: True if the response was cached, False if it was too large to cache
+        """
+        size = len(payload)
+        with self._lock:
+            if query_hash in self._entries:
+                self._remove(query_hash)
+            if size > self.max_bytes * KP_MEMORY_CACHE_MAX_ENTRY_FRACTION:
+                self._metrics['n_rejected_too_large'] += 1
+                return False
+
+            while self._entries and self._n_bytes + size > self.max_bytes:
+                _, (_, _, evicted_response, _) = self._entries.popitem(last=False)
+                self._n_bytes -= len(evicted_response)
+                self._metrics['n_evictions'] += 1
+                self._metrics['n_evicted_bytes'] += len(evicted_response)
+
+            self._entries[query_hash] = (kp_curie, http_code, payload, time.time() + self.get_ttl(kp_curie))
+            self._n_bytes += size
+            self._metrics['n_puts'] += 1
+            return True
+
+
+    def invalidate(self, query_hash: str):
+        """
+        Removes a query hash from the cache (e.g., because its database record was deleted).
+        """
+        with self._lock:
+            if query_hash in self._entries:
+                self._remove(query_hash)
+                self._metrics['n_invalidations'] += 1
+
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+
+
+    def get_free_bytes(self) -> int:
+        with self._lock:
+            return self.max_bytes - self._n_bytes
+
+
+    def _remove(self, query_hash: str):
+        # Caller must hold self._lock
+        _, _, payload, _ = self._entries.pop(query_hash)
+        self._n_bytes -= len(payload)
+
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns the current size of the cache and its hit/miss/eviction counts.
+        """
+        with self._lock:
+            stats: dict[str, Any] = dict(self._metrics)
+            stats['n_entries'] = len(self._entries)
+            stats['total_size_MiB'] = round(self._n_bytes / 1024 / 1024, 3)
+            stats['max_size_MiB'] = round(self.max_bytes / 1024 / 1024, 3)
+            n_lookups = stats['n_hits'] + stats['n_misses']
+            stats['hit_rate'] = round(stats['n_hits'] / n_lookups, 3) if n_lookups else None
+        return stats
+
+
+_kp_response_memory_cache = KPResponseMemoryCache()
+
+
+def get_kp_response_memory_cache() -> KPResponseMemoryCache:
+    """
+    Returns the process-wide in-memory KP response cache.
+    """
+    return _kp_response_memory_cache
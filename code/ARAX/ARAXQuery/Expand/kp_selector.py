@@ -4,7 +4,6 @@ import pprint
 import sys
 from typing import Optional
 from collections import defaultdict
-from itertools import product
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import expand_utilities as eu
@@ -28,6 +27,7 @@ class KPSelector:
         self.kg2_mode = kg2_mode
         self.kp_cacher = KPInfoCacher()
         self.meta_map, self.kp_urls, self.kps_excluded_by_version, self.kps_excluded_by_maturity = self._load_cached_kp_info()
+        self.meta_map_index = self.kp_cacher.get_meta_map_index(self.meta_map) if self.meta_map is not None else None
         if (not self.kg2_mode) and (self.kp_urls is None):
             raise ValueError("KP info cache has not been filled and we are not in KG2 mode; cannot initialize KP selector")
         self.valid_kps = {"infores:rtx-kg2"} if self.kg2_mode else set(self.kp_urls.keys())
@@ -79,20 +79,17 @@ class KPSelector:
 
         accepting_kps = kps_skip_metakg_checks_that_are_allowed
         self.log.debug(f"selecting from {len(self.valid_kps)} kps")
+        # look up all KPs that have the triple in their meta map at once, accounting for symmetrical predicates by
+        # also looking up the triple with swapped sub and obj categories
+        kps_with_triple = self.meta_map_index.get_kps_bitset(sub_categories, predicates, obj_categories) | \
+            self.meta_map_index.get_kps_bitset(obj_categories, predicates, sub_categories)
         for kp in self.meta_map:
             # kp should contain the infores CURIE of the knowledge provider
-            if self._triple_is_in_meta_map(kp,
-                                           sub_categories,
-                                           predicates,
-                                           obj_categories):
-                accepting_kps.add(kp)
-            # account for symmetrical predicates by checking if kp accepts with swapped sub and obj categories
-            elif self._triple_is_in_meta_map(kp,
-                                             obj_categories,
-                                             predicates,
-                                             sub_categories):
+            if self.meta_map_index.kp_bits[kp] & kps_with_triple:
                 accepting_kps.add(kp)
             else:
+                if not self.meta_map[kp]:
+                    self.log.warning(f"Somehow missing meta info for {kp}.")
                 if kp not in KPS_SKIP_METAKG_CHECKS:
                     self.log.update_query_plan(qedge_key, kp, "Skipped", "MetaKG indicates this qedge is unsupported")
                 else:
@@ -247,32 +244,9 @@ class KPSelector:
                 self.log.warning(f"Somehow missing meta info for {kp}.")
             return False
         else:
-            predicates_map = kp_meta_map["predicates"]
-            # handle potential emptiness of sub, obj, predicate lists
-            if not subject_categories:  # any subject
-                subject_categories = set(predicates_map.keys())
-            if not object_categories:  # any object
-                object_categories = {obj for obj_dict in predicates_map.values() for obj in obj_dict.keys()}
-
-            # handle combinations of subject and objects using cross product
-            qg_sub_obj_dict = defaultdict(lambda: set())
-            for sub, obj in list(product(subject_categories, object_categories)):
-                qg_sub_obj_dict[sub].add(obj)
-
-            # check for subjects
-            kp_allowed_subs = set(predicates_map.keys())
-            accepted_subs = kp_allowed_subs.intersection(set(qg_sub_obj_dict.keys()))
-
-            # check for objects
-            for sub in accepted_subs:
-                kp_allowed_objs = set(predicates_map[sub].keys())
-                accepted_objs = kp_allowed_objs.intersection(qg_sub_obj_dict[sub])
-                if len(accepted_objs) > 0:
-                    # check predicates
-                    for obj in accepted_objs:
-                        if predicates.intersection(predicates_map[sub][obj]):
-                            return True
-            return False
+            # (empty sub/obj categories mean any category; see MetaMapIndex)
+            kps_with_triple = self.meta_map_index.get_kps_bitset(subject_categories, predicates, object_categories)
+            return bool(self.meta_map_index.kp_bits[kp] & kps_with_triple)
 
 
 def main():
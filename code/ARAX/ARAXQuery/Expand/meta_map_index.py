@@ -0,0 +1,62 @@
+#!/bin/env python3
+"""
+An inverted index of the KP meta map (see KPInfoCacher), for finding all KPs that support a qedge at once.
+
+For every (subject category, object category, predicate) triple in any KP's meta map, the index holds the set of KPs
+that support it as a bitset (an int with bit i set for the KP self.kps[i]). Finding the KPs that support any triple of
+some subject categories, predicates and object categories then only means visiting the triples that actually exist in
+the meta map and ORing their bitsets, instead of checking the full cross product of the categories for each KP. (The
+index also has the bitset of all KPs with any triple of each subject category and of each subject/object category
+pair, so that parts of the meta map that couldn't add any more KPs are skipped.)
+"""
+from typing import Iterable
+
+
+class MetaMapIndex:
+
+    def __init__(self, meta_map: dict[str, dict]):
+        self.kps = list(meta_map)
+        self.kp_bits = {kp: 1 << kp_index for kp_index, kp in enumerate(self.kps)}
+        # subject category -> object category -> predicate -> bitset of the KPs that support the triple
+        self.kps_by_triple: dict[str, dict[str, dict[str, int]]] = dict()
+        self.kps_by_subject_category: dict[str, int] = dict()
+        self.kps_by_category_pair: dict[tuple[str, str], int] = dict()
+        for kp, kp_meta_map in meta_map.items():
+            if not kp_meta_map:
+                continue
+            kp_bit = self.kp_bits[kp]
+            for subject_category, predicates_by_object_category in kp_meta_map["predicates"].items():
+                kps_by_object_category = self.kps_by_triple.setdefault(subject_category, dict())
+                for object_category, predicates in predicates_by_object_category.items():
+                    kps_by_predicate = kps_by_object_category.setdefault(object_category, dict())
+                    for predicate in predicates:
+                        kps_by_predicate[predicate] = kps_by_predicate.get(predicate, 0) | kp_bit
+                    category_pair = (subject_category, object_category)
+                    self.kps_by_category_pair[category_pair] = self.kps_by_category_pair.get(category_pair, 0) | kp_bit
+                self.kps_by_subject_category[subject_category] = \
+                    self.kps_by_subject_category.get(subject_category, 0) | kp_bit
+
+    def get_kps_bitset(self, subject_categories: set[str], predicates: set[str], object_categories: set[str]) -> int:
+        """
+        Returns the bitset of the KPs whose meta map has at least one of the possible triples. Empty subject or object
+        categories mean any category. NOT meant to handle empty predicates; sub in "biolink:related_to" (and its
+        descendants) for QEdges without predicates.
+        """
+        kps_bitset = 0
+        subjects = self.kps_by_triple.keys() & subject_categories if subject_categories else self.kps_by_triple.keys()
+        for subject_category in subjects:
+            if not self.kps_by_subject_category[subject_category] & ~kps_bitset:
+                continue  # (all KPs with this subject category were found already)
+            kps_by_object_category = self.kps_by_triple[subject_category]
+            objects = kps_by_object_category.keys() & object_categories if object_categories \
+                else kps_by_object_category.keys()
+            for object_category in objects:
+                if not self.kps_by_category_pair[subject_category, object_category] & ~kps_bitset:
+                    continue
+                kps_by_predicate = kps_by_object_category[object_category]
+                for predicate in kps_by_predicate.keys() & predicates:
+                    kps_bitset |= kps_by_predicate[predicate]
+        return kps_bitset
+
+    def get_kps(self, kps_bitset: int) -> Iterable[str]:
+        return [kp for kp, kp_bit in self.kp_bits.items() if kps_bitset & kp_bit]
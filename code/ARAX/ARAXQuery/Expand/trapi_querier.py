@@ -15,10 +15,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import Expand.expand_utilities as eu
 from Expand.expand_utilities import QGOrganizedKnowledgeGraph
 from Expand.kp_selector import KPSelector
+from Expand.compact_kg import CompactEdge, CompactNode
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../")  # ARAXQuery directory
 from ARAX_response import ARAXResponse
-from ARAX_messenger import ARAXMessenger
-from trapi_query_cacher import KPQueryCacher
+from trapi_query_cacher import get_kp_query_cacher
+from kp_connection_pool import get_kp_connection_pool
 import util
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../BiolinkHelper/")
@@ -32,7 +33,6 @@ from openapi_server.models.edge import Edge  # noqa: E402
 from openapi_server.models.q_node import QNode  # noqa: E402
 from openapi_server.models.q_edge import QEdge  # noqa: E402
 from openapi_server.models.query_graph import QueryGraph  # noqa: E402
-from openapi_server.models.result import Result  # noqa: E402
 from openapi_server.models.attribute import Attribute  # noqa: E402
 from openapi_server.models.retrieval_source import RetrievalSource  # noqa: E402
 from openapi_server.models.auxiliary_graph import AuxiliaryGraph  # noqa: E402
@@ -46,6 +46,18 @@ _TREATS_DESCENDANTS = frozenset(
 
 UUID_NAMESPACE = uuid.UUID('31a17f10-c100-45ad-a3bb-2cccc37a8924')
 
+KG2_TIMEOUT_SECONDS = 600
+DEFAULT_KP_TIMEOUT_SECONDS = 120
+# Unless the user gave a timeout, KPs with enough latency history get a timeout of a multiple of their
+#  p95 latency (within the bounds below), and a hedged copy of the query once their p95 has passed (unless
+#  that is too close to the timeout for a second copy to help). A query that timed out under such a timeout
+#  is sent again under the default timeout the next time it is asked for, rather than served as a timeout
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_P95_MULTIPLIER = 3.0
+ADAPTIVE_TIMEOUT_MIN_SECONDS = 30
+HEDGE_MIN_DELAY_SECONDS = 2.0
+HEDGE_MAX_DELAY_FRACTION_OF_TIMEOUT = 0.5
+
 def _remove_attributes_with_invalid_values(response_json: dict,
                                            kp_curie: str,
                                            log: ARAXResponse) -> \
@@ -94,6 +106,8 @@ class TRAPIQuerier:
         self.kp_selector = kp_selector
         self.kp_endpoint = kp_selector.kp_urls[self.kp_infores_curie]
         self.qnodes_with_single_id: dict[str, str] = {}  # This is set during the processing of each query
+        self.kp_latency_stats: Optional[dict[str, Any]] = None  # Loaded from the KP query cache when first needed
+        self.kp_latency_stats_loaded = False
         self.arax_infores_curie = "infores:arax"
         self.arax_retrieval_source = RetrievalSource(resource_id=self.arax_infores_curie,
                                                      resource_role="aggregator_knowledge_source",
@@ -325,12 +339,13 @@ class TRAPIQuerier:
 
     def _get_kg_to_qg_mappings_from_results(
             self,
-            results: list[Result],
+            results: list[dict[str, Any]],
             qg: QueryGraph
     ) -> tuple[dict[str, dict[str, set[str]]], dict[str, set[str]]]:
         """
         This function returns a dictionary in which one can lookup which qnode_keys/qedge_keys a given node/edge
         fulfills. Like: {"nodes": {"PR:11": {"n00"}, "MESH:22": {"n00", "n01"} ... }, "edges": { ... }}
+        It works on the raw (JSON) results returned by the KP; they are never converted into Result objects.
         """
         qnodes_with_multiple_ids = {qnode_key for qnode_key, qnode in qg.nodes.items() if qnode.ids and len(qnode.ids) > 1}
         qnodes_with_single_id = {qnode_key for qnode_key, qnode in qg.nodes.items() if qnode.ids and len(qnode.ids) == 1}
@@ -339,17 +354,18 @@ class TRAPIQuerier:
         qedge_key_mappings = defaultdict(set)
         for result in results:
             # Record mappings from the returned node to the parent curie listed in the QG that it is fulfilling
-            for qnode_key, node_bindings in result.node_bindings.items():
+            for qnode_key, node_bindings in (result.get("node_bindings") or {}).items():
                 query_node_ids = set(eu.convert_to_list(qg.nodes[qnode_key].ids))
-                for node_binding in node_bindings:
-                    kg_id = node_binding.id
+                for node_binding in node_bindings or []:
+                    kg_id = node_binding.get("id")
                     qnode_key_mappings[kg_id].add(qnode_key)
                     # Handle case where the KP does return a query_id
-                    if node_binding.query_id:
-                        if node_binding.query_id in query_node_ids:
-                            kg_id_to_parent_query_id_map[kg_id].add(node_binding.query_id)
+                    query_id = node_binding.get("query_id")
+                    if query_id:
+                        if query_id in query_node_ids:
+                            kg_id_to_parent_query_id_map[kg_id].add(query_id)
                         else:
-                            self.log.warning(f"{self.kp_infores_curie} returned a NodeBinding.query_id ({node_binding.query_id})"
+                            self.log.warning(f"{self.kp_infores_curie} returned a NodeBinding.query_id ({query_id})"
                                              f" for {qnode_key} that is not in {qnode_key}'s ids in the QG sent "
                                              f"to {self.kp_infores_curie}. This is invalid TRAPI. Skipping this binding.")
                     # Handle case where KP does NOT return a query_id (may or may not be valid TRAPI)
@@ -367,12 +383,11 @@ class TRAPIQuerier:
                                                  f"query sent to {self.kp_infores_curie}, none of which are the KG ID ({kg_id})."
                                                  f" This is invalid TRAPI. Skipping this binding.")
 
-            for analysis in result.analyses:  # TODO: Maybe later extract Analysis support graphs from KPs?
-                if analysis.edge_bindings:
-                    for qedge_key, edge_bindings in analysis.edge_bindings.items():
-                        for edge_binding in edge_bindings:
-                            kg_id = edge_binding.id
-                            qedge_key_mappings[kg_id].add(qedge_key)
+            for analysis in result.get("analyses") or []:  # TODO: Maybe later extract Analysis support graphs from KPs?
+                for qedge_key, edge_bindings in (analysis.get("edge_bindings") or {}).items():
+                    for edge_binding in edge_bindings or []:
+                        kg_id = edge_binding.get("id")
+                        qedge_key_mappings[kg_id].add(qedge_key)
 
         return {"nodes": qnode_key_mappings, "edges": qedge_key_mappings}, kg_id_to_parent_query_id_map
 
@@ -385,6 +400,8 @@ class TRAPIQuerier:
         request_body = self._get_prepped_request_body(query_graph)
         query_sent = copy.deepcopy(request_body)
         query_timeout = self._get_query_timeout_length()
+        hedge_delay = self._get_hedge_delay(query_timeout)
+        timeout_retry_timeout = self._get_timeout_retry_length(query_timeout)
         bypass_cache = self.bypass_cache
         if not query_graph.edges:
             raise ValueError("query graph has no edges")
@@ -396,10 +413,11 @@ class TRAPIQuerier:
         waiting_message = f"Query with {num_input_curies} curies sent: waiting for response"
         self.log.update_query_plan(qedge_key, self.kp_infores_curie, "Waiting", waiting_message, query=query_sent)
         start = time.time()
-        self.log.debug(f"{self.kp_infores_curie}: Sending query to {self.kp_infores_curie} API ({self.kp_endpoint}) with timeout={query_timeout}")
+        self.log.debug(f"{self.kp_infores_curie}: Sending query to {self.kp_infores_curie} API ({self.kp_endpoint}) with timeout={query_timeout}"
+                       + (f" (hedged after {hedge_delay:.1f} seconds)" if hedge_delay else ""))
 
         # Send the query graph to the KP's TRAPI API
-        cacher = KPQueryCacher()
+        cacher = get_kp_query_cacher()
         r = None
         try:
             response_data, http_code, elapsed_time, error = await cacher.get_result(f"{self.kp_endpoint}/query",
@@ -407,7 +425,8 @@ class TRAPIQuerier:
                                                                                     kp_curie=self.kp_infores_curie,
                                                                                     timeout=query_timeout,
                                                                                     bypass_cache=bypass_cache,
-                                                                                    async_session=True)
+                                                                                    hedge_after=hedge_delay,
+                                                                                    retry_timeout=timeout_retry_timeout)
             if http_code == 200:
                 r = response_data
 
@@ -478,6 +497,12 @@ class TRAPIQuerier:
         # - If the response is queried de-novo from the KP successfully, then `error`
         #   contains None
         cache_phrase = " from cache" if error == "from cache" else ""
+        if not cache_phrase:
+            pool_stats = get_kp_connection_pool().get_stats().get(self.kp_infores_curie)
+            if pool_stats:
+                self.log.debug(f"{self.kp_infores_curie}: Connection pool has served {pool_stats['n_requests']} requests "
+                               f"to this KP with {pool_stats['n_new_connections']} new connections "
+                               f"(reuse ratio {pool_stats['reuse_ratio']})")
 
         wait_time = round(time.time() - start, 2)
 
@@ -571,6 +596,14 @@ class TRAPIQuerier:
             qg: QueryGraph
     ) -> tuple[QGOrganizedKnowledgeGraph,
                dict[str, AuxiliaryGraph] | None]:
+        """
+        Loads a KP's (JSON) response into a QGOrganizedKnowledgeGraph in a single pass over its KG. Rather than
+        converting the whole message into OpenAPI model objects up front, the results are read as plain dicts, and
+        each KG node/edge is converted into a model object only if it will be kept, at which point its raw dict is
+        removed from json_response. So the raw and the model version of the KG never coexist in memory, and
+        nodes/edges that get dropped are never converted at all. Kept nodes/edges are loaded as compact records
+        (see compact_kg.py). NOTE: This consumes json_response's KG.
+        """
 
         kp_curie = self.kp_infores_curie
 
@@ -582,16 +615,15 @@ class TRAPIQuerier:
                              f"Response was: {json.dumps(json_response, indent=4)}")
             return answer_kg, None
 
-        arax_message = ARAXMessenger().from_dict(message)
-
-        kg = arax_message.knowledge_graph
+        kg = message.get("knowledge_graph")
         if not kg:
             self.log.error(f"{kp_curie}: no knowledge graph was returned")
             return answer_kg, None
 
-        aux_graphs = arax_message.auxiliary_graphs or {}
+        aux_graphs = {aux_graph_id: AuxiliaryGraph.from_dict(aux_graph)
+                      for aux_graph_id, aux_graph in (message.get("auxiliary_graphs") or {}).items()}
 
-        results = arax_message.results or []
+        results = message.get("results") or []
         if not results:
             self.log.debug(f"{kp_curie}: No 'results' were returned.")
             return answer_kg, aux_graphs
@@ -599,134 +631,131 @@ class TRAPIQuerier:
 
         # Work around genetics provider's curie whitespace bug for now  TODO: remove once they've fixed it
         if kp_curie == "infores:genetics-data-provider":
-            self._remove_whitespace_from_curies(arax_message)
+            self._remove_whitespace_from_curies(message)
 
         # Build a map that indicates which qnodes/qedges a given node/edge fulfills
         kg_to_qg_mappings, query_curie_mappings = \
             self._get_kg_to_qg_mappings_from_results(results, qg)
 
+        # KPs can return result-specific "analyses" each of which can "bind" a
+        # qedges to one or more edge keys in the knowledge graph. Each such
+        # bound edge can, in turn, reference nodes (including nodes that are not
+        # bound to qnodes) via the edge's subject and/or object
+        # properties. These nodes should _not_ get dropped from the KG, since
+        # the result analysis is semantically incomplete without them.
+        # KPs can also return auxiliary graphs, which can reference edges.
+        # Any edge referenced by an auxiliary graph can also reference nodes,
+        # which should be retained in the knowledge graph for semantic
+        # completeness. Both sets of edge keys are known before we look at
+        # the KG, so the nodes they reference are collected in the edge pass.
+        edge_keys_in_analyses = {edge_key for edge_key, qedge_keys in kg_to_qg_mappings['edges'].items()
+                                 if not qedge_keys.isdisjoint(qg.edges)}
+        edge_keys_in_aux_graphs = {edge_key for aux_graph in aux_graphs.values()
+                                   for edge_key in aux_graph.edges or []}
+        nodes_linked_in_bound_edges = set()
+        nodes_referenced_in_aux_graphs = set()
+
         # Populate our final KG with the returned edges
-        unbound_edges = {}
-        nodes_dict = kg.nodes or {}
-        edges_dict = kg.edges or {}
-        for edge_key, edge in edges_dict.items():
+        nodes_dict = kg.get("nodes") or {}
+        edges_dict = kg.get("edges") or {}
+        all_edge_keys = set(edges_dict)
+        unbound_edges_keep = {}
+        unreferenced_unbound_edges = set()
+        # (each edge is popped in KP order once it's processed, so its dict can be freed early)
+        for edge_key in list(edges_dict):
+            edge_dict = edges_dict.pop(edge_key)
+            subject_key = edge_dict.get("subject")
+            object_key = edge_dict.get("object")
+            if edge_key in edge_keys_in_analyses:
+                nodes_linked_in_bound_edges.update((subject_key, object_key))
+            if edge_key in edge_keys_in_aux_graphs:
+                nodes_referenced_in_aux_graphs.update((subject_key, object_key))
+
             # check the edge's subject and object properties:
-            if not edge.subject or not edge.object:
+            if not subject_key or not object_key:
                 # the edge's `subject` or `object` property is empty; log a warning and skip this edge
                 self.log.warning(f"{kp_curie}: Edge has empty subject/object, skipping. "
-                                 f"subject: '{edge.subject}', object: '{edge.object}'")
+                                 f"subject: '{subject_key}', object: '{object_key}'")
                 continue
-            if edge.subject not in nodes_dict or edge.object not in nodes_dict:
+            if subject_key not in nodes_dict or object_key not in nodes_dict:
                 # the edge's `subject` or `object` refers to a node ID that is not in the KG;
                 # log a warning and skip this edge
                 self.log.warning(f"{kp_curie}: Edge is an orphan, skipping. "
-                                 f"subject: '{edge.subject}', object: '{edge.object}'")
+                                 f"subject: '{subject_key}', object: '{object_key}'")
                 continue
 
+            is_bound = edge_key in kg_to_qg_mappings['edges']
+            if not is_bound and edge_key not in edge_keys_in_aux_graphs:
+                # this edge is neither bound to a qedge nor referenced by an aux graph; it is dropped
+                unreferenced_unbound_edges.add(edge_key)
+                continue
+
+            edge = CompactEdge.from_dict(edge_dict)
             # Indicate that this edge passed through ARAX
             if edge.sources:
                 edge.sources.append(self.arax_retrieval_source)
             else:
                 edge.sources = [self.arax_retrieval_source]
 
-            # Create ARAX-generated edge key that's unique for us
-            arax_edge_key = self._get_arax_edge_key(edge)
-
-            if edge_key in kg_to_qg_mappings['edges']:
+            if is_bound:
+                # Create ARAX-generated edge key that's unique for us
+                arax_edge_key = self._get_arax_edge_key(edge)
                 for qedge_key in kg_to_qg_mappings['edges'][edge_key]:
                     # for each `qedge_key` to which this edge is bound,
                     # add the edge to `answer_kg` with the ARAX edge key
                     answer_kg.add_edge(arax_edge_key, edge, qedge_key)
             else:
-                unbound_edges[edge_key] = edge
+                unbound_edges_keep[edge_key] = edge
+        answer_kg.unbound_edges = unbound_edges_keep
+        self.log.debug("Number of nodes referenced in result analysis edges: "
+                       f"{len(nodes_linked_in_bound_edges)}")
 
-        # Populate our final KG with the returned nodes
-        unbound_nodes = {}
+        for aux_graph_id, aux_graph in aux_graphs.items():
+            for edge_key in aux_graph.edges or []:
+                if edge_key not in all_edge_keys:
+                    self.log.warning(f"{kp_curie}: aux graph {aux_graph_id} "
+                                     f"references edge not in KG: {edge_key}")
 
-        for node_key, node in nodes_dict.items():
+        # Populate our final KG with the returned nodes
+        unbound_nodes_keep = {}
+        unbound_nodes_not_kept = set()
+        for node_key in list(nodes_dict):
+            node_dict = nodes_dict.pop(node_key)
             if not node_key:
                 self.log.warning(f"{kp_curie}: Node has empty ID, skipping. "
                                  f"Node key is: '{node_key}'")
                 continue
-            if node_key in kg_to_qg_mappings['nodes']:
-                # this node is bound to a qnode; add to answer KG
-                for qnode_key in kg_to_qg_mappings['nodes'][node_key]:
-                    answer_kg.add_node(node_key, node, qnode_key)
-            else:
-                # this node is not bound to a query node; store it in
-                # `unbound_nodes`
-                unbound_nodes[node_key] = node
+            is_bound = node_key in kg_to_qg_mappings['nodes']
+            if not is_bound and node_key not in nodes_linked_in_bound_edges and \
+               node_key not in nodes_referenced_in_aux_graphs:
+                # this node is not bound to a query node nor referenced by a kept edge; it is dropped
+                unbound_nodes_not_kept.add(node_key)
+                continue
 
+            if isinstance(node_dict.get("categories"), str):
+                node_dict["categories"] = [node_dict["categories"]]
+            node = CompactNode.from_dict(node_dict)
             # if a node attrib has no `attribute_type_id`, put in a KP blame message
             for attribute in node.attributes or []:
                 if not attribute.attribute_type_id:
                     attribute.attribute_type_id = \
                         f"not provided (this attribute came from {kp_curie})"
 
-        # KPs can return result-specific "analyses" each of which can "bind" a
-        # qedges to one or more edge keys in the knowledge graph. Each such
-        # bound edge can, in turn, reference nodes (including nodes that are not
-        # bound to qnodes) via the edge's subject and/or object
-        # properties. These nodes should _not_ get dropped from the KG, since
-        # the result analysis is semantically incomplete without them. To
-        # compile a dictionary of such nodes, it is necessary to iterate through
-        # results, analyses, and edges (in that specific order of nesting from
-        # outermost to innermost loop). But, if there are no unbound nodes, there
-        # is no need to do this, since all nodes will already be in the answer KG.
-        nodes_linked_in_bound_edges = set()
-        if unbound_nodes:
-            for result in results:
-                for analysis in result.analyses or []:
-                    edge_bindings_iterable = analysis.edge_bindings or {}
-                    for qedge_key, edge_bindings in edge_bindings_iterable.items():
-                        if qedge_key in qg.edges:
-                            for edge_binding in edge_bindings or []:
-                                edge_id = edge_binding.id
-                                if edge_id in edges_dict:
-                                    edge = edges_dict[edge_id]
-                                    nodes_linked_in_bound_edges.add(edge.subject)
-                                    nodes_linked_in_bound_edges.add(edge.object)
-        self.log.debug("Number of nodes referenced in result analysis edges: "
-                       f"{len(nodes_linked_in_bound_edges)}")
-
-        nodes_referenced_in_aux_graphs = set()
-        unbound_edges_keep = {}
-        # KPs can also return auxiliary graphs, which can reference edges.
-        # Any edge referenced by an auxiliary graph can also reference nodes,
-        # which should be retained in the knowledge graph for semantic
-        # completeness.
-        if unbound_edges and aux_graphs:
-            for aux_graph_id, aux_graph in aux_graphs.items():
-                for edge_id in aux_graph.edges or []:
-                    edge = edges_dict.get(edge_id)
-                    if edge is None:
-                        self.log.warning(f"{kp_curie}: aux graph {aux_graph_id} "
-                                         f"references edge not in KG: {edge_id}")
-                        continue
-                    if edge_id in unbound_edges:
-                        unbound_edges_keep[edge_id] = edge
-                    nodes_referenced_in_aux_graphs.add(edge.subject)
-                    nodes_referenced_in_aux_graphs.add(edge.object)
-        answer_kg.unbound_edges = unbound_edges_keep
-
-        unbound_nodes_keep = {}
-        unbound_nodes_not_kept = {}
-        for node_key, node in unbound_nodes.items():
-            if node_key in nodes_linked_in_bound_edges or \
-               node_key in nodes_referenced_in_aux_graphs:
-                unbound_nodes_keep[node_key] = node
+            if is_bound:
+                # this node is bound to a qnode; add to answer KG
+                for qnode_key in kg_to_qg_mappings['nodes'][node_key]:
+                    answer_kg.add_node(node_key, node, qnode_key)
             else:
-                unbound_nodes_not_kept[node_key] = node
+                unbound_nodes_keep[node_key] = node
         answer_kg.unbound_nodes = unbound_nodes_keep
 
         if unbound_nodes_not_kept:
-            curie_summary = util.summarize_set_elements(unbound_nodes_not_kept.keys())
+            curie_summary = util.summarize_set_elements(unbound_nodes_not_kept)
             self.log.warning(f"{kp_curie}: {len(unbound_nodes_not_kept)} "
                              "nodes in the KP's answer KG have no bindings to the QG "
                              "and are not referenced in any analysis or aux graphs: "
                              f"{curie_summary}")
 
-        unreferenced_unbound_edges = set(unbound_edges) - set(unbound_edges_keep)
         if unreferenced_unbound_edges:
             edge_key_summary = util.summarize_set_elements(unreferenced_unbound_edges)
             self.log.warning(f"{kp_curie}: {len(unreferenced_unbound_edges)} "
@@ -771,11 +800,49 @@ class TRAPIQuerier:
     def _get_query_timeout_length(self) -> int:
         # Returns the number of seconds we should wait for a response
         if self.kp_infores_curie == "infores:rtx-kg2":
-            return 600
+            return KG2_TIMEOUT_SECONDS
         elif self.kp_timeout:
             return self.kp_timeout
-        else:
-            return 120
+        latency_stats = self._get_kp_latency_stats()
+        if latency_stats:
+            if latency_stats['p95_is_timeout']:
+                # Over 5% of the KP's recent queries timed out, so its p95 is unknown
+                return DEFAULT_KP_TIMEOUT_SECONDS
+            adaptive_timeout = math.ceil(latency_stats['p95'] * ADAPTIVE_TIMEOUT_P95_MULTIPLIER)
+            return min(max(adaptive_timeout, ADAPTIVE_TIMEOUT_MIN_SECONDS), DEFAULT_KP_TIMEOUT_SECONDS)
+        return DEFAULT_KP_TIMEOUT_SECONDS
+
+    def _get_hedge_delay(self, query_timeout: int) -> Optional[float]:
+        # Returns the number of seconds after which a hedged copy of the query should be sent (None means never)
+        if self.kp_infores_curie == "infores:rtx-kg2" or self.kp_timeout:
+            return None
+        latency_stats = self._get_kp_latency_stats()
+        if latency_stats and not latency_stats['p95_is_timeout']:
+            hedge_delay = max(latency_stats['p95'], HEDGE_MIN_DELAY_SECONDS)
+            # (a KP whose p95 is near the timeout is slow as a rule, so a duplicate query would only add to its load)
+            if hedge_delay <= query_timeout * HEDGE_MAX_DELAY_FRACTION_OF_TIMEOUT:
+                return hedge_delay
+        return None
+
+    def _get_timeout_retry_length(self, query_timeout: int) -> Optional[int]:
+        # Returns the longer timeout to send a query again with if it timed out under an adaptive timeout before
+        #  (None means a cached timeout is final)
+        if self.kp_infores_curie == "infores:rtx-kg2" or self.kp_timeout or query_timeout >= DEFAULT_KP_TIMEOUT_SECONDS:
+            return None
+        return DEFAULT_KP_TIMEOUT_SECONDS
+
+    def _get_kp_latency_stats(self) -> Optional[dict[str, Any]]:
+        # Latency stats (see KPQueryCacher.get_kp_latency_stats) if the KP has enough history to go on
+        if not self.kp_latency_stats_loaded:
+            try:
+                latency_stats = get_kp_query_cacher().get_kp_latency_stats(self.kp_infores_curie)
+            except Exception as e:
+                self.log.debug(f"{self.kp_infores_curie}: Could not get latency history ({e}); using default timeouts")
+                latency_stats = None
+            if latency_stats and latency_stats['n_samples'] >= ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+                self.kp_latency_stats = latency_stats
+            self.kp_latency_stats_loaded = True
+        return self.kp_latency_stats
 
     def _add_subclass_of_edges(self, answer_kg: QGOrganizedKnowledgeGraph) -> QGOrganizedKnowledgeGraph:
         for qnode_key in answer_kg.nodes_by_qg_id:
@@ -846,18 +913,18 @@ class TRAPIQuerier:
         return answer_kg
 
     @staticmethod
-    def _remove_whitespace_from_curies(kp_message):
-        kg = kp_message.knowledge_graph
-        for node_key in set(kg.nodes):
-            node = kg.nodes[node_key]
-            del kg.nodes[node_key]
-            kg.nodes[node_key.strip()] = node
-        for edge in kg.edges.values():
-            edge.subject = edge.subject.strip()
-            edge.object = edge.object.strip()
-        for result in kp_message.results:
-            for qnode_key, node_bindings in result.node_bindings.items():
+    def _remove_whitespace_from_curies(kp_message: dict):
+        kg = kp_message["knowledge_graph"]
+        nodes = kg.get("nodes") or {}
+        for node_key in set(nodes):
+            node = nodes.pop(node_key)
+            nodes[node_key.strip()] = node
+        for edge in (kg.get("edges") or {}).values():
+            edge["subject"] = edge["subject"].strip()
+            edge["object"] = edge["object"].strip()
+        for result in kp_message.get("results") or []:
+            for qnode_key, node_bindings in result["node_bindings"].items():
                 for node_binding in node_bindings:
-                    node_binding.id = node_binding.id.strip()
-                    if node_binding.query_id:
-                        node_binding.query_id = node_binding.query_id.strip()
+                    node_binding["id"] = node_binding["id"].strip()
+                    if node_binding.get("query_id"):
+                        node_binding["query_id"] = node_binding["query_id"].strip()
@@ -3,25 +3,35 @@
 """
 KPQueryCacher: A Python class to cache KP TRAPI queries using
 SQLAlchemy, SQLite, and a compressed file store.
+The format of the files is set by KP_RESPONSE_CODEC (see kp_response_codecs.py);
+files in other formats remain readable and can be rewritten with --migrate_cache_format.
 """
 
 import sys
 import os
-import gzip
-import pickle
 import json
 import hashlib
 import time
+import asyncio
+import copy
+import threading
+import concurrent.futures
 from datetime import datetime
 from contextlib import contextmanager
 # External dependencies
 import aiohttp
+import filelock
 import requests
 from sqlalchemy import create_engine, Column, Integer, String, Float, PickleType
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.orm.session import Session
 from typing import cast, Any, Collection
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from kp_connection_pool import get_kp_connection_pool
+from kp_response_memory_cache import get_kp_response_memory_cache
+from kp_response_codecs import get_kp_response_codecs, KPResponseCodec, ZstdMsgpackCodec
+
 def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
 
 # Constants
@@ -33,6 +43,16 @@ NO_CACHED_RESPONSE = -2
 CONNECTION_ERROR = -1
 TEST_QUERY_FAILURE = False
 CLEAR_CACHE_ON_BACKGROUND_TASKER_START = True
+WARM_MEMORY_CACHE_MAX_ENTRIES = 100
+KP_RESPONSE_CODEC = 'zstd-msgpack'
+DICTIONARY_TRAINING_CHUNK_BYTES = 16384
+DICTIONARY_TRAINING_MAX_BYTES_PER_RESPONSE = 1024 * 1024
+LEASE_POLL_SECONDS = 0.2
+LEASE_WAIT_MARGIN_SECONDS = 10.0
+LEASE_FILE_MAX_AGE_SECONDS = 3600.0  # Lease files untouched for this long are no longer held or waited on
+KP_LATENCY_HISTORY_SIZE = 200  # Number of recent successful or timed-out queries to a KP that its latency statistics are based on
+KP_LATENCY_MIN_TIMEOUT_SECONDS = 10.0  # Failed (-1) queries that took at least this long timed out; faster ones had connection errors
+KP_LATENCY_STATS_TTL_SECONDS = 300.0
 # not currently used CLEAR_CACHE_AFTER = 30 * 24 * 60 * 60 # Clear cache completely after 30 days
 
 # --- SQLAlchemy Model Definition ---
@@ -90,6 +110,20 @@ class KPQuery(Base):  # type: ignore[misc, valid-type]
 
 
 
+# --- Single-flight bookkeeping ---
+
+# Identical KP queries currently being sent by this process, keyed by query hash. Each future is
+# resolved with the leader's result tuple. concurrent.futures (rather than asyncio) futures are
+# used because Expand runs each qedge's KP queries in their own event loop.
+_in_flight_queries: dict[str, concurrent.futures.Future] = {}
+_in_flight_queries_lock = threading.Lock()
+
+# Per-KP latency statistics computed from the KPQuery table, keyed by KP curie: (time computed, stats)
+_kp_latency_stats: dict[str, tuple[float, dict[str, Any] | None]] = {}
+_kp_latency_stats_lock = threading.Lock()
+
+
+
 # --- KPQueryCacher Class ---
 
 class KPQueryCacher:
@@ -103,9 +137,18 @@ class KPQueryCacher:
         """
         self.db_file_path = os.path.dirname(os.path.abspath(__file__))+"/trapi_query_cacher_database.sqlite"
         self.cache_dir = os.path.dirname(os.path.abspath(__file__))+"/trapi_query_cacher_responses"
+        self.lease_dir = os.path.dirname(os.path.abspath(__file__))+"/trapi_query_cacher_leases"
         
-        # Ensure cache directory exists
+        # Ensure cache and lease directories exist
         os.makedirs(self.cache_dir, exist_ok=True)
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+        # The codec used to write new cache files; files written with any other codec can still be read
+        self.codecs = get_kp_response_codecs(self.cache_dir)
+        self.codec = self.codecs[KP_RESPONSE_CODEC]
+
+        # In-memory LRU tier in front of the compressed file store, shared by all cachers in this process
+        self.memory_cache = get_kp_response_memory_cache()
         
         # Set up SQLAlchemy engine and session
         self.engine = create_engine(f'sqlite:///{self.db_file_path}')
@@ -113,7 +156,6 @@ class KPQueryCacher:
         
         # Create tables if they don't exist
         Base.metadata.create_all(self.engine)
-        print(f"Cacher initialized. database: '{self.db_file_path}'\n                    cachedir: '{self.cache_dir}'")
 
         if str(mode) == 'BackgroundTasker':
             if CLEAR_CACHE_ON_BACKGROUND_TASKER_START:
@@ -128,6 +170,7 @@ class KPQueryCacher:
         All records and all cached files will be deleted.
         """
         print("Initializing cache: Wiping DB and cache directory...")
+        self.memory_cache.clear()
         with self._get_session() as session:
             # Clear the table
             session.query(KPQuery).delete()
@@ -136,8 +179,10 @@ class KPQueryCacher:
         Base.metadata.drop_all(self.engine)
         Base.metadata.create_all(self.engine)
             
-        # Clear the cache directory
+        # Clear the cache directory (but keep any trained zstd dictionaries)
         for f_name in os.listdir(self.cache_dir):
+            if f_name.startswith('zstd_dictionary.'):
+                continue
             f_path = os.path.join(self.cache_dir, f_name)
             try:
                 if os.path.isfile(f_path) or os.path.islink(f_path):
@@ -189,31 +234,125 @@ class KPQueryCacher:
         return hash
 
 
-    def _get_cache_filepath(self, query_hash: str) -> str:
+    def _get_cache_filepath(self, query_hash: str, codec: KPResponseCodec | None = None) -> str:
         """
         Gets the standardized file path for a given query hash.
         
         :param query_hash: The hash of the query.
+        :param codec: The codec whose file extension to use (by default, the codec used for new files).
         :return: The full file path for the compressed response.
         """
-        return os.path.join(self.cache_dir, f"{query_hash}.pkl.gz")
+        codec = codec or self.codec
+        return os.path.join(self.cache_dir, f"{query_hash}{codec.file_extension}")
+
+
+
+    def _find_cache_filepath(self, query_hash: str) -> str:
+        """
+        Gets the path of the existing cache file for a given query hash, in whatever format it was written.
+        If there is none, returns the path it would have in the current format.
+        """
+        for codec in [self.codec] + [codec for codec in self.codecs.values() if codec is not self.codec]:
+            filepath = self._get_cache_filepath(query_hash, codec)
+            if os.path.exists(filepath):
+                return filepath
+        return self._get_cache_filepath(query_hash)
+
+
+
+    def _get_codec_for_filepath(self, filepath: str) -> KPResponseCodec:
+        """Determines from its file extension which codec a cache file was written with."""
+        for codec in self.codecs.values():
+            if filepath.endswith(codec.file_extension):
+                return codec
+        raise ValueError(f"Unrecognized cache file format: {filepath}")
+
+
+
+    def _remove_other_format_cache_files(self, query_hash: str):
+        """Removes any cache files for a query hash that are not in the current format."""
+        for codec in self.codecs.values():
+            if codec is not self.codec:
+                try:
+                    os.unlink(self._get_cache_filepath(query_hash, codec))
+                except FileNotFoundError:
+                    pass
+
+
+
+    def _get_lease_filepath(self, query_hash: str) -> str:
+        """
+        Gets the path of the lock file that serves as the cross-process lease for
+        sending a given query to its KP.
+
+        :param query_hash: The hash of the query.
+        :return: The full file path of the lease lock file.
+        """
+        return os.path.join(self.lease_dir, f"{query_hash}.lock")
+
+
+    @staticmethod
+    def _touch_lease_file(lease_filepath: str):
+        """
+        Updates the modification time of a lease lock file, to show that it is still in use.
+        """
+        try:
+            os.utime(lease_filepath)
+        except OSError:
+            pass
+
+
+    def remove_stale_leases(self, max_age_seconds: float = LEASE_FILE_MAX_AGE_SECONDS) -> int:
+        """
+        Deletes the lease lock files that have not been used for max_age_seconds. The holder and the
+        waiters of a lease touch its lock file, and a query never waits for a lease longer than its
+        timeout plus LEASE_WAIT_MARGIN_SECONDS, so a lock file this old is no longer in use.
+
+        :param max_age_seconds: The minimum age (since last use) of the lock files to delete.
+        :return: The number of lock files deleted.
+        """
+        n_removed = 0
+        oldest_mtime = time.time() - max_age_seconds
+        for lease_filename in os.listdir(self.lease_dir):
+            lease_filepath = os.path.join(self.lease_dir, lease_filename)
+            try:
+                if os.path.getmtime(lease_filepath) >= oldest_mtime:
+                    continue
+                # (only delete a lock file while holding it, so that a lease that was just taken is left alone)
+                with filelock.FileLock(lease_filepath, timeout=0):
+                    os.unlink(lease_filepath)
+                n_removed += 1
+            except (OSError, filelock.Timeout):
+                pass
+        return n_removed
 
 
 
     def _read_cache_file(self, filepath: str) -> Any:
-        """Reads and de-pickles a compressed cache file."""
-        with gzip.open(filepath, 'rb') as f:
-            return pickle.load(f)
+        """Reads and decodes a compressed cache file."""
+        return self._get_codec_for_filepath(filepath).loads(self._read_cache_file_payload(filepath))
+
+
 
+    def _read_cache_file_payload(self, filepath: str) -> bytes:
+        """Reads and decompresses a compressed cache file, returning the (still serialized) payload."""
+        return self._get_codec_for_filepath(filepath).read_file(filepath)
 
 
-    def _write_cache_file(self, filepath: str, data: Any):
-        """Pickles and writes data to a compressed cache file."""
+
+    def _write_cache_file(self, filepath: str, data: Any) -> bytes:
+        """Serializes and writes data to a compressed cache file, returning the uncompressed serialized payload."""
         #eprint(f"Writing caching file {filepath}")
         #eprint(f"data content: {data}")
-        with gzip.open(filepath, 'wb') as f:
-            pickle.dump(data, f)
+        codec = self._get_codec_for_filepath(filepath)
+        payload = codec.dumps(data)
+        # Write to a process-unique temporary file and rename it into place, so that readers
+        # never see a partially written file
+        temp_filepath = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        codec.write_file(temp_filepath, payload)
+        os.replace(temp_filepath, filepath)
         #eprint(f"Done writing caching file {filepath}")
+        return payload
 
 
 
@@ -269,13 +408,22 @@ class KPQueryCacher:
 
 
 
-    async def get_result(self, query_url: str, query_object: dict, kp_curie: str, timeout=30, bypass_cache=False, async_session=None) -> tuple:
+    async def get_result(self, query_url: str, query_object: dict, kp_curie: str, timeout=30, bypass_cache=False, hedge_after=None, retry_timeout=None) -> tuple:
         """
         Looks for a cached result based on the query object.
         If found, updates access stats and returns the decompressed response.
         if not found, then perform the remote query and store the result in the cache
 
+        Identical queries that miss the cache at the same time are coalesced ("single-flight"):
+        within this process, only the first caller (the leader) sends the query while the others
+        await its completion; across processes, a file lease in the lease directory ensures that
+        only one process sends the query while the others wait and then read the cached result.
+
         :param query_object: The query object to hash and look up.
+        :param hedge_after: If set, and the KP has not answered the query after this many seconds,
+            a second (hedged) copy of the query is sent and whichever answers first is used.
+        :param retry_timeout: If set, and the cached result is a timeout (or connection error) that happened
+            sooner than this many seconds, the query is sent again with this timeout instead.
         :return: A tuple of (response_data, http_status_code, elapsed_time, error_message)
             http_status_code -1 means the cached result is a timeout
             http_status_code -2 means there is not cached result available
@@ -285,18 +433,121 @@ class KPQueryCacher:
         #eprint(f"*** Checking cache for query with {kp_curie} to {query_url}")
         if bypass_cache:
             eprint(f"*** Bypassing cache by user request")
-        else:
+            return await self._fetch_and_store_result(query_url, query_object, kp_curie, timeout=timeout, hedge_after=hedge_after)
+
+        response_data, http_code, elapsed_time, error = self.get_cached_result(query_url, query_object)
+        if http_code == CONNECTION_ERROR and retry_timeout and \
+                self._get_cached_failure_elapsed(query_url, query_object) < retry_timeout:
+            eprint(f"*** Cached result for query to {kp_curie} is a timeout under a shorter timeout; sending it again with timeout={retry_timeout}")
+            timeout = retry_timeout
+        elif http_code != NO_CACHED_RESPONSE:
+            #eprint("*** Found cached result")
+            return response_data, http_code, elapsed_time, 'from cache'
+
+        #### Else join an identical in-flight query in this process, if there is one
+        query_hash = self._hash_query( { 'query_url': query_url, 'query_object': query_object } )
+        with _in_flight_queries_lock:
+            in_flight_query = _in_flight_queries.get(query_hash)
+            is_leader = in_flight_query is None
+            if is_leader:
+                in_flight_query = concurrent.futures.Future()
+                _in_flight_queries[query_hash] = in_flight_query
+
+        if not is_leader:
+            eprint(f"*** Identical query to {kp_curie} with query_hash={query_hash} is already in flight; awaiting its result")
+            # (shielded, so that a follower being cancelled does not cancel the shared future of the others)
+            leader_result = await asyncio.shield(asyncio.wrap_future(in_flight_query))
             response_data, http_code, elapsed_time, error = self.get_cached_result(query_url, query_object)
             if http_code != NO_CACHED_RESPONSE:
-                #eprint("*** Found cached result")
                 return response_data, http_code, elapsed_time, 'from cache'
+            if leader_result is not None:
+                # The leader could not store its result, so hand over a private copy of it
+                return copy.deepcopy(leader_result)
+            # The leader was cancelled or interrupted before it had a result, so send the query ourselves
+            eprint(f"*** In-flight query to {kp_curie} with query_hash={query_hash} was abandoned; sending it again")
+            return await self._get_result_with_lease(query_hash, query_url, query_object, kp_curie,
+                                                     timeout=timeout, hedge_after=hedge_after)
+
+        #### We are the leader in this process: send the query (once we hold the cross-process lease)
+        try:
+            result = await self._get_result_with_lease(query_hash, query_url, query_object, kp_curie,
+                                                       timeout=timeout, hedge_after=hedge_after)
+            in_flight_query.set_result(result)
+            return result
+        except Exception as e:
+            in_flight_query.set_exception(e)
+            raise
+        except BaseException:
+            # (a cancelled leader must not cancel its followers; a None result tells them to send the query themselves)
+            in_flight_query.set_result(None)
+            raise
+        finally:
+            with _in_flight_queries_lock:
+                del _in_flight_queries[query_hash]
+
+
+
+    async def _get_result_with_lease(self, query_hash: str, query_url: str, query_object: dict, kp_curie: str, timeout=30, hedge_after=None) -> tuple:
+        """
+        Acquires the cross-process lease for this query before sending it to the KP. If another
+        process holds the lease, waits (without blocking the event loop) for it to finish and
+        returns the result it cached. If the lease cannot be had within the query timeout plus
+        a margin, sends the query anyway rather than failing.
+
+        :return: A tuple of (response_data, http_status_code, elapsed_time, error_message)
+        """
+        lease = filelock.FileLock(self._get_lease_filepath(query_hash))
+        lease_deadline = time.time() + timeout + LEASE_WAIT_MARGIN_SECONDS
+        waited_for_lease = False
+        have_lease = False
+        while not have_lease:
+            try:
+                lease.acquire(timeout=0)
+                have_lease = True
+            except filelock.Timeout:
+                self._touch_lease_file(lease.lock_file)
+                if time.time() > lease_deadline:
+                    eprint(f"*** Gave up waiting for the lease on query_hash={query_hash}; querying {kp_curie} anyway")
+                    break
+                if not waited_for_lease:
+                    eprint(f"*** Another process is already querying {kp_curie} with query_hash={query_hash}; waiting for its result")
+                    waited_for_lease = True
+                await asyncio.sleep(LEASE_POLL_SECONDS)
+
+        try:
+            #### The process that held the lease will usually have cached the result by now
+            if waited_for_lease:
+                response_data, http_code, elapsed_time, error = self.get_cached_result(query_url, query_object)
+                if http_code != NO_CACHED_RESPONSE:
+                    return response_data, http_code, elapsed_time, 'from cache'
+
+            return await self._fetch_and_store_result(query_url, query_object, kp_curie, timeout=timeout, hedge_after=hedge_after)
+
+        finally:
+            if have_lease:
+                # (the lock file is not deleted here: a process waiting on it could then lock the deleted file while
+                # another one locks a new file at the same path; remove_stale_leases() cleans up old lock files)
+                self._touch_lease_file(lease.lock_file)
+                lease.release()
+
+
 
-        #### Else send it to the service
+    async def _fetch_and_store_result(self, query_url: str, query_object: dict, kp_curie: str, timeout=30, hedge_after=None) -> tuple:
+        """
+        Sends the query to the KP and stores the outcome (including timeouts and HTTP errors) in the cache.
+
+        :return: A tuple of (response_data, http_status_code, elapsed_time, error_message)
+        """
+
+        #### Send it to the service
         #eprint(f"*** Fetch data directly from KP {query_url} using payload {query_object}, timeout={timeout}")
         try:
-            response_data, http_code, elapsed_time, error = await self.async_post_query_to_web_service(query_url, query_object, timeout=timeout, async_session=async_session)
+            if hedge_after and hedge_after < timeout:
+                response_data, http_code, elapsed_time, error = await self._post_query_with_hedge(query_url, query_object, timeout=timeout, kp_curie=kp_curie, hedge_after=hedge_after)
+            else:
+                response_data, http_code, elapsed_time, error = await self.async_post_query_to_web_service(query_url, query_object, timeout=timeout, kp_curie=kp_curie)
             n_results = self._get_n_results(response_data)
-        except TimeoutError:
+        except (TimeoutError, asyncio.TimeoutError):
             response_data = None
             http_code = -1
             elapsed_time = timeout
@@ -319,9 +570,23 @@ class KPQueryCacher:
 
 
 
+    def _get_cached_failure_elapsed(self, query_url: str, query_object: dict) -> float:
+        # Returns how long the query took (i.e., the timeout it was sent with, if it timed out) the last time it failed
+        query_hash = self._hash_query( { 'query_url': query_url, 'query_object': query_object } )
+        with self._get_session() as session:
+            record = session.query(KPQuery).filter_by(query_url=query_url, query_hash=query_hash).first()
+            if record is None:
+                return 0.0
+            if record.last_refresh_http_code is not None:
+                return record.last_refresh_elapsed or 0.0
+            return record.first_query_elapsed
+
+
+
     def get_cached_result(self, query_url: str, query_object: dict) -> tuple:
         """
-        Looks for a cached result based on the query object.
+        Looks for a cached result based on the query object, first in the in-memory LRU tier
+        and then in the compressed file store.
         If found, updates access stats and returns the decompressed response.
 
         :param query_object: The query object to hash and look up.
@@ -335,6 +600,19 @@ class KPQueryCacher:
 
         eprint(f"*** Looking for pre-existing query_url={query_url}, query_object={query_object} which yields query_hash={query_hash}")
 
+        #### First try the in-memory tier. The record must still exist (it may have been purged by another process)
+        memory_entry = self.memory_cache.get(query_hash)
+        if memory_entry is not None:
+            kp_curie, http_code, payload = memory_entry
+            with self._get_session() as session:
+                n_updated = session.query(KPQuery).filter_by(query_hash=query_hash).update(
+                    {KPQuery.n_requests: KPQuery.n_requests + 1,
+                     KPQuery.last_request_datetime: datetime.now().strftime('%Y-%m-%d %H:%M:%S')},
+                    synchronize_session=False)
+            if n_updated:
+                return self.codec.loads(payload), http_code, time.time() - start_time, None
+            self.memory_cache.invalidate(query_hash)
+
         with self._get_session() as session:
             record = session.query(KPQuery).filter_by(query_url=query_url, query_hash=query_hash).first()
 
@@ -347,10 +625,14 @@ class KPQueryCacher:
             session.commit()
 
             # Now try to read the file
-            filepath = self._get_cache_filepath(query_hash)
+            filepath = self._find_cache_filepath(query_hash)
             try:
-                response_data = self._read_cache_file(filepath)
-                return response_data, record.last_refresh_http_code or record.first_query_http_code, time.time() - start_time, None
+                codec = self._get_codec_for_filepath(filepath)
+                payload = codec.read_file(filepath)
+                http_code = record.last_refresh_http_code or record.first_query_http_code
+                if http_code == 200 and codec is self.codec:
+                    self.memory_cache.put(query_hash, record.kp_curie, http_code, payload)
+                return codec.loads(payload), http_code, time.time() - start_time, None
 
             except FileNotFoundError as e:
                 # Cache inconsistency: DB record exists, but file is missing.
@@ -401,13 +683,16 @@ class KPQueryCacher:
 
 
 
-    async def async_post_query_to_web_service(self, query_url: str, query_object: dict, timeout: int = 30, async_session=None) -> tuple:
+    async def async_post_query_to_web_service(self, query_url: str, query_object: dict, timeout: int = 30, kp_curie: str | None = None) -> tuple:
         """
-        Posts the query to the remote KP.
+        Posts the query to the remote KP using the process-wide pooled session (see kp_connection_pool.py),
+        so that repeated queries to the same KP reuse keep-alive connections instead of paying for new
+        DNS lookups and TCP/TLS handshakes every time.
 
         :param query_object: The query (request body) to send.
         :param query_url: The URL of the web service.
         :param timeout: Request timeout in seconds.
+        :param kp_curie: CURIE of the Knowledge Provider, used to key the connection pool statistics.
         :return: A tuple of (response_data, http_status_code, elapsed_time, error_message)
         """
         start_time = time.time()
@@ -416,24 +701,119 @@ class KPQueryCacher:
             requests_query_url = requests_query_url.replace('https://dev.retriever.biothings.io', 'https://gateway.systemsbiology.net')
             eprint(f"XXXXXX POSTing async to {requests_query_url} instead of {query_url}")
 
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False)) as session:
-            try:
-                async with session.post(requests_query_url, json=query_object, timeout=timeout, headers={'accept': 'application/json'}) as response:
-                    elapsed = time.time() - start_time
-                    # Raise an exception for bad status codes (4xx, 5xx)
-                    response.raise_for_status() 
-                    json_response = await response.json()
-                    return json_response, response.status, elapsed, None
+        try:
+            response_body, status = await get_kp_connection_pool().post(requests_query_url, query_object, timeout=timeout, kp_curie=kp_curie)
+            elapsed = time.time() - start_time
+            return json.loads(response_body), status, elapsed, None
 
-            except requests.exceptions.HTTPError as e:
-                # Got a 4xx or 5xx response
-                elapsed = time.time() - start_time
-                return None, e.response.status_code, elapsed, str(e)
+        except aiohttp.ClientResponseError as e:
+            # Got a 4xx or 5xx response
+            elapsed = time.time() - start_time
+            return None, e.status, elapsed, str(e)
+
+        except aiohttp.ClientError as e:
+            # Connection error, DNS error, etc.
+            elapsed = time.time() - start_time
+            return None, CONNECTION_ERROR, elapsed, str(e) # -1 for non-HTTP errors
+
+
+
+    async def _post_query_with_hedge(self, query_url: str, query_object: dict, timeout: float, kp_curie: str, hedge_after: float) -> tuple:
+        """
+        Posts the query to the KP, and if it has not answered after hedge_after seconds, posts a second copy
+        of it (TRAPI queries are read-only, so this is safe) and uses whichever copy succeeds first; the
+        other one is cancelled. Both copies are bound by the same overall timeout.
+
+        :return: A tuple of (response_data, http_status_code, elapsed_time, error_message), where
+            elapsed_time is counted from when the first copy was sent
+        :raises asyncio.TimeoutError: if neither copy answers within the timeout
+        """
+        start_time = time.time()
+        pending = {asyncio.ensure_future(self.async_post_query_to_web_service(query_url, query_object, timeout=timeout, kp_curie=kp_curie))}
+        result = None
+        exception = None
+        n_sent = 1
+        try:
+            while pending:
+                wait_timeout = hedge_after if n_sent == 1 else None
+                done, pending = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    remaining_timeout = timeout - (time.time() - start_time)
+                    eprint(f"*** {kp_curie} has not answered after {hedge_after:.1f} seconds; sending a hedged copy of the query")
+                    pending.add(asyncio.ensure_future(self.async_post_query_to_web_service(query_url, query_object, timeout=remaining_timeout, kp_curie=kp_curie)))
+                    n_sent = 2
+                    continue
+                for task in done:
+                    if task.exception() is not None:
+                        exception = task.exception()
+                    else:
+                        result = task.result()
+                        if result[1] == 200:
+                            if n_sent == 2:
+                                eprint(f"*** The hedged query to {kp_curie} was answered after {time.time() - start_time:.1f} seconds")
+                            return result[0], result[1], time.time() - start_time, result[3]
+                if n_sent == 1:
+                    # The one copy sent so far failed (without timing out); no point in hedging
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
 
-            except requests.exceptions.RequestException as e:
-                # Connection error, timeout, DNS error, etc.
-                elapsed = time.time() - start_time
-                return None, CONNECTION_ERROR, elapsed, str(e) # -1 for non-HTTP errors
+        if result is not None:
+            return result[0], result[1], time.time() - start_time, result[3]
+        raise cast(BaseException, exception)
+
+
+
+    def get_kp_latency_stats(self, kp_curie: str) -> dict[str, Any] | None:
+        """
+        Returns latency statistics for a KP, based on the time it took to answer its last
+        KP_LATENCY_HISTORY_SIZE successful (HTTP 200) or timed-out queries that were not answered from
+        the cache (i.e., KPQuery.first_query_elapsed). A query that timed out is a censored sample: it
+        counts at its timeout, which is only a lower bound of the time the KP would have needed, so
+        p95_is_timeout says whether p95 is such a lower bound. Statistics are cached in this process
+        for KP_LATENCY_STATS_TTL_SECONDS.
+
+        :param kp_curie: CURIE of the Knowledge Provider.
+        :return: A dict with n_samples, n_timeouts, p50, p95, max (in seconds), and p95_is_timeout,
+            or None if there is no history.
+        """
+        with _kp_latency_stats_lock:
+            cached_stats = _kp_latency_stats.get(kp_curie)
+        if cached_stats is not None and time.time() - cached_stats[0] < KP_LATENCY_STATS_TTL_SECONDS:
+            return cached_stats[1]
+
+        with self._get_session() as session:
+            rows = session.query(KPQuery.first_query_elapsed, KPQuery.first_query_http_code) \
+                .filter(KPQuery.kp_curie == kp_curie,
+                        (KPQuery.first_query_http_code == 200) |
+                        ((KPQuery.first_query_http_code == CONNECTION_ERROR) &
+                         (KPQuery.first_query_elapsed >= KP_LATENCY_MIN_TIMEOUT_SECONDS))) \
+                .order_by(KPQuery.kp_query_id.desc()) \
+                .limit(KP_LATENCY_HISTORY_SIZE).all()
+        # (elapsed time, whether it timed out); a timeout sorts after an answer that took as long
+        samples = sorted((row[0], row[1] != 200) for row in rows if row[0] is not None)
+
+        stats = None
+        if samples:
+            p95, p95_is_timeout = self._get_percentile(samples, 95)
+            stats = {'n_samples': len(samples),
+                     'n_timeouts': sum(timed_out for _, timed_out in samples),
+                     'p50': self._get_percentile(samples, 50)[0],
+                     'p95': p95,
+                     'max': samples[-1][0],
+                     'p95_is_timeout': p95_is_timeout}
+        with _kp_latency_stats_lock:
+            _kp_latency_stats[kp_curie] = (time.time(), stats)
+        return stats
+
+
+
+    @staticmethod
+    def _get_percentile(sorted_values: list, percentile: float) -> Any:
+        # Nearest-rank percentile
+        rank = max(int(-(-percentile * len(sorted_values) // 100)), 1)
+        return sorted_values[rank - 1]
 
 
 
@@ -466,7 +846,7 @@ class KPQueryCacher:
         
         filepath = self._get_cache_filepath(query_hash)
         updated_existing_record = False
-        if os.path.exists(filepath):
+        if os.path.exists(self._find_cache_filepath(query_hash)):
             eprint(f"There is already a file {filepath}. Maybe some parallel job beat us to it or maybe the previous try resulted in an error")
 
             with self._get_session() as session:
@@ -496,11 +876,18 @@ class KPQueryCacher:
                 updated_existing_record = True
 
         try:
-            self._write_cache_file(filepath, response_object)
+            payload = self._write_cache_file(filepath, response_object)
+            self._remove_other_format_cache_files(query_hash)
         except Exception as e:
             eprint(f"Failed to write cache file {filepath}: {e}")
+            self.memory_cache.invalidate(query_hash)
             return # Don't create a DB record if file write fails
 
+        if http_code == 200:
+            self.memory_cache.put(query_hash, kp_curie, http_code, payload)
+        else:
+            self.memory_cache.invalidate(query_hash)
+
         if updated_existing_record:
             return
 
@@ -550,6 +937,7 @@ class KPQueryCacher:
             if record.query_url and record.query_url.startswith(query_url_start):
                 timestamp = str(datetime.now().isoformat())
                 eprint(f"{timestamp}: INFO: KPQueryCacher.purge_cache: Deleting record {record.kp_query_id} matching {record.query_url}")
+                self.memory_cache.invalidate(record.query_hash)
                 session.delete(record)
                 session.commit()
                 deleted_count += 1
@@ -570,6 +958,9 @@ class KPQueryCacher:
         #eprint(f"{timestamp}: INFO: KPQueryCacher.refresh_cache: Starting KP response cache refresh process")
         start_time = time.time()
 
+        #### Clean up the lease lock files of queries that are no longer in flight
+        self.remove_stale_leases()
+
         session = self.Session()
         try:
             records = session.query(KPQuery).all()
@@ -671,13 +1062,11 @@ class KPQueryCacher:
                     record.last_refresh_n_results = self._get_n_results(response_data)
                 
                     # 4. Compare results
-                    filepath = self._get_cache_filepath(record.query_hash)
+                    filepath = self._find_cache_filepath(record.query_hash)
                     try:
                         old_response_data = self._read_cache_file(filepath)
                         if old_response_data is None:
                             old_response_n_results = -1
-                        elif isinstance(old_response_data, tuple):
-                            old_response_n_results = old_response_data[0]['message']['results']
                         else:
                             old_response_n_results = old_response_data['message']['results']
                         if old_response_n_results == response_data['message']['results']:
@@ -687,7 +1076,9 @@ class KPQueryCacher:
                             #eprint(f"The 'result' portion of the new response is the different than the old. Storing new response")
                             record.n_refresh_different_results = (record.n_refresh_different_results or 0) + 1
                             # Overwrite file with new data
-                            self._write_cache_file(filepath, response_data)
+                            self._write_cache_file(self._get_cache_filepath(record.query_hash), response_data)
+                            self._remove_other_format_cache_files(record.query_hash)
+                            self.memory_cache.invalidate(record.query_hash)
                     #except FileNotFoundError:
                     #    # File was missing, so this counts as "different"
                     #    record.n_refresh_different_results = (record.n_refresh_different_results or 0) + 1
@@ -748,6 +1139,7 @@ class KPQueryCacher:
         record = session.query(KPQuery).filter_by(kp_query_id=kp_query_id).first()
         if record:
             eprint(f"INFO: Deleting record for kp_query_id={kp_query_id}")
+            self.memory_cache.invalidate(record.query_hash)
             session.delete(record)
             session.commit()
             eprint(f"INFO: Done")
@@ -769,7 +1161,7 @@ class KPQueryCacher:
         record = session.query(KPQuery).filter_by(kp_query_id=kp_query_id).first()
         if record:
             query_hash = record.query_hash
-            filepath = self._get_cache_filepath(query_hash)
+            filepath = self._find_cache_filepath(query_hash)
             try:
                 response_data = self._read_cache_file(filepath)
                 return response_data
@@ -784,6 +1176,125 @@ class KPQueryCacher:
 
 
 
+    def warm_memory_cache(self, max_entries: int = WARM_MEMORY_CACHE_MAX_ENTRIES) -> int:
+        """
+        Preloads the in-memory tier with the successful responses of the most-requested
+        cached queries, most popular first, until either max_entries or the memory tier's
+        size cap is reached. Meant to be called once at application start-up (before
+        query processes are forked), not at query time.
+
+        :param max_entries: The maximum number of responses to preload.
+        :return: The number of responses loaded into memory.
+        """
+        start_time = time.time()
+        with self._get_session() as session:
+            records = session.query(KPQuery).order_by(KPQuery.n_requests.desc()).all()
+            candidates = [(record.query_hash, record.kp_curie, record.last_refresh_http_code or record.first_query_http_code)
+                          for record in records]
+
+        #### Read the most popular responses that fit, then insert them least popular first so that
+        #### the most popular ones end up most recently used
+        free_bytes = self.memory_cache.get_free_bytes()
+        responses_to_load = []
+        for query_hash, kp_curie, http_code in candidates:
+            if len(responses_to_load) >= max_entries:
+                break
+            if http_code != 200:
+                continue
+            try:
+                filepath = self._find_cache_filepath(query_hash)
+                if self._get_codec_for_filepath(filepath) is not self.codec:
+                    continue
+                payload = self._read_cache_file_payload(filepath)
+            except Exception as e:
+                eprint(f"WARNING: KPQueryCacher.warm_memory_cache: unable to read cached response {query_hash}: {e}")
+                continue
+            if len(payload) > free_bytes:
+                continue
+            free_bytes -= len(payload)
+            responses_to_load.append((query_hash, kp_curie, http_code, payload))
+
+        n_loaded = 0
+        for query_hash, kp_curie, http_code, payload in reversed(responses_to_load):
+            if self.memory_cache.put(query_hash, kp_curie, http_code, payload):
+                n_loaded += 1
+        eprint(f"INFO: KPQueryCacher.warm_memory_cache: Loaded {n_loaded} cached KP responses into memory "
+               f"in {time.time() - start_time:.2f} seconds")
+        return n_loaded
+
+
+
+    def migrate_cache_format(self) -> dict[str, Any]:
+        """
+        Rewrites, in place, every cache file that is not in the current format (KP_RESPONSE_CODEC).
+        Each file is written to a temporary file and renamed into place before the old file is
+        removed, so the cache stays readable throughout and the migration can be interrupted and rerun.
+
+        :return: A summary of the number of files migrated and the disk footprint before and after.
+        """
+        summary = {'n_files_migrated': 0, 'n_files_failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+        for f_name in sorted(os.listdir(self.cache_dir)):
+            filepath = os.path.join(self.cache_dir, f_name)
+            if f_name.endswith('.tmp') or f_name.startswith('zstd_dictionary.'):
+                continue
+            try:
+                codec = self._get_codec_for_filepath(filepath)
+            except ValueError:
+                continue
+            if codec is self.codec:
+                continue
+
+            query_hash = f_name[:-len(codec.file_extension)]
+            try:
+                bytes_before = os.path.getsize(filepath)
+                self._write_cache_file(self._get_cache_filepath(query_hash), self._read_cache_file(filepath))
+                os.unlink(filepath)
+            except Exception as e:
+                eprint(f"ERROR: KPQueryCacher.migrate_cache_format: unable to migrate {filepath}: {e}")
+                summary['n_files_failed'] += 1
+                continue
+            self.memory_cache.invalidate(query_hash)
+            summary['n_files_migrated'] += 1
+            summary['bytes_before'] += bytes_before
+            summary['bytes_after'] += os.path.getsize(self._get_cache_filepath(query_hash))
+        return summary
+
+
+
+    def train_zstd_dictionary(self, max_responses: int = 200) -> int | None:
+        """
+        Trains a zstd dictionary on chunks of the most-requested cached responses, to improve the
+        compression of (especially small) responses written from now on.
+
+        :param max_responses: The maximum number of cached responses to sample.
+        :return: The ID of the new dictionary, or None if the current codec does not use dictionaries.
+        """
+        if not isinstance(self.codec, ZstdMsgpackCodec):
+            eprint(f"ERROR: Codec {self.codec.name} does not use a dictionary")
+            return None
+        with self._get_session() as session:
+            query_hashes = [record.query_hash for record in
+                            session.query(KPQuery).order_by(KPQuery.n_requests.desc()).limit(max_responses)]
+
+        samples = []
+        for query_hash in query_hashes:
+            try:
+                payload = self.codec.dumps(self._read_cache_file(self._find_cache_filepath(query_hash)))
+            except Exception:
+                continue
+            payload = payload[:DICTIONARY_TRAINING_MAX_BYTES_PER_RESPONSE]
+            samples.extend(payload[i:i + DICTIONARY_TRAINING_CHUNK_BYTES]
+                           for i in range(0, len(payload), DICTIONARY_TRAINING_CHUNK_BYTES))
+        try:
+            dict_id = self.codec.train_dictionary(samples)
+        except Exception as e:
+            eprint(f"ERROR: Unable to train a zstd dictionary on {len(samples)} samples: {e}")
+            return None
+        eprint(f"INFO: Trained zstd dictionary {dict_id} on {len(samples)} samples from {len(query_hashes)} responses")
+        return dict_id
+
+
+
     def list_cached_queries(self) -> dict[str, Collection[object]]:
         """
         Generates a JSON-encoded list of all query records in the cache.
@@ -853,12 +1364,35 @@ class KPQueryCacher:
             #{ "key": "query_hash", "title": "query hash", "title_hover": "query hash" },
         ]
 
+        cache_stats['connection_pool'] = get_kp_connection_pool().get_stats()
+        cache_stats['memory_cache'] = self.memory_cache.get_stats()
+
         cache_stats['total_cache_size_MiB'] = sum(os.path.getsize(f"{self.cache_dir}/{file}") for file in os.listdir(self.cache_dir)) / 1024 / 1024
 
         response = { 'cache_stats': cache_stats, 'column_data': column_data, 'cache_data': cached_queries }
         return response
 
 
+# The process-wide KPQueryCacher (with the ID of the process that created it), created on first use
+_kp_query_cacher: tuple[int, KPQueryCacher] | None = None
+_kp_query_cacher_lock = threading.Lock()
+
+
+def get_kp_query_cacher() -> KPQueryCacher:
+    """
+    Returns the process-wide KPQueryCacher. A forked process (e.g., the child process that runs a query) creates
+    its own on first use rather than sharing its parent's database engine.
+    """
+    global _kp_query_cacher
+    cached = _kp_query_cacher
+    if cached is None or cached[0] != os.getpid():
+        with _kp_query_cacher_lock:
+            cached = _kp_query_cacher
+            if cached is None or cached[0] != os.getpid():
+                cached = _kp_query_cacher = (os.getpid(), KPQueryCacher())
+    return cached[1]
+
+
 
 ############################################ Main ############################################################
 #### If this class is run from the command line, allow some basic testing of the class functionality
@@ -877,6 +1411,9 @@ def main():
     argparser.add_argument('--delete_query', action='store', help='Delete the given kp_query_id')
     argparser.add_argument('--delete_query_url_match', action='store', help='Delete cached queries where the query_url matches the provided string')
     argparser.add_argument('--refresh', action='count', help='Refresh all queries in the cache')
+    argparser.add_argument('--warm_memory_cache', action='count', help='Load the most-requested responses into the in-memory tier and show its stats')
+    argparser.add_argument('--migrate_cache_format', action='count', help=f"Rewrite all cache files that are not in the current format ({KP_RESPONSE_CODEC})")
+    argparser.add_argument('--train_zstd_dictionary', action='count', help='Train a zstd dictionary on the most-requested cached responses')
     params = argparser.parse_args()
 
     verbose = False
@@ -989,4 +1526,24 @@ def main():
         return
 
 
+    if params.train_zstd_dictionary:
+        eprint("Train a zstd dictionary for the cache")
+        cacher.train_zstd_dictionary()
+        return
+
+
+    if params.migrate_cache_format:
+        eprint(f"Migrate the cache files to {KP_RESPONSE_CODEC}")
+        summary = cacher.migrate_cache_format()
+        eprint(json.dumps(summary, indent=2, sort_keys=True))
+        return
+
+
+    if params.warm_memory_cache:
+        eprint("Warm the in-memory tier of the cache")
+        cacher.warm_memory_cache()
+        eprint(json.dumps(cacher.memory_cache.get_stats(), indent=2, sort_keys=True))
+        return
+
+
 if __name__ == "__main__": main()
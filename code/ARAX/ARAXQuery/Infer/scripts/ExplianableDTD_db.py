@@ -17,6 +17,8 @@ import os
 import sys
 import argparse
 import sqlite3
+import threading
+from collections import OrderedDict
 from typing import Optional, Union, List, Dict, Tuple
 
 import pandas as pd
@@ -32,6 +34,8 @@ sys.path.append(os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code']))
 from RTXConfiguration import RTXConfiguration #noqa: E402
 RTXConfig = RTXConfiguration()
 from ARAX_database_manager import ARAXDatabaseManager #noqa: E402
+from xdtd_sqlite import get_read_only_connection #noqa: E402
+from xdtd_score_store import XDTDScoreStore, build_score_store, build_score_store_from_db, get_score_store_dir #noqa: E402
 
 # Default output directory for the database
 _DEFAULT_OUTDIR = os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code', 'ARAX', 'KnowledgeSources', 'Prediction'])
@@ -40,6 +44,22 @@ _DEFAULT_OUTDIR = os.path.sep.join([*pathlist[:(RTXindex + 1)], 'code', 'ARAX',
 _SCORE_COLUMNS = ["drug_id", "drug_name", "disease_id", "disease_name", "tn_score", "tp_score", "unknown_score"]
 _PATH_COLUMNS = ["drug_id", "drug_name", "disease_id", "disease_name", "path", "path_score"]
 
+# Covering indexes for the run-mode lookups by drug and/or disease (they hold every column those queries read)
+_COVERING_INDEXES = {
+    "PREDICTION_SCORE_TABLE": ["drug_id", "disease_id", "drug_name", "disease_name", "tn_score", "tp_score", "unknown_score"],
+    "PATH_RESULT_TABLE": ["drug_id", "disease_id", "path_score", "path"],
+}
+
+# Max number of run-mode query results (e.g. all predictions for a common disease) kept in memory; 0 disables
+_HOT_CACHE_SIZE = 64
+# (real database path, (inode, mtime) of the file, table, drug IDs, disease IDs) -> query result, in least to most
+# recently used order
+_hot_cache: "OrderedDict[tuple, object]" = OrderedDict()
+_hot_cache_lock = threading.Lock()
+
+# Score store directory -> (version of the store, XDTDScoreStore), shared by the process
+_score_stores: Dict[str, Tuple[int, XDTDScoreStore]] = {}
+
 
 class ExplainableDTD:
     """SQLite interface for the xDTD prediction score and path result database.
@@ -61,7 +81,8 @@ class ExplainableDTD:
         path_to_path_results: Optional[str] = None,
         database_name: Optional[str] = None,
         outdir: Optional[str] = _DEFAULT_OUTDIR,
-        build: bool = False
+        build: bool = False,
+        use_hot_cache: bool = True
     ):
         """
         Args:
@@ -71,9 +92,12 @@ class ExplainableDTD:
                            or "ExplainableDTD.db" in build mode.
             outdir: Directory for the database file.
             build: True = create/populate mode; False = read-only query mode.
+            use_hot_cache: Whether run-mode query results are cached in memory (see _HOT_CACHE_SIZE).
         """
         self.is_connected = False
         self.conn: Optional[sqlite3.Connection] = None
+        self.build = build
+        self.use_hot_cache = use_hot_cache and not build
 
         if build:
             self._init_build_mode(path_to_score_results, path_to_path_results, database_name, outdir)
@@ -119,6 +143,7 @@ class ExplainableDTD:
     def connect(self) -> bool:
         """Open a connection to the SQLite database. Downloads via ARAXDatabaseManager if needed.
 
+        In run mode this is the process-wide read-only connection to the database (see xdtd_sqlite.py).
         Returns True on success.
         """
         if self.is_connected:
@@ -134,9 +159,12 @@ class ExplainableDTD:
                     f"Database '{db_path}' not found and ARAX database manager reports missing databases"
                 )
 
-        self.conn = sqlite3.connect(db_path)
+        if self.build:
+            self.conn = sqlite3.connect(db_path)
+            print(f"INFO: Connected to database: {db_path}", flush=True)
+        else:
+            self.conn = get_read_only_connection(db_path)
         self.is_connected = True
-        print(f"INFO: Connected to database: {db_path}", flush=True)
         return True
 
     def disconnect(self):
@@ -144,6 +172,11 @@ class ExplainableDTD:
         if not self.is_connected or self.conn is None:
             print("INFO: No active database connection to close", flush=True)
             return
+        if not self.build:
+            # The read-only connection is shared with the rest of the process; just let go of it
+            self.conn = None
+            self.is_connected = False
+            return
         try:
             self.conn.commit()
             self.conn.close()
@@ -235,14 +268,8 @@ class ExplainableDTD:
             conn.commit()
 
     def create_indexes(self):
-        """Create B-tree indexes on drug_id, drug_name, disease_id, disease_name for both tables."""
-        print("INFO: Creating indexes", flush=True)
-        conn = self._get_conn()
-        for table in ("PREDICTION_SCORE_TABLE", "PATH_RESULT_TABLE"):
-            for col in ("drug_id", "drug_name", "disease_id", "disease_name"):
-                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table}({col})")
-        conn.commit()
-        print("INFO: Index creation completed", flush=True)
+        """Create the indexes of both tables (see create_indexes())."""
+        create_indexes(self._get_conn())
 
     # ──────────────────────────────────────────────────────────────────────
     #  Run mode: query methods
@@ -305,12 +332,62 @@ class ExplainableDTD:
             print("WARNING: get_score_table called with no drug or disease CURIEs", flush=True)
             return pd.DataFrame([], columns=_SCORE_COLUMNS)
 
-        where_sql, params = self._build_where_clause(drug_ids, disease_ids)
-        query = f"SELECT {', '.join(_SCORE_COLUMNS)} FROM PREDICTION_SCORE_TABLE{where_sql}"
+        def _query_score_table():
+            where_sql, params = self._build_where_clause(drug_ids, disease_ids)
+            query = f"SELECT {', '.join(_SCORE_COLUMNS)} FROM PREDICTION_SCORE_TABLE{where_sql} ORDER BY rowid"
+            return pd.DataFrame(self._get_conn().execute(query, params).fetchall(), columns=_SCORE_COLUMNS)
 
-        cursor = self._get_conn().cursor()
-        cursor.execute(query, params)
-        return pd.DataFrame(cursor.fetchall(), columns=_SCORE_COLUMNS)
+        return self._get_cached("PREDICTION_SCORE_TABLE", drug_ids, disease_ids, _query_score_table).copy()
+
+    def get_top_scores(
+        self,
+        drug_curie_id: Optional[str] = None,
+        disease_curie_id: Optional[str] = None,
+        n: Optional[int] = None,
+        threshold: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """Return the top n predictions of a drug and/or disease, by decreasing tp_score.
+
+        Reads the columnar score store of the database (see xdtd_score_store.py) if it was built,
+        which makes this a slice read; otherwise falls back to get_score_table.
+
+        Args:
+            drug_curie_id: Drug CURIE, e.g. "CHEMBL.COMPOUND:CHEMBL55643".
+            disease_curie_id: Disease CURIE, e.g. "MONDO:0008753".
+            n: Max number of rows to return (all rows if None).
+            threshold: Only return rows with a tp_score of at least this.
+
+        Returns:
+            DataFrame with the same columns as get_score_table.
+        """
+        if not drug_curie_id and not disease_curie_id:
+            print("WARNING: get_top_scores called with no drug or disease CURIE", flush=True)
+            return pd.DataFrame([], columns=_SCORE_COLUMNS)
+
+        score_store = self._get_score_store()
+        if score_store is not None:
+            return score_store.get_top_scores(drug_curie_id, disease_curie_id, n, threshold)
+
+        top_scores = self.get_score_table(drug_curie_ids=drug_curie_id, disease_curie_ids=disease_curie_id)
+        top_scores = top_scores.sort_values(by="tp_score", ascending=False, kind="stable")
+        if threshold is not None:
+            top_scores = top_scores.loc[top_scores["tp_score"] >= threshold]
+        return top_scores.iloc[:n].reset_index(drop=True)
+
+    def _get_score_store(self) -> Optional[XDTDScoreStore]:
+        """Return the score store of the database (loaded once per build of it), or None if it has none."""
+        if self.build:
+            return None
+        store_dir = get_score_store_dir(os.path.join(self.outdir, self.database_name))
+        # (checked on every call, so that a store built by the database manager after startup is picked up)
+        store_version = XDTDScoreStore.get_version(store_dir)
+        if store_version is None:
+            return None
+        cached = _score_stores.get(store_dir)
+        if cached is None or cached[0] != store_version:
+            cached = (store_version, XDTDScoreStore(store_dir))
+            _score_stores[store_dir] = cached
+        return cached[1]
 
     def get_top_path(
         self,
@@ -334,16 +411,59 @@ class ExplainableDTD:
             print("WARNING: get_top_path called with no drug or disease CURIEs", flush=True)
             return {}
 
-        where_sql, params = self._build_where_clause(drug_ids, disease_ids)
-        query = f"SELECT drug_id, disease_id, path, path_score FROM PATH_RESULT_TABLE{where_sql}"
+        def _query_top_paths():
+            where_sql, params = self._build_where_clause(drug_ids, disease_ids)
+            query = f"SELECT drug_id, disease_id, path, path_score FROM PATH_RESULT_TABLE{where_sql} ORDER BY rowid"
+            top_paths: Dict[Tuple[str, str], List[list]] = {}
+            for drug_id, disease_id, path, path_score in self._get_conn().execute(query, params):
+                top_paths.setdefault((drug_id, disease_id), []).append([path, path_score])
+            return top_paths
 
-        cursor = self._get_conn().cursor()
-        cursor.execute(query, params)
+        top_paths = self._get_cached("PATH_RESULT_TABLE", drug_ids, disease_ids, _query_top_paths)
+        return {pair: [list(path) for path in paths] for pair, paths in top_paths.items()}
 
-        top_paths: Dict[Tuple[str, str], List[list]] = {}
-        for drug_id, disease_id, path, path_score in cursor.fetchall():
-            top_paths.setdefault((drug_id, disease_id), []).append([path, path_score])
-        return top_paths
+    def _get_cached(self, table: str, drug_ids: Optional[List[str]], disease_ids: Optional[List[str]], run_query):
+        """Return the result of run_query() for the given drug/disease IDs, from the hot cache if it's there.
+
+        The database is immutable in run mode, but the file can be replaced (e.g. by the ARAX database
+        manager), so results are cached by the (inode, mtime) of the file, like the read-only connections
+        in xdtd_sqlite. Callers must copy the returned object before handing it out.
+        """
+        if not self.use_hot_cache or _HOT_CACHE_SIZE <= 0:
+            return run_query()
+        real_path = os.path.realpath(os.path.join(self.outdir, self.database_name))
+        stat = os.stat(real_path)
+        key = (real_path, (stat.st_ino, stat.st_mtime_ns), table,
+               tuple(sorted(drug_ids or [])), tuple(sorted(disease_ids or [])))
+        with _hot_cache_lock:
+            if key in _hot_cache:
+                _hot_cache.move_to_end(key)
+                return _hot_cache[key]
+        result = run_query()
+        with _hot_cache_lock:
+            _hot_cache[key] = result
+            while len(_hot_cache) > _HOT_CACHE_SIZE:
+                _hot_cache.popitem(last=False)
+        return result
+
+
+def create_indexes(conn: sqlite3.Connection):
+    """Create the indexes of the PREDICTION_SCORE_TABLE and PATH_RESULT_TABLE.
+
+    The lookups by drug and/or disease use covering indexes (see _COVERING_INDEXES), one
+    leading with each of drug_id and disease_id, so they never have to read the tables
+    themselves. drug_name and disease_name get plain B-tree indexes.
+    """
+    print("INFO: Creating indexes", flush=True)
+    for table, columns in _COVERING_INDEXES.items():
+        for lead_col in ("drug_id", "disease_id"):
+            index_columns = [lead_col] + [col for col in columns if col != lead_col]
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{lead_col}_covering ON {table}({', '.join(index_columns)})")
+        for col in ("drug_name", "disease_name"):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table}({col})")
+    conn.execute("ANALYZE")
+    conn.commit()
+    print("INFO: Index creation completed", flush=True)
 
 
 # ══════════════════════════════════════════════════════════════════════════
@@ -359,6 +479,13 @@ def main():
                         help="(Re)build the database from scratch")
     parser.add_argument('--test', action="store_true", default=False,
                         help="Run test lookups against the database")
+    parser.add_argument('--create_indexes', action="store_true", default=False,
+                        help="Add the (covering) indexes to an existing database")
+    parser.add_argument('--build_score_store', action="store_true", default=False,
+                        help="(Re)build only the columnar score store, from --path_to_score_results if given, "
+                             "else from the database")
+    parser.add_argument('--top_k', type=int, default=100,
+                        help="Number of top predictions precomputed per drug and per disease in the score store")
     parser.add_argument('--path_to_score_results', type=str, default=None,
                         help="Directory containing prediction score TSV files (required for --build)")
     parser.add_argument('--path_to_path_results', type=str, default=None,
@@ -369,10 +496,15 @@ def main():
                         help="Output directory for the database file")
     args = parser.parse_args()
 
-    if not args.build and not args.test:
+    if not args.build and not args.test and not args.create_indexes and not args.build_score_store:
         parser.print_help()
         sys.exit(2)
 
+    if args.create_indexes and not args.build:
+        conn = sqlite3.connect(os.path.join(args.outdir, args.database_name))
+        create_indexes(conn)
+        conn.close()
+
     if args.build:
         # Build mode: input directories are required
         if not args.path_to_score_results or not args.path_to_path_results:
@@ -387,7 +519,16 @@ def main():
         db.create_tables()
         db.populate_table()
         db.create_indexes()
-    else:
+
+    if args.build or args.build_score_store:
+        # The score store goes next to the database, and is built from the same score files if given
+        db_path = os.path.join(args.outdir, args.database_name)
+        if args.path_to_score_results:
+            build_score_store(args.path_to_score_results, get_score_store_dir(db_path), args.top_k)
+        else:
+            build_score_store_from_db(db_path, get_score_store_dir(db_path), args.top_k)
+
+    if args.test and not args.build:
         # Test-only mode: connect to existing database (run mode)
         db = ExplainableDTD(
             database_name=args.database_name,
@@ -398,6 +539,8 @@ def main():
     if args.test:
         print("==== Testing: score table by disease ID ====", flush=True)
         print(db.get_score_table(disease_curie_ids='MONDO:0005148'))
+        print("==== Testing: top 10 scores by disease ID ====", flush=True)
+        print(db.get_top_scores(disease_curie_id='MONDO:0005148', n=10))
         print("==== Testing: top paths by disease ID ====", flush=True)
         print(db.get_top_path(disease_curie_ids='MONDO:0005148'))
 
@@ -23,9 +23,11 @@ import json
 import argparse
 import collections
 import sqlite3
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable, Tuple
 from tqdm import tqdm
 
+from xdtd_sqlite import get_read_only_connection
+
 
 # Named tuples returned by get_node_info / get_edge_info
 NodeInfo = collections.namedtuple('NodeInfo', [
@@ -41,13 +43,19 @@ EdgeInfo = collections.namedtuple('EdgeInfo', [
     'original_subject', 'original_object', 'extra_attributes'
 ])
 
+# Max number of node IDs / edge triples looked up per query by get_node_infos / get_edge_infos
+# (keeps the number of bound parameters under SQLite's limit)
+_NODE_LOOKUP_BATCH_SIZE = 900
+_EDGE_LOOKUP_BATCH_SIZE = 300
+
 
 class xDTDMappingDB:
     """SQLite interface for the xDTD node/edge mapping database.
 
     Attributes:
         database_name: Filename of the SQLite database.
-        conn: Active sqlite3.Connection (set after construction).
+        conn: Active sqlite3.Connection (set after construction). In run mode this is the
+              process-wide read-only connection to the database (see xdtd_sqlite.py).
     """
 
     def __init__(self, database_name: str = 'ExplainableDTD.db', outdir: Optional[str] = None,
@@ -60,6 +68,7 @@ class xDTDMappingDB:
             db_loc: Directory of an existing database (required for mode='run').
         """
         self.database_name = database_name
+        self.mode = mode
 
         if mode == 'build':
             outdir = outdir or './'
@@ -72,11 +81,15 @@ class xDTDMappingDB:
         else:
             raise ValueError(f"Unknown mode '{mode}'. Use 'build' or 'run'.")
 
-        self.conn = sqlite3.connect(db_path)
-        print(f"INFO: Connected to database: {db_path}", flush=True)
+        if mode == 'build':
+            self.conn = sqlite3.connect(db_path)
+            print(f"INFO: Connected to database: {db_path}", flush=True)
+        else:
+            self.conn = get_read_only_connection(db_path)
 
     def __del__(self):
-        if hasattr(self, 'conn') and self.conn:
+        # (the shared read-only connection of run mode stays open for the rest of the process)
+        if getattr(self, 'mode', None) == 'build' and getattr(self, 'conn', None):
             try:
                 self.conn.commit()
                 self.conn.close()
@@ -268,12 +281,37 @@ class xDTDMappingDB:
         result = cursor.fetchone()
         if not result:
             return None
+        return self._make_node_info(result)
+
+    def get_node_infos(self, node_ids: Iterable[str]) -> Dict[str, NodeInfo]:
+        """Look up many nodes by ID at once (a few queries rather than one per node).
+
+        Args:
+            node_ids: Node CURIEs, e.g. all nodes of the explanation paths of a result set.
+        Returns:
+            Dict of node ID -> NodeInfo (the same one get_node_info would return) for the
+            IDs that were found.
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        node_infos: Dict[str, NodeInfo] = {}
+        for start in range(0, len(node_ids), _NODE_LOOKUP_BATCH_SIZE):
+            batch = node_ids[start:start + _NODE_LOOKUP_BATCH_SIZE]
+            cursor = self.conn.execute(
+                f"SELECT * FROM NODE_MAPPING_TABLE WHERE id IN ({','.join('?' * len(batch))}) ORDER BY rowid", batch
+            )
+            for record in cursor:
+                if record[0] not in node_infos:  # (like get_node_info, use the first row of an ID)
+                    node_infos[record[0]] = self._make_node_info(record)
+        return node_infos
+
+    @staticmethod
+    def _make_node_info(record: tuple) -> NodeInfo:
         # `category` is stored as a JSON-encoded list string by _insert_nodes;
         # decode it back to a list so callers (Node.categories expects a list)
         # don't have to handle the encoding themselves. Other JSON-encoded
         # fields (equivalent_identifiers/synonym/xref) currently have no live
         # consumers; leaving them as-is to avoid scope creep (#2671).
-        values = list(result)
+        values = list(record)
         cat_idx = NodeInfo._fields.index('category')
         if values[cat_idx]:
             try:
@@ -318,6 +356,37 @@ class xDTDMappingDB:
         )
         return [EdgeInfo._make(record) for record in cursor.fetchall()]
 
+    def get_edge_infos(self, triples: Iterable[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], List[EdgeInfo]]:
+        """Look up the edges of many (subject, predicate, object) triples at once.
+
+        Args:
+            triples: (subject, predicate, object) tuples, e.g. all hops of the explanation
+                     paths of a result set.
+        Returns:
+            Dict of triple -> list of EdgeInfo namedtuples (what get_edge_info would return
+            for it), with an empty list for triples that weren't found.
+        """
+        triples = list(dict.fromkeys(tuple(triple) for triple in triples))
+        edge_infos: Dict[Tuple[str, str, str], List[EdgeInfo]] = {triple: [] for triple in triples}
+        # SELF_LOOP_RELATION is a synthetic edge used by the xDTD model for flexible path lengths
+        db_triples = []
+        for triple in triples:
+            if triple[1] == 'SELF_LOOP_RELATION':
+                edge_infos[triple].append(EdgeInfo._make(triple + (None,) * (len(EdgeInfo._fields) - 3)))
+            else:
+                db_triples.append(triple)
+        for start in range(0, len(db_triples), _EDGE_LOOKUP_BATCH_SIZE):
+            batch = db_triples[start:start + _EDGE_LOOKUP_BATCH_SIZE]
+            cursor = self.conn.execute(
+                "SELECT * FROM EDGE_MAPPING_TABLE WHERE "
+                + " OR ".join(["(subject = ? AND predicate = ? AND object = ?)"] * len(batch))
+                + " ORDER BY rowid",
+                [value for triple in batch for value in triple]
+            )
+            for record in cursor:
+                edge_infos[tuple(record[:3])].append(EdgeInfo._make(record))
+        return edge_infos
+
 
 # ══════════════════════════════════════════════════════════════════════════
 #  CLI entry point
@@ -1,5 +1,6 @@
 from typing import List, Dict, Set, Union, Optional
 import asyncio
+from collections import OrderedDict
 import os, sys
 import joblib
 import json
@@ -31,6 +32,11 @@ from openapi_server.models.q_edge import QEdge
 from openapi_server.models.query_graph import QueryGraph
 def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
 
+## max number of query curies whose chemical/gene probabilities are kept in creativeCRG's score cache
+xcrg_score_cache_size = 128
+## max number of chemical-gene pairs that are scored with one predict_proba call
+xcrg_prediction_chunk_rows = 1 << 15
+
 def _convert_kg2c_plover_edge_to_trapi_edge(edge_tuple: list) -> Edge:
         edge = Edge(subject=edge_tuple[0], object=edge_tuple[1], predicate=edge_tuple[2])
         primary_knowledge_source = edge_tuple[3]
@@ -278,12 +284,10 @@ class creativeCRG:
         ## initialize other variables
         self.num_chemicals = len(self.chemical_curies)
         self.num_genes = len(self.gene_curies)
-        self._top_N_chemicals_dict = dict()
-        self._top_N_chemicals_dict['increase'] = dict()
-        self._top_N_chemicals_dict['decrease'] = dict()
-        self._top_N_genes_dict = dict()
-        self._top_N_genes_dict['increase'] = dict()
-        self._top_N_genes_dict['decrease'] = dict()
+        self.chemical_curie_index = {curie: index for index, curie in enumerate(self.chemical_curies)}
+        self.gene_curie_index = {curie: index for index, curie in enumerate(self.gene_curies)}
+        ## (query type, model type, query curie) -> probabilities of all chemicals/genes; see _get_scores
+        self._score_cache = OrderedDict()
         path_list = os.path.realpath(__file__).split(os.path.sep)
         rtx_index = path_list.index("RTX")
         tf_list_file_path = os.path.sep.join([*path_list[:(rtx_index + 1)], 'code', 'ARAX', 'ARAXQuery','Infer','data','xCRG_data','transcription_factors.json'])
@@ -352,154 +356,165 @@ class creativeCRG:
 
         if not query_gene or not isinstance(query_gene, str):
             self.response.warning(f"The parameter 'query_gene' should be string. But {query_gene} is provided.")
-            return None        
-
-        if not N or not isinstance(N, int):
-            self.response.warning(f"The parameter 'N' should be integer. But {N} is provided.")
             return None
 
-        if not threshold or not isinstance(threshold, float) or not (0 <= threshold <= 1):
-            self.response.warning(f"The parameter 'threshold' should be float between 0 and 1. But {threshold} is provided.")
-            return None   
+        if not self._check_prediction_params(N, threshold, model_type):
+            return None
 
-        if query_gene:
-            self.response.info(f"Predicting top{N} chemicals for gene {query_gene}")
+        self.response.info(f"Predicting top{N} chemicals for gene {query_gene}")
+        return self.predict_top_N_chemicals_batch([query_gene], N, threshold, model_type)[query_gene]
 
-            ## get the preferred curie
-            # preferred_query_gene = self.get_preferred_curie(query_gene)
-            # if not preferred_query_gene:
-            #     return None
-            # self.response.info(f"Use the preferred curie {preferred_query_gene} of gene {query_gene} for prediction")
-            preferred_query_gene = query_gene
+    def predict_top_N_genes(self, query_chemical: str, N: int = 10, threshold: float = 0.5, model_type: str = 'increase'):
 
-            if model_type not in ['increase', 'decrease']:
-                self.response.warning(f"The parameter 'model_type' allows either 'increase' or 'decrease'. But {model_type} is provided.")
-                return None
-            if preferred_query_gene not in self._top_N_genes_dict[model_type]:
-                ## check if the query gene curie was trained in the specific model and if so, get its embedding
-                if preferred_query_gene not in self.gene_curies:
-                    self.response.warning(f"The increase-type model was not trained with gene curie {preferred_query_gene}.")
-                    return None
-                else:
-                    query_gene_array = np.tile(self.gene_embs[self.gene_curies.index(preferred_query_gene)].reshape(1,-1),(self.num_chemicals,1))
-                ## get all chemical embeddings
-                chemical_array = self.chemical_embs
-                ## do prediction
-                X = np.hstack([chemical_array,query_gene_array])
-                if model_type == 'increase':
-                    probas = self.increase_model.predict_proba(X)
-                else:
-                    probas = self.decrease_model.predict_proba(X)
-                res = pd.concat([pd.DataFrame(self.chemical_curies),pd.DataFrame([preferred_query_gene] * self.num_chemicals),pd.DataFrame(probas)], axis=1)
-                res.columns = ['chemical_id','gene_id','tn_prob','tp_prob']
-                res = res.sort_values(by=['tp_prob'],ascending=False).reset_index(drop=True)
-                self._top_N_genes_dict[model_type][preferred_query_gene] = res
-
-                ## filter results according to threshold
-                if threshold:
-                    res = res.loc[res['tp_prob'] >= threshold,:].reset_index(drop=True)
-                
-                ## give warning if the number of result records is smaller than the requirement
-                if len(res) == 0:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold}. Perhaps try using more loose threshold.")
-                if len(res) < N:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold} and top{N}. Only has {len(res)} satisfiable results.")
+        if not query_chemical or not isinstance(query_chemical, str):
+            self.response.warning(f"The parameter 'query_chemical' should be string. But {query_chemical} is provided.")
+            return None
 
-                return res.iloc[:N,:]
-            else:
+        if not self._check_prediction_params(N, threshold, model_type):
+            return None
 
-                ## filter results according to threshold
-                res = self._top_N_genes_dict[model_type][preferred_query_gene]
-                if threshold:
-                    res = res.loc[res['tp_prob'] >= threshold,:].reset_index(drop=True)
+        self.response.info(f"Predicting top{N} genes for chemical {query_chemical}")
+        return self.predict_top_N_genes_batch([query_chemical], N, threshold, model_type)[query_chemical]
 
-                ## give warning if the number of result records is smaller than the requirement
-                if len(res) == 0:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold}. Perhaps try using more loose threshold.")
-                if len(res) < N:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold} and top{N}. Only has {len(res)} satisfiable results.")
+    def predict_top_N_chemicals_batch(self, query_genes: List[str], N: int = 10, threshold: float = 0.5, model_type: str = 'increase') -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Predicts the top N chemicals for each of the query genes, scoring all genes that aren't cached yet together.
+        Returns a dict of query gene -> DataFrame of its top N chemicals (as returned by predict_top_N_chemicals), or
+        None for genes the model was not trained with.
+        """
+        return self._predict_top_N_batch('gene', query_genes, N, threshold, model_type)
 
-                return res.iloc[:N,:]
-        else:
-            self.response.warning("The parameter 'query_gene' is not provided. Please give a gene curie to the parameter 'query_gene'.")
-            return None
+    def predict_top_N_genes_batch(self, query_chemicals: List[str], N: int = 10, threshold: float = 0.5, model_type: str = 'increase') -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Predicts the top N genes for each of the query chemicals, scoring all chemicals that aren't cached yet together.
+        Returns a dict of query chemical -> DataFrame of its top N genes (as returned by predict_top_N_genes), or None
+        for chemicals the model was not trained with.
+        """
+        return self._predict_top_N_batch('chemical', query_chemicals, N, threshold, model_type)
 
-    def predict_top_N_genes(self, query_chemical: str, N: int = 10, threshold: float = 0.5, model_type: str = 'increase'):
-
-        if not query_chemical or not isinstance(query_chemical, str):
-            self.response.warning(f"The parameter 'query_chemical' should be string. But {query_chemical} is provided.")
-            return None        
+    def _check_prediction_params(self, N: int, threshold: float, model_type: str) -> bool:
 
         if not N or not isinstance(N, int):
             self.response.warning(f"The parameter 'N' should be integer. But {N} is provided.")
-            return None
+            return False
 
         if not threshold or not isinstance(threshold, float) or not (0 <= threshold <= 1):
             self.response.warning(f"The parameter 'threshold' should be float between 0 and 1. But {threshold} is provided.")
-            return None   
+            return False
 
-        if query_chemical:
-            self.response.info(f"Predicting top{N} genes for chemical {query_chemical}")
+        if model_type not in ['increase', 'decrease']:
+            self.response.warning(f"The parameter 'model_type' allows either 'increase' or 'decrease'. But {model_type} is provided.")
+            return False
 
-            ## get the preferred curie
-            # preferred_query_chemical = self.get_preferred_curie(query_chemical)
-            # if not preferred_query_chemical:
-            #     return None
-            # self.response.info(f"Use the preferred curie {preferred_query_chemical} of chemical {query_chemical} for prediction.")
-            preferred_query_chemical = query_chemical
-            if model_type not in ['increase', 'decrease']:
-                self.response.warning(f"The parameter 'model_type' allows either 'increase' or 'decrease'. But {model_type} is provided.")
-                return None
-            if preferred_query_chemical not in self._top_N_chemicals_dict[model_type]:
-                ## check if the query chemical curie was trained in the specific model and if so, get its embedding 
-                if preferred_query_chemical not in self.chemical_curies:
-                    self.response.warning(f"The increase-type model was not trained with chemical curie {query_chemical}.")
-                    return None
-                else:
-                    query_chemical_array = np.tile(self.chemical_embs[self.chemical_curies.index(preferred_query_chemical)].reshape(1,-1),(self.num_genes,1))
-                ## get all gene embeddings
-                gene_array = self.gene_embs
-                ## do prediction
-                X = np.hstack([query_chemical_array,gene_array])
-                if model_type == 'increase':
-                    probas = self.increase_model.predict_proba(X)
-                else:
-                    probas = self.decrease_model.predict_proba(X)
-                res = pd.concat([pd.DataFrame([preferred_query_chemical] * self.num_genes),pd.DataFrame(self.gene_curies),pd.DataFrame(probas)], axis=1)
-                res.columns = ['chemical_id','gene_id','tn_prob','tp_prob']
-                res = res.sort_values(by=['tp_prob'],ascending=False).reset_index(drop=True)
-                self._top_N_chemicals_dict[model_type][preferred_query_chemical] = res
+        return True
 
-                ## filter results according to threshold
-                if threshold:
-                    res = res.loc[res['tp_prob'] >= threshold,:].reset_index(drop=True)
+    def _predict_top_N_batch(self, query_type: str, query_curies: List[str], N: int, threshold: float, model_type: str) -> Dict[str, Optional[pd.DataFrame]]:
 
-                ## give warning if the number of result records is smaller than the requirement
-                if len(res) == 0:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold}. Perhaps try using more loose threshold.")
-                if len(res) < N:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold} and top{N}. Only has {len(res)} satisfiable results.")
+        ## the query curies are used as is (rather than their preferred curies) for prediction
+        scores = self._get_scores(query_type, query_curies, model_type)
+        answer_type = 'chemical' if query_type == 'gene' else 'gene'
+        top_predictions = dict()
+        for query_curie in query_curies:
+            if scores[query_curie] is None:
+                self.response.warning(f"The {model_type}-type model was not trained with {query_type} curie {query_curie}.")
+                top_predictions[query_curie] = None
+                continue
+            res = self._get_top_N_predictions(query_type, query_curie, scores[query_curie], N, threshold)
 
-                return res.iloc[:N,:]
+            ## give warning if the number of result records is smaller than the requirement
+            if len(res) == 0:
+                self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold} for {query_type} {query_curie}. Perhaps try using more loose threshold.")
+            if len(res) < N:
+                self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold} and top{N} for {query_type} {query_curie}. Only has {len(res)} satisfiable {answer_type} results.")
+            top_predictions[query_curie] = res
+        return top_predictions
+
+    def _get_scores(self, query_type: str, query_curies: List[str], model_type: str) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Returns a dict of query curie -> vector of the model's probabilities ('tp_prob') of each chemical (for a query
+        gene) or gene (for a query chemical), or None if the model was not trained with the query curie. The vectors
+        come from the LRU score cache where possible; all other query curies are scored together.
+        """
+        scores = dict()
+        curies_to_score = []
+        for query_curie in query_curies:
+            cache_key = (query_type, model_type, query_curie)
+            if cache_key in self._score_cache:
+                self._score_cache.move_to_end(cache_key)
+                scores[query_curie] = self._score_cache[cache_key]
+            elif query_curie in (self.gene_curie_index if query_type == 'gene' else self.chemical_curie_index):
+                if query_curie not in curies_to_score:
+                    curies_to_score.append(query_curie)
             else:
+                scores[query_curie] = None
 
-                ## filter results according to threshold
-                res = self._top_N_chemicals_dict[model_type][preferred_query_chemical]
-
-                if threshold:
-                    res = res.loc[res['tp_prob'] >= threshold,:].reset_index(drop=True)
-
-                ## give warning if the number of result records is smaller than the requirement
-                if len(res) == 0:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold}. Perhaps try using more loose threshold.")
-                if len(res) < N:
-                    self.response.warning(f"No chemical-gene pair meets the requirement of threshold >={threshold} and top{N}. Only has {len(res)} satisfiable results.")
-
-                return res.iloc[:N,:]
-
+        if curies_to_score:
+            if query_type == 'gene':
+                query_embs = self.gene_embs[[self.gene_curie_index[curie] for curie in curies_to_score]]
+            else:
+                query_embs = self.chemical_embs[[self.chemical_curie_index[curie] for curie in curies_to_score]]
+            new_scores = self._score_pairs(query_type, query_embs, model_type)
+            for query_curie, query_scores in zip(curies_to_score, new_scores):
+                scores[query_curie] = query_scores
+                self._score_cache[(query_type, model_type, query_curie)] = query_scores
+            while len(self._score_cache) > xcrg_score_cache_size:
+                self._score_cache.popitem(last=False)
+        return scores
+
+    def _score_pairs(self, query_type: str, query_embs: np.ndarray, model_type: str) -> np.ndarray:
+        """
+        Returns the model's probabilities ('tp_prob') of the pairs of each query gene (or chemical) embedding with all
+        chemicals (or genes), as a (query curies x candidate curies) array. The feature matrix ([chemical embedding,
+        gene embedding] per pair) is filled in chunks of xcrg_prediction_chunk_rows pairs, so the query embeddings are
+        never tiled across all candidates at once.
+        """
+        model = self.increase_model if model_type == 'increase' else self.decrease_model
+        num_chemical_features, num_gene_features = self.chemical_embs.shape[1], self.gene_embs.shape[1]
+        chemical_columns = slice(0, num_chemical_features)
+        gene_columns = slice(num_chemical_features, num_chemical_features + num_gene_features)
+        if query_type == 'gene':
+            candidate_embs, query_columns, candidate_columns = self.chemical_embs, gene_columns, chemical_columns
         else:
-            self.response.warning(f"The parameter 'query_chemical' is not provided. Please assign a chemical curie to the parameter 'query_chemical'.")
-            return None
+            candidate_embs, query_columns, candidate_columns = self.gene_embs, chemical_columns, gene_columns
+        num_queries, num_candidates = len(query_embs), len(candidate_embs)
+
+        num_pairs = num_queries * num_candidates
+        scores = np.empty(num_pairs)
+        X_buffer = np.empty((min(xcrg_prediction_chunk_rows, num_pairs), gene_columns.stop),
+                            dtype=np.result_type(self.chemical_embs, self.gene_embs))
+        for chunk_start in range(0, num_pairs, xcrg_prediction_chunk_rows):
+            chunk_stop = min(chunk_start + xcrg_prediction_chunk_rows, num_pairs)
+            X = X_buffer[:chunk_stop - chunk_start]
+            ## fill the rows of each query curie in the chunk (query embedding broadcast over its candidates)
+            pair_index = chunk_start
+            while pair_index < chunk_stop:
+                query_index, candidate_start = divmod(pair_index, num_candidates)
+                candidate_stop = min(num_candidates, candidate_start + chunk_stop - pair_index)
+                rows = slice(pair_index - chunk_start, pair_index - chunk_start + candidate_stop - candidate_start)
+                X[rows, query_columns] = query_embs[query_index]
+                X[rows, candidate_columns] = candidate_embs[candidate_start:candidate_stop]
+                pair_index += candidate_stop - candidate_start
+            scores[chunk_start:chunk_stop] = model.predict_proba(X)[:, 1]
+        return scores.reshape(num_queries, num_candidates)
+
+    def _get_top_N_predictions(self, query_type: str, query_curie: str, scores: np.ndarray, N: int, threshold: float) -> pd.DataFrame:
+        """
+        Returns the (at most N) chemical-gene pairs of the query curie with the highest probabilities that are at least
+        the threshold, sorted by decreasing probability, as a DataFrame with columns 'chemical_id', 'gene_id',
+        'tn_prob' and 'tp_prob'.
+        """
+        num_top = min(N, len(scores))
+        top_indices = np.argpartition(-scores, num_top - 1)[:num_top] if num_top < len(scores) else np.arange(len(scores))
+        top_indices = top_indices[np.argsort(-scores[top_indices], kind='stable')]
+        top_indices = top_indices[scores[top_indices] >= threshold]
+        top_scores = scores[top_indices]
+        if query_type == 'gene':
+            chemical_ids = [self.chemical_curies[index] for index in top_indices]
+            gene_ids = [query_curie] * len(top_indices)
+        else:
+            chemical_ids = [query_curie] * len(top_indices)
+            gene_ids = [self.gene_curies[index] for index in top_indices]
+        return pd.DataFrame({'chemical_id': chemical_ids, 'gene_id': gene_ids, 'tn_prob': 1 - top_scores, 'tp_prob': top_scores})
 
     def predict_top_M_paths(self, query_chemical: Optional[str], query_gene: Optional[str], model_type: str = 'increase', N: int = 10, M: int = 10, threshold: float = 0.5, kp: Optional[str] = 'infores:retriever', path_len: int = 2, interm_ids: Optional[List[Optional[str]]] = None, interm_names: Optional[List[Optional[str]]] = None, interm_categories: Optional[List[Optional[str]]] =None):
 
@@ -562,12 +577,12 @@ class creativeCRG:
             #     return None
             # self.response.info(f"Use the preferred curie {preferred_query_chemical} of chemical {query_chemical} for prediction")
             preferred_query_chemical = query_chemical
-            if preferred_query_chemical not in self._top_N_chemicals_dict[model_type]:
-                self.response.warning(f"No '{model_type}-type' prediction record for the chemical {preferred_query_chemical}. Please first call the 'predict_top_N_genes' method.")
+            scores = self._get_scores('chemical', [preferred_query_chemical], model_type)[preferred_query_chemical]
+            if scores is None:
+                self.response.warning(f"No '{model_type}-type' prediction record for the chemical {preferred_query_chemical}. The model was not trained with this chemical.")
                 return None
 
-            res = self._top_N_chemicals_dict[model_type][preferred_query_chemical]
-            res = res.loc[res['tp_prob'] >= threshold,:].reset_index(drop=True).iloc[:N,:]
+            res = self._get_top_N_predictions('chemical', preferred_query_chemical, scores, N, threshold)
             if len(res) == 0:
                 self.response.warning(f"There is no chemical-gene pair satisfying the requirement of top {N} with threshold >={threshold}. Perhaps try using more loose threshold.")
                 return None
@@ -602,12 +617,12 @@ class creativeCRG:
             return final_paths
         else:
             preferred_query_gene = query_gene
-            if preferred_query_gene not in self._top_N_genes_dict[model_type]:
-                self.response.warning(f"No '{model_type}-type' prediction record for the gene {preferred_query_gene}. Please first call the 'predict_top_N_chemicals' method.")
+            scores = self._get_scores('gene', [preferred_query_gene], model_type)[preferred_query_gene]
+            if scores is None:
+                self.response.warning(f"No '{model_type}-type' prediction record for the gene {preferred_query_gene}. The model was not trained with this gene.")
                 return None
             else:
-                res = self._top_N_genes_dict[model_type][preferred_query_gene]
-                res = res.loc[res['tp_prob'] >= threshold,:].reset_index(drop=True).iloc[:N,:]
+                res = self._get_top_N_predictions('gene', preferred_query_gene, scores, N, threshold)
                 if len(res) == 0:
                     self.response.warning(f"There is no chemical-gene pair satisfying the requirement of top {N} with threshold >={threshold}. Perhaps try using more loose threshold.")
                     return None
@@ -264,6 +264,14 @@ class InferUtilities:
         except ValueError:
             max_path_len = 0
 
+        # Look up the metadata of every node and edge the results can refer to (the drugs/diseases in top_scores
+        # and all elements of the explanation paths) with a few batched queries, rather than one query per element.
+        split_top_paths = [x[0].split("->") for paths in top_paths.values() for x in paths]
+        edge_infos = xdtdmapping.get_edge_infos((path[i], path[i+1], path[i+2])
+                                                for path in split_top_paths for i in range(0, len(path)-2, 2))
+        node_infos = xdtdmapping.get_node_infos(list(top_scores['drug_id']) + list(top_scores['disease_id']) +
+                                                [path[i] for path in split_top_paths for i in range(0, len(path), 2)])
+
         # Preserve the original query graph before we modify it with inferred edges/nodes
         if len(message.query_graph.edges) !=0 and not hasattr(self.response, 'original_query_graph'):
             self.response.original_query_graph = copy.deepcopy(message.query_graph)
@@ -271,7 +279,7 @@ class InferUtilities:
         if drug_curie and disease_curie:
             query_drug_curie = top_scores['drug_id'].tolist()[0]
             query_drug_name = top_scores['drug_name'].tolist()[0]
-            query_drug_info = xdtdmapping.get_node_info(node_id=query_drug_curie)
+            query_drug_info = node_infos.get(query_drug_curie)
             if query_drug_info is None:
                 self.response.warning(f"Could not find {drug_curie} in NODE_MAPPING table")
                 return self.response, self.kedge_global_iter, self.qedge_global_iter, self.qnode_global_iter, self.option_global_iter
@@ -279,7 +287,7 @@ class InferUtilities:
             
             query_disease_curie = top_scores['disease_id'].tolist()[0]
             query_disease_name = top_scores['disease_name'].tolist()[0]
-            query_disease_info = xdtdmapping.get_node_info(node_id=query_disease_curie)
+            query_disease_info = node_infos.get(query_disease_curie)
             if query_disease_info is None:
                 self.response.warning(f"Could not find {disease_curie} in NODE_MAPPING table")
                 return self.response, self.kedge_global_iter, self.qedge_global_iter, self.qnode_global_iter, self.option_global_iter
@@ -289,7 +297,7 @@ class InferUtilities:
         elif drug_curie:
             query_drug_curie = top_scores['drug_id'].tolist()[0]
             query_drug_name = top_scores['drug_name'].tolist()[0]
-            query_drug_info = xdtdmapping.get_node_info(node_id=query_drug_curie)
+            query_drug_info = node_infos.get(query_drug_curie)
             if query_drug_info is None:
                 self.response.warning(f"Could not find {drug_curie} in NODE_MAPPING table due to using refreshed xDTD database")
                 return self.response, self.kedge_global_iter, self.qedge_global_iter, self.qnode_global_iter, self.option_global_iter
@@ -298,7 +306,7 @@ class InferUtilities:
         elif disease_curie:
             query_disease_curie = top_scores['disease_id'].tolist()[0]
             query_disease_name = top_scores['disease_name'].tolist()[0]
-            query_disease_info = xdtdmapping.get_node_info(node_id=query_disease_curie)
+            query_disease_info = node_infos.get(query_disease_curie)
             if query_disease_info is None:
                 self.response.warning(f"Could not find {disease_curie} in NODE_MAPPING table due to using refreshed xDTD database")
                 return self.response, self.kedge_global_iter, self.qedge_global_iter, self.qnode_global_iter, self.option_global_iter
@@ -395,10 +403,7 @@ class InferUtilities:
             
             def _add_node_and_edge(node_ids, node_id_to_score, node_role_key, edge_subject_func, edge_object_func):
                 for canonical_id in node_ids:
-                    try:
-                        node_info = xdtdmapping.get_node_info(node_id=canonical_id)
-                    except Exception:
-                        continue
+                    node_info = node_infos.get(canonical_id)
                     if not node_info:
                         continue
                     categories = node_info.category
@@ -496,7 +501,7 @@ class InferUtilities:
                 edges_info = []
                 break_flag = False
                 for i in range(0,n_elements-2,2):
-                    edge_info = xdtdmapping.get_edge_info(triple_id=(path[i],path[i+1],path[i+2]))
+                    edge_info = edge_infos[(path[i],path[i+1],path[i+2])]
                     if len(edge_info) == 0:
                         break_flag = True
                     else:
@@ -511,11 +516,7 @@ class InferUtilities:
                 for i in range(path_idx+1):
                     subject_qnode_key = path_keys[path_idx]["qnode_pairs"][i][0]
                     subject_curie = edges_info[i][0].subject
-                    try:
-                        subject_node_info = xdtdmapping.get_node_info(node_id=subject_curie)
-                    except Exception:
-                        break_flag = True
-                        break
+                    subject_node_info = node_infos.get(subject_curie)
                     if subject_node_info is None:
                         break_flag = True
                         break
@@ -528,11 +529,7 @@ class InferUtilities:
                         message.knowledge_graph.nodes[subject_curie].qnode_keys.append(subject_qnode_key)
                     object_qnode_key = path_keys[path_idx]["qnode_pairs"][i][1]
                     object_curie = edges_info[i][0].object
-                    try:
-                        object_node_info = xdtdmapping.get_node_info(node_id=object_curie)
-                    except Exception:
-                        break_flag = True
-                        break
+                    object_node_info = node_infos.get(object_curie)
                     if object_node_info is None:
                         break_flag = True
                         break
@@ -627,8 +624,8 @@ class InferUtilities:
                 # carrying the xDTD model's probability_treats score as an attribute.
                 # The explanation path edges above provide supporting evidence for this prediction.
                 treat_score = top_scores.loc[(top_scores['drug_id'] == drug) & (top_scores['disease_id'] == disease)]["tp_score"].iloc[0]
-                path_drug_node_info = xdtdmapping.get_node_info(node_id=path_drug_curie)
-                path_disease_node_info = xdtdmapping.get_node_info(node_id=path_disease_curie)
+                path_drug_node_info = node_infos.get(path_drug_curie)
+                path_disease_node_info = node_infos.get(path_disease_curie)
                 
                 # essence_scores maps the "varying" node name to its score for result ranking.
                 # The "varying" node is the one predicted by the model (not the query input).
@@ -0,0 +1,271 @@
+"""
+xDTD (Explainable Drug-Treat-Disease) Columnar Prediction Score Store
+=================================
+
+A read-only, memory-mapped alternative to PREDICTION_SCORE_TABLE (see
+ExplianableDTD_db.py) for the "top N drugs for a disease" and "top N diseases
+for a drug" lookups. It is built either from the same score TSV files as the
+database or from the database itself (which is what the ARAX database manager
+does after downloading it), and stored as a directory of .npy arrays:
+
+  meta.json                       format version, number of rows, top_k
+  drug_ids.npy, disease_ids.npy   sorted CURIE vocabularies (a row stores the index into them)
+  drug_names.npy, disease_names.npy
+                                  the name of each drug/disease (from its first row)
+  drug_codes.npy, disease_codes.npy, tn_scores.npy, tp_scores.npy, unknown_scores.npy
+                                  the score rows, sorted by disease and then by decreasing tp_score
+  disease_offsets.npy             rows [disease_offsets[i], disease_offsets[i+1]) are those of disease i
+  by_drug_rows.npy, drug_offsets.npy
+                                  the same for drugs: by_drug_rows lists the rows sorted by drug and then by
+                                  decreasing tp_score, and drug_offsets delimits each drug's part of it
+  top_k_by_disease.npy, top_k_by_drug.npy
+                                  the (at most top_k) highest-scoring rows of each disease/drug, padded with -1
+
+Rows with equal tp_score keep the order of the input files (sorted by file name)
+or of the database rows, so building from the same input always gives the same
+store. A top N query with a tp_score threshold is a slice of these arrays.
+"""
+
+import csv
+import json
+import os
+import pathlib
+import sqlite3
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+
+_FORMAT_VERSION = 1
+# Number of highest-scoring rows precomputed per disease and per drug
+_DEFAULT_TOP_K = 100
+# Number of score rows read (from a score file or the database) at a time while building a store
+_CHUNK_ROWS = 1_000_000
+
+_SCORE_COLUMNS = ["drug_id", "drug_name", "disease_id", "disease_name", "tn_score", "tp_score", "unknown_score"]
+
+
+def get_score_store_dir(db_path: str) -> str:
+    """Return the directory of the score store that belongs to the given ExplainableDTD database.
+
+    The store lives next to the real database file (following any symlink, so that ARAX
+    instances symlinked to the same database share its store, too).
+    """
+    return f"{os.path.splitext(os.path.realpath(db_path))[0]}_score_store"
+
+
+def build_score_store(path_to_score_results: str, store_dir: str, top_k: int = _DEFAULT_TOP_K) -> int:
+    """Build the score store from a directory of score TSV files (the input of ExplainableDTD.populate_table).
+
+    Each file has a header row and the tab-separated columns drug_id, drug_name, disease_id,
+    disease_name, tn_score, tp_score, unknown_score. Returns the number of score rows.
+    """
+    print(f"INFO: Building xDTD score store {store_dir} from {path_to_score_results}", flush=True)
+
+    def read_score_chunks() -> Iterator[pd.DataFrame]:
+        for file_name in sorted(os.listdir(path_to_score_results)):
+            with pd.read_csv(os.path.join(path_to_score_results, file_name), sep="\t", header=0, names=_SCORE_COLUMNS,
+                             quoting=csv.QUOTE_NONE, keep_default_na=False, chunksize=_CHUNK_ROWS,
+                             dtype={"drug_id": str, "drug_name": str, "disease_id": str, "disease_name": str,
+                                    "tn_score": np.float64, "tp_score": np.float64,
+                                    "unknown_score": np.float64}) as score_chunks:
+                yield from score_chunks
+
+    return _write_score_store(read_score_chunks(), store_dir, top_k)
+
+
+def build_score_store_from_db(db_path: str, store_dir: str, top_k: int = _DEFAULT_TOP_K) -> int:
+    """Build the score store from the PREDICTION_SCORE_TABLE of an ExplainableDTD database.
+
+    Returns the number of score rows.
+    """
+    print(f"INFO: Building xDTD score store {store_dir} from {db_path}", flush=True)
+
+    def read_score_chunks() -> Iterator[pd.DataFrame]:
+        conn = sqlite3.connect(f"{pathlib.Path(os.path.realpath(db_path)).as_uri()}?mode=ro", uri=True)
+        try:
+            for scores in pd.read_sql_query(f"SELECT {', '.join(_SCORE_COLUMNS)} FROM PREDICTION_SCORE_TABLE "
+                                            f"ORDER BY rowid", conn, chunksize=_CHUNK_ROWS):
+                scores[["drug_name", "disease_name"]] = scores[["drug_name", "disease_name"]].fillna("")
+                yield scores
+        finally:
+            conn.close()
+
+    return _write_score_store(read_score_chunks(), store_dir, top_k)
+
+
+def _write_score_store(score_chunks: Iterable[pd.DataFrame], store_dir: str, top_k: int) -> int:
+    # Only the score columns and the codes of the IDs are kept for all rows; the IDs and names are kept once per
+    # drug/disease (numbered in order of appearance while reading, and in sorted order once all rows are read)
+    drug_codes_by_id, drug_names, disease_codes_by_id, disease_names = dict(), [], dict(), []
+    columns = {"drug_codes": [], "disease_codes": [], "tn_scores": [], "tp_scores": [], "unknown_scores": []}
+    for scores in score_chunks:
+        columns["drug_codes"].append(_get_codes(scores["drug_id"], scores["drug_name"], drug_codes_by_id, drug_names))
+        columns["disease_codes"].append(_get_codes(scores["disease_id"], scores["disease_name"], disease_codes_by_id,
+                                                   disease_names))
+        for column_name in ["tn_score", "tp_score", "unknown_score"]:
+            columns[f"{column_name}s"].append(scores[column_name].to_numpy(dtype=np.float64))
+    columns = {array_name: np.concatenate(chunk_arrays) if chunk_arrays else
+               np.empty(0, dtype=np.int32 if array_name.endswith("_codes") else np.float64)
+               for array_name, chunk_arrays in columns.items()}
+    drug_ids, drug_names, drug_codes = _sort_codes(drug_codes_by_id, drug_names, columns["drug_codes"])
+    disease_ids, disease_names, disease_codes = _sort_codes(disease_codes_by_id, disease_names,
+                                                            columns["disease_codes"])
+    tp_scores = columns["tp_scores"]
+
+    # Sort the rows by disease and then by decreasing tp_score (stable, so ties keep their input order)
+    by_disease_rows = np.lexsort((-tp_scores, disease_codes))
+    arrays = {
+        "drug_codes": drug_codes[by_disease_rows],
+        "disease_codes": disease_codes[by_disease_rows],
+        "tn_scores": columns["tn_scores"][by_disease_rows],
+        "tp_scores": tp_scores[by_disease_rows],
+        "unknown_scores": columns["unknown_scores"][by_disease_rows],
+    }
+    del columns, drug_codes, disease_codes, tp_scores
+    arrays["disease_offsets"] = _get_offsets(arrays["disease_codes"], len(disease_ids))
+    arrays["by_drug_rows"] = np.lexsort((-arrays["tp_scores"], arrays["drug_codes"])).astype(np.int64)
+    arrays["drug_offsets"] = _get_offsets(arrays["drug_codes"][arrays["by_drug_rows"]], len(drug_ids))
+    arrays["top_k_by_disease"] = _get_top_k_rows(np.arange(len(by_disease_rows)), arrays["disease_offsets"], top_k)
+    arrays["top_k_by_drug"] = _get_top_k_rows(arrays["by_drug_rows"], arrays["drug_offsets"], top_k)
+    arrays.update(drug_ids=drug_ids, drug_names=drug_names, disease_ids=disease_ids, disease_names=disease_names)
+
+    # (meta.json is removed first and written last, so a store whose build was interrupted is never loaded)
+    meta_path = os.path.join(store_dir, "meta.json")
+    os.makedirs(store_dir, exist_ok=True)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for array_name, array in arrays.items():
+        np.save(os.path.join(store_dir, f"{array_name}.npy"), array, allow_pickle=False)
+    with open(meta_path, "w") as meta_file:
+        json.dump({"format_version": _FORMAT_VERSION, "n_rows": int(len(by_disease_rows)), "top_k": top_k}, meta_file)
+    print(f"INFO: Built xDTD score store with {len(by_disease_rows)} rows, {len(drug_ids)} drugs and "
+          f"{len(disease_ids)} diseases", flush=True)
+    return len(by_disease_rows)
+
+
+def _get_codes(ids: pd.Series, names: pd.Series, codes_by_id: dict[str, int], first_names: list[str]) -> np.ndarray:
+    """Return the codes of the given IDs, giving IDs not seen before the next codes (and the name of their first row)."""
+    chunk_codes, chunk_ids = pd.factorize(ids)
+    # (factorize numbers the IDs in order of appearance, so the first rows of the IDs are in the order of their codes)
+    first_rows = np.flatnonzero(~pd.Series(chunk_codes).duplicated().to_numpy())
+    codes = np.empty(len(chunk_ids), dtype=np.int32)
+    for chunk_code, (curie_id, first_row) in enumerate(zip(chunk_ids, first_rows)):
+        code = codes_by_id.get(curie_id)
+        if code is None:
+            code = codes_by_id[curie_id] = len(codes_by_id)
+            first_names.append(names.iat[first_row])
+        codes[chunk_code] = code
+    return codes[chunk_codes]
+
+
+def _sort_codes(codes_by_id: dict[str, int], names: list[str],
+                codes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Renumber the codes in the order of their sorted IDs; returns the sorted IDs, their names and the new codes."""
+    ids = np.array(list(codes_by_id), dtype=str)
+    order = np.argsort(ids, kind="stable")
+    new_codes = np.empty(len(order), dtype=np.int32)
+    new_codes[order] = np.arange(len(order), dtype=np.int32)
+    return ids[order], np.array(names, dtype=str)[order], new_codes[codes]
+
+
+def _get_offsets(sorted_codes: np.ndarray, n_codes: int) -> np.ndarray:
+    return np.searchsorted(sorted_codes, np.arange(n_codes + 1)).astype(np.int64)
+
+
+def _get_top_k_rows(rows: np.ndarray, offsets: np.ndarray, top_k: int) -> np.ndarray:
+    top_k_rows = np.full((len(offsets) - 1, top_k), -1, dtype=np.int64)
+    for code, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+        segment = rows[start:min(stop, start + top_k)]
+        top_k_rows[code, :len(segment)] = segment
+    return top_k_rows
+
+
+class XDTDScoreStore:
+    """Read-only access to a score store built by build_score_store (the arrays are memory-mapped)."""
+
+    def __init__(self, store_dir: str):
+        with open(os.path.join(store_dir, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        if meta["format_version"] != _FORMAT_VERSION:
+            raise ValueError(f"xDTD score store {store_dir} has format version {meta['format_version']}, "
+                             f"expected {_FORMAT_VERSION}")
+        self.store_dir = store_dir
+        self.top_k = meta["top_k"]
+        self._arrays = {array_name[:-len(".npy")]: np.load(os.path.join(store_dir, array_name), mmap_mode="r")
+                        for array_name in os.listdir(store_dir) if array_name.endswith(".npy")}
+
+    @staticmethod
+    def exists(store_dir: str) -> bool:
+        return XDTDScoreStore.get_version(store_dir) is not None
+
+    @staticmethod
+    def get_version(store_dir: str) -> Optional[int]:
+        """Return the modification time of the store's meta.json (a new build changes it), or None if there is no store."""
+        try:
+            return os.stat(os.path.join(store_dir, "meta.json")).st_mtime_ns
+        except OSError:
+            return None
+
+    def get_top_scores(self, drug_curie_id: Optional[str] = None, disease_curie_id: Optional[str] = None,
+                       n: Optional[int] = None, threshold: Optional[float] = None) -> pd.DataFrame:
+        """Return the top n score rows of a drug and/or disease, by decreasing tp_score.
+
+        Args:
+            drug_curie_id: Drug CURIE, e.g. "CHEMBL.COMPOUND:CHEMBL55643".
+            disease_curie_id: Disease CURIE, e.g. "MONDO:0008753".
+            n: Max number of rows to return (all rows if None).
+            threshold: Only return rows with a tp_score of at least this.
+
+        Returns:
+            DataFrame with the columns of ExplainableDTD.get_score_table. Empty if no CURIE is given
+            or the CURIEs have no scores.
+        """
+        drug_code = self._get_code("drug_ids", drug_curie_id)
+        disease_code = self._get_code("disease_ids", disease_curie_id)
+        if (drug_curie_id and drug_code is None) or (disease_curie_id and disease_code is None) or \
+                (drug_code is None and disease_code is None):
+            return self._get_rows(np.arange(0))
+
+        if drug_code is not None and disease_code is not None:
+            start, stop = self._arrays["disease_offsets"][disease_code:disease_code + 2]
+            rows = np.arange(start, stop)[self._arrays["drug_codes"][start:stop] == drug_code][:n]
+        else:
+            if disease_code is not None:
+                start, stop = self._arrays["disease_offsets"][disease_code:disease_code + 2]
+                rows = np.arange(start, stop)
+                top_k_rows = self._arrays["top_k_by_disease"][disease_code]
+            else:
+                start, stop = self._arrays["drug_offsets"][drug_code:drug_code + 2]
+                rows = self._arrays["by_drug_rows"][start:stop]
+                top_k_rows = self._arrays["top_k_by_drug"][drug_code]
+            if n is not None and n <= self.top_k:
+                rows = top_k_rows[:n]
+                rows = rows[rows >= 0]
+            else:
+                rows = rows[:n]
+        if threshold is not None:
+            # (the rows are sorted by decreasing tp_score, so the ones above the threshold are a prefix)
+            rows = rows[:np.searchsorted(-self._arrays["tp_scores"][rows], -threshold, side="right")]
+        return self._get_rows(rows)
+
+    def _get_code(self, vocabulary_name: str, curie_id: Optional[str]) -> Optional[int]:
+        if not curie_id:
+            return None
+        vocabulary = self._arrays[vocabulary_name]
+        code = int(np.searchsorted(vocabulary, curie_id))
+        return code if code < len(vocabulary) and vocabulary[code] == curie_id else None
+
+    def _get_rows(self, rows: np.ndarray) -> pd.DataFrame:
+        drug_codes = self._arrays["drug_codes"][rows]
+        disease_codes = self._arrays["disease_codes"][rows]
+        return pd.DataFrame({
+            "drug_id": self._arrays["drug_ids"][drug_codes].tolist(),
+            "drug_name": self._arrays["drug_names"][drug_codes].tolist(),
+            "disease_id": self._arrays["disease_ids"][disease_codes].tolist(),
+            "disease_name": self._arrays["disease_names"][disease_codes].tolist(),
+            "tn_score": self._arrays["tn_scores"][rows],
+            "tp_score": self._arrays["tp_scores"][rows],
+            "unknown_score": self._arrays["unknown_scores"][rows],
+        }, columns=_SCORE_COLUMNS)
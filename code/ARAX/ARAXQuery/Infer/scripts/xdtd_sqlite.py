@@ -0,0 +1,55 @@
+"""
+Read-only access to the xDTD SQLite databases
+=================================
+
+The xDTD databases (see ExplianableDTD_db.py and build_mapping_db.py) are never
+written to once built, so in run mode they are opened read-only with
+``immutable=1`` (no locking or change detection) and memory-mapped, and one
+connection per database file is shared by all threads of a process.
+"""
+
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+
+# Max number of bytes of a database file that SQLite memory-maps
+_MMAP_SIZE = 1 << 34
+# Page cache size per connection, in KiB (negative values of PRAGMA cache_size are KiB)
+_CACHE_SIZE_KIB = 262144
+
+# (pid, thread ID or None, real path) -> ((inode, mtime) of the file, read-only connection)
+_read_only_connections: Dict[Tuple[int, Optional[int], str], Tuple[Tuple[int, int], sqlite3.Connection]] = {}
+_read_only_connections_lock = threading.Lock()
+
+
+def get_read_only_connection(db_path: str) -> sqlite3.Connection:
+    """Return the process-wide read-only connection to the given database file.
+
+    The connection is created on first use and shared across threads (if the sqlite3
+    module isn't built in serialized mode, each thread gets its own connection
+    instead). A database file that is replaced (e.g. by the ARAX database manager)
+    gets a new connection, and forked processes never use their parent's connection.
+    """
+    real_path = os.path.realpath(db_path)
+    stat = os.stat(real_path)  # raises FileNotFoundError, like sqlite3.connect() would in read-only mode
+    file_version = (stat.st_ino, stat.st_mtime_ns)
+    key = (os.getpid(), None if sqlite3.threadsafety == 3 else threading.get_ident(), real_path)
+    cached = _read_only_connections.get(key)
+    if cached is not None and cached[0] == file_version:
+        return cached[1]
+    with _read_only_connections_lock:
+        cached = _read_only_connections.get(key)
+        if cached is not None and cached[0] == file_version:
+            return cached[1]
+        # (a connection to a replaced file is just dropped; another thread may still be using it)
+        conn = sqlite3.connect(f"{pathlib.Path(real_path).as_uri()}?mode=ro&immutable=1", uri=True,
+                               check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{_CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA query_only = 1")
+        _read_only_connections[key] = (file_version, conn)
+        print(f"INFO: Opened read-only connection to database: {real_path}", flush=True)
+    return conn
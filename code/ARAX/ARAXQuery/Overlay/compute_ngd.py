@@ -1,6 +1,5 @@
 # This class will overlay the normalized google distance on a message (all edges)
 #!/bin/env python3
-import functools
 import json
 import math
 import sys
@@ -9,7 +8,6 @@ import sqlite3
 import traceback
 import numpy as np
 from datetime import datetime
-import itertools
 import copy
 
 import random
@@ -18,6 +16,7 @@ import time
 # relative imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import overlay_utilities as ou
+from curie_pmid_index import CuriePMIDIndex
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../UI/OpenAPI/python-flask-server/")
 from openapi_server.models.attribute import Attribute as EdgeAttribute
 from openapi_server.models.edge import Edge
@@ -30,6 +29,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../../")
 from RTXConfiguration import RTXConfiguration
 random.seed(time.time())
 RTXConfig = RTXConfiguration()
+max_pmids_per_ngd_chunk = 1 << 22
 
 
 class ComputeNGD:
@@ -41,8 +41,15 @@ class ComputeNGD:
         self.parameters = parameters
         self.global_iter = 0
         self.ngd_database_name = RTXConfig.curie_to_pmids_path.split('/')[-1]
-        self.connection, self.cursor = self._setup_ngd_database()
+        self.ngd_database_path = os.path.dirname(os.path.abspath(__file__)) + f"/../../KnowledgeSources/NormalizedGoogleDistance/{self.ngd_database_name}"
+        # use the memory-mapped PMID index if it has been built for this database, otherwise query the database itself
+        self.curie_pmid_index = self._load_curie_pmid_index()
+        if self.curie_pmid_index is None:
+            self.connection, self.cursor = self._setup_ngd_database()
+        else:
+            self.connection, self.cursor = None, None
         self.curie_to_pmids_map = dict()
+        self.curie_to_pmid_index_row_map = dict()
         self.ngd_normalizer = 3.5e+7 * 20  # From PubMed home page there are 35 million articles (based on the information on https://pubmed.ncbi.nlm.nih.gov/ on 08/09/2023); avg 20 MeSH terms per article
         self.first_ngd_log = True
 
@@ -99,13 +106,14 @@ class ComputeNGD:
                     canonicalized_curie_lookup = self._get_canonical_curies_map(list(involved_curies))
                     self.load_curie_to_pmids_data(canonicalized_curie_lookup.values())
                     added_flag = False  # check to see if any edges where added
-                    self.response.debug(f"Looping through {len(node_pairs_to_evaluate)} node pairs and calculating NGD values")
+                    self.response.debug(f"Calculating NGD values for {len(node_pairs_to_evaluate)} node pairs")
+                    node_pairs_to_evaluate = list(node_pairs_to_evaluate)
+                    ngd_values, joint_pmids = self.calculate_ngd_for_pairs(
+                        [(canonicalized_curie_lookup.get(subject_curie, subject_curie), canonicalized_curie_lookup.get(object_curie, object_curie))
+                         for subject_curie, object_curie in node_pairs_to_evaluate])
                     # iterate over all pairs of these nodes, add the virtual edge, decorate with the correct attribute
-                    for (subject_curie, object_curie) in node_pairs_to_evaluate:
+                    for (subject_curie, object_curie), ngd_value, pmids in zip(node_pairs_to_evaluate, ngd_values.tolist(), joint_pmids):
                         # create the edge attribute if it can be
-                        canonical_subject_curie = canonicalized_curie_lookup.get(subject_curie, subject_curie)
-                        canonical_object_curie = canonicalized_curie_lookup.get(object_curie, object_curie)
-                        ngd_value, pmid_set = self.calculate_ngd_fast(canonical_subject_curie, canonical_object_curie)
                         if np.isfinite(ngd_value):  # if ngd is finite, that's ok, otherwise, stay with default
                             edge_value = ngd_value
                         else:
@@ -180,7 +188,7 @@ class ComputeNGD:
                             #             confidence=confidence, weight=weight, attributes=[edge_attribute], qedge_ids=qedge_ids)
                             
                             ## fix #1980 issue
-                            temp_list = [f"PMID:{pmid}" for pmid in pmid_set]
+                            temp_list = [f"PMID:{pmid}" for pmid in pmids]
                             if len(temp_list) != 0:
                                 pmid_attribute = EdgeAttribute(attribute_type_id="biolink:publications",
                                                                original_attribute_name="publications",
@@ -241,13 +249,14 @@ class ComputeNGD:
             canonicalized_curie_lookup = self._get_canonical_curies_map(list(involved_curies))
             self.load_curie_to_pmids_data(canonicalized_curie_lookup.values())
             added_flag = False  # check to see if any edges where added
-            self.response.debug(f"Looping through {len(node_pairs_to_evaluate)} node pairs and calculating NGD values")
+            self.response.debug(f"Calculating NGD values for {len(node_pairs_to_evaluate)} node pairs")
+            node_pairs_to_evaluate = list(node_pairs_to_evaluate)
+            ngd_values, joint_pmids = self.calculate_ngd_for_pairs(
+                [(canonicalized_curie_lookup.get(subject_curie, subject_curie), canonicalized_curie_lookup.get(object_curie, object_curie))
+                 for subject_curie, object_curie in node_pairs_to_evaluate])
             # iterate over all pairs of these nodes, add the virtual edge, decorate with the correct attribute
-            for (subject_curie, object_curie) in node_pairs_to_evaluate:
+            for (subject_curie, object_curie), ngd_value, pmids in zip(node_pairs_to_evaluate, ngd_values.tolist(), joint_pmids):
                 # create the edge attribute if it can be
-                canonical_subject_curie = canonicalized_curie_lookup.get(subject_curie, subject_curie)
-                canonical_object_curie = canonicalized_curie_lookup.get(object_curie, object_curie)
-                ngd_value, pmid_set = self.calculate_ngd_fast(canonical_subject_curie, canonical_object_curie)
                 if np.isfinite(ngd_value):  # if ngd is finite, that's ok, otherwise, stay with default
                     edge_value = ngd_value
                 else:
@@ -322,7 +331,7 @@ class ComputeNGD:
                     #             confidence=confidence, weight=weight, attributes=[edge_attribute], qedge_ids=qedge_ids)
 
                     ## fix #1980 issue
-                    temp_list = [f"PMID:{pmid}" for pmid in pmid_set]
+                    temp_list = [f"PMID:{pmid}" for pmid in pmids]
                     if len(temp_list) != 0:
                         pmid_attribute = EdgeAttribute(attribute_type_id="biolink:publications",
                                                        original_attribute_name="publications",
@@ -378,17 +387,15 @@ class ComputeNGD:
                 # Map all nodes to their canonicalized curies in one batch (need canonical IDs for the local NGD system)
                 canonicalized_curie_map = self._get_canonical_curies_map([key for key in self.message.knowledge_graph.nodes.keys()])
                 self.load_curie_to_pmids_data(canonicalized_curie_map.values())
-                self.response.debug("Looping through edges and calculating NGD values")
-                for edge in self.message.knowledge_graph.edges.values():
+                self.response.debug("Calculating NGD values for all edges")
+                edges = list(self.message.knowledge_graph.edges.values())
+                ngd_values, joint_pmids = self.calculate_ngd_for_pairs(
+                    [(canonicalized_curie_map.get(edge.subject, edge.subject), canonicalized_curie_map.get(edge.object, edge.object))
+                     for edge in edges])
+                for edge, ngd_value, pmids in zip(edges, ngd_values.tolist(), joint_pmids):
                     # Make sure the attributes are not None
                     if not edge.attributes:
                         edge.attributes = []  # should be an array, but why not a list?
-                    # now go and actually get the NGD
-                    subject_curie = edge.subject
-                    object_curie = edge.object
-                    canonical_subject_curie = canonicalized_curie_map.get(subject_curie, subject_curie)
-                    canonical_object_curie = canonicalized_curie_map.get(object_curie, object_curie)
-                    ngd_value, pmid_set = self.calculate_ngd_fast(canonical_subject_curie, canonical_object_curie)
                     if np.isfinite(ngd_value):  # if ngd is finite, that's ok, otherwise, stay with default
                         edge_value = ngd_value
                     else:
@@ -401,7 +408,7 @@ class ComputeNGD:
                                                        attribute_source=attribute_source)  # populate the NGD edge attribute
                     edge.attributes.append(ngd_edge_attribute)  # append it to the list of attributes
                     ## fix #1980 issue
-                    temp_list = [f"PMID:{pmid}" for pmid in pmid_set]
+                    temp_list = [f"PMID:{pmid}" for pmid in pmids]
                     if len(temp_list) != 0:
                         pmid_edge_attribute = EdgeAttribute(attribute_type_id="biolink:publications",
                                                             original_attribute_name="ngd_publications",
@@ -420,70 +427,129 @@ class ComputeNGD:
         return self.response
 
     def load_curie_to_pmids_data(self, canonicalized_curies):
-        self.response.debug("Extracting PMID lists from sqlite database for relevant nodes")
         curies = list(set(canonicalized_curies))
-        chunk_size = 20000
-        num_chunks = len(curies) // chunk_size if len(curies) % chunk_size == 0 else (len(curies) // chunk_size) + 1
-        start_index = 0
-        stop_index = chunk_size
-        for num in range(num_chunks):
-            chunk = curies[start_index:stop_index] if stop_index <= len(curies) else curies[start_index:]
-            curie_list_str = ", ".join([f"'{curie}'" for curie in chunk if "'" not in curie])
-            self.cursor.execute(f"SELECT * FROM curie_to_pmids WHERE curie in ({curie_list_str})")
+        if self.curie_pmid_index is not None:
+            self.response.debug("Looking up PMID lists in the PMID index for relevant nodes")
+            curie_to_pmid_index_row_map = self.curie_pmid_index.get_rows(curies)
+            self.curie_to_pmid_index_row_map.update(curie_to_pmid_index_row_map)
+            for curie, row in curie_to_pmid_index_row_map.items():
+                self.curie_to_pmids_map[curie] = self.curie_pmid_index.get_pmids(row)  # (a view into the index)
+            return
+        self.response.debug("Extracting PMID lists from sqlite database for relevant nodes")
+        chunk_size = 999  # (older sqlite versions allow at most 999 parameters per query)
+        for start_index in range(0, len(curies), chunk_size):
+            chunk = curies[start_index:start_index + chunk_size]
+            self.cursor.execute(f"SELECT * FROM curie_to_pmids WHERE curie in ({', '.join('?' * len(chunk))})", chunk)
             rows = self.cursor.fetchall()
             for row in rows:
                 self.curie_to_pmids_map[row[0]] = json.loads(row[1])  # PMID list is stored as JSON string in sqlite db
-            start_index += chunk_size
-            stop_index += chunk_size
 
     def calculate_ngd_fast(self, subject_curie, object_curie):
-        if subject_curie in self.curie_to_pmids_map and object_curie in self.curie_to_pmids_map:
-            pubmed_ids_for_curies = [self.curie_to_pmids_map.get(subject_curie),
-                                     self.curie_to_pmids_map.get(object_curie)]
-            pubmed_id_set = set(self.curie_to_pmids_map.get(subject_curie)).intersection(set(self.curie_to_pmids_map.get(object_curie)))
-            n_pmids = len(pubmed_id_set)
-            if n_pmids > 30:
-                if self.first_ngd_log:
-                    #self.response.debug(f"{n_pmids} publications found for edge ({subject_curie})-[]-({object_curie}) limiting to 30...")
-                    self.response.debug("More than 30 publications found for some edges limiting to 30...")
-                    self.first_ngd_log = False
-                # limited_pmids = set()
-                # for i, val in enumerate(itertools.islice(pubmed_id_set, 30)):
-                #     limited_pmids.add(val)
-                # pubmed_id_set = limited_pmids
-                pubmed_id_set = set([val for val in itertools.islice(pubmed_id_set, 30)])
-            counts_res = self._compute_marginal_and_joint_counts(pubmed_ids_for_curies)
-            return self._compute_multiway_ngd_from_counts(*counts_res), pubmed_id_set
-        else:
-            return math.nan, {}
+        ngd_values, joint_pmids = self.calculate_ngd_for_pairs([(subject_curie, object_curie)])
+        return float(ngd_values[0]), set(joint_pmids[0])
+
+    def calculate_ngd_for_pairs(self, curie_pairs):
+        """
+        Computes the NGD of all the given (subject, object) canonical curie pairs in one go: marginal counts are
+        looked up once per curie and joint counts are found for many pairs at a time by binary searching each pair's
+        shorter PMID list in the longer one (with all lists concatenated into one sorted array of (curie, PMID) keys).
+        Curies must have been loaded with load_curie_to_pmids_data() first.
+        :return: an array of the pairs' NGD values (NaN where NGD can't be computed) and a list of the pairs' joint
+                 PMIDs (tuples of the 30 lowest, at most), both in the same order as curie_pairs
+        """
+        curie_pairs = list(curie_pairs)
+        ngd_values = np.full(len(curie_pairs), math.nan)
+        joint_pmids_of_pairs = [()] * len(curie_pairs)
+        # Give every loaded curie involved a local ID and concatenate their (sorted, distinct) PMID lists
+        curie_ids = dict()
+        pmid_arrays = []
+        for curie_pair in curie_pairs:
+            for curie in curie_pair:
+                if curie not in curie_ids and curie in self.curie_to_pmids_map:
+                    curie_ids[curie] = len(pmid_arrays)
+                    pmids = self.curie_to_pmids_map[curie]
+                    pmid_arrays.append(pmids if curie in self.curie_to_pmid_index_row_map
+                                       else np.unique(np.asarray(pmids, dtype=np.int64)))
+        pair_indexes = [index for index, (subject_curie, object_curie) in enumerate(curie_pairs)
+                        if subject_curie in curie_ids and object_curie in curie_ids]
+        if not pair_indexes:
+            return ngd_values, joint_pmids_of_pairs
+        marginal_counts = np.array([len(pmids) for pmids in pmid_arrays], dtype=np.int64)
+        pmid_offsets = np.concatenate([[0], np.cumsum(marginal_counts)])
+        all_pmids = np.concatenate(pmid_arrays).astype(np.int64)
+        # (curie ID, PMID) keys, which are sorted since each curie's PMIDs are
+        pmid_range = int(all_pmids.max()) + 1 if len(all_pmids) else 1
+        keys = np.repeat(np.arange(len(pmid_arrays), dtype=np.int64), marginal_counts) * pmid_range + all_pmids
+
+        # NGD is symmetric, so each unordered pair only needs to be done once
+        subject_ids = np.array([curie_ids[curie_pairs[index][0]] for index in pair_indexes], dtype=np.int64)
+        object_ids = np.array([curie_ids[curie_pairs[index][1]] for index in pair_indexes], dtype=np.int64)
+        swap = (marginal_counts[subject_ids] > marginal_counts[object_ids]) | \
+            ((marginal_counts[subject_ids] == marginal_counts[object_ids]) & (subject_ids > object_ids))
+        short_ids = np.where(swap, object_ids, subject_ids)
+        long_ids = np.where(swap, subject_ids, object_ids)
+        unique_pair_keys, unique_pair_inverse = np.unique(short_ids * len(pmid_arrays) + long_ids, return_inverse=True)
+        unique_short_ids = unique_pair_keys // len(pmid_arrays)
+        unique_long_ids = unique_pair_keys % len(pmid_arrays)
+
+        joint_counts = np.zeros(len(unique_pair_keys), dtype=np.int64)
+        unique_joint_pmids = [None] * len(unique_pair_keys)
+        short_lengths = marginal_counts[unique_short_ids]
+        # Do the pairs in chunks of about max_pmids_per_ngd_chunk PMIDs so that memory use stays bounded
+        chunk_starts = np.searchsorted(np.cumsum(short_lengths), np.arange(0, short_lengths.sum(), max_pmids_per_ngd_chunk),
+                                       side="right")
+        for chunk_start, chunk_end in zip(chunk_starts, list(chunk_starts[1:]) + [len(unique_pair_keys)]):
+            lengths = short_lengths[chunk_start:chunk_end]
+            if not lengths.sum():
+                continue
+            # Gather the shorter list of each pair in the chunk, along with which pair each PMID belongs to
+            chunk_pair_indexes = np.repeat(np.arange(chunk_start, chunk_end), lengths)
+            element_offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            short_pmids = all_pmids[pmid_offsets[unique_short_ids[chunk_pair_indexes]] + element_offsets]
+            query_keys = unique_long_ids[chunk_pair_indexes] * pmid_range + short_pmids
+            positions = np.minimum(np.searchsorted(keys, query_keys), len(keys) - 1)
+            is_joint = keys[positions] == query_keys
+            joint_pair_indexes = chunk_pair_indexes[is_joint]
+            joint_pmids = short_pmids[is_joint]
+            joint_counts[chunk_start:chunk_end] = np.bincount(joint_pair_indexes - chunk_start,
+                                                              minlength=chunk_end - chunk_start)
+            # Keep (up to) the first 30 joint PMIDs of each pair; they come out grouped by pair and sorted
+            ranks = np.arange(len(joint_pair_indexes)) - np.searchsorted(joint_pair_indexes, joint_pair_indexes)
+            joint_pair_indexes = joint_pair_indexes[ranks < 30]
+            joint_pmids = joint_pmids[ranks < 30]
+            pair_starts = np.flatnonzero(np.diff(joint_pair_indexes, prepend=-1))
+            for pair_index, pmids in zip(joint_pair_indexes[pair_starts].tolist(),
+                                         np.split(joint_pmids, pair_starts[1:])):
+                unique_joint_pmids[pair_index] = tuple(pmids.tolist())
+        if joint_counts.max() > 30:
+            if self.first_ngd_log:
+                self.response.debug("More than 30 publications found for some edges limiting to 30...")
+                self.first_ngd_log = False
+
+        ngd_values[pair_indexes] = self._compute_ngd_from_counts(marginal_counts[subject_ids],
+                                                                 marginal_counts[object_ids],
+                                                                 joint_counts[unique_pair_inverse])
+        for index, unique_pair_index in zip(pair_indexes, unique_pair_inverse.tolist()):
+            if unique_joint_pmids[unique_pair_index]:
+                joint_pmids_of_pairs[index] = unique_joint_pmids[unique_pair_index]
+        return ngd_values, joint_pmids_of_pairs
+
+    def _compute_ngd_from_counts(self, subject_counts: np.ndarray, object_counts: np.ndarray,
+                                 joint_counts: np.ndarray) -> np.ndarray:
+        # NGD is NaN wherever a count is 0 (there's nothing to take the log of)
+        counts_are_positive = (subject_counts > 0) & (object_counts > 0) & (joint_counts > 0)
+        max_log_marginal_counts = self._get_logs(np.maximum(subject_counts, object_counts))
+        min_log_marginal_counts = self._get_logs(np.minimum(subject_counts, object_counts))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ngd_values = (max_log_marginal_counts - self._get_logs(joint_counts)) / \
+                (math.log(self.ngd_normalizer) - min_log_marginal_counts)
+        return np.where(counts_are_positive, ngd_values, math.nan)
 
     @staticmethod
-    def _compute_marginal_and_joint_counts(concept_pubmed_ids: list[list[int]]) -> list:
-        def reducer(pmids_intersec_cumul: set[int], pmids_next: set[int]) -> set[int]:
-            return pmids_intersec_cumul.intersection(pmids_next)
-        # Convert concept_pubmed_ids to a list of sets first
-        pubmed_id_sets: list[set[int]] = [set(pmid_list) for pmid_list in concept_pubmed_ids]
-        # Reduce over set[int], which is now type-consistent
-        joint_pubmed_ids: set[int] = functools.reduce(reducer, pubmed_id_sets)
-        marginal_counts = [len(s) for s in pubmed_id_sets]
-        return [marginal_counts, len(joint_pubmed_ids)]
-
-    def _compute_multiway_ngd_from_counts(self, marginal_counts: list[int],
-                                          joint_count: int) -> float:
-        # Make sure that things are within the right domain for the logs
-        # Should also make sure things are not negative, but I'll just do this with a ValueError
-        if None in marginal_counts:
-            return math.nan
-        elif 0 in marginal_counts or 0. in marginal_counts:
-            return math.nan
-        elif joint_count == 0 or joint_count == 0.:
-            return math.nan
-        else:
-            try:
-                return (max([math.log(count) for count in marginal_counts]) - math.log(joint_count)) / \
-                   (math.log(self.ngd_normalizer) - min([math.log(count) for count in marginal_counts]))
-            except ValueError:
-                return math.nan
+    def _get_logs(counts: np.ndarray) -> np.ndarray:
+        # math.log of each distinct count (there are few of them), so NGD values are exactly what they've always been
+        distinct_counts, inverse = np.unique(counts, return_inverse=True)
+        return np.array([math.log(count) if count > 0 else math.nan for count in distinct_counts.tolist()])[inverse]
 
     def _get_canonical_curies_map(self, curies):
         self.response.debug("Canonicalizing curies of relevant nodes using NodeSynonymizer")
@@ -504,12 +570,19 @@ class ComputeNGD:
                     canonical_curies_map[input_curie] = input_curie
             return canonical_curies_map
 
+    def _load_curie_pmid_index(self):
+        try:
+            return CuriePMIDIndex.load_if_built(self.ngd_database_path)
+        except Exception:
+            tb = traceback.format_exc()
+            self.response.warning(f"Could not load the PMID index for {self.ngd_database_name}, so will use the "
+                                  f"sqlite database instead: {tb}")
+            return None
+
     def _setup_ngd_database(self):
-        ngd_filepath = os.path.dirname(os.path.abspath(__file__)) + "/../../KnowledgeSources/NormalizedGoogleDistance/"
-        db_path_local = f"{ngd_filepath}{self.ngd_database_name}"
         # Set up a connection to the database so it's ready for use
         try:
-            connection = sqlite3.connect(db_path_local)
+            connection = sqlite3.connect(self.ngd_database_path)
             cursor = connection.cursor()
         except Exception:
             self.response.error("Encountered an error connecting "
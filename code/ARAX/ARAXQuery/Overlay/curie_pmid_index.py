@@ -0,0 +1,204 @@
+#!/bin/env python3
+# This file contains the memory-mapped curie -> PMIDs index that NGD is computed from, along with the code to build it
+# (from the curie_to_pmids sqlite database, or directly by ngd/build_ngd_database.py).
+#
+# The index is a directory of flat little-endian arrays, laid out like a CSR matrix:
+#   pmids.u32            the (sorted, distinct) PMIDs of every curie, one curie after another
+#   pmid_offsets.i64     row i's PMIDs are pmids[pmid_offsets[i]:pmid_offsets[i + 1]]
+#   curies.utf8          the curies, one after another (UTF-8)
+#   curie_offsets.i64    row i's curie is curies[curie_offsets[i]:curie_offsets[i + 1]]
+#   curie_hashes.u64     sorted 64-bit hashes of the curies, for looking up their rows by binary search
+#   curie_hash_rows.i64  the row of the curie each hash in curie_hashes.u64 belongs to
+#   index_info.json      format version and sizes (written last, so only complete indexes have it)
+# Everything is opened read-only with mmap, so all processes that use the same index share its pages.
+import array
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import Iterable, Optional
+
+import numpy as np
+
+index_format_version = 1
+index_info_file_name = "index_info.json"
+max_pmid = np.iinfo(np.uint32).max
+
+
+def get_curie_pmid_index_path(curie_to_pmids_path: str) -> str:
+    """
+    Returns where the index built from the given curie_to_pmids sqlite database lives: next to the real database file
+    (following any symlink, so that ARAX instances symlinked to the same database share its index, too)
+    """
+    return f"{os.path.realpath(curie_to_pmids_path)}-pmid-index"
+
+
+def _get_curie_hash(curie: str) -> int:
+    return int.from_bytes(hashlib.blake2b(curie.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CuriePMIDIndexBuilder:
+    """
+    Writes a curie -> PMIDs index one curie at a time (so it never needs to hold all PMIDs in memory). The index is
+    written to a temporary directory that replaces index_path once finish() is called.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.tmp_index_path = tempfile.mkdtemp(prefix=f"{os.path.basename(index_path)}.tmp-",
+                                               dir=os.path.dirname(os.path.abspath(index_path)))
+        self.pmids_file = open(os.path.join(self.tmp_index_path, "pmids.u32"), "wb")
+        self.curies_file = open(os.path.join(self.tmp_index_path, "curies.utf8"), "wb")
+        self.pmid_offsets = array.array("q", [0])
+        self.curie_offsets = array.array("q", [0])
+        self.curie_hashes = array.array("Q")
+
+    def add(self, curie: str, pmids: Iterable[int]):
+        """
+        Adds a curie and its PMIDs (which may be in any order, with duplicates); each curie may only be added once
+        """
+        pmids = np.unique(np.fromiter(pmids, dtype=np.int64))
+        if len(pmids) and (pmids[0] < 0 or pmids[-1] > max_pmid):
+            raise ValueError(f"PMIDs of {curie} do not fit in 32 bits")
+        self.pmids_file.write(pmids.astype("<u4").tobytes())
+        self.pmid_offsets.append(self.pmid_offsets[-1] + len(pmids))
+        curie_bytes = curie.encode("utf-8")
+        self.curies_file.write(curie_bytes)
+        self.curie_offsets.append(self.curie_offsets[-1] + len(curie_bytes))
+        self.curie_hashes.append(_get_curie_hash(curie))
+
+    def finish(self) -> int:
+        """
+        Writes out the offsets and curie lookup table and moves the index into place. Returns the number of curies.
+        """
+        self.pmids_file.close()
+        self.curies_file.close()
+        curie_hashes = np.frombuffer(self.curie_hashes, dtype=np.uint64)
+        curie_hash_rows = np.argsort(curie_hashes, kind="stable")
+        for file_name, index_array in [("pmid_offsets.i64", np.frombuffer(self.pmid_offsets, dtype=np.int64)),
+                                       ("curie_offsets.i64", np.frombuffer(self.curie_offsets, dtype=np.int64)),
+                                       ("curie_hashes.u64", curie_hashes[curie_hash_rows]),
+                                       ("curie_hash_rows.i64", curie_hash_rows)]:
+            index_array.astype(index_array.dtype.newbyteorder("<")).tofile(os.path.join(self.tmp_index_path, file_name))
+        with open(os.path.join(self.tmp_index_path, index_info_file_name), "w") as index_info_file:
+            json.dump({"format_version": index_format_version,
+                       "num_curies": len(self.curie_hashes),
+                       "num_pmids": self.pmid_offsets[-1]}, index_info_file)
+        if os.path.exists(self.index_path):
+            shutil.rmtree(self.index_path)
+        os.rename(self.tmp_index_path, self.index_path)
+        return len(self.curie_hashes)
+
+    def abort(self):
+        self.pmids_file.close()
+        self.curies_file.close()
+        shutil.rmtree(self.tmp_index_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+        return False
+
+
+def build_curie_pmid_index_from_sqlite(curie_to_pmids_path: str, index_path: Optional[str] = None) -> int:
+    """
+    Builds the index for a curie_to_pmids sqlite database (whose PMID lists are stored as JSON); returns the number of
+    curies indexed.
+    """
+    if index_path is None:
+        index_path = get_curie_pmid_index_path(curie_to_pmids_path)
+    connection = sqlite3.connect(f"file:{curie_to_pmids_path}?mode=ro", uri=True)
+    try:
+        with CuriePMIDIndexBuilder(index_path) as index_builder:
+            for curie, pmids_json in connection.execute("SELECT curie, pmids FROM curie_to_pmids"):
+                index_builder.add(curie, json.loads(pmids_json))
+    finally:
+        connection.close()
+    return len(index_builder.curie_hashes)
+
+
+def _open_array(file_path: str, dtype: str) -> np.ndarray:
+    if os.path.getsize(file_path) == 0:
+        return np.zeros(0, dtype=dtype)  # (empty files can't be memory-mapped)
+    # (a plain ndarray view of the mapping, since slicing np.memmap objects themselves is a lot slower)
+    return np.memmap(file_path, dtype=dtype, mode="r").view(np.ndarray)
+
+
+class CuriePMIDIndex:
+    """
+    Read-only, memory-mapped curie -> PMIDs index. Curies are looked up to their row in the index first; PMID lists
+    come back as sorted uint32 arrays (views into the index, not copies).
+    """
+
+    def __init__(self, index_path: str):
+        with open(os.path.join(index_path, index_info_file_name)) as index_info_file:
+            index_info = json.load(index_info_file)
+        if index_info["format_version"] != index_format_version:
+            raise ValueError(f"PMID index {index_path} has format version {index_info['format_version']}, but "
+                             f"version {index_format_version} is needed")
+        self.index_path = index_path
+        self.pmids = _open_array(os.path.join(index_path, "pmids.u32"), "<u4")
+        self.pmid_offsets = _open_array(os.path.join(index_path, "pmid_offsets.i64"), "<i8")
+        self.curies = _open_array(os.path.join(index_path, "curies.utf8"), "u1")
+        self.curie_offsets = _open_array(os.path.join(index_path, "curie_offsets.i64"), "<i8")
+        self.curie_hashes = _open_array(os.path.join(index_path, "curie_hashes.u64"), "<u8")
+        self.curie_hash_rows = _open_array(os.path.join(index_path, "curie_hash_rows.i64"), "<i8")
+
+    @classmethod
+    def load_if_built(cls, curie_to_pmids_path: str) -> Optional["CuriePMIDIndex"]:
+        """
+        Returns the index for the given curie_to_pmids sqlite database, or None if it hasn't been built (yet)
+        """
+        index_path = get_curie_pmid_index_path(curie_to_pmids_path)
+        if not os.path.exists(os.path.join(index_path, index_info_file_name)):
+            return None
+        return cls(index_path)
+
+    def __len__(self) -> int:
+        return len(self.curie_hashes)
+
+    def _get_curie(self, row: int) -> str:
+        return self.curies[self.curie_offsets[row]:self.curie_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def get_rows(self, curies: Iterable[str]) -> dict[str, int]:
+        """
+        Looks up the rows of the given curies (all at once); curies that aren't in the index are left out
+        """
+        curies = list(dict.fromkeys(curies))
+        if not curies or not len(self):
+            return dict()
+        hashes = np.array([_get_curie_hash(curie) for curie in curies], dtype=np.uint64)
+        positions = np.searchsorted(self.curie_hashes, hashes)
+        rows = dict()
+        for curie, curie_hash, position in zip(curies, hashes.tolist(), positions.tolist()):
+            # (on a hash collision, check all curies with the same hash)
+            while position < len(self) and int(self.curie_hashes[position]) == curie_hash:
+                row = int(self.curie_hash_rows[position])
+                if self._get_curie(row) == curie:
+                    rows[curie] = row
+                    break
+                position += 1
+        return rows
+
+    def get_pmids(self, row: int) -> np.ndarray:
+        return self.pmids[self.pmid_offsets[row]:self.pmid_offsets[row + 1]]
+
+    def get_joint_pmids(self, row_a: int, row_b: int) -> np.ndarray:
+        """
+        Returns the (sorted) PMIDs the two rows have in common, by binary searching the shorter PMID list in the longer
+        """
+        pmids_a = self.get_pmids(row_a)
+        pmids_b = self.get_pmids(row_b)
+        if len(pmids_a) > len(pmids_b):
+            pmids_a, pmids_b = pmids_b, pmids_a
+        if not len(pmids_a):
+            return pmids_a
+        positions = np.minimum(np.searchsorted(pmids_b, pmids_a), len(pmids_b) - 1)
+        return pmids_a[pmids_b[positions] == pmids_a]
@@ -5,12 +5,13 @@ import asyncio
 import json
 import os
 import re
-import scipy.stats as stats
 import sqlite3
 import sys
+import threading
 import traceback
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 SCRIPT_DIR = Path(__file__).resolve().parent
 sys.path.append(str(SCRIPT_DIR / "../../.."))  # RTX/code directory
 from RTXConfiguration import RTXConfiguration
@@ -25,6 +26,90 @@ from openapi_server.models.retrieval_source import RetrievalSource
 from ARAX.NodeSynonymizer.node_synonymizer import NodeSynonymizer
 
 RTX_CONFIG = RTXConfiguration()
+neighbor_counts_batch_size = 500  # (every batch has this many placeholders, so its statement is only prepared once)
+fisher_exact_test_chunk_size = 1 << 22  # max number of (table, support value) cells to compute p-values for at once
+fisher_exact_test_tolerance = 1e-7  # relative tolerance for tables as likely as the observed one (as R uses)
+
+_kg2c_connections = dict()  # KG2c sqlite path -> (connection, pid of the process that opened it)
+_kg2c_connections_lock = threading.Lock()
+
+
+def _execute_on_kg2c(sqlite_file_path, sql: str, values=()) -> list[tuple]:
+    """
+    Runs a read-only query on the KG2c sqlite database, over one connection per process (which sqlite3 keeps the
+    prepared statements of), instead of connecting anew for every query.
+    """
+    sqlite_file_path = str(sqlite_file_path)
+    with _kg2c_connections_lock:
+        connection, connection_pid = _kg2c_connections.get(sqlite_file_path, (None, None))
+        if connection is None or connection_pid != os.getpid():  # (connections can't be shared across a fork)
+            connection = sqlite3.connect(f"file:{sqlite_file_path}?mode=ro", uri=True, check_same_thread=False)
+            _kg2c_connections[sqlite_file_path] = (connection, os.getpid())
+        return connection.execute(sql, list(values)).fetchall()
+
+
+def fisher_exact_pvalues(a, b, c, d, alternative: str = "two-sided") -> np.ndarray:
+    """
+    Computes Fisher's exact test p-values for many 2x2 contingency tables [[a, b], [c, d]] at once (the same p-values
+    as scipy.stats.fisher_exact, which does one table per call).
+    :param a, b, c, d: arrays of the (non-negative) counts of each table
+    :param alternative: 'two-sided' (default), 'less' or 'greater'
+    :return: an array of the tables' p-values
+    """
+    if alternative not in {"two-sided", "less", "greater"}:
+        raise ValueError(f"alternative should be 'two-sided', 'less' or 'greater', not {alternative!r}")
+    a, b, c, d = (np.asarray(counts, dtype=np.int64).reshape(-1) for counts in (a, b, c, d))
+    if min(counts.min(initial=0) for counts in (a, b, c, d)) < 0:
+        raise ValueError("All counts of a contingency table must be non-negative")
+    row_1_totals, row_2_totals, column_1_totals = a + b, c + d, a + c
+    pvalues = np.ones(len(a))
+    # Under the null hypothesis a follows a hypergeometric distribution over [a_min, a_max]. Tables with an empty row or
+    # column have a p-value of 1 (like in scipy).
+    a_min = np.maximum(0, column_1_totals - row_2_totals)
+    a_max = np.minimum(column_1_totals, row_1_totals)
+    is_informative = (row_1_totals > 0) & (row_2_totals > 0) & (column_1_totals > 0) & (b + d > 0)
+    table_indexes = np.flatnonzero(is_informative)
+    table_indexes = table_indexes[np.argsort(a_max[table_indexes] - a_min[table_indexes], kind="stable")]
+    support_sizes = a_max[table_indexes] - a_min[table_indexes] + 1
+    # Tables are done in chunks of similar support size, as rows of a 2-D array over their support
+    chunk_start = 0
+    while chunk_start < len(table_indexes):
+        chunk_cells = np.arange(1, len(table_indexes) - chunk_start + 1) * support_sizes[chunk_start:]
+        chunk_end = chunk_start + max(1, int(np.searchsorted(chunk_cells, fisher_exact_test_chunk_size, side="right")))
+        chunk = table_indexes[chunk_start:chunk_end]
+        pvalues[chunk] = _get_fisher_exact_pvalues_of_chunk(a[chunk], row_1_totals[chunk], row_2_totals[chunk],
+                                                            column_1_totals[chunk], a_min[chunk], a_max[chunk],
+                                                            alternative)
+        chunk_start = chunk_end
+    return pvalues
+
+
+def _get_fisher_exact_pvalues_of_chunk(a, row_1_totals, row_2_totals, column_1_totals, a_min, a_max,
+                                       alternative: str) -> np.ndarray:
+    support_offsets = np.arange(int((a_max - a_min).max()) + 1)
+    x = a_min[:, None] + support_offsets[None, :]
+    in_support = x <= a_max[:, None]
+    # Log probabilities (up to a constant per table), built up with the ratio of successive hypergeometric pmfs,
+    # P(x + 1) / P(x) = (row_1_total - x)(column_1_total - x) / ((x + 1)(row_2_total - column_1_total + x + 1)),
+    # which keeps them accurate even for tables with huge totals
+    x_before = x[:, :-1]
+    numerators = (row_1_totals[:, None] - x_before) * (column_1_totals[:, None] - x_before)
+    denominators = (x_before + 1) * (row_2_totals[:, None] - column_1_totals[:, None] + x_before + 1)
+    in_step = in_support[:, 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratios = np.where(in_step, np.log(np.where(in_step, numerators, 1) / np.where(in_step, denominators, 1)), 0)
+    log_probabilities = np.concatenate([np.zeros((len(a), 1)), np.cumsum(log_ratios, axis=1)], axis=1)
+    log_probabilities[~in_support] = -np.inf
+    log_probability_of_a = log_probabilities[np.arange(len(a)), a - a_min]
+    if alternative == "less":
+        is_as_extreme = x <= a[:, None]
+    elif alternative == "greater":
+        is_as_extreme = x >= a[:, None]
+    else:
+        is_as_extreme = log_probabilities <= (log_probability_of_a + np.log1p(fisher_exact_test_tolerance))[:, None]
+    probabilities = np.exp(log_probabilities - log_probabilities.max(axis=1, keepdims=True))
+    pvalues = np.where(is_as_extreme & in_support, probabilities, 0).sum(axis=1) / probabilities.sum(axis=1)
+    return np.minimum(pvalues, 1.0)
 
 
 class ComputeFTEST:
@@ -338,9 +423,8 @@ class ComputeFTEST:
             size_of_query_sample = len(subject_node_list)
 
             self.response.debug("Computing Fisher's Exact Test P-value")
-            # calculate FET p-value for each target node in parallel
+            # calculate FET p-values for all target nodes at once
 
-            parameter_list = []
             del_list = []
             for node in object_node_dict:
                 temp = [len(object_node_dict[node]), size_of_object[node]-len(object_node_dict[node]), size_of_query_sample - len(object_node_dict[node]), (size_of_total - size_of_object[node]) - (size_of_query_sample - len(object_node_dict[node]))]
@@ -350,28 +434,20 @@ class ComputeFTEST:
 
             for del_node in del_list:
                 del object_node_dict[del_node]
-            parameter_list = [(node, len(object_node_dict[node]), size_of_object[node]-len(object_node_dict[node]), size_of_query_sample - len(object_node_dict[node]), (size_of_total - size_of_object[node]) - (size_of_query_sample - len(object_node_dict[node]))) for node in object_node_dict]
+            nodes = list(object_node_dict)
+            a = np.array([len(object_node_dict[node]) for node in nodes], dtype=np.int64)
+            size_of_object_array = np.array([size_of_object[node] for node in nodes], dtype=np.int64)
 
             try:
-                # with multiprocessing.Pool() as executor:
-                #     FETpvalue_list = [elem for elem in executor.map(self._calculate_FET_pvalue_parallel, parameter_list)]
-                FETpvalue_list = [elem for elem in map(self._calculate_FET_pvalue_parallel, parameter_list)]
+                FETpvalues = fisher_exact_pvalues(a, size_of_object_array - a, size_of_query_sample - a,
+                                                  (size_of_total - size_of_object_array) - (size_of_query_sample - a))
             except Exception:
                 tb = traceback.format_exc()
                 error_type, error, _ = sys.exc_info()
                 self.response.error(tb, error_code=error_type.__name__)
                 self.response.error("Something went wrong with computing Fisher's Exact Test P-value")
                 return self.response
-
-            if any([type(elem) is list for elem in FETpvalue_list]):
-                for msg in [elem2 for elem1 in FETpvalue_list if type(elem1) is list for elem2 in elem1]:
-                    if type(msg) is tuple:
-                        self.response.error(msg[0], error_code=msg[1])
-                    else:
-                        self.response.error(msg)
-                return self.response
-            else:
-                output = dict(FETpvalue_list)
+            output = dict(zip(nodes, FETpvalues.tolist()))
 
             # check if the results need to be filtered
             output = dict(sorted(output.items(), key=lambda x: x[1]))
@@ -463,19 +539,18 @@ class ComputeFTEST:
             failure_nodes += list(normalized_nodes.keys() - mapping.keys())
 
             query_nodes = list(set(mapping.values()))
-            # Get connected to kg2c sqlite
-            connection = sqlite3.connect(self.sqlite_file_path)
-            cursor = connection.cursor()
-            # Extract the neighbor count data
-            placeholders = ",".join("?" for _ in query_nodes)
+            # Extract the neighbor count data (in fixed-size batches, padded out with NULLs, which match nothing)
+            placeholders = ",".join("?" for _ in range(neighbor_counts_batch_size))
             sql_query = (
                 "SELECT N.id, N.neighbor_counts "
                 "FROM neighbors AS N "
                 f"WHERE N.id IN ({placeholders})"
             )
-            cursor.execute(sql_query, query_nodes)
-            rows = cursor.fetchall()
-            connection.close()
+            rows = []
+            for start_index in range(0, len(query_nodes), neighbor_counts_batch_size):
+                batch = query_nodes[start_index:start_index + neighbor_counts_batch_size]
+                batch += [None] * (neighbor_counts_batch_size - len(batch))
+                rows += _execute_on_kg2c(self.sqlite_file_path, sql_query, batch)
 
             # Load the counts into a dictionary
             neighbor_counts_dict = {row[0]: json.loads(row[1]) for row in rows}
@@ -566,52 +641,16 @@ class ComputeFTEST:
         node_type = ComputeFTEST.convert_string_to_snake_case(node_type.replace('biolink:',''))
         node_type = ComputeFTEST.convert_string_biolinkformat(node_type)
 
-        # Get connected to kg2c sqlite
-        connection = sqlite3.connect(self.sqlite_file_path)
-        cursor = connection.cursor()
-
         # Extract total count of nodes with certain type in kg2c
-        sql_query = f"SELECT C.count " \
-                    f"FROM category_counts AS C " \
-                    f"WHERE C.category = '{node_type}'"
+        sql_query = "SELECT C.count " \
+                    "FROM category_counts AS C " \
+                    "WHERE C.category = ?"
 
-        cursor.execute(sql_query)
-        rows = cursor.fetchall()
+        rows = _execute_on_kg2c(self.sqlite_file_path, sql_query, [node_type])
         size_of_total = rows[0][0]
-        connection.close()
 
         return size_of_total
 
-    def _calculate_FET_pvalue_parallel(self, this):
-        # *Note*: The arugment 'this' is a list containing five sub-arguments below since this function is exectued in parallel.
-        # This method is expected to be run within this class
-        """
-        Calculate Fisher Exact Test' p-value.
-        *param this is a list containing five sub-arguments below since this function is exectued in parallel.
-        :return a list of FET p-values
-        """
-        #:sub-argument node: (required) the curie name of node, eg. "UniProtKB:Q13330"
-        #:sub-argument a: (required) count of in_sample and in_pathway
-        #:sub-argument b: (required) count of not_in_sample but in_pathway
-        #:sub-argument c: (required) count of in_sample but not in_pathway
-        #:sub-argument d: (required) count of not in_sample and not in_pathway
-
-        # this should contain five variables and assign them to different variables
-        node, a, b, c, d = this
-        error_message = []
-
-        try:
-            contingency_table = [[a, b], [c, d]]
-            pvalue = stats.fisher_exact(contingency_table)[1]
-            return (node, pvalue)
-        except Exception:
-            tb = traceback.format_exc()
-            error_type, error, _ = sys.exc_info()
-            error_message.append((tb, error_type.__name__))
-            error_message.append(f"Something went wrong for target node {node} to calculate FET p-value")
-            error_message.append(f"a, b, c, d are respectively {a}, {b}, {c}, {d} ")
-            return error_message
-
     @staticmethod
     def convert_string_to_snake_case(input_string: str) -> str:
         # Converts a string like 'ChemicalEntity' or 'chemicalEntity' to 'chemical_entity'
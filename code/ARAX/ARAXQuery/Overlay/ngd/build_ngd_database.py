@@ -14,10 +14,13 @@ import os
 import pathlib
 import sqlite3
 import subprocess
+import sys
 import time
 
 from lxml import etree
 from extraction_script import process_names
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Overlay directory
+from curie_pmid_index import CuriePMIDIndexBuilder, get_curie_pmid_index_path
 from stitch.local_babel import (
     connect_to_db_read_only,
     map_curie_to_preferred_curies,
@@ -358,28 +361,36 @@ class NGDDatabaseBuilder:
             "SELECT curie, pmid FROM staging ORDER BY curie"
         )
 
+        # The memory-mapped PMID index that ARAX computes NGD from is written
+        # alongside the database (ARAX can also build it from the database).
         write_cursor = out_conn.cursor()
+        index_builder = CuriePMIDIndexBuilder(
+            get_curie_pmid_index_path(self.curie_to_pmids_db_path)
+        )
         current_curie = None
         current_pmids = set()
         n_written = 0
 
-        for curie, pmid in rows_iter:
-            if curie != current_curie:
-                if current_curie is not None:
-                    write_cursor.execute(
-                        "INSERT INTO curie_to_pmids VALUES (?, ?)",
-                        (current_curie, json.dumps(sorted(current_pmids))),
-                    )
-                    n_written += 1
-                current_curie = curie
-                current_pmids = set()
-            current_pmids.add(pmid)
-        if current_curie is not None:
+        def write(curie, pmids):
+            sorted_pmids = sorted(pmids)
             write_cursor.execute(
                 "INSERT INTO curie_to_pmids VALUES (?, ?)",
-                (current_curie, json.dumps(sorted(current_pmids))),
+                (curie, json.dumps(sorted_pmids)),
             )
-            n_written += 1
+            index_builder.add(curie, sorted_pmids)
+
+        with index_builder:
+            for curie, pmid in rows_iter:
+                if curie != current_curie:
+                    if current_curie is not None:
+                        write(current_curie, current_pmids)
+                        n_written += 1
+                    current_curie = curie
+                    current_pmids = set()
+                current_pmids.add(pmid)
+            if current_curie is not None:
+                write(current_curie, current_pmids)
+                n_written += 1
 
         out_cursor.execute("DROP TABLE staging")
         out_conn.commit()
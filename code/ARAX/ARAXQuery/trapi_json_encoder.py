@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Streaming JSON encoder for TRAPI responses: walks the OpenAPI model objects directly, producing the same JSON as
+# json.dumps(model.to_dict(), sort_keys=True) a piece at a time, so that a response never has to exist as one giant
+# dict plus one giant string. Big collections (KG nodes and edges, results, auxiliary graphs, ...) are encoded one
+# element at a time. JSON has no NaN or infinity, so an attribute with such a value is left out, and any other such
+# value (e.g., a result's score) is sent as null, rather than failing the whole response.
+import json
+import math
+from typing import Callable, Iterator, Optional
+
+default_chunk_size = 1 << 20  # (characters) pieces of JSON are joined into chunks of about this size
+
+_encoder = json.JSONEncoder(allow_nan=False, sort_keys=True)
+
+
+def iter_trapi_json_chunks(model, extra_fields: Optional[dict] = None, chunk_size: int = default_chunk_size,
+                           on_non_finite_float: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """
+    Yields the JSON of a TRAPI model object (e.g., a Response envelope) in chunks of about chunk_size characters.
+    :param model: the model object to encode
+    :param extra_fields: any additional top-level fields to put in the JSON (e.g., {'http_status': 200})
+    :param chunk_size: about how many characters to put in each chunk
+    :param on_non_finite_float: called with a description of where it was whenever an attribute had to be left out or
+                                a value sent as null because of a NaN or infinity
+    """
+    chunk = []
+    chunk_length = 0
+    for piece in _iter_model_json(model, extra_fields or dict(), "", on_non_finite_float):
+        chunk.append(piece)
+        chunk_length += len(piece)
+        if chunk_length >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            chunk_length = 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _iter_model_json(model, extra_fields: dict, path: str, on_non_finite_float) -> Iterator[str]:
+    # (these are the fields of Model.to_dict(), which uses attribute names, not the JSON keys of attribute_map)
+    fields = dict()
+    for attribute_name in model.openapi_types:
+        value = getattr(model, attribute_name)
+        if attribute_name == '_not' and not (hasattr(value, "to_dict") or isinstance(value, (list, dict))):
+            attribute_name = 'not'
+        fields[attribute_name] = value
+    fields.update(extra_fields)
+    yield "{"
+    for index, (key, value) in enumerate(sorted(fields.items())):
+        field_path = f"{path}.{key}" if path else key
+        yield f"{', ' if index else ''}{_encode_key(key)}: "
+        if hasattr(value, "to_dict"):
+            yield from _iter_model_json(value, dict(), field_path, on_non_finite_float)
+        elif isinstance(value, list):
+            # (lists and dicts are sent one element at a time; each element is converted like Model.to_dict() does)
+            yield "["
+            for element_index, element in enumerate(value):
+                yield (", " if element_index else "") + \
+                    _encode(element.to_dict() if hasattr(element, "to_dict") else element,
+                            f"{field_path}[{element_index}]", on_non_finite_float)
+            yield "]"
+        elif isinstance(value, dict) and value:
+            yield "{"
+            for element_index, (element_key, element) in enumerate(sorted(value.items())):
+                yield f"{', ' if element_index else ''}{_encode_key(element_key)}: " + \
+                    _encode(_get_dict_value_as_dict(element), f"{field_path}[{element_key}]", on_non_finite_float)
+            yield "}"
+        else:
+            yield _encode(value, field_path, on_non_finite_float)
+    yield "}"
+
+
+def _get_dict_value_as_dict(value):
+    # Converts a value of a dict field like Model.to_dict() does (which goes two levels deep)
+    if isinstance(value, list):
+        return [element.to_dict() if hasattr(element, "to_dict") else element for element in value]
+    elif isinstance(value, dict):
+        return {key: element.to_dict() if hasattr(element, "to_dict") else element for key, element in value.items()}
+    elif hasattr(value, "to_dict"):
+        return value.to_dict()
+    else:
+        return value
+
+
+def _encode(value, path: str, on_non_finite_float) -> str:
+    try:
+        return _encoder.encode(value)
+    except ValueError:
+        # Something in here is NaN or infinite (which JSON can't represent), so leave out or null just those values
+        return _encoder.encode(_drop_non_finite_floats(value, path, on_non_finite_float))
+
+
+_dropped = object()
+
+
+def _drop_non_finite_floats(value, path: str, on_non_finite_float):
+    # Returns the value with any attribute that has a NaN or infinity in it left out (since an attribute's value can't
+    # be null) and any other NaN or infinity replaced by None, so that every field keeps its type in the TRAPI schema
+    if isinstance(value, float) and not math.isfinite(value):
+        if on_non_finite_float is not None:
+            on_non_finite_float(path)
+        return None
+    elif isinstance(value, dict):
+        if "attribute_type_id" in value and _has_non_finite_float(value):
+            if on_non_finite_float is not None:
+                on_non_finite_float(path)
+            return _dropped
+        elements = {key: _drop_non_finite_floats(element, f"{path}.{key}", on_non_finite_float)
+                    for key, element in value.items()}
+        return {key: element for key, element in elements.items() if element is not _dropped}
+    elif isinstance(value, (list, tuple)):
+        elements = [_drop_non_finite_floats(element, f"{path}[{index}]", on_non_finite_float)
+                    for index, element in enumerate(value)]
+        return [element for element in elements if element is not _dropped]
+    else:
+        return value
+
+
+def _has_non_finite_float(value) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    elif isinstance(value, dict):
+        return any(_has_non_finite_float(element) for element in value.values())
+    elif isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(element) for element in value)
+    else:
+        return False
+
+
+def _encode_key(key) -> str:
+    if isinstance(key, str):
+        return _encoder.encode(key)
+    return json.dumps({key: None})[1:-len(": null}")]  # (how json turns ints, floats, etc. into keys)
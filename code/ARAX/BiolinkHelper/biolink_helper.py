@@ -7,8 +7,10 @@ import datetime
 import json
 import os
 import pathlib
+import pickle
 import sys
-from typing import Optional
+import threading
+from typing import Dict, List, Optional, Set, Union
 
 import yaml
 from biolink_helper_pkg import BiolinkHelper
@@ -17,25 +19,138 @@ from biolink_helper_pkg import BiolinkHelper
 def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
 
 
-def get_biolink_helper(biolink_version: Optional[str] = None):
-    timestamp = str(datetime.datetime.now().isoformat())
-    eprint(f"{timestamp}: DEBUG: In BiolinkHelper init")
+biolink_helper_dir = os.path.dirname(os.path.abspath(__file__))
 
+# The BiolinkHelpers are shared by all callers of get_biolink_helper() in a process (one per Biolink version)
+_biolink_helpers: Dict[str, "ARAXBiolinkHelper"] = dict()
+_biolink_helpers_lock = threading.Lock()
+_current_arax_biolink_version: Optional[str] = None
+
+
+class ARAXBiolinkHelper(BiolinkHelper):
+    """
+    A BiolinkHelper that answers get_ancestors()/get_descendants()/get_canonical_predicates() from precomputed
+    per-item tables instead of walking the lookup map on every call. The ancestors and descendants of each Biolink
+    category, predicate, aspect, and direction are computed once (for each combination of the include_mixins and
+    include_conflations flags) as interned frozensets, and are saved to a pickle next to the Biolink lookup map so
+    that later processes just load them. The closure of several items is the union of their closures, which is what
+    BiolinkHelper itself computes, so the results are the same (apart from their order).
+    """
+    closures_version = "v1"
+
+    def __init__(self, biolink_version: str, cached_path: str):
+        super().__init__(biolink_version, cached_path)
+        self.biolink_closures_path = f"{cached_path}/biolink_closures_{biolink_version}_{self.closures_version}.pickle"
+        closures = self._load_closures()
+        # (relation, include_mixins, include_conflations) -> Biolink item -> frozenset of its ancestors/descendants
+        self.closures: Dict[tuple, Dict[str, frozenset]] = closures["closures"]
+        self.canonical_predicate_map: Dict[str, str] = closures["canonical_predicates"]
+
+    def get_ancestors(self, biolink_items: Union[str, List[str]], include_mixins: bool = True,
+                      include_conflations: bool = True) -> List[str]:
+        return self._get_closure(biolink_items, ("ancestors", include_mixins, include_conflations))
+
+    def get_descendants(self, biolink_items: Union[str, List[str], Set[str]], include_mixins: bool = True,
+                        include_conflations: bool = True) -> List[str]:
+        return self._get_closure(biolink_items, ("descendants", include_mixins, include_conflations))
+
+    def get_canonical_predicates(self, predicates: Union[str, List[str], Set[str]],
+                                 print_warnings: bool = True) -> List[str]:
+        input_predicate_set = self._convert_to_set(predicates)
+        invalid_predicates = input_predicate_set.difference(self.canonical_predicate_map)
+        if invalid_predicates and print_warnings:
+            eprint(f"WARNING: Provided predicate(s) {invalid_predicates} do not exist in Biolink {self.biolink_version}")
+        # (predicates we don't have canonical info for are returned as is)
+        return list({self.canonical_predicate_map.get(predicate, predicate) for predicate in input_predicate_set})
+
+    def _get_closure(self, biolink_items: Union[str, List[str], Set[str]], closure_key: tuple) -> List[str]:
+        relation, include_mixins, include_conflations = closure_key
+        closures = self.closures[(relation, bool(include_mixins), bool(include_conflations))]
+        if isinstance(biolink_items, str):
+            return list(closures.get(biolink_items, (biolink_items,)))
+        input_item_set = self._convert_to_set(biolink_items)
+        return list(set().union(*(closures.get(item, (item,)) for item in input_item_set)))
+
+    def _load_closures(self) -> dict:
+        lookup_map_signature = self._get_lookup_map_signature()
+        if pathlib.Path(self.biolink_closures_path).exists():
+            try:
+                with open(self.biolink_closures_path, "rb") as closures_file:
+                    closures = pickle.load(closures_file)
+                if closures.get("lookup_map_signature") == lookup_map_signature:
+                    return closures
+            except Exception as e:
+                eprint(f"WARNING: Could not load Biolink closures from {self.biolink_closures_path}: {e}")
+        closures = self._build_closures()
+        closures["lookup_map_signature"] = lookup_map_signature
+        # Write to a temporary file first so that other processes never load a partially written pickle
+        temp_file_path = f"{self.biolink_closures_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_file_path, "wb") as closures_file:
+                pickle.dump(closures, closures_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file_path, self.biolink_closures_path)
+        except OSError as e:
+            eprint(f"WARNING: Could not save Biolink closures to {self.biolink_closures_path}: {e}")
+        return closures
+
+    def _build_closures(self) -> dict:
+        timestamp = str(datetime.datetime.now().isoformat())
+        eprint(f"{timestamp}: INFO: Building Biolink {self.biolink_version} ancestor/descendant closures")
+        all_items = {item for item_type in ["categories", "predicates", "aspects", "directions"]
+                     for item in self.biolink_lookup_map[item_type]}
+        interned_closures = dict()
+        closures = dict()
+        for include_mixins in [True, False]:
+            for include_conflations in [True, False]:
+                for relation, get_closure in [("ancestors", super().get_ancestors),
+                                              ("descendants", super().get_descendants)]:
+                    closures[(relation, include_mixins, include_conflations)] = {
+                        item: interned_closures.setdefault(closure, closure)
+                        for item in all_items
+                        for closure in [frozenset(get_closure(item, include_mixins, include_conflations))]}
+        canonical_predicates = {predicate: predicate_info["canonical_predicate"]
+                                for predicate, predicate_info in self.biolink_lookup_map["predicates"].items()}
+        return {"closures": closures, "canonical_predicates": canonical_predicates}
+
+    def _get_lookup_map_signature(self) -> Optional[tuple]:
+        try:
+            lookup_map_stat = os.stat(self.biolink_lookup_map_path)
+            return lookup_map_stat.st_size, lookup_map_stat.st_mtime_ns
+        except OSError:
+            return None
+
+
+def get_biolink_helper(biolink_version: Optional[str] = None) -> ARAXBiolinkHelper:
+    """
+    Returns the BiolinkHelper for the given Biolink version (by default, the version ARAX is currently using). It is
+    only constructed on the first call for its version; later calls in the same process return the same object.
+    """
     biolink_version = biolink_version if biolink_version else get_current_arax_biolink_version()
     if biolink_version == "4.2.0":
-        eprint(f"{timestamp}: DEBUG: Overriding Biolink version from 4.2.0 to 4.2.1 due to issues with "
-               f"treats predicates in 4.2.0")
+        # Override the Biolink version from 4.2.0 to 4.2.1 due to issues with treats predicates in 4.2.0
         biolink_version = "4.2.1"
 
-    biolink_helper_dir = os.path.dirname(os.path.abspath(__file__))
-
-    return BiolinkHelper(biolink_version, biolink_helper_dir)
+    biolink_helper = _biolink_helpers.get(biolink_version)
+    if biolink_helper is None:
+        with _biolink_helpers_lock:
+            biolink_helper = _biolink_helpers.get(biolink_version)
+            if biolink_helper is None:
+                timestamp = str(datetime.datetime.now().isoformat())
+                eprint(f"{timestamp}: DEBUG: In BiolinkHelper init (Biolink {biolink_version})")
+                biolink_helper = ARAXBiolinkHelper(biolink_version, biolink_helper_dir)
+                _biolink_helpers[biolink_version] = biolink_helper
+    return biolink_helper
 
 
 def get_current_arax_biolink_version() -> str:
     """
-    Returns the current Biolink version that the ARAX system is using, according to the OpenAPI YAML file.
+    Returns the current Biolink version that the ARAX system is using, according to the OpenAPI YAML file. (The file
+    is only read on the first call in a process.)
     """
+    global _current_arax_biolink_version
+    if _current_arax_biolink_version is not None:
+        return _current_arax_biolink_version
+
     code_dir = f"{os.path.dirname(os.path.abspath(__file__))}/../.."
     openapi_yaml_path = f"{code_dir}/UI/OpenAPI/python-flask-server/openapi_server/openapi/openapi.yaml"
     openapi_json_path = f"{code_dir}/UI/OpenAPI/python-flask-server/openapi_server/openapi/openapi.json"
@@ -48,7 +163,5 @@ def get_current_arax_biolink_version() -> str:
     else:
         with open(openapi_yaml_path) as api_file:
             opanapi_data = yaml.safe_load(api_file)
-    return opanapi_data["info"]["x-translator"]["biolink-version"]
-
-
-
+    _current_arax_biolink_version = opanapi_data["info"]["x-translator"]["biolink-version"]
+    return _current_arax_biolink_version
@@ -0,0 +1,211 @@
+"""Offline NodeSynonymizer backed by a KG2c synonymizer build."""
+import ast
+import glob
+import os
+import sqlite3
+import string
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from node_synonymizer import NodeSynonymizer  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+sys.path.append(os.path.sep.join(
+    [os.path.dirname(os.path.abspath(__file__)), '..', 'BiolinkHelper']))
+from biolink_helper import get_biolink_helper  # type: ignore[import-not-found]  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+
+SYNONYMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
+# build_synonymizer.py moves its output here under this name
+SYNONYMIZER_SQLITE_GLOB = "node_synonymizer_*_KG*.sqlite"
+SQLITE_MMAP_SIZE_BYTES = 4 * 1024 * 1024 * 1024
+SQLITE_BATCH_SIZE = 500  # stay below SQLite's variable limit
+UNNECESSARY_CHARS_MAP = {
+    ord(char): None
+    for char in string.punctuation + string.whitespace}
+
+
+class LocalNodeSynonymizer(NodeSynonymizer):
+    """NodeSynonymizer that answers from a local synonymizer sqlite.
+
+    Same contracts as NodeSynonymizer (get_canonical_curies,
+    get_equivalent_nodes, get_normalizer_results, ...), but with
+    no network at all: CURIE and name lookups go to the indexed
+    nodes/clusters tables that kg2c/synonymizer_build writes
+    (5_create_synonymizer_sqlite.py), opened read-only and
+    memory-mapped. Meant for NGD builds, benchmarks and regression
+    runs that should not depend on SRI latency or availability.
+
+    It works by answering the two backend hooks of the parent
+    class in the Node Normalizer / Name Resolver response shapes,
+    so all the result assembly is shared. Differences from the
+    API version:
+      - "type" holds only the cluster's category (the API lists
+        the cluster's whole ancestry).
+      - Names are matched exactly after lowercasing and dropping
+        punctuation/whitespace (like the pre-API synonymizer),
+        not fuzzily as the Name Resolver does.
+      - Biolink category levels come from ARAX's BiolinkHelper,
+        which caches the Biolink model locally, instead of bmt.
+    """
+
+    def __init__(self, sqlite_file_name: Optional[str] = None,
+                 autocomplete: bool = True,
+                 use_async: bool = False,
+                 use_persistent_cache: bool = False):
+        """
+        :param sqlite_file_name: Synonymizer sqlite to use; a bare
+            file name is looked up in the NodeSynonymizer directory.
+            Defaults to the newest node_synonymizer_*_KG*.sqlite there.
+        :param use_persistent_cache: Off by default, since local
+            lookups are about as fast as the cache itself.
+        """
+        self.database_path = self._find_database(sqlite_file_name)
+        self._db_lock = threading.Lock()
+        self._db_connection: Optional[sqlite3.Connection] = None
+        self._db_connection_pid: Optional[int] = None
+        super().__init__(sqlite_file_name=sqlite_file_name,
+                         autocomplete=autocomplete,
+                         use_async=use_async,
+                         use_persistent_cache=use_persistent_cache)
+
+    @staticmethod
+    def _find_database(sqlite_file_name: Optional[str]) -> str:
+        if sqlite_file_name:
+            database_path = (
+                sqlite_file_name if os.path.isabs(sqlite_file_name)
+                else os.path.join(SYNONYMIZER_DIR, sqlite_file_name))
+        else:
+            candidates = glob.glob(os.path.join(
+                SYNONYMIZER_DIR, SYNONYMIZER_SQLITE_GLOB))
+            database_path = (
+                max(candidates, key=os.path.getmtime)
+                if candidates else "")
+        if not database_path or not os.path.exists(database_path):
+            raise ValueError(
+                "Local synonymizer sqlite does not exist. Build one "
+                "with kg2c/synonymizer_build/build_synonymizer.py or "
+                "download it to "
+                f"{SYNONYMIZER_DIR}/{SYNONYMIZER_SQLITE_GLOB}"
+                f" (looked for: {sqlite_file_name})")
+        return database_path
+
+    def _execute(self, sql: str,
+                 values: Iterable[Any] = ()) -> list[tuple]:
+        """Run a read-only query (one connection per process)."""
+        with self._db_lock:
+            if (self._db_connection is None
+                    or self._db_connection_pid != os.getpid()):
+                self._db_connection = sqlite3.connect(
+                    f"file:{self.database_path}?mode=ro", uri=True,
+                    check_same_thread=False)
+                self._db_connection.execute(
+                    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+                self._db_connection_pid = os.getpid()
+            return self._db_connection.execute(
+                sql, list(values)).fetchall()
+
+    def _execute_in_batches(self, sql_template: str,
+                            values: Iterable[str]) -> list[tuple]:
+        """Run an 'IN ({})' query over any number of values."""
+        values = list(values)
+        rows: list[tuple] = []
+        for i in range(0, len(values), SQLITE_BATCH_SIZE):
+            batch = values[i:i + SQLITE_BATCH_SIZE]
+            rows += self._execute(
+                sql_template.format(",".join("?" * len(batch))),
+                batch)
+        return rows
+
+    def _get_categories_and_levels(
+            self, debug: bool = False) -> dict[str, int]:
+        """Depth of each Biolink category below NamedThing."""
+        biolink_helper = get_biolink_helper()
+        categories = biolink_helper.get_descendants(
+            "biolink:NamedThing", include_mixins=False,
+            include_conflations=False)
+        return {
+            category.replace("biolink:", ""): len(
+                biolink_helper.get_ancestors(
+                    category, include_mixins=False,
+                    include_conflations=False)) - 1
+            for category in categories}
+
+    def _fetch_normalized_nodes(
+            self, curies: List[str]
+    ) -> tuple[dict[str, dict | None], list[str], Optional[str]]:
+        """Build Node Normalizer-shaped results from the local DB."""
+        # The DB stores CURIE prefixes uppercased (id_simplified),
+        # so e.g. "chebi:15365" still matches "CHEBI:15365"
+        simplified = {
+            curie: self._capitalize_curie_prefix(curie)
+            for curie in curies}
+        cluster_ids = dict(self._execute_in_batches(
+            "SELECT id_simplified, cluster_id FROM nodes "
+            "WHERE id_simplified IN ({})", set(simplified.values())))
+
+        clusters: dict[str, tuple[Any, Any, list[str]]] = {}
+        for cluster_id, name, category, member_ids in (
+                self._execute_in_batches(
+                    "SELECT cluster_id, name, category, member_ids "
+                    "FROM clusters WHERE cluster_id IN ({})",
+                    set(cluster_ids.values()))):
+            clusters[cluster_id] = (
+                name, category, ast.literal_eval(member_ids))
+
+        member_names = dict(self._execute_in_batches(
+            "SELECT id, name FROM nodes WHERE id IN ({})",
+            {member_id for _, _, member_ids in clusters.values()
+             for member_id in member_ids}))
+
+        results: dict[str, dict | None] = {}
+        for curie, curie_simplified in simplified.items():
+            cluster = clusters.get(cluster_ids.get(curie_simplified))
+            if cluster is None:
+                results[curie] = None
+                continue
+            name, category, member_ids = cluster
+            category = self._add_biolink_prefix(
+                category.replace("biolink:", "") if category else None)
+            results[curie] = {
+                "id": {"identifier": cluster_ids[curie_simplified],
+                       "label": name},
+                "equivalent_identifiers": [
+                    {"identifier": member_id,
+                     "label": member_names.get(member_id)}
+                    for member_id in member_ids],
+                "type": [category] if category else []}
+        return results, [], None
+
+    def _call_name_resolver_api(
+            self, names: List[str]) -> dict:
+        """Resolve names to cluster IDs from the local DB."""
+        if not names:
+            return {}
+        simplified = {
+            name: name.lower().translate(UNNECESSARY_CHARS_MAP)
+            for name in names}
+        clusters_per_name: defaultdict[str, Counter] = (
+            defaultdict(Counter))
+        for name_simplified, cluster_id in self._execute_in_batches(
+                "SELECT name_simplified, cluster_id FROM nodes "
+                "WHERE name_simplified IN ({})",
+                set(simplified.values())):
+            clusters_per_name[name_simplified][cluster_id] += 1
+        # Several clusters can share a name; like the pre-API
+        # synonymizer, pick the one with the most matching nodes
+        # (ties broken by cluster ID, for stable answers)
+        return {
+            name: (min(clusters_per_name[name_simplified].items(),
+                       key=lambda item: (-item[1], item[0]))[0]
+                   if clusters_per_name.get(name_simplified)
+                   else None)
+            for name, name_simplified in simplified.items()}
+
+    @staticmethod
+    def _capitalize_curie_prefix(curie: str) -> str:
+        curie_chunks = curie.split(":")
+        curie_chunks[0] = curie_chunks[0].upper()
+        return ":".join(curie_chunks)
@@ -6,6 +6,7 @@ import json
 import logging
 import math
 import os
+import sqlite3
 import sys
 import threading
 import time
@@ -71,8 +72,268 @@ def get_bmt_toolkit():
     return _BMT_TOOLKIT
 
 
-# 13 instance attrs (limit 7): API URLs, session, cache, config,
-# infores CURIEs, bmt toolkit, category levels. All needed for the
+# The old SQLite synonymizer made every lookup a local, sub-millisecond
+# read. The API version only caches per NodeSynonymizer instance, and
+# ARAX makes new instances all over Expand, Overlay, Resultify and the
+# background tasker, so the same CURIEs were being re-fetched over the
+# network on every query. NormalizerCache is a persistent cache shared by
+# all instances and all processes (ARAX forks a child per query). It is a
+# local SQLite file, so this module stays free of non-stdlib dependencies.
+NORMALIZER_CACHE_FILE = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    "node_synonymizer_cache.sqlite")
+NORMALIZER_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+NORMALIZER_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# "Unknown to the API" answers are cached for less time than
+# positive ones, since a new Babel build may start recognizing them.
+NORMALIZER_CACHE_NEGATIVE_TTL_SECONDS = 24 * 60 * 60
+NORMALIZER_CACHE_EVICTION_CHECK_INTERVAL = 1000  # puts between size checks
+NORMALIZER_CACHE_EVICTION_TARGET_FRACTION = 0.9
+NORMALIZER_CACHE_SQLITE_BATCH_SIZE = 500  # stay below SQLite's variable limit
+NORMALIZER_CACHE_BUSY_TIMEOUT_SECONDS = 30
+
+
+class NormalizerCache:
+    """Persistent, size-bounded, cross-process cache of SRI API answers.
+
+    Entries live in a namespace (e.g. "nodenorm" for Node Normalizer
+    results, "nameres:autocomplete" for Name Resolver results) and are
+    stored as JSON with an expiration time. When the file grows past
+    max_bytes, the least recently used entries are evicted. SQLite runs
+    in WAL mode so concurrent readers don't block the writer.
+
+    Failures are never fatal: if the cache file can't be opened or
+    written, lookups simply miss and NodeSynonymizer falls back to the
+    APIs, same as before this cache existed.
+    """
+
+    def __init__(self, db_file: str = NORMALIZER_CACHE_FILE,
+                 max_bytes: int = NORMALIZER_CACHE_MAX_BYTES):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._n_puts_since_eviction_check = 0
+        self._disabled = False
+        self._metrics = self._get_empty_metrics()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _get_empty_metrics() -> dict[str, int]:
+        return {"hits": 0, "misses": 0, "expired": 0, "puts": 0,
+                "evictions": 0, "errors": 0}
+
+    def _get_connection(self) -> Optional[sqlite3.Connection]:
+        """Return this process's connection (caller holds _lock).
+
+        SQLite connections must not be shared across a fork, so a
+        forked child opens its own connection on first use.
+        """
+        if self._disabled:
+            return None
+        if (self._connection is not None
+                and self._connection_pid == os.getpid()):
+            return self._connection
+        connection = sqlite3.connect(
+            self.db_file,
+            timeout=NORMALIZER_CACHE_BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "last_access REAL NOT NULL, size INTEGER NOT NULL, "
+            "PRIMARY KEY (namespace, key)) WITHOUT ROWID")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access "
+            "ON entries (last_access)")
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
+
+    def _handle_error(self, error: Exception) -> None:
+        """Log an SQLite error and drop the connection (caller holds _lock).
+
+        If the file can't even be opened (e.g. a read-only deployment
+        directory), stop trying for the rest of this process.
+        """
+        self._metrics["errors"] += 1
+        self.logger.warning(
+            "NodeSynonymizer cache %s unavailable: %s",
+            self.db_file, error)
+        if self._connection is None:
+            self._disabled = True
+        self._connection = None
+
+    def get_many(self, namespace: str,
+                 keys: List[str]) -> dict[str, Any]:
+        """Return {key: value} for the keys with unexpired entries.
+
+        A cached value may itself be None (the API didn't know the
+        key), so callers must test membership rather than truthiness.
+        """
+        found: dict[str, Any] = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._get_connection()
+                if connection is None:
+                    self._metrics["misses"] += len(keys)
+                    return found
+                expired_keys = []
+                for i in range(0, len(keys),
+                               NORMALIZER_CACHE_SQLITE_BATCH_SIZE):
+                    batch = keys[i:i + NORMALIZER_CACHE_SQLITE_BATCH_SIZE]
+                    rows = connection.execute(
+                        "SELECT key, value, expires_at FROM entries "
+                        "WHERE namespace = ? AND key IN "
+                        f"({','.join('?' * len(batch))})",
+                        [namespace, *batch]).fetchall()
+                    for key, value, expires_at in rows:
+                        if expires_at < now:
+                            expired_keys.append(key)
+                        else:
+                            found[key] = json.loads(value)
+                # Touch the hits so LRU eviction keeps them
+                connection.executemany(
+                    "UPDATE entries SET last_access = ? "
+                    "WHERE namespace = ? AND key = ?",
+                    [(now, namespace, key) for key in found])
+                if expired_keys:
+                    connection.executemany(
+                        "DELETE FROM entries "
+                        "WHERE namespace = ? AND key = ?",
+                        [(namespace, key) for key in expired_keys])
+                self._metrics["hits"] += len(found)
+                self._metrics["misses"] += len(keys) - len(found)
+                self._metrics["expired"] += len(expired_keys)
+            except sqlite3.Error as error:
+                self._handle_error(error)
+                self._metrics["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, namespace: str, items: dict[str, Any],
+                 ttl_seconds: float = NORMALIZER_CACHE_TTL_SECONDS,
+                 negative_ttl_seconds: float = (
+                     NORMALIZER_CACHE_NEGATIVE_TTL_SECONDS)) -> None:
+        """Store {key: value} pairs; None values get negative_ttl_seconds."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            serialized = json.dumps(value, separators=(",", ":"))
+            ttl = negative_ttl_seconds if value is None else ttl_seconds
+            rows.append((namespace, key, serialized, now + ttl, now,
+                         len(key) + len(serialized)))
+        with self._lock:
+            try:
+                connection = self._get_connection()
+                if connection is None:
+                    return
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO entries "
+                        "(namespace, key, value, expires_at, "
+                        "last_access, size) VALUES (?, ?, ?, ?, ?, ?)",
+                        rows)
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+                self._metrics["puts"] += len(rows)
+                self._n_puts_since_eviction_check += len(rows)
+                if (self._n_puts_since_eviction_check
+                        >= NORMALIZER_CACHE_EVICTION_CHECK_INTERVAL):
+                    self._n_puts_since_eviction_check = 0
+                    self._evict_if_needed(connection)
+            except sqlite3.Error as error:
+                self._handle_error(error)
+
+    def _evict_if_needed(self, connection: sqlite3.Connection) -> None:
+        """Drop expired, then least recently used, entries if too big.
+
+        Summing the size column is a full scan, which is why this only
+        runs every NORMALIZER_CACHE_EVICTION_CHECK_INTERVAL puts.
+        """
+        connection.execute(
+            "DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+        total_bytes = connection.execute(
+            "SELECT TOTAL(size) FROM entries").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        bytes_to_free = total_bytes - (
+            self.max_bytes * NORMALIZER_CACHE_EVICTION_TARGET_FRACTION)
+        # Walk the LRU index until enough bytes are covered
+        cutoff = None
+        freed = 0
+        for last_access, size in connection.execute(
+                "SELECT last_access, size FROM entries "
+                "ORDER BY last_access"):
+            freed += size
+            cutoff = last_access
+            if freed >= bytes_to_free:
+                break
+        if cutoff is not None:
+            cursor = connection.execute(
+                "DELETE FROM entries WHERE last_access <= ?", (cutoff,))
+            self._metrics["evictions"] += cursor.rowcount
+
+    def clear(self) -> None:
+        """Delete every entry in the cache (all namespaces)."""
+        with self._lock:
+            try:
+                connection = self._get_connection()
+                if connection is not None:
+                    connection.execute("DELETE FROM entries")
+            except sqlite3.Error as error:
+                self._handle_error(error)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return this process's hit/miss counts and the cache size."""
+        with self._lock:
+            stats: dict[str, Any] = dict(self._metrics)
+            total = stats["hits"] + stats["misses"]
+            stats["hit_rate_pct"] = (
+                round(stats["hits"] / total * 100, 1) if total else 0)
+            stats["cache_file"] = self.db_file
+            try:
+                connection = self._get_connection()
+                if connection is not None:
+                    n_entries, total_bytes = connection.execute(
+                        "SELECT COUNT(*), TOTAL(size) FROM entries"
+                    ).fetchone()
+                    stats["n_entries"] = n_entries
+                    stats["total_size_MiB"] = round(
+                        total_bytes / 1024 / 1024, 3)
+            except sqlite3.Error as error:
+                self._handle_error(error)
+        return stats
+
+
+_NORMALIZER_CACHE = None
+_NORMALIZER_CACHE_LOCK = threading.Lock()
+
+
+def get_normalizer_cache() -> NormalizerCache:
+    """Return the process-wide NormalizerCache, creating it on first call."""
+    global _NORMALIZER_CACHE
+    if _NORMALIZER_CACHE is None:
+        with _NORMALIZER_CACHE_LOCK:
+            if _NORMALIZER_CACHE is None:
+                _NORMALIZER_CACHE = NormalizerCache()
+    return _NORMALIZER_CACHE
+
+
+# 15 instance attrs (limit 7): API URLs, session, caches, config,
+# infores CURIEs, category levels. All needed for the
 # API-based lifecycle — the old SQLite version had similar state.
 class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
     """CURIE/name normalization via SRI Node Normalizer and Name Resolver APIs.
@@ -122,7 +383,8 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
 
     def __init__(self, sqlite_file_name: Optional[str] = None,
                  autocomplete: bool = True,
-                 use_async: bool = False):
+                 use_async: bool = False,
+                 use_persistent_cache: bool = True):
         # sqlite_file_name: kept for interface compat so existing
         # callers don't break. The new implementation ignores it
         # entirely — no local database is used.
@@ -150,7 +412,6 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
         self.kg2_infores_curie = "infores:rtx-kg2"
         self.sri_nn_infores_curie = "infores:sri-node-normalizer"
         self.arax_infores_curie = "infores:arax"
-        self.bmt_tk = get_bmt_toolkit()
         self.category_levels = self._get_categories_and_levels()
 
         # Since we now hit external APIs instead of a local DB,
@@ -171,6 +432,18 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
         self._cache_hits = 0
         self._cache_misses = 0
 
+        # Behind the per-instance dict sits the persistent cache
+        # shared by all instances and processes (see
+        # NormalizerCache). Name Resolver answers depend on the
+        # autocomplete mode, so the two modes get separate
+        # namespaces. use_persistent_cache=False always goes to
+        # the APIs (e.g. to check what they currently return).
+        self._persistent_cache: Optional[NormalizerCache] = (
+            get_normalizer_cache() if use_persistent_cache else None)
+        self._nr_cache_namespace = (
+            "nameres:autocomplete" if autocomplete
+            else "nameres:exact")
+
         self.logger = logging.getLogger(__name__)
 
     # ------------ EXTERNAL MAIN METHODS ------------- #
@@ -518,11 +791,12 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
             self, debug: bool = False) -> dict[str, int]:
         """Build Biolink category hierarchy with depth levels."""
         start = time.time()
+        bmt_tk = get_bmt_toolkit()
         q = collections.deque(['biolink:NamedThing'])
         levels = {'biolink:NamedThing': 0}
         while q:
             item = q.popleft()
-            for neighbor in self.bmt_tk.get_children(
+            for neighbor in bmt_tk.get_children(
                     item, formatted=True):
                 if neighbor not in levels:
                     levels[neighbor] = levels[item] + 1
@@ -895,11 +1169,13 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
         """Call Node Normalizer POST /get_normalized_nodes.
 
         Uses in-memory cache and batching (2500 CURIEs per
-        request). The old SQLite was a local file, so lookups
+        request, sent concurrently when there are several). The old SQLite was a local file, so lookups
         were essentially free. With network calls, caching is
         critical — get_normalizer_results calls this method
         multiple times for overlapping CURIE sets, and without
-        caching that would mean redundant round-trips.
+        caching that would mean redundant round-trips. CURIEs
+        not in the in-memory cache are looked up in the
+        persistent cache before going to the network.
         """
         if not curies:
             return {}
@@ -918,33 +1194,254 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
                 uncached_curies.append(curie)
                 self._cache_misses += 1
 
+        if uncached_curies and self._persistent_cache is not None:
+            persisted = self._persistent_cache.get_many(
+                "nodenorm", uncached_curies)
+            self._normalizer_cache.update(persisted)
+            all_results.update(persisted)
+            uncached_curies = [
+                c for c in uncached_curies if c not in persisted]
+
         if uncached_curies:
-            batch_size = 2500
-            for i in range(0, len(uncached_curies),
-                           batch_size):
-                batch = uncached_curies[i:i + batch_size]
+            fetched, failed, last_error = (
+                self._fetch_normalized_nodes(uncached_curies))
+            self._normalizer_cache.update(fetched)
+            all_results.update(fetched)
+            if self._persistent_cache is not None:
+                self._persistent_cache.put_many(
+                    "nodenorm", fetched)
+            # CURIEs from batches that failed come back as None
+            # but are not cached (in memory or on disk), so the
+            # next call tries them again rather than treating a
+            # transient outage as "unknown CURIE".
+            for c in failed:
+                all_results[c] = None
+            if failed:
+                self.logger.warning(
+                    "Node Normalizer failed for %d of %d CURIEs. "
+                    "Last error: %s",
+                    len(failed), len(uncached_curies), last_error)
+                if len(curies) <= 10:
+                    print("Warning: API call failed"
+                          f" for batch: {last_error}")
+
+        return all_results
+
+    def _fetch_normalized_nodes(
+            self, curies: List[str]
+    ) -> tuple[dict[str, dict | None], list[str], Optional[str]]:
+        """Look up uncached CURIEs in the Node Normalizer.
+
+        Returns (results, failed_curies, last_error). This is
+        the only place _call_normalizer_api touches the
+        network, so a different backend (see
+        local_node_synonymizer.py) only needs to override it.
+        """
+        batches = [
+            curies[i:i + self._NN_BATCH_SIZE]
+            for i in range(0, len(curies), self._NN_BATCH_SIZE)]
+        # Unlike the Name Resolver (see use_async), there is
+        # no flag here: one batch goes out synchronously, and
+        # several go out concurrently, which is where an event
+        # loop pays for itself. asyncio.run() can't be nested,
+        # so callers already inside a loop get the sync path.
+        if len(batches) > 1 and not self._in_event_loop():
+            return self._call_normalizer_api_async(batches)
+        return self._call_normalizer_api_sync(batches)
+
+    # ---- Node Normalizer config ----
+    _NN_BATCH_SIZE = 2500        # CURIEs per /get_normalized_nodes request
+    _NN_MIN_BATCH_SIZE = 100     # smallest batch when splitting
+    _NN_REQUEST_TIMEOUT = 30.0   # seconds per request
+    _NN_MAX_RETRIES = 3          # attempts per batch
+    _NN_RETRY_WAIT = 1.0         # seconds; doubles after each attempt
+    _NN_MAX_CONCURRENT = 4       # max parallel batches (async)
+    _NN_MAX_CALL_RETRIES = 6     # retries per _fetch_normalized_nodes call
+    _NN_MAX_CALL_SECONDS = 90.0  # time per _fetch_normalized_nodes call
+    # 429 and 5xx are worth retrying; other HTTP errors are not.
+    _NN_RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+    @staticmethod
+    def _in_event_loop() -> bool:
+        """True if called from code running inside an event loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def _is_retryable_nn_error(
+            self, status: Optional[int]) -> bool:
+        """Timeouts/connection errors (status None), 429 and 5xx."""
+        return status is None or status in self._NN_RETRY_STATUS_CODES
+
+    def _can_split_nn_batch(
+            self, batch: list[str], status: Optional[int]) -> bool:
+        """Whether a failed batch should be halved.
+
+        Only a 413 Payload Too Large means the batch itself is
+        the problem; it is retried as two smaller ones until it
+        reaches _NN_MIN_BATCH_SIZE. Timeouts, 429 and 5xx mean
+        the service is struggling, and splitting would only send
+        it more requests.
+        """
+        return len(batch) > self._NN_MIN_BATCH_SIZE and status == 413
+
+    def _new_nn_budget(self) -> dict:
+        """Retry/time budget shared by all batches of one call.
+
+        Without it, an outage costs every batch all of its
+        attempts and backoff; once it is spent, the remaining
+        CURIEs fail right away.
+        """
+        return {"retries": self._NN_MAX_CALL_RETRIES,
+                "deadline": (time.monotonic()
+                             + self._NN_MAX_CALL_SECONDS)}
+
+    @staticmethod
+    def _nn_budget_left(budget: dict, retry: bool) -> bool:
+        """Whether another attempt fits in the budget (and take it)."""
+        if time.monotonic() >= budget["deadline"]:
+            return False
+        if retry:
+            if budget["retries"] <= 0:
+                return False
+            budget["retries"] -= 1
+        return True
+
+    def _call_normalizer_api_sync(
+            self, batches: list[list[str]]
+    ) -> tuple[dict[str, dict | None], list[str], Optional[str]]:
+        """Sequential batches via requests.Session.
+
+        Returns (results, failed_curies, last_error).
+        """
+        results: dict[str, dict | None] = {}
+        failed: list[str] = []
+        last_error: Optional[str] = None
+        pending = collections.deque(batches)
+        budget = self._new_nn_budget()
+        while pending:
+            batch = pending.popleft()
+            status: Optional[int] = None
+            for attempt in range(1, self._NN_MAX_RETRIES + 1):
+                if not self._nn_budget_left(budget, attempt > 1):
+                    last_error = last_error or (
+                        "Node Normalizer retry/time budget exhausted")
+                    failed.extend(batch)
+                    break
                 try:
                     response = self._session.post(
                         f"{self.api_base_url}"
                         "/get_normalized_nodes",
                         json={"curies": batch},
-                        timeout=30)
+                        timeout=self._NN_REQUEST_TIMEOUT)
                     response.raise_for_status()
-                    batch_results = response.json()
-                    for curie_key, value in (
-                            batch_results.items()):
-                        self._normalizer_cache[curie_key] = (
-                            value)
-                        all_results[curie_key] = value
+                    results.update(response.json())
+                    break
                 except requests.exceptions.RequestException as e:
-                    for c in batch:
-                        self._normalizer_cache[c] = None
-                        all_results[c] = None
-                    if len(curies) <= 10:
-                        print("Warning: API call failed"
-                              f" for batch: {e}")
+                    last_error = str(e)
+                    status = (e.response.status_code
+                              if e.response is not None else None)
+                    if (attempt == self._NN_MAX_RETRIES
+                            or not self._is_retryable_nn_error(
+                                status)):
+                        self._fail_nn_batch(
+                            batch, status, pending, failed)
+                        break
+                    time.sleep(
+                        self._NN_RETRY_WAIT * 2 ** (attempt - 1))
+        return results, failed, last_error
+
+    def _fail_nn_batch(self, batch: list[str],
+                       status: Optional[int],
+                       pending: Any,
+                       failed: list[str]) -> None:
+        """Queue the halves of a failed batch, or give up on it."""
+        if self._can_split_nn_batch(batch, status):
+            middle = len(batch) // 2
+            self.logger.info(
+                "Node Normalizer batch of %d failed; retrying "
+                "as two batches of ~%d", len(batch), middle)
+            pending.append(batch[:middle])
+            pending.append(batch[middle:])
+        else:
+            failed.extend(batch)
 
-        return all_results
+    def _call_normalizer_api_async(
+            self, batches: list[list[str]]
+    ) -> tuple[dict[str, dict | None], list[str], Optional[str]]:
+        """Concurrent batches via aiohttp with a semaphore.
+
+        Same retry/split behavior as the sync version. Uses
+        asyncio.run() so callers don't need to be async.
+        Returns (results, failed_curies, last_error).
+        """
+        self.logger.info(
+            "Node Normalizer ASYNC: %d CURIEs, %d batches "
+            "(max_concurrent=%d)",
+            sum(len(b) for b in batches), len(batches),
+            self._NN_MAX_CONCURRENT)
+
+        async def _run() -> tuple[
+                dict[str, dict | None], list[str], Optional[str]]:
+            sem = asyncio.Semaphore(self._NN_MAX_CONCURRENT)
+            results: dict[str, dict | None] = {}
+            failed: list[str] = []
+            last_error: Optional[str] = None
+            budget = self._new_nn_budget()
+
+            async with aiohttp.ClientSession(
+                headers={'accept': 'application/json'}
+            ) as session:
+                async def fetch_batch(batch: list[str]) -> None:
+                    nonlocal last_error
+                    status: Optional[int] = None
+                    async with sem:
+                        for attempt in range(
+                                1, self._NN_MAX_RETRIES + 1):
+                            if not self._nn_budget_left(
+                                    budget, attempt > 1):
+                                last_error = (
+                                    last_error or "Node Normalizer "
+                                    "retry/time budget exhausted")
+                                failed.extend(batch)
+                                return
+                            try:
+                                async with session.post(
+                                    f"{self.api_base_url}"
+                                    "/get_normalized_nodes",
+                                    json={"curies": batch},
+                                    timeout=aiohttp.ClientTimeout(
+                                        total=self._NN_REQUEST_TIMEOUT),
+                                ) as resp:
+                                    resp.raise_for_status()
+                                    results.update(await resp.json())
+                                    return
+                            except (aiohttp.ClientError,
+                                    asyncio.TimeoutError) as e:
+                                last_error = str(e) or repr(e)
+                                status = getattr(e, "status", None)
+                                if (attempt == self._NN_MAX_RETRIES
+                                        or not self._is_retryable_nn_error(
+                                            status)):
+                                    break
+                                await asyncio.sleep(
+                                    self._NN_RETRY_WAIT
+                                    * 2 ** (attempt - 1))
+                    # Out of attempts: split outside the semaphore
+                    # so the halves can take its slots.
+                    halves: list[list[str]] = []
+                    self._fail_nn_batch(batch, status, halves, failed)
+                    await asyncio.gather(
+                        *(fetch_batch(half) for half in halves))
+
+                await asyncio.gather(
+                    *(fetch_batch(batch) for batch in batches))
+
+            return results, failed, last_error
+
+        return asyncio.run(_run())
 
     # ---- Name Resolver config ----
     _NR_BATCH_SIZE = 50       # names per /bulk-lookup request
@@ -1006,13 +1503,31 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
         """Resolve names to CURIEs via Name Resolver /bulk-lookup.
 
         Auto-batches the input list. Dispatches to sync or
-        async based on self._use_async.
+        async based on self._use_async. Names found in the
+        persistent cache are not sent; answers from batches
+        that succeeded are added to it.
         """
         if not names:
             return {}
+        results: dict[str, str | None] = {}
+        if self._persistent_cache is not None:
+            results = self._persistent_cache.get_many(
+                self._nr_cache_namespace, names)
+            names = [n for n in names if n not in results]
+            if not names:
+                return results
         if self._use_async:
-            return self._call_name_resolver_api_async(names)
-        return self._call_name_resolver_api_sync(names)
+            results.update(self._call_name_resolver_api_async(names))
+        else:
+            results.update(self._call_name_resolver_api_sync(names))
+        return results
+
+    def _cache_name_resolver_results(
+            self, batch_curies: dict[str, str | None]) -> None:
+        """Persist the answers of one successful /bulk-lookup batch."""
+        if self._persistent_cache is not None:
+            self._persistent_cache.put_many(
+                self._nr_cache_namespace, batch_curies)
 
     def _call_name_resolver_api_sync(
             self, names: List[str]) -> dict:
@@ -1048,6 +1563,7 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
                     batch_curies = self._extract_curies(
                         batch, data)
                     results.update(batch_curies)
+                    self._cache_name_resolver_results(batch_curies)
                     resolved = sum(
                         1 for v in batch_curies.values() if v)
                     self.logger.info(
@@ -1126,6 +1642,9 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
         async def _run() -> dict[str, str | None]:
             sem = asyncio.Semaphore(self._NR_MAX_CONCURRENT)
             results: dict[str, str | None] = {}
+            # Persisted after the gather, to keep SQLite writes
+            # out of the event loop
+            succeeded: dict[str, str | None] = {}
             failed_batches = 0
             completed_batches = 0
             total_resolved = 0
@@ -1173,6 +1692,7 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
                                     completed_batches += 1
                                     total_resolved += resolved
                                     total_null += nulls
+                                    succeeded.update(batch_curies)
                                     self.logger.info(
                                         "batch %d/%d: "
                                         "resolved %d/%d  "
@@ -1218,6 +1738,7 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
 
             for batch_result in batch_results:
                 results.update(batch_result)
+            self._cache_name_resolver_results(succeeded)
 
             if failed_batches > 0:
                 failed_names = failed_batches * batch_size
@@ -1237,7 +1758,12 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
         return asyncio.run(_run())
 
     def get_cache_stats(self) -> dict:
-        """Return cache performance statistics for debugging."""
+        """Return cache performance statistics for debugging.
+
+        The top-level counts are for this instance's in-memory
+        cache; "persistent_cache" holds the process-wide counts
+        (and size) of the shared NormalizerCache.
+        """
         total = self._cache_hits + self._cache_misses
         hit_rate = (
             (self._cache_hits / total * 100)
@@ -1246,7 +1772,10 @@ class NodeSynonymizer:  # pylint: disable=too-many-instance-attributes
             "cache_hits": self._cache_hits,
             "cache_misses": self._cache_misses,
             "hit_rate_pct": round(hit_rate, 1),
-            "cached_curies": len(self._normalizer_cache)
+            "cached_curies": len(self._normalizer_cache),
+            "persistent_cache": (
+                self._persistent_cache.get_stats()
+                if self._persistent_cache is not None else None)
         }
 
     @staticmethod
@@ -20,9 +20,9 @@ import requests_cache
 from flask import Flask,redirect
 import copy
 import multiprocessing
+import threading
 from importlib import metadata
 
-import boto3
 import timeit
 import uuid
 import shutil
@@ -48,6 +48,8 @@ from ARAX_attribute_parser import ARAXAttributeParser
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../../UI/OpenAPI/python-flask-server/")
 from openapi_server.models.response import Response as Envelope
 
+from response_store import ResponseStore, S3ResponseStoreBackend, LocalObjectCache, get_response_key
+
 # only certain versions of TRAPI can be validated; place default in position [0]
 valid_trapi_versions = ['1.6.0', '1.5.0']
 biolink_version = '4.4.2'
@@ -57,6 +59,20 @@ try:
 except metadata.PackageNotFoundError:
     validator_version = ""
 
+#### The S3 buckets that responses are stored in (which one new responses go to depends on S3BucketMigrationDatetime)
+s3_buckets = {
+    'old': { 'region_name': 'us-west-2', 'bucket_name': 'arax-response-storage' },
+    'new': { 'region_name': 'us-east-1', 'bucket_name': 'arax-response-storage-2' }
+}
+
+#### Local disk cache of the responses fetched from (and written to) S3, which are immutable once written
+response_store_cache_dir = os.path.dirname(os.path.abspath(__file__)) + '/../../../data/response_store_cache'
+response_store_cache_max_bytes = 10 << 30
+
+#### The ResponseStore is shared by all ResponseCache objects of a process (see get_response_store())
+_response_store = None
+_response_store_lock = threading.Lock()
+
 component_cache_dir = os.path.dirname(os.path.abspath(__file__))+"/json_cache"
 if os.path.exists(component_cache_dir):
     shutil.rmtree(component_cache_dir)
@@ -64,6 +80,17 @@ if not os.path.exists(component_cache_dir):
     os.mkdir(component_cache_dir)
 
 
+def get_response_store():
+    global _response_store
+    with _response_store_lock:
+        if _response_store is None:
+            rtx_config = RTXConfiguration()
+            backend = S3ResponseStoreBackend({ bucket['bucket_name']: bucket['region_name'] for bucket in s3_buckets.values() },
+                rtx_config.config_secrets['s3']['access'], rtx_config.config_secrets['s3']['secret'])
+            _response_store = ResponseStore(backend, LocalObjectCache(response_store_cache_dir, response_store_cache_max_bytes))
+        return _response_store
+
+
 def validate_envelope(process_params):
     validator = process_params['validator']
     envelope = process_params['envelope']
@@ -247,9 +274,7 @@ class ResponseCache:
         envelope.id = f"https://{servername}/api/arax/v1.4/response/{response_id}"
 
         #### New system to store the responses in an S3 bucket
-        rtx_config = RTXConfiguration()
-        KEY_ID = rtx_config.config_secrets['s3']['access']
-        ACCESS_KEY = rtx_config.config_secrets['s3']['secret']
+        response_store = get_response_store()
         succeeded_to_s3 = False
 
         #### Get information needed to decide which bucket to write to
@@ -259,10 +284,7 @@ class ResponseCache:
         if DEBUG:
             print(f"DEBUG: Datetime now is: {datetime_now}")
             print(f"DEBUG: Cutover date is: {s3_bucket_migration_datetime}")
-        buckets = {
-            'old': { 'region_name': 'us-west-2', 'bucket_name': 'arax-response-storage' },
-            'new': { 'region_name': 'us-east-1', 'bucket_name': 'arax-response-storage-2' }
-        }
+        buckets = s3_buckets
 
         if s3_bucket_migration_datetime:  # Only save the response in S3 if we know which bucket to use
 
@@ -278,24 +300,32 @@ class ResponseCache:
                     print(f"DEBUG: Since we're before the cutover date, use {bucket_tag} " +
                         f"{buckets[bucket_tag]['region_name']} S3 bucket {buckets[bucket_tag]['bucket_name']}")
 
-            serialized_response = json.dumps(envelope.to_dict(), sort_keys=True, indent=2)
+            envelope_dict = envelope.to_dict()
+
+            #### The response is stored zstd-compressed (with the shared dictionary, if one has been trained) and its KG content-addressed
+            dictionary_id = bucket_config.get('ResponseStoreZstdDictionaryId')
+            dictionary_id = int(dictionary_id) if dictionary_id else None
 
             try:
                 region_name = buckets[bucket_tag]['region_name']
                 bucket_name = buckets[bucket_tag]['bucket_name']
+                response_filename = get_response_key(response_id)
                 eprint(f"INFO: Attempting to write to S3 bucket {region_name}:{bucket_name}:{response_filename}")
 
                 t0 = timeit.default_timer()
-                s3 = boto3.resource('s3', region_name=region_name, aws_access_key_id=KEY_ID, aws_secret_access_key=ACCESS_KEY)
-                s3.Object(bucket_name, response_filename).put(Body=serialized_response)
+                n_bytes = response_store.put_response(bucket_name, response_id, envelope_dict, dictionary_id=dictionary_id)
                 t1 = timeit.default_timer()
 
-                response.info(f"Successfully wrote {response_filename} to {region_name} S3 bucket {bucket_name} in {t1-t0} seconds")
+                response.info(f"Successfully wrote {response_filename} ({n_bytes} bytes) to {region_name} S3 bucket {bucket_name} in {t1-t0} seconds")
                 succeeded_to_s3 = True
 
             except:
                 response.error(f"Unable to write response {response_filename} to {region_name} S3 bucket {bucket_name}", error_code="InternalError")
 
+            #### Remember where the current storage format starts, so that older responses are read in the legacy format first
+            if succeeded_to_s3 and 'ResponseStoreFirstResponseId' not in bucket_config:
+                self.set_config(f"ResponseStoreFirstResponseId={response_id}")
+
 
             #### if the S3 write failed, store it as a JSON file on the filesystem
             if not succeeded_to_s3:
@@ -311,7 +341,7 @@ class ResponseCache:
                     response_path = f"{response_dir}/{response_filename}"
                     try:
                         with open(response_path, 'w') as outfile:
-                            json.dump(serialized_response, outfile, sort_keys=True, indent=2)
+                            json.dump(envelope_dict, outfile, sort_keys=True, indent=2)
                     except:
                         eprint(f"ERROR: Unable to write response to file {response_path}")
         else:
@@ -352,11 +382,9 @@ class ResponseCache:
                 except:
                     pass
 
-                #### If the file wasn't local, try it in S3
+                #### If the file wasn't local, try it in S3 (through the local response store cache)
                 if not found_response_locally:
-                    rtx_config = RTXConfiguration()
-                    KEY_ID = rtx_config.config_secrets['s3']['access']
-                    ACCESS_KEY = rtx_config.config_secrets['s3']['secret']
+                    response_store = get_response_store()
 
                     #### Get information needed to decide which bucket to look in
                     bucket_config = self.get_configs()
@@ -364,10 +392,14 @@ class ResponseCache:
                     if DEBUG:
                         print(f"DEBUG: Datetime now is: {datetime_now}")
                         print(f"DEBUG: Cutover date is: {bucket_config['S3BucketMigrationDatetime']}")
-                    buckets = {
-                        'old': { 'region_name': 'us-west-2', 'bucket_name': 'arax-response-storage' },
-                        'new': { 'region_name': 'us-east-1', 'bucket_name': 'arax-response-storage-2' }
-                    }
+                    buckets = s3_buckets
+
+                    #### Responses from before the first one in the current storage format are only in the legacy format
+                    first_response_id = bucket_config.get('ResponseStoreFirstResponseId')
+                    try:
+                        legacy_first = first_response_id is None or int(response_id) < int(first_response_id)
+                    except ValueError:
+                        legacy_first = False
 
                     for attempt in  [ 'expected_bucket', 'other_bucket' ]:
 
@@ -395,14 +427,12 @@ class ResponseCache:
                         try:
                             region_name = buckets[bucket_tag]['region_name']
                             bucket_name = buckets[bucket_tag]['bucket_name']
-                            s3 = boto3.resource('s3', region_name=region_name, aws_access_key_id=KEY_ID, aws_secret_access_key=ACCESS_KEY)
 
-                            response_filename = f"/responses/{response_id}.json"
+                            response_filename = get_response_key(response_id)
                             eprint(f"INFO: Attempting to read {region_name}:{bucket_name}:{response_filename} from S3")
                             t0 = timeit.default_timer()
 
-                            content = s3.Object(bucket_name, response_filename).get()["Body"].read()
-                            envelope = json.loads(content)
+                            envelope = response_store.get_response(bucket_name, response_id, legacy_first=legacy_first)
                             t1 = timeit.default_timer()
                             eprint(f"INFO: Successfully read {response_filename} from {region_name} S3 bucket {bucket_name} in {t1-t0} seconds")
                             break
@@ -925,6 +955,31 @@ class ResponseCache:
 
 
 
+    ##################################################################################################
+    #### Train a zstd dictionary on the most recent responses, which new responses are then compressed with in S3
+    def train_response_store_dictionary(self, n_responses):
+
+        session = self.session
+        response_store = get_response_store()
+
+        sample_envelopes = []
+        for stored_response in session.query(Response).order_by(desc(Response.response_id)).limit(n_responses):
+            for bucket in s3_buckets.values():
+                try:
+                    sample_envelopes.append(response_store.get_response(bucket['bucket_name'], stored_response.response_id))
+                    break
+                except KeyError:
+                    pass
+        if len(sample_envelopes) == 0:
+            eprint(f"ERROR: Unable to find any responses to train a zstd dictionary on")
+            return
+
+        eprint(f"INFO: Training a zstd dictionary on {len(sample_envelopes)} responses")
+        dictionary_id = response_store.train_dictionary([ bucket['bucket_name'] for bucket in s3_buckets.values() ], sample_envelopes)
+        self.set_config(f"ResponseStoreZstdDictionaryId={dictionary_id}")
+        return dictionary_id
+
+
     ##################################################################################################
     #### Fetch the configs stored in the MySQL server
     def get_configs(self):
@@ -999,6 +1054,7 @@ def main():
     argparser.add_argument('--show_config', action='count', help='Show all the database config settings')
     argparser.add_argument('--set_config', action='store', help='Specify a key and value to insert or update with format key=value')
     argparser.add_argument('--response_id', action='store', help='Id of a response to display')
+    argparser.add_argument('--train_zstd_dictionary', action='store', type=int, help='Train the zstd dictionary that new responses are compressed with in S3 on this many of the most recent responses')
     params = argparser.parse_args()
 
     #### Create a new ResponseStore object
@@ -1022,6 +1078,12 @@ def main():
         #print(json.dumps(envelope, sort_keys=True, indent=2))
         return
 
+    if params.train_zstd_dictionary is not None:
+        print(f"Training a zstd dictionary on the last {params.train_zstd_dictionary} responses")
+        dictionary_id = response_cache.train_response_store_dictionary(params.train_zstd_dictionary)
+        print(f"INFO: New responses will be compressed with zstd dictionary {dictionary_id}")
+        return
+
     if params.set_config is not None:
         print(f"Setting ResponseCacheConfigSetting {params.set_config}")
         response_cache.set_config(params.set_config)
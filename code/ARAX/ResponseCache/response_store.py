@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+"""
+Storage of ARAX responses in S3 (or a stand-in for it) for ResponseCache.
+
+- A response is stored as zstd-compressed JSON at `/responses/<response_id>.json.zst`, with its knowledge graph taken
+  out and stored content-addressed at `/knowledge_graphs/<sha256 of the KG JSON>.json.zst`, so that identical
+  knowledge graphs (e.g., of the same query run again) are only stored once.
+- Responses stored before this (plain JSON at `/responses/<response_id>.json`) are still read; ResponseCache records
+  the first response ID stored in the current format (as ResponseStoreFirstResponseId), so that the legacy key is
+  tried first for older responses.
+- New objects can be compressed with a shared zstd dictionary (trained on stored responses with train_dictionary()),
+  which is stored in the bucket at `/zstd_dictionaries/<dict_id>.bin`; the dictionary ID is in each zstd frame.
+- All objects are immutable once written, so a local LRU disk cache (LocalObjectCache) sits in front of the remote
+  store: reads go through it, and newly written responses are put in it, too.
+- The remote store is a ResponseStoreBackend: S3ResponseStoreBackend for S3 (one boto3 client per region, created
+  once per process) or FilesystemResponseStoreBackend, which keeps the buckets in a local directory (for testing and
+  for running without S3).
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from typing import Iterable, Optional
+
+import boto3
+import zstandard
+from botocore.exceptions import ClientError
+
+def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
+
+zstd_compression_level = 3
+zstd_dictionary_size = 112640
+zstd_frame_header_max_bytes = 18
+dictionary_sample_max_bytes = 1 << 20  # (only this much of each stored object is used to train a dictionary)
+stored_response_format_name = "arax-response"
+stored_response_format_version = 1
+default_cache_max_bytes = 10 << 30
+cache_eviction_target_fraction = 0.9  # (when the cache is full, it's evicted down to this fraction of its maximum)
+
+
+def get_response_key(response_id) -> str:
+    return f"/responses/{response_id}.json.zst"
+
+
+def get_legacy_response_key(response_id) -> str:
+    return f"/responses/{response_id}.json"
+
+
+def get_knowledge_graph_key(knowledge_graph_sha256: str) -> str:
+    return f"/knowledge_graphs/{knowledge_graph_sha256}.json.zst"
+
+
+def get_dictionary_key(dictionary_id: int) -> str:
+    return f"/zstd_dictionaries/{dictionary_id}.bin"
+
+
+class ResponseStoreBackend:
+    """
+    Base class for the remote stores of response objects (S3 and its stand-ins)
+    """
+
+    def get_object(self, bucket_name: str, key: str) -> bytes:
+        """Returns the content of an object; raises KeyError if there is no such object."""
+        raise NotImplementedError
+
+    def put_object(self, bucket_name: str, key: str, body: bytes):
+        raise NotImplementedError
+
+    def has_object(self, bucket_name: str, key: str) -> bool:
+        raise NotImplementedError
+
+
+class S3ResponseStoreBackend(ResponseStoreBackend):
+    """
+    Response objects in S3 buckets. The boto3 client of each region is created once (per process, since clients
+    can't be shared across a fork) instead of for every request.
+    """
+
+    def __init__(self, bucket_regions: dict[str, str], aws_access_key_id: str, aws_secret_access_key: str):
+        self.bucket_regions = bucket_regions
+        self.aws_access_key_id = aws_access_key_id
+        self.aws_secret_access_key = aws_secret_access_key
+        self._clients = dict()
+        self._clients_pid = None
+        self._clients_lock = threading.Lock()
+
+    def _get_client(self, bucket_name: str):
+        region_name = self.bucket_regions[bucket_name]
+        with self._clients_lock:
+            if self._clients_pid != os.getpid():
+                self._clients = dict()
+                self._clients_pid = os.getpid()
+            if region_name not in self._clients:
+                self._clients[region_name] = boto3.session.Session().client(
+                    's3', region_name=region_name, aws_access_key_id=self.aws_access_key_id,
+                    aws_secret_access_key=self.aws_secret_access_key)
+            return self._clients[region_name]
+
+    def get_object(self, bucket_name: str, key: str) -> bytes:
+        try:
+            return self._get_client(bucket_name).get_object(Bucket=bucket_name, Key=key)["Body"].read()
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise KeyError(key) from error
+            raise
+
+    def put_object(self, bucket_name: str, key: str, body: bytes):
+        self._get_client(bucket_name).put_object(Bucket=bucket_name, Key=key, Body=body)
+
+    def has_object(self, bucket_name: str, key: str) -> bool:
+        try:
+            self._get_client(bucket_name).head_object(Bucket=bucket_name, Key=key)
+            return True
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return False
+            raise
+
+
+class FilesystemResponseStoreBackend(ResponseStoreBackend):
+    """
+    A stand-in for S3 that keeps each bucket in a subdirectory of a local directory (with the same object keys)
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def _get_path(self, bucket_name: str, key: str) -> str:
+        return os.path.join(self.root_dir, bucket_name, key.lstrip("/"))
+
+    def get_object(self, bucket_name: str, key: str) -> bytes:
+        try:
+            with open(self._get_path(bucket_name, key), "rb") as infile:
+                return infile.read()
+        except FileNotFoundError as error:
+            raise KeyError(key) from error
+
+    def put_object(self, bucket_name: str, key: str, body: bytes):
+        _write_file_atomically(self._get_path(bucket_name, key), body)
+
+    def has_object(self, bucket_name: str, key: str) -> bool:
+        return os.path.exists(self._get_path(bucket_name, key))
+
+
+class LocalObjectCache:
+    """
+    A local disk cache of (immutable) remote objects, which evicts the least recently used objects once it holds more
+    than max_bytes. Several processes can share the same cache directory.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = default_cache_max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # (found by scanning the cache directory when first needed)
+        self._lock = threading.Lock()
+
+    def _get_path(self, bucket_name: str, key: str) -> str:
+        digest = hashlib.sha256(f"{bucket_name}{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def get(self, bucket_name: str, key: str) -> Optional[bytes]:
+        path = self._get_path(bucket_name, key)
+        try:
+            with open(path, "rb") as infile:
+                body = infile.read()
+            os.utime(path)  # (the modification time is when it was last used)
+        except FileNotFoundError:
+            return None
+        return body
+
+    def has(self, bucket_name: str, key: str) -> bool:
+        # (only checks that it's cached, so neither reads it nor counts as a use of it)
+        return os.path.exists(self._get_path(bucket_name, key))
+
+    def put(self, bucket_name: str, key: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        try:
+            _write_file_atomically(self._get_path(bucket_name, key), body)
+        except OSError as error:
+            eprint(f"WARNING: Unable to write {key} to the local response cache: {error}")
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._list_files())
+            else:
+                self._total_bytes += len(body)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _list_files(self) -> list[tuple[float, str, int]]:
+        files = []
+        if not os.path.isdir(self.cache_dir):
+            return files
+        for subdir in os.scandir(self.cache_dir):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # (evicted by another process meanwhile)
+                    continue
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def _evict(self):
+        files = sorted(self._list_files())
+        total_bytes = sum(size for _, _, size in files)
+        target_bytes = self.max_bytes * cache_eviction_target_fraction
+        for _, path, size in files:
+            if total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        self._total_bytes = total_bytes
+
+
+class ResponseStore:
+    """
+    Stores and fetches responses (as dicts) through a ResponseStoreBackend, with a local read-through cache
+    """
+
+    def __init__(self, backend: ResponseStoreBackend, cache: Optional[LocalObjectCache] = None):
+        self.backend = backend
+        self.cache = cache
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = dict()
+
+    def _get_object(self, bucket_name: str, key: str) -> bytes:
+        if self.cache is not None:
+            body = self.cache.get(bucket_name, key)
+            if body is not None:
+                return body
+        body = self.backend.get_object(bucket_name, key)
+        if self.cache is not None:
+            self.cache.put(bucket_name, key, body)
+        return body
+
+    def _put_object(self, bucket_name: str, key: str, body: bytes):
+        self.backend.put_object(bucket_name, key, body)
+        if self.cache is not None:
+            self.cache.put(bucket_name, key, body)
+
+    def _get_dictionary(self, bucket_name: str, dictionary_id: int) -> zstandard.ZstdCompressionDict:
+        if dictionary_id not in self._dictionaries:
+            dictionary = zstandard.ZstdCompressionDict(self._get_object(bucket_name, get_dictionary_key(dictionary_id)))
+            self._dictionaries[dictionary_id] = dictionary
+        return self._dictionaries[dictionary_id]
+
+    def _compress(self, payload: bytes, dictionary: Optional[zstandard.ZstdCompressionDict]) -> bytes:
+        return zstandard.ZstdCompressor(level=zstd_compression_level, dict_data=dictionary).compress(payload)
+
+    def _decompress(self, bucket_name: str, body: bytes) -> bytes:
+        dictionary_id = zstandard.get_frame_parameters(body[:zstd_frame_header_max_bytes]).dict_id
+        dictionary = self._get_dictionary(bucket_name, dictionary_id) if dictionary_id else None
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompressobj().decompress(body)
+
+    def put_response(self, bucket_name: str, response_id, envelope: dict, dictionary_id: Optional[int] = None) -> int:
+        """
+        Stores a response (the dict of its envelope), compressed with the given zstd dictionary (if any); its knowledge
+        graph is only uploaded if an identical one isn't stored already. Returns the number of (compressed) bytes
+        uploaded.
+        """
+        dictionary = None
+        if dictionary_id:
+            try:
+                dictionary = self._get_dictionary(bucket_name, dictionary_id)
+            except KeyError:
+                eprint(f"WARNING: zstd dictionary {dictionary_id} is not in bucket {bucket_name}; not using it")
+        stored_response, knowledge_graph_payload = _split_response(envelope)
+        n_bytes = 0
+        if knowledge_graph_payload is not None:
+            knowledge_graph_key = get_knowledge_graph_key(stored_response["knowledge_graph_sha256"])
+            if not self._has_object(bucket_name, knowledge_graph_key):
+                body = self._compress(knowledge_graph_payload, dictionary)
+                self._put_object(bucket_name, knowledge_graph_key, body)
+                n_bytes += len(body)
+        body = self._compress(_dump_json(stored_response), dictionary)
+        self._put_object(bucket_name, get_response_key(response_id), body)
+        return n_bytes + len(body)
+
+    def _has_object(self, bucket_name: str, key: str) -> bool:
+        if self.cache is not None and self.cache.has(bucket_name, key):
+            return True
+        return self.backend.has_object(bucket_name, key)
+
+    def get_response(self, bucket_name: str, response_id, legacy_first: bool = False) -> dict:
+        """
+        Returns the dict of a stored response envelope (in either the current or the legacy plain JSON format); raises
+        KeyError if the bucket doesn't have it. The current format is looked for first, unless legacy_first is set
+        (for responses that were probably stored before the current format, to save a remote lookup of it).
+        """
+        if legacy_first:
+            try:
+                return json.loads(self._get_object(bucket_name, get_legacy_response_key(response_id)))
+            except KeyError:
+                pass
+            body = self._get_object(bucket_name, get_response_key(response_id))
+        else:
+            try:
+                body = self._get_object(bucket_name, get_response_key(response_id))
+            except KeyError:
+                return json.loads(self._get_object(bucket_name, get_legacy_response_key(response_id)))
+        stored_response = json.loads(self._decompress(bucket_name, body))
+        if not isinstance(stored_response, dict) or stored_response.get("format") != stored_response_format_name:
+            raise ValueError(f"Response {response_id} is not a stored ARAX response")
+        if stored_response.get("version") != stored_response_format_version:
+            raise ValueError(f"Unsupported stored ARAX response version {stored_response.get('version')}")
+        envelope = stored_response["envelope"]
+        if stored_response["knowledge_graph_sha256"] is not None:
+            knowledge_graph_key = get_knowledge_graph_key(stored_response["knowledge_graph_sha256"])
+            envelope["message"]["knowledge_graph"] = json.loads(
+                self._decompress(bucket_name, self._get_object(bucket_name, knowledge_graph_key)))
+        return envelope
+
+    def train_dictionary(self, bucket_names: Iterable[str], sample_envelopes: Iterable[dict],
+                         dict_size: int = zstd_dictionary_size) -> int:
+        """
+        Trains a zstd dictionary on (the stored objects of) some representative responses and uploads it to each of
+        the given buckets. Returns the ID of the dictionary, which put_response() needs to be told to use it.
+        """
+        samples = []
+        for envelope in sample_envelopes:
+            stored_response, knowledge_graph_payload = _split_response(envelope)
+            samples.append(_dump_json(stored_response)[:dictionary_sample_max_bytes])
+            if knowledge_graph_payload is not None:
+                samples.append(knowledge_graph_payload[:dictionary_sample_max_bytes])
+        dictionary = zstandard.train_dictionary(dict_size, samples)
+        for bucket_name in bucket_names:
+            self._put_object(bucket_name, get_dictionary_key(dictionary.dict_id()), dictionary.as_bytes())
+        self._dictionaries[dictionary.dict_id()] = dictionary
+        return dictionary.dict_id()
+
+
+def _dump_json(content) -> bytes:
+    return json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _split_response(envelope: dict) -> tuple[dict, Optional[bytes]]:
+    """
+    Returns the stored form of a response envelope (without its knowledge graph, which is referred to by its SHA-256)
+    and the JSON of its knowledge graph (None if it has none, in which case the envelope is stored as is)
+    """
+    message = envelope.get("message")
+    knowledge_graph = message.get("knowledge_graph") if isinstance(message, dict) else None
+    if not isinstance(knowledge_graph, dict):
+        return {"format": stored_response_format_name, "version": stored_response_format_version,
+                "knowledge_graph_sha256": None, "envelope": envelope}, None
+    knowledge_graph_payload = _dump_json(knowledge_graph)
+    envelope = dict(envelope, message=dict(message, knowledge_graph=None))
+    return {"format": stored_response_format_name, "version": stored_response_format_version,
+            "knowledge_graph_sha256": hashlib.sha256(knowledge_graph_payload).hexdigest(),
+            "envelope": envelope}, knowledge_graph_payload
+
+
+def _write_file_atomically(path: str, body: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_descriptor, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(file_descriptor, "wb") as outfile:
+            outfile.write(body)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Benchmark of holding a large KG in a QGOrganizedKnowledgeGraph as TRAPI models (Node/Edge) vs. as the
+# compact records that Expand uses (see ARAXQuery/Expand/compact_kg.py). Builds a synthetic KG2-like
+# answer KG from TRAPI dicts with each representation and reports its (Python heap) memory footprint,
+# the time to build it, the time for a typical Expand pass over it (knowledge source constraints +
+# orphan check), the time to convert it to the TRAPI KG at the end of Expand, and, end to end (build,
+# Expand pass, and conversion), the wall time and the peak RSS. Each representation is run in its own
+# process, so that the peak RSS of one is not that of the other.
+#
+# Usage: python benchmark_compact_kg.py [--edges 1000000] [--edges_per_node 5]
+
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery")
+import Expand.expand_utilities as eu  # noqa: E402
+from Expand.compact_kg import CompactEdge, CompactNode  # noqa: E402
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../UI/OpenAPI/python-flask-server/")
+from openapi_server.models.edge import Edge  # noqa: E402
+from openapi_server.models.node import Node  # noqa: E402
+
+PRIMARY_SOURCES = ["infores:semmeddb", "infores:drugcentral", "infores:chembl", "infores:ctd"]
+
+
+def iter_synthetic_kg(n_edges: int, edges_per_node: int):
+    """Yields ('node'|'edge', key, TRAPI dict) for a one-hop KG with n_edges edges, built as a KP would send it."""
+    n_nodes = max(n_edges // edges_per_node, 1)
+    yield 'node', "CHEBI:15365", {"name": "aspirin", "categories": ["biolink:SmallMolecule"], "attributes": []}
+    for i in range(n_nodes):
+        yield 'node', f"MONDO:{i:07d}", {"name": f"disease {i}",
+                                         "categories": ["biolink:Disease"],
+                                         "attributes": [{"attribute_type_id": "biolink:xref",
+                                                         "value": [f"DOID:{i}", f"UMLS:C{i:07d}"]}]}
+    for i in range(n_edges):
+        primary_source = PRIMARY_SOURCES[i % len(PRIMARY_SOURCES)]
+        yield 'edge', f"infores:rtx-kg2:{i}", {
+            "subject": "CHEBI:15365",
+            "object": f"MONDO:{i % n_nodes:07d}",
+            "predicate": "biolink:treats_or_applied_or_studied_to_treat",
+            "sources": [{"resource_id": primary_source, "resource_role": "primary_knowledge_source"},
+                        {"resource_id": "infores:rtx-kg2", "resource_role": "aggregator_knowledge_source",
+                         "upstream_resource_ids": [primary_source]}],
+            "qualifiers": [{"qualifier_type_id": "biolink:object_aspect_qualifier", "qualifier_value": "activity"}],
+            "attributes": [{"attribute_type_id": "biolink:publications", "value": [f"PMID:{i}", f"PMID:{i + 7}"],
+                            "value_type_id": "linkml:Uriorcurie"},
+                           {"attribute_type_id": "biolink:knowledge_level", "value": "not_provided"},
+                           {"attribute_type_id": "biolink:agent_type", "value": "text_mining_agent"}]}
+
+
+def build_kg(node_class, edge_class, n_edges: int, edges_per_node: int) -> eu.QGOrganizedKnowledgeGraph:
+    kg = eu.QGOrganizedKnowledgeGraph()
+    for item_type, key, item_dict in iter_synthetic_kg(n_edges, edges_per_node):
+        if item_type == 'node':
+            kg.add_node(key, node_class.from_dict(item_dict), "n00" if key.startswith("CHEBI") else "n01")
+        else:
+            kg.add_edge(key, edge_class.from_dict(item_dict), "e00")
+    return kg
+
+
+def traverse_kg(kg: eu.QGOrganizedKnowledgeGraph) -> int:
+    # What Expand does to every edge: knowledge source constraints, then an orphan check
+    denylist = {"infores:ctd"}
+    n_kept = 0
+    for edges in kg.edges_by_qg_id.values():
+        for edge in edges.values():
+            edge_sources = {retrieval_source.resource_id for retrieval_source in edge.sources}
+            if not edge_sources.issubset(denylist) and eu.get_primary_knowledge_source(edge):
+                n_kept += 1
+    n_kept += len(kg.get_all_node_keys_used_by_edges())
+    return n_kept
+
+
+REPRESENTATIONS = {"TRAPI models": (Node, Edge), "compact records": (CompactNode, CompactEdge)}
+
+
+def run_representation(representation_name: str, n_edges: int, edges_per_node: int) -> dict:
+    node_class, edge_class = REPRESENTATIONS[representation_name]
+    # The timed (and RSS-measured) run comes first, since tracing memory slows things down and uses memory itself
+    start_time = time.time()
+    kg = build_kg(node_class, edge_class, n_edges, edges_per_node)
+    build_seconds = time.time() - start_time
+
+    start_time = time.time()
+    traverse_kg(kg)
+    traverse_seconds = time.time() - start_time
+
+    start_time = time.time()
+    standard_kg = eu.convert_qg_organized_kg_to_standard_kg(kg)
+    convert_seconds = time.time() - start_time
+    peak_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    del kg, standard_kg
+    gc.collect()
+
+    tracemalloc.start()
+    kg = build_kg(node_class, edge_class, n_edges, edges_per_node)
+    kg_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"kg_bytes": kg_bytes, "build_seconds": build_seconds, "traverse_seconds": traverse_seconds,
+            "convert_seconds": convert_seconds, "peak_rss_bytes": peak_rss_bytes}
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmark TRAPI models vs. compact records in a large QGOrganizedKnowledgeGraph')
+    argparser.add_argument('--edges', type=int, default=1000000, help='Number of edges in the synthetic KG')
+    argparser.add_argument('--edges_per_node', type=int, default=5, help='Average number of edges per (non-pinned) node')
+    argparser.add_argument('--representation', choices=list(REPRESENTATIONS), help=argparse.SUPPRESS)  # (for a child process)
+    params = argparser.parse_args()
+
+    if params.representation:
+        print(json.dumps(run_representation(params.representation, params.edges, params.edges_per_node)))
+        return
+
+    rows = []
+    for representation_name in REPRESENTATIONS:
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--representation', representation_name,
+                                '--edges', str(params.edges), '--edges_per_node', str(params.edges_per_node)],
+                               check=True, capture_output=True, text=True)
+        stats = json.loads(child.stdout.splitlines()[-1])
+        rows.append([representation_name,
+                     f"{stats['kg_bytes'] / 1024 / 1024:.1f}",
+                     f"{stats['build_seconds']:.2f}",
+                     f"{stats['traverse_seconds']:.2f}",
+                     f"{stats['convert_seconds']:.2f}",
+                     f"{stats['build_seconds'] + stats['traverse_seconds'] + stats['convert_seconds']:.2f}",
+                     f"{stats['peak_rss_bytes'] / 1024 / 1024:.1f}"])
+
+    print(f"Synthetic KG: {params.edges} edges, {max(params.edges // params.edges_per_node, 1) + 1} nodes")
+    print(tabulate(rows, headers=['representation', 'KG heap MiB', 'build s', 'Expand pass s', 'to TRAPI KG s',
+                                  'end-to-end s', 'end-to-end peak RSS MiB']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Benchmark of the KP query cache file formats (see ARAXQuery/Expand/kp_response_codecs.py).
+# Takes real cached KP responses from the KPQueryCacher's response directory, writes each
+# of them with every codec into a scratch directory, and reports the disk footprint and
+# the read+decode latency of each codec.
+#
+# Usage: python benchmark_kp_response_codecs.py [--max_responses 20] [--repeats 3] [--with_dictionary]
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from tabulate import tabulate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery/Expand")
+from trapi_query_cacher import KPQueryCacher  # noqa: E402
+from kp_response_codecs import get_kp_response_codecs  # noqa: E402
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmark the KP query cache file formats on real cached responses')
+    argparser.add_argument('--max_responses', type=int, default=20, help='Number of cached responses to benchmark (largest first)')
+    argparser.add_argument('--repeats', type=int, default=3, help='Number of timed reads per response and codec')
+    argparser.add_argument('--with_dictionary', action='store_true', help='Also benchmark zstd-msgpack with a trained dictionary')
+    params = argparser.parse_args()
+
+    cacher = KPQueryCacher()
+    cache_files = [os.path.join(cacher.cache_dir, f_name) for f_name in os.listdir(cacher.cache_dir)
+                   if not f_name.endswith('.tmp') and not f_name.startswith('zstd_dictionary.')]
+    cache_files = sorted(cache_files, key=os.path.getsize, reverse=True)[:params.max_responses]
+    if not cache_files:
+        print(f"No cached responses found in {cacher.cache_dir}")
+        return
+    responses = [cacher._read_cache_file(cache_file) for cache_file in cache_files]
+    print(f"Benchmarking {len(responses)} cached responses from {cacher.cache_dir}")
+
+    scratch_dir = tempfile.mkdtemp(prefix="kp_response_codecs_")
+    try:
+        codecs = get_kp_response_codecs(scratch_dir)
+        configurations = [(codec_name, codec) for codec_name, codec in codecs.items()]
+        if params.with_dictionary:
+            codec = get_kp_response_codecs(scratch_dir)['zstd-msgpack']
+            payloads = [codec.dumps(response) for response in responses]
+            codec.train_dictionary([payload[i:i + 16384] for payload in payloads
+                                    for i in range(0, min(len(payload), 1024 * 1024), 16384)])
+            configurations.append(('zstd-msgpack + dictionary', codec))
+
+        rows = []
+        for configuration_name, codec in configurations:
+            total_bytes = 0
+            write_times = []
+            read_times = []
+            for i_response, response in enumerate(responses):
+                filepath = os.path.join(scratch_dir, f"{i_response}{codec.file_extension}")
+                start_time = time.time()
+                codec.write_file(filepath, codec.dumps(response))
+                write_times.append(time.time() - start_time)
+                total_bytes += os.path.getsize(filepath)
+
+                for _ in range(params.repeats):
+                    start_time = time.time()
+                    codec.loads(codec.read_file(filepath))
+                    read_times.append(time.time() - start_time)
+                os.unlink(filepath)
+
+            rows.append([configuration_name,
+                         f"{total_bytes / 1024 / 1024:.2f}",
+                         f"{statistics.mean(write_times):.4f}",
+                         f"{statistics.mean(read_times):.4f}",
+                         f"{max(read_times):.4f}"])
+
+        print(tabulate(rows, headers=['codec', 'disk MiB', 'mean write s', 'mean read s', 'max read s']))
+    finally:
+        shutil.rmtree(scratch_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Benchmark of loading KP responses into a QGOrganizedKnowledgeGraph (TRAPIQuerier._load_kp_json_response).
+# For each response it reports the wall time and the peak (Python heap) memory of:
+#   - "full model": converting the whole TRAPI message into OpenAPI model objects up front (what the
+#     loader used to do before building the answer KG), and
+#   - "answer KG": the current single-pass loader, which only converts the KG nodes/edges it keeps.
+# Responses come from JSON files given on the command line (e.g., captured 100MB+ KP responses), from
+# the largest responses in the KPQueryCacher's cache, or are synthesized (--synthetic_edges).
+# Peak memory is measured with tracemalloc in a separate run from the timing, since tracing slows
+# allocation-heavy code down a lot.
+#
+# Usage: python benchmark_kp_response_ingestion.py [response.json ...] [--max_cached_responses 5]
+#                                                 [--synthetic_edges 500000] [--repeats 3]
+
+import argparse
+import copy
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery/Expand")
+from ARAX_response import ARAXResponse  # noqa: E402
+from ARAX_messenger import ARAXMessenger  # noqa: E402
+from trapi_querier import TRAPIQuerier  # noqa: E402
+from trapi_query_cacher import KPQueryCacher  # noqa: E402
+from Expand.kp_selector import KPSelector  # noqa: E402
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../UI/OpenAPI/python-flask-server/")
+from openapi_server.models.query_graph import QueryGraph  # noqa: E402
+
+KP_NAME = "infores:rtx-kg2"
+
+
+def get_synthetic_response(n_edges: int) -> dict:
+    """
+    Builds a one-hop KG2-like response with n_edges edges (about 450 bytes of JSON per edge), a
+    tenth of which are not bound in any result (and so get dropped by the loader).
+    """
+    n_nodes = max(n_edges // 5, 1)
+    nodes = {f"MONDO:{i}": {"name": f"disease {i}", "categories": ["biolink:Disease"],
+                            "attributes": [{"attribute_type_id": "biolink:xref", "value": [f"DOID:{i}", f"UMLS:C{i}"]}]}
+             for i in range(n_nodes)}
+    nodes["CHEBI:15365"] = {"name": "aspirin", "categories": ["biolink:SmallMolecule"], "attributes": []}
+    edges = {}
+    results = []
+    for i in range(n_edges):
+        edge_key = f"kg2:{i}"
+        object_key = f"MONDO:{i % n_nodes}"
+        edges[edge_key] = {"subject": "CHEBI:15365", "object": object_key, "predicate": "biolink:treats",
+                           "sources": [{"resource_id": "infores:semmeddb", "resource_role": "primary_knowledge_source"},
+                                       {"resource_id": KP_NAME, "resource_role": "aggregator_knowledge_source",
+                                        "upstream_resource_ids": ["infores:semmeddb"]}],
+                           "attributes": [{"attribute_type_id": "biolink:publications", "value": [f"PMID:{i}", f"PMID:{i + 1}"]},
+                                          {"attribute_type_id": "biolink:knowledge_level", "value": "not_provided"}]}
+        if i % 10:
+            results.append({"node_bindings": {"n0": [{"id": "CHEBI:15365"}], "n1": [{"id": object_key}]},
+                            "analyses": [{"resource_id": KP_NAME, "edge_bindings": {"e0": [{"id": edge_key}]}}]})
+    query_graph = {"nodes": {"n0": {"ids": ["CHEBI:15365"]}, "n1": {"categories": ["biolink:Disease"]}},
+                   "edges": {"e0": {"subject": "n0", "object": "n1", "predicates": ["biolink:treats"]}}}
+    return {"message": {"query_graph": query_graph,
+                        "knowledge_graph": {"nodes": nodes, "edges": edges},
+                        "results": results}}
+
+
+def load_full_model(response: dict, query_graph: QueryGraph):
+    return ARAXMessenger().from_dict(response["message"])
+
+
+def load_answer_kg(response: dict, query_graph: QueryGraph):
+    querier = TRAPIQuerier(ARAXResponse(), KP_NAME, False, None, kp_selector=KPSelector())
+    return querier._load_kp_json_response(response, query_graph)
+
+
+def measure(loader, response: dict, query_graph: QueryGraph, repeats: int) -> tuple[list[float], int]:
+    wall_times = []
+    for _ in range(repeats):
+        response_copy = copy.deepcopy(response)  # The loader consumes the KG of the response
+        gc.collect()
+        start_time = time.time()
+        result = loader(response_copy, query_graph)
+        wall_times.append(time.time() - start_time)
+        del result, response_copy
+
+    response_copy = copy.deepcopy(response)
+    gc.collect()
+    tracemalloc.start()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+    result = loader(response_copy, query_graph)
+    peak_bytes = tracemalloc.get_traced_memory()[1] - baseline_bytes
+    tracemalloc.stop()
+    del result, response_copy
+    return wall_times, peak_bytes
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmark loading KP responses into an answer KG')
+    argparser.add_argument('response_files', nargs='*', help='JSON files containing TRAPI responses (with message.query_graph)')
+    argparser.add_argument('--max_cached_responses', type=int, default=0, help='Also benchmark this many of the largest KPQueryCacher responses')
+    argparser.add_argument('--synthetic_edges', type=int, default=0, help='Also benchmark a synthetic response with this many edges')
+    argparser.add_argument('--repeats', type=int, default=3, help='Number of timed loads per response and loader')
+    params = argparser.parse_args()
+
+    responses = []
+    for response_file in params.response_files:
+        with open(response_file) as f:
+            responses.append((os.path.basename(response_file), os.path.getsize(response_file), json.load(f)))
+    if params.max_cached_responses:
+        cacher = KPQueryCacher()
+        cache_files = [os.path.join(cacher.cache_dir, f_name) for f_name in os.listdir(cacher.cache_dir)
+                       if not f_name.endswith('.tmp') and not f_name.startswith('zstd_dictionary.')]
+        for cache_file in sorted(cache_files, key=os.path.getsize, reverse=True)[:params.max_cached_responses]:
+            response = cacher._read_cache_file(cache_file)
+            responses.append((os.path.basename(cache_file), len(json.dumps(response)), response))
+    if params.synthetic_edges:
+        response = get_synthetic_response(params.synthetic_edges)
+        responses.append((f"synthetic ({params.synthetic_edges} edges)", len(json.dumps(response)), response))
+    if not responses:
+        argparser.error("No responses to benchmark; give response files, --max_cached_responses, or --synthetic_edges")
+
+    rows = []
+    for response_name, n_bytes, response in responses:
+        query_graph = QueryGraph.from_dict(response["message"]["query_graph"])
+        for loader_name, loader in [("full model", load_full_model), ("answer KG", load_answer_kg)]:
+            wall_times, peak_bytes = measure(loader, response, query_graph, params.repeats)
+            rows.append([response_name,
+                         f"{n_bytes / 1024 / 1024:.1f}",
+                         loader_name,
+                         f"{statistics.mean(wall_times):.2f}",
+                         f"{max(wall_times):.2f}",
+                         f"{peak_bytes / 1024 / 1024:.1f}"])
+
+    print(tabulate(rows, headers=['response', 'JSON MiB', 'loader', 'mean wall s', 'max wall s', 'peak heap MiB']))
+
+
+if __name__ == "__main__":
+    main()
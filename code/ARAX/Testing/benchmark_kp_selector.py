@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Benchmark of KPSelector's KP selection for one-hop QGs (KPSelector.get_kps_for_single_hop_qg): the lookup in the
+# precomputed meta map index (MetaMapIndex) that KPSelector uses vs. the original per-KP check over the cross product
+# of the (Biolink-expanded) subject and object categories. Uses the real KP info cache (the meta map) and Biolink
+# model, and qedge shapes made from the categories and predicates that the ARAX test suite (code/ARAX/test) uses, plus
+# unconstrained qnodes and qedges. Checks that both methods select the same KPs and reports the wall time of each.
+#
+# Usage: python benchmark_kp_selector.py [--shapes 1000] [--seed 42]
+
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from itertools import product
+
+from tabulate import tabulate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery")
+from ARAX_response import ARAXResponse  # noqa: E402
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery/Expand")
+from kp_selector import KPSelector  # noqa: E402
+
+
+def triple_is_in_meta_map_by_product(kp_meta_map: dict, subject_categories: set[str], predicates: set[str],
+                                     object_categories: set[str]) -> bool:
+    """
+    The original KPSelector._triple_is_in_meta_map check, for comparison
+    """
+    predicates_map = kp_meta_map["predicates"]
+    if not subject_categories:
+        subject_categories = set(predicates_map.keys())
+    if not object_categories:
+        object_categories = {obj for obj_dict in predicates_map.values() for obj in obj_dict.keys()}
+    qg_sub_obj_dict = defaultdict(lambda: set())
+    for sub, obj in list(product(subject_categories, object_categories)):
+        qg_sub_obj_dict[sub].add(obj)
+    accepted_subs = set(predicates_map.keys()).intersection(set(qg_sub_obj_dict.keys()))
+    for sub in accepted_subs:
+        accepted_objs = set(predicates_map[sub].keys()).intersection(qg_sub_obj_dict[sub])
+        for obj in accepted_objs:
+            if predicates.intersection(predicates_map[sub][obj]):
+                return True
+    return False
+
+
+def get_test_suite_qedge_shapes(kp_selector: KPSelector, n_shapes: int, seed: int) -> list[tuple[list, list, list]]:
+    """
+    Returns (subject categories, predicates, object categories) of qedges made from the Biolink categories and
+    predicates used in the ARAX test suite (an empty list meaning an unconstrained qnode/qedge)
+    """
+    bh = kp_selector.bh
+    test_suite_text = ""
+    for test_file_path in glob.glob(os.path.dirname(os.path.abspath(__file__)) + "/../test/test_*.py"):
+        with open(test_file_path) as test_file:
+            test_suite_text += test_file.read()
+    all_categories = set(bh.get_descendants([bh.get_root_category()]))
+    all_predicates = set(bh.get_descendants([bh.root_predicate]))
+    categories = sorted(set(re.findall(r"biolink:[A-Z][A-Za-z]+", test_suite_text)) & all_categories)
+    predicates = sorted(set(re.findall(r"biolink:[a-z_]+", test_suite_text)) & all_predicates)
+    shapes = [([subject_category] if subject_category else [], [predicate] if predicate else [],
+               [object_category] if object_category else [])
+              for subject_category, predicate, object_category in product(categories + [None], predicates + [None],
+                                                                          categories + [None])]
+    random.Random(seed).shuffle(shapes)
+    print(f"{len(categories)} categories and {len(predicates)} predicates in the test suite; using "
+          f"{min(n_shapes, len(shapes))} of their {len(shapes)} qedge shapes")
+    return shapes[:n_shapes]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark of KPSelector's KP selection for one-hop QGs")
+    argparser.add_argument('--shapes', type=int, default=1000, help='Number of qedge shapes to select KPs for')
+    argparser.add_argument('--seed', type=int, default=42)
+    args = argparser.parse_args()
+
+    kp_selector = KPSelector(log=ARAXResponse())
+    bh = kp_selector.bh
+    shapes = get_test_suite_qedge_shapes(kp_selector, args.shapes, args.seed)
+    expanded_shapes = [(set(bh.get_descendants(subject_categories)) if subject_categories else set(),
+                        set(bh.get_descendants(predicates if predicates else [bh.root_predicate])),
+                        set(bh.get_descendants(object_categories)) if object_categories else set())
+                       for subject_categories, predicates, object_categories in shapes]
+
+    start = time.time()
+    kps_by_product = [{kp for kp, kp_meta_map in kp_selector.meta_map.items() if kp_meta_map and
+                       (triple_is_in_meta_map_by_product(kp_meta_map, sub_categories, predicates, obj_categories) or
+                        triple_is_in_meta_map_by_product(kp_meta_map, obj_categories, predicates, sub_categories))}
+                      for sub_categories, predicates, obj_categories in expanded_shapes]
+    product_seconds = time.time() - start
+
+    start = time.time()
+    meta_map_index = kp_selector.meta_map_index
+    kps_by_index = [set(meta_map_index.get_kps(
+                        meta_map_index.get_kps_bitset(sub_categories, predicates, obj_categories) |
+                        meta_map_index.get_kps_bitset(obj_categories, predicates, sub_categories)))
+                    for sub_categories, predicates, obj_categories in expanded_shapes]
+    index_seconds = time.time() - start
+
+    n_mismatches = sum(kps_1 != kps_2 for kps_1, kps_2 in zip(kps_by_product, kps_by_index))
+    print(tabulate([["cross product per KP", f"{product_seconds:.3f}", f"{1000 * product_seconds / len(shapes):.3f}"],
+                    ["meta map index", f"{index_seconds:.3f}", f"{1000 * index_seconds / len(shapes):.3f}"]],
+                   headers=["method", "total seconds", "ms per qedge"]))
+    print(f"{len(kp_selector.meta_map)} KPs in the meta map; {n_mismatches} qedge shapes with different selected KPs")
+
+
+if __name__ == "__main__":
+    main()
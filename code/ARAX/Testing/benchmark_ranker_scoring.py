@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# Benchmark of the Ranker's result graph scoring (max flow, longest path and Frobenius norm): the vectorized scoring
+# the Ranker uses (ARAX_ranker._score_result_graphs) vs. the original per-result networkx scorers. Builds synthetic
+# results for 1-, 2- and 3-hop query graphs (with a few edge bindings per qedge, each with a random confidence),
+# checks that both methods give the same scores, and reports the wall time of each.
+#
+# Usage: python benchmark_ranker_scoring.py [--hops 1 2 3] [--results 5000] [--bindings_per_qedge 3]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from tabulate import tabulate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery")
+import ARAX_ranker  # noqa: E402
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../UI/OpenAPI/python-flask-server/")
+from openapi_server.models.analysis import Analysis  # noqa: E402
+from openapi_server.models.edge import Edge  # noqa: E402
+from openapi_server.models.edge_binding import EdgeBinding  # noqa: E402
+from openapi_server.models.q_edge import QEdge  # noqa: E402
+from openapi_server.models.q_node import QNode  # noqa: E402
+from openapi_server.models.query_graph import QueryGraph  # noqa: E402
+from openapi_server.models.result import Result  # noqa: E402
+
+
+def get_synthetic_results(n_hops: int, n_results: int, bindings_per_qedge: int,
+                          seed: int = 42) -> tuple[QueryGraph, dict, list]:
+    """
+    Builds a linear QG n00->n01->...->n0<n_hops> (plus a virtual qedge from n00 to the last qnode, like Overlay
+    adds) and results for it, returned as the QG, the KG edges by ID (with confidences filled in, as the Ranker does
+    before scoring) and the results.
+    """
+    rng = random.Random(seed)
+    qnode_keys = [f"n{i:02d}" for i in range(n_hops + 1)]
+    qedges = {f"e{i:02d}": QEdge(subject=qnode_keys[i], object=qnode_keys[i + 1]) for i in range(n_hops)}
+    if n_hops > 1:
+        qedges["N1"] = QEdge(subject=qnode_keys[0], object=qnode_keys[-1])
+    query_graph = QueryGraph(nodes={qnode_key: QNode() for qnode_key in qnode_keys}, edges=qedges)
+
+    kg_edge_id_to_edge = dict()
+    results = []
+    for result_index in range(n_results):
+        edge_bindings = dict()
+        for qedge_key in qedges:
+            edge_bindings[qedge_key] = []
+            for binding_index in range(rng.randint(1, bindings_per_qedge)):
+                edge_key = f"{qedge_key}:{result_index}:{binding_index}--infores:kp{binding_index}"
+                edge = Edge(subject=f"NODE:{result_index}", object=f"NODE:{binding_index}")
+                edge.confidence = rng.random()
+                kg_edge_id_to_edge[edge_key] = edge
+                edge_bindings[qedge_key].append(EdgeBinding(id=edge_key, attributes=[]))
+        results.append(Result(node_bindings={}, analyses=[Analysis(resource_id="infores:arax",
+                                                                   edge_bindings=edge_bindings)]))
+    return query_graph, kg_edge_id_to_edge, results
+
+
+def score_with_networkx(kg_edge_id_to_edge: dict, qg_nx, results: list) -> list[list[float]]:
+    return [ARAX_ranker._score_result_graphs_by_networkx_graph_scorer(kg_edge_id_to_edge, qg_nx, results, scorer_func)
+            for scorer_func in [ARAX_ranker._score_networkx_graphs_by_max_flow,
+                                ARAX_ranker._score_networkx_graphs_by_longest_path,
+                                ARAX_ranker._score_networkx_graphs_by_frobenius_norm]]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark the Ranker's vectorized scoring vs. per-result networkx")
+    argparser.add_argument('--hops', type=int, nargs='+', default=[1, 2, 3], help='Numbers of hops to benchmark')
+    argparser.add_argument('--results', type=int, default=5000, help='Number of results to score')
+    argparser.add_argument('--bindings_per_qedge', type=int, default=3, help='Max number of edges bound to each qedge')
+    params = argparser.parse_args()
+
+    rows = []
+    for n_hops in sorted(params.hops):
+        query_graph, kg_edge_id_to_edge, results = get_synthetic_results(n_hops, params.results,
+                                                                         params.bindings_per_qedge)
+        qg_nx = ARAX_ranker._get_query_graph_networkx_from_query_graph(query_graph)
+        scores = dict()
+        for method_name, score_func in [("networkx", score_with_networkx),
+                                        ("vectorized", ARAX_ranker._score_result_graphs)]:
+            start_time = time.time()
+            scores[method_name] = score_func(kg_edge_id_to_edge, qg_nx, results)
+            rows.append([n_hops, method_name, f"{time.time() - start_time:.2f}"])
+        for scorer_name, networkx_scores, vectorized_scores in zip(["max flow", "longest path", "frobenius norm"],
+                                                                   scores["networkx"], scores["vectorized"]):
+            assert np.allclose(networkx_scores, vectorized_scores, rtol=0, atol=1e-9), \
+                f"{scorer_name} scores for the {n_hops}-hop query differ between networkx and the vectorized scoring!"
+
+    print(f"Synthetic results: {params.results} results, up to {params.bindings_per_qedge} edges bound per qedge")
+    print(tabulate(rows, headers=['hops', 'method', 'wall s']))
+
+
+if __name__ == "__main__":
+    main()
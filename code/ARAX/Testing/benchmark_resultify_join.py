@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+
+# Benchmark of Resultify's result graph construction (ARAX_resultify._create_result_graphs): the join over the QG
+# that Resultify uses vs. the original qnode-by-qnode walk (kept below as a reference implementation). Builds synthetic 2-, 3- and 4-hop KGs shaped like
+# typical Expand answers (a pinned first qnode, large intermediate qnodes, and only some intermediate nodes that
+# lead anywhere), checks that both methods produce the same result graphs, and reports the wall time and peak
+# (Python heap) memory of each. Peak memory is measured in a separate run from the timing, since tracing slows
+# allocation-heavy code down a lot.
+#
+# Usage: python benchmark_resultify_join.py [--hops 2 3 4] [--middle_nodes 300] [--degree 4]
+#                                           [--dead_end_fraction 0.8] [--set_middle] [--max_walk_seconds 600]
+
+import argparse
+import collections
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import DefaultDict, Optional
+
+from tabulate import tabulate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../ARAXQuery")
+from ARAX_response import ARAXResponse  # noqa: E402
+import ARAX_resultify  # noqa: E402
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../UI/OpenAPI/python-flask-server/")
+from openapi_server.models.q_edge import QEdge  # noqa: E402
+from openapi_server.models.q_node import QNode  # noqa: E402
+from openapi_server.models.query_graph import QueryGraph  # noqa: E402
+
+
+def get_synthetic_query(n_hops: int, n_middle_nodes: int, degree: int, dead_end_fraction: float,
+                        set_middle: bool, seed: int = 42) -> tuple[QueryGraph, dict, dict]:
+    """
+    Builds a linear QG n00--n01--...--n0<n_hops> (n00 pinned to a single node) and a KG answering it, returned as the
+    QG plus the node and edge indexes Resultify builds before it creates result graphs. The pinned node connects to
+    all n01 nodes, and every other node connects to `degree` random nodes for the next qnode, except that only
+    (1 - dead_end_fraction) of the nodes for the next-to-last qnode connect onward to the last qnode.
+    """
+    rng = random.Random(seed)
+    qnode_keys = [f"n{i:02d}" for i in range(n_hops + 1)]
+    qnodes = {qnode_key: QNode(is_set=set_middle and 0 < i < n_hops) for i, qnode_key in enumerate(qnode_keys)}
+    qedges = {f"e{i:02d}": QEdge(subject=qnode_keys[i], object=qnode_keys[i + 1]) for i in range(n_hops)}
+    query_graph = QueryGraph(nodes=qnodes, edges=qedges)
+
+    kg_node_keys_by_qg_key = {qnode_key: {f"{qnode_key}:{j}" for j in range(1 if i == 0 else n_middle_nodes)}
+                              for i, qnode_key in enumerate(qnode_keys)}
+    edge_keys_by_subject = collections.defaultdict(lambda: collections.defaultdict(set))
+    edge_keys_by_object = collections.defaultdict(lambda: collections.defaultdict(set))
+    edge_keys_by_node_pair = collections.defaultdict(lambda: collections.defaultdict(set))
+    for i, (qedge_key, qedge) in enumerate(qedges.items()):
+        object_node_keys = sorted(kg_node_keys_by_qg_key[qedge.object])
+        for subject_node_key in sorted(kg_node_keys_by_qg_key[qedge.subject]):
+            if i == n_hops - 1 and n_hops > 1 and rng.random() < dead_end_fraction:
+                continue
+            n_objects = len(object_node_keys) if i == 0 else min(degree, len(object_node_keys))
+            for object_node_key in rng.sample(object_node_keys, n_objects):
+                edge_key = f"{qedge_key}:{subject_node_key}--{object_node_key}"
+                edge_keys_by_subject[qedge_key][subject_node_key].add(edge_key)
+                edge_keys_by_object[qedge_key][object_node_key].add(edge_key)
+                edge_keys_by_node_pair[qedge_key][(subject_node_key, object_node_key)].add(edge_key)
+                edge_keys_by_node_pair[qedge_key][(object_node_key, subject_node_key)].add(edge_key)
+    return query_graph, kg_node_keys_by_qg_key, {"edge_keys_by_subject": edge_keys_by_subject,
+                                                 "edge_keys_by_object": edge_keys_by_object,
+                                                 "edge_keys_by_node_pair": edge_keys_by_node_pair}
+
+
+def get_all_adjacent_nodes(kg_node_keys: set[str], start_qnode_key: str, target_qnode_key: str,
+                           kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]]) -> set[str]:
+    """
+    This function returns all nodes adjacent to a set of nodes (kg_node_keys) that fulfill the target_qnode_key. The
+    start_qnode_key is the qnode ID that the set of input nodes fulfill. Being adjacent to the set of nodes means that
+    the node is connected to ANY of the individual input nodes in the set (not ALL).
+    """
+    connections = [kg_node_adj_map_by_qg_key[start_qnode_key][kg_node_key][target_qnode_key] for kg_node_key in kg_node_keys]
+    return {node_key for node_key_set in connections for node_key in node_key_set}
+
+
+def extract_sub_qg_adj_map(qg_adj_map: dict[str, set[str]], allowed_qnode_keys: set[str]) -> dict[str, set[str]]:
+    """
+    This function extracts the node adjacency info for a "subgraph" of the query graph (represented by
+    allowed_qnode_keys). Example of qg_adj_map: {"n0": {"n1"}, "n1": {"n0"}}
+    """
+    return {qnode_key: neighbor_qnode_keys.intersection(allowed_qnode_keys)
+            for qnode_key, neighbor_qnode_keys in qg_adj_map.items() if qnode_key in allowed_qnode_keys}
+
+
+def clean_up_dead_ends(result_graph: dict[str, DefaultDict[str, set[str]]],
+                       sub_qg_adj_map: dict[str, set[str]],
+                       kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]],
+                       log: ARAXResponse) -> dict[str, DefaultDict[str, set[str]]]:
+    """
+    This function iteratively removes "dead ends" from a result graph until no more dead ends can be found. Dead ends
+    can be thought of as intermediate nodes (typically for is_set=True qnodes) that connect to only a subset of the
+    nodes they should be connected to according to the query graph. Only the part of the result graph that has been
+    "fulfilled" so far during the result construction process is evaluated here: the sub_qg_adj_map must contain only
+    info for qnodes fulfilled thus far.
+    """
+    fulfilled_qnode_keys = set(sub_qg_adj_map)
+    found_dead_ends = True
+    while found_dead_ends:
+        found_dead_ends = False
+        nodes_to_remove: dict[str, set[str]] = dict()
+        # Go through each qnode "role" in our result graph, and check the nodes corresponding to that qnode
+        for qnode_key in fulfilled_qnode_keys:
+            corresponding_node_keys = result_graph["nodes"][qnode_key]
+            required_neighbor_qnode_keys = sub_qg_adj_map[qnode_key]
+            # Make sure each node for this qnode ID is connected to at LEAST one node fulfilling each neighbor qnode ID
+            for corresponding_node_key in corresponding_node_keys:
+                for neighbor_qnode_key in required_neighbor_qnode_keys:
+                    # Look for at least one node in the result graph in this neighbor spot that this node is linked to
+                    neighbors_in_kg = kg_node_adj_map_by_qg_key[qnode_key][corresponding_node_key][neighbor_qnode_key]
+                    if not neighbors_in_kg.intersection(result_graph["nodes"][neighbor_qnode_key]):
+                        # Mark this node for removal from this result graph since it's lacking a neighbor here
+                        found_dead_ends = True
+                        if qnode_key not in nodes_to_remove:
+                            nodes_to_remove[qnode_key] = set()
+                        nodes_to_remove[qnode_key].add(corresponding_node_key)
+        # Actually go through and remove our nodes marked for removal
+        for qnode_key, node_keys in nodes_to_remove.items():
+            result_graph["nodes"][qnode_key] = result_graph["nodes"][qnode_key].difference(node_keys)
+    return result_graph
+
+
+def assign_result_graph_nodes_by_qnode_walk(qg: QueryGraph,
+                                            kg_node_keys_by_qg_key: dict[str, set[str]],
+                                            kg_node_adj_map_by_qg_key: dict[str, dict[str, dict[str, set[str]]]],
+                                            log: ARAXResponse,
+                                            base_result_graphs: Optional[list[dict]] = None) -> list[dict]:
+    """
+    This is Resultify's original way of constructing result graphs, which ARAX_resultify's join replaced; it's kept
+    here as a reference implementation for benchmarking and testing the join (see test_join_matches_qnode_walk in
+    code/ARAX/test/test_ARAX_resultify.py). It walks through the qnodes one at a time, copying each partial result
+    graph for every KG node that can fill the next qnode and cleaning up the copy's dead ends.
+    """
+    qg_adj_map = ARAX_resultify._get_qg_adj_map_undirected(qg)
+
+    # Iteratively construct "result graphs" (initially containing only nodes, not edges) by walking through all qnodes
+    log.debug("Constructing result graphs qnode by qnode")
+    if base_result_graphs:
+        # We'll build off of the 'base' result graphs rather than start anew (saves time for option group processing)
+        result_graphs = base_result_graphs
+        qnode_keys_already_handled = set(result_graphs[0]["nodes"])
+        qnode_keys_remaining = set(qg.nodes).difference(qnode_keys_already_handled)
+    else:
+        result_graphs = []
+        qnode_keys_already_handled = set()
+        qnode_keys_remaining = set(qg.nodes)
+    log.debug(f"Qnode keys already handled are: {qnode_keys_already_handled}")
+    while qnode_keys_remaining:
+        # Start with a random qnode if this is our first iteration
+        if not qnode_keys_already_handled:
+            current_qnode_key = list(qnode_keys_remaining)[0]
+            prior_qnode_connections: set[str] = set()
+        # Otherwise find a yet unhandled qnode ID that connects somehow to the part of the QG we've already handled
+        else:
+            current_qnode_key, prior_qnode_connections = ARAX_resultify._find_qnode_connected_to_sub_qg(qnode_keys_already_handled, qnode_keys_remaining, qg)
+            log.debug(f"Next qnode chosen is: {current_qnode_key}")
+        current_qnode = qg.nodes[current_qnode_key]
+
+        # Initialize our result graphs if this is our first iteration
+        if not result_graphs:
+            log.debug(f"Initiating result graphs with nodes for {current_qnode_key} (is_set={current_qnode.is_set})")
+            all_node_keys_in_kg_for_this_qnode_key = kg_node_keys_by_qg_key.get(current_qnode_key)
+            assert all_node_keys_in_kg_for_this_qnode_key is not None, \
+                f"unexpected None state for all_node_keys_in_kg_for_this_qnode_key; current_qnode_key: {current_qnode_key}"
+
+            # We'll start with one result graph with ALL corresponding nodes in the KG in this spot if is_set=True
+            if current_qnode.is_set:
+                log.debug(f"Starting with one result graph because is_set=True for {current_qnode_key}")
+                new_result_graph = ARAX_resultify._create_new_empty_result_graph()
+                new_result_graph["nodes"][current_qnode_key] = all_node_keys_in_kg_for_this_qnode_key  # Parents included already
+                result_graphs.append(new_result_graph)
+            # Otherwise, we'll start with a result graph for EACH corresponding node in the KG
+            else:
+                log.debug(f'Starting with a result graph for each {current_qnode_key} node')
+                for node_key in all_node_keys_in_kg_for_this_qnode_key:
+                    new_result_graph = ARAX_resultify._create_new_empty_result_graph()
+                    new_result_graph["nodes"][current_qnode_key] = {node_key}
+                    result_graphs.append(new_result_graph)
+        # Otherwise fan out our existing result graphs, filling out this qnode spot in them based on prior contents
+        else:
+            log.debug(f"Adding a layer to each result graph for qnode {current_qnode_key} (is_set={current_qnode.is_set})")
+            new_result_graphs = []
+            sub_qg_adj_map = extract_sub_qg_adj_map(qg_adj_map, qnode_keys_already_handled.union({current_qnode_key}))
+            for result_graph in result_graphs:
+                # Figure out which KG nodes could fulfill the current qnode in this result
+                prior_qnodes_kg_nodes = {prior_qnode_key: result_graph["nodes"][prior_qnode_key] for prior_qnode_key in prior_qnode_connections}
+                current_kg_node_possibilities = [get_all_adjacent_nodes(corresponding_kg_nodes, prior_qnode_key, current_qnode_key, kg_node_adj_map_by_qg_key)
+                                                 for prior_qnode_key, corresponding_kg_nodes in prior_qnodes_kg_nodes.items()]
+                # Only keep connections that have links to KG nodes in ALL prior connected qnode roles
+                final_connected_kg_nodes = set.intersection(*current_kg_node_possibilities)
+
+                # Fan out or add to result graphs as appropriate
+                if final_connected_kg_nodes:
+                    if current_qnode.is_set:
+                        # Replace this result graph with a new one with all valid connections listed under this qnode
+                        new_result_graph = ARAX_resultify._copy_result_graph(result_graph)
+                        new_result_graph["nodes"][current_qnode_key] = final_connected_kg_nodes
+                        pruned_result_graph = clean_up_dead_ends(result_graph=new_result_graph,
+                                                                 sub_qg_adj_map=sub_qg_adj_map,
+                                                                 kg_node_adj_map_by_qg_key=kg_node_adj_map_by_qg_key,
+                                                                 log=log)
+                        new_result_graphs.append(pruned_result_graph)
+                    else:
+                        # Create a new result graph for each new valid connected node
+                        for connected_node_key in final_connected_kg_nodes:
+                            new_result_graph = ARAX_resultify._copy_result_graph(result_graph)
+                            new_result_graph["nodes"][current_qnode_key] = {connected_node_key}
+                            pruned_result_graph = clean_up_dead_ends(result_graph=new_result_graph,
+                                                                     sub_qg_adj_map=sub_qg_adj_map,
+                                                                     kg_node_adj_map_by_qg_key=kg_node_adj_map_by_qg_key,
+                                                                     log=log)
+                            new_result_graphs.append(pruned_result_graph)
+
+            result_graphs = new_result_graphs
+        log.debug(f"Current count of result graphs is {len(result_graphs)}")
+
+        # Update our records about which qnodes we've already processed
+        qnode_keys_remaining.remove(current_qnode_key)
+        qnode_keys_already_handled.add(current_qnode_key)
+    return result_graphs
+
+
+def create_result_graphs_by_qnode_walk(qg: QueryGraph,
+                                       kg_node_keys_by_qg_key: dict[str, set[str]],
+                                       edge_keys_by_subject: DefaultDict[str, DefaultDict[str, set[str]]],
+                                       edge_keys_by_object: DefaultDict[str, DefaultDict[str, set[str]]],
+                                       edge_keys_by_node_pair: DefaultDict[str, DefaultDict[tuple[str, str], set[str]]],
+                                       ignore_edge_direction: bool = True,
+                                       log: Optional[ARAXResponse] = None,
+                                       base_result_graphs: Optional[list[dict]] = None) -> list[dict]:
+    """
+    Drop-in replacement for ARAX_resultify._create_result_graphs that assigns nodes to result graphs with the qnode
+    walk instead of the join.
+    """
+    if log is None:
+        log = ARAXResponse()
+    kg_node_adj_map_by_qg_key = ARAX_resultify._get_kg_node_adj_map_by_qg_key(kg_node_keys_by_qg_key,
+                                                                              edge_keys_by_node_pair, qg, log)
+    result_graphs = assign_result_graph_nodes_by_qnode_walk(qg, kg_node_keys_by_qg_key, kg_node_adj_map_by_qg_key,
+                                                            log, base_result_graphs)
+    ARAX_resultify._add_edges_to_result_graphs(result_graphs, qg, edge_keys_by_subject, edge_keys_by_object,
+                                               edge_keys_by_node_pair, ignore_edge_direction)
+    return [result_graph for result_graph in result_graphs if ARAX_resultify._result_graph_is_fulfilled(result_graph, qg)]
+
+
+def create_result_graphs(query_graph: QueryGraph, kg_node_keys_by_qg_key: dict, edge_indexes: dict,
+                         use_qnode_walk: bool) -> list[dict]:
+    create_function = create_result_graphs_by_qnode_walk if use_qnode_walk else ARAX_resultify._create_result_graphs
+    return create_function(query_graph, kg_node_keys_by_qg_key, **edge_indexes, log=ARAXResponse())
+
+
+def get_canonical_result_graphs(result_graphs: list[dict]) -> set:
+    return {(frozenset((qnode_key, frozenset(node_keys)) for qnode_key, node_keys in result_graph["nodes"].items()),
+             frozenset((qedge_key, frozenset(edge_keys)) for qedge_key, edge_keys in result_graph["edges"].items()))
+            for result_graph in result_graphs}
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark Resultify's join vs. its original qnode-by-qnode walk")
+    argparser.add_argument('--hops', type=int, nargs='+', default=[2, 3, 4], help='Numbers of hops to benchmark')
+    argparser.add_argument('--middle_nodes', type=int, default=300, help='Number of KG nodes for each unpinned qnode')
+    argparser.add_argument('--degree', type=int, default=4, help='Number of edges from each node to the next qnode')
+    argparser.add_argument('--dead_end_fraction', type=float, default=0.8,
+                           help='Fraction of next-to-last qnode nodes with no edges to the last qnode')
+    argparser.add_argument('--set_middle', action='store_true', help='Make the intermediate qnodes is_set=True')
+    argparser.add_argument('--max_walk_seconds', type=float, default=600,
+                           help='Skip the qnode walk for bigger queries once it took longer than this')
+    params = argparser.parse_args()
+
+    rows = []
+    walk_too_slow = False
+    for n_hops in sorted(params.hops):
+        query = get_synthetic_query(n_hops, params.middle_nodes, params.degree, params.dead_end_fraction,
+                                    params.set_middle)
+        canonical_result_graphs = dict()
+        for method_name, use_qnode_walk in [("qnode walk", True), ("join", False)]:
+            if use_qnode_walk and walk_too_slow:
+                rows.append([n_hops, method_name, "-", "skipped", "-"])
+                continue
+            gc.collect()
+            start_time = time.time()
+            result_graphs = create_result_graphs(*query, use_qnode_walk=use_qnode_walk)
+            wall_seconds = time.time() - start_time
+            canonical_result_graphs[method_name] = get_canonical_result_graphs(result_graphs)
+            del result_graphs
+            if use_qnode_walk and wall_seconds > params.max_walk_seconds:
+                walk_too_slow = True
+
+            gc.collect()
+            tracemalloc.start()
+            result_graphs = create_result_graphs(*query, use_qnode_walk=use_qnode_walk)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del result_graphs
+            rows.append([n_hops, method_name, len(canonical_result_graphs[method_name]), f"{wall_seconds:.2f}",
+                         f"{peak_bytes / 1024 / 1024:.1f}"])
+        if len(canonical_result_graphs) == 2:
+            assert canonical_result_graphs["qnode walk"] == canonical_result_graphs["join"], \
+                f"Result graphs for the {n_hops}-hop query differ between the qnode walk and the join!"
+
+    print(f"Synthetic KGs: {params.middle_nodes} nodes per unpinned qnode, degree {params.degree}, "
+          f"{params.dead_end_fraction:.0%} dead ends before the last qnode, "
+          f"intermediate qnodes is_set={params.set_middle}")
+    print(tabulate(rows, headers=['hops', 'method', 'result graphs', 'wall s', 'peak heap MiB']))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery/")
 from ARAX_query import ARAXQuery
 from ARAX_response import ARAXResponse
 import Expand.expand_utilities as eu
+from Expand.compact_kg import CompactEdge, CompactNode
+from Expand.meta_map_index import MetaMapIndex
+from Expand.trapi_querier import TRAPIQuerier, ADAPTIVE_TIMEOUT_MIN_SECONDS, DEFAULT_KP_TIMEOUT_SECONDS, KG2_TIMEOUT_SECONDS
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../../UI/OpenAPI/python-flask-server/")
 from openapi_server.models.edge import Edge
 from openapi_server.models.node import Node
@@ -1706,6 +1709,95 @@ def test_issue_2736():
                 qedge_predicates.append(edge.predicate)
     assert all(p == 'biolink:treats' for p in qedge_predicates)
 
-    
+
+def test_compact_kg_records_convert_to_trapi_models():
+    edge_dict = {"subject": "CHEBI:15365", "object": "MONDO:0005148", "predicate": "biolink:treats",
+                 "sources": [{"resource_id": "infores:semmeddb", "resource_role": "primary_knowledge_source"}],
+                 "qualifiers": [{"qualifier_type_id": "biolink:object_aspect_qualifier", "qualifier_value": "activity"}],
+                 "attributes": [{"attribute_type_id": "biolink:publications", "value": ["PMID:1", "PMID:2"],
+                                 "attributes": [{"attribute_type_id": "biolink:description", "value": "sub"}]}]}
+    node_dict = {"name": "aspirin", "categories": ["biolink:SmallMolecule"],
+                 "attributes": [{"attribute_type_id": "biolink:xref", "value": ["DRUGBANK:DB00945"]}]}
+    compact_edge = CompactEdge.from_dict(edge_dict)
+    compact_node = CompactNode.from_dict(node_dict)
+    compact_node.query_ids = ["CHEBI:15365"]
+    assert compact_edge.sources[0].resource_id == "infores:semmeddb"
+    assert not hasattr(compact_edge, "qedge_keys")
+    with pytest.raises(ValueError):
+        CompactEdge.from_dict({**edge_dict, "predicate": None})
+
+    organized_kg = eu.QGOrganizedKnowledgeGraph()
+    organized_kg.add_node("CHEBI:15365", compact_node, "n00")
+    organized_kg.add_node("CHEBI:15365", compact_node, "n01")
+    organized_kg.add_edge("e1", compact_edge, "e00")
+    standard_kg = eu.convert_qg_organized_kg_to_standard_kg(organized_kg)
+    # (the records are let go of as they are converted)
+    assert not any(organized_kg.nodes_by_qg_id.values()) and not any(organized_kg.edges_by_qg_id.values())
+    node = standard_kg.nodes["CHEBI:15365"]
+    edge = standard_kg.edges["e1"]
+    assert isinstance(node, Node) and isinstance(edge, Edge)
+    assert isinstance(edge.attributes[0], Attribute) and isinstance(edge.attributes[0].attributes[0], Attribute)
+    assert edge.to_dict() == Edge.from_dict(edge_dict).to_dict()
+    assert node.to_dict() == Node.from_dict(node_dict).to_dict()
+    assert node.query_ids == ["CHEBI:15365"] and node.qnode_keys == ["n00", "n01"]
+    assert edge.qedge_keys == ["e00"]
+
+
+def test_adaptive_kp_timeout_and_hedge_delay():
+    querier = TRAPIQuerier.__new__(TRAPIQuerier)  # (no KP is queried, so none of its other state is needed)
+    querier.kp_infores_curie = "infores:some-kp"
+    querier.kp_timeout = None
+    querier.kp_latency_stats_loaded = True
+
+    def get_timeout_and_hedge_delay(p95=None, p95_is_timeout=False):
+        querier.kp_latency_stats = {"n_samples": 100, "p95": p95, "p95_is_timeout": p95_is_timeout} \
+            if p95 is not None else None
+        query_timeout = querier._get_query_timeout_length()
+        return query_timeout, querier._get_hedge_delay(query_timeout)
+
+    assert get_timeout_and_hedge_delay() == (DEFAULT_KP_TIMEOUT_SECONDS, None)
+    assert get_timeout_and_hedge_delay(p95=5.0) == (ADAPTIVE_TIMEOUT_MIN_SECONDS, 5.0)
+    assert get_timeout_and_hedge_delay(p95=0.5) == (ADAPTIVE_TIMEOUT_MIN_SECONDS, 2.0)
+    assert get_timeout_and_hedge_delay(p95=12.0) == (36, 12.0)
+    assert get_timeout_and_hedge_delay(p95=35.0) == (105, 35.0)
+    assert get_timeout_and_hedge_delay(p95=50.0) == (DEFAULT_KP_TIMEOUT_SECONDS, 50.0)
+    # A KP whose p95 is near its timeout doesn't get sent a hedged copy of its queries
+    assert get_timeout_and_hedge_delay(p95=70.0) == (DEFAULT_KP_TIMEOUT_SECONDS, None)
+    # If over 5% of the KP's queries timed out, its p95 is only a lower bound
+    assert get_timeout_and_hedge_delay(p95=float(ADAPTIVE_TIMEOUT_MIN_SECONDS), p95_is_timeout=True) == \
+        (DEFAULT_KP_TIMEOUT_SECONDS, None)
+    # A query that timed out under an adaptive timeout is sent again with the default timeout
+    assert querier._get_timeout_retry_length(ADAPTIVE_TIMEOUT_MIN_SECONDS) == DEFAULT_KP_TIMEOUT_SECONDS
+    assert querier._get_timeout_retry_length(DEFAULT_KP_TIMEOUT_SECONDS) is None
+    querier.kp_timeout = 10
+    assert get_timeout_and_hedge_delay(p95=5.0) == (10, None)
+    assert querier._get_timeout_retry_length(10) is None
+    querier.kp_timeout = None
+    querier.kp_infores_curie = "infores:rtx-kg2"
+    assert get_timeout_and_hedge_delay(p95=5.0) == (KG2_TIMEOUT_SECONDS, None)
+    assert querier._get_timeout_retry_length(KG2_TIMEOUT_SECONDS) is None
+
+
+def test_meta_map_index_selects_kps():
+    meta_map = {"infores:kp-a": {"predicates": {"biolink:SmallMolecule": {"biolink:Disease": {"biolink:treats"}}},
+                                 "prefixes": {}},
+                "infores:kp-b": {"predicates": {"biolink:Gene": {"biolink:Disease": {"biolink:related_to",
+                                                                                      "biolink:causes"}}},
+                                 "prefixes": {}},
+                "infores:kp-c": {}}
+    meta_map_index = MetaMapIndex(meta_map)
+
+    def get_kps(subject_categories, predicates, object_categories):
+        return set(meta_map_index.get_kps(meta_map_index.get_kps_bitset(subject_categories, predicates,
+                                                                         object_categories)))
+
+    assert get_kps({"biolink:SmallMolecule", "biolink:Drug"}, {"biolink:treats"}, {"biolink:Disease"}) == {"infores:kp-a"}
+    assert get_kps({"biolink:Disease"}, {"biolink:treats"}, {"biolink:SmallMolecule"}) == set()
+    assert get_kps({"biolink:Gene"}, {"biolink:treats"}, {"biolink:Disease"}) == set()
+    # (empty categories mean any category)
+    assert get_kps(set(), {"biolink:treats", "biolink:causes"}, {"biolink:Disease"}) == {"infores:kp-a", "infores:kp-b"}
+    assert get_kps({"biolink:Gene"}, {"biolink:causes"}, set()) == {"infores:kp-b"}
+
+
 if __name__ == "__main__":
     pytest.main(['-v', 'test_ARAX_expand.py'])
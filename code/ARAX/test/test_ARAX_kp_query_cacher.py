@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Tests of the coalescing of identical in-flight KP queries in KPQueryCacher.get_result (no KP is queried)
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery/Expand")
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from trapi_query_cacher import Base, CONNECTION_ERROR, KPQuery, KPQueryCacher, NO_CACHED_RESPONSE
+
+
+QUERY_URL = "https://kp.example.org/query"
+QUERY_OBJECT = {"message": {"query_graph": {"nodes": {"n0": {"ids": ["MONDO:0005148"]}, "n1": {}},
+                                            "edges": {"e0": {"subject": "n0", "object": "n1"}}}}}
+
+
+@pytest.fixture
+def cacher(tmp_path):
+    # (a cacher without a database or file store: nothing is ever cached, and every fetch waits for a go-ahead)
+    cacher = KPQueryCacher.__new__(KPQueryCacher)
+    cacher.lease_dir = str(tmp_path)
+    cacher.get_cached_result = lambda query_url, query_object: (None, NO_CACHED_RESPONSE, 0.0, None)
+    cacher.fetches = []
+    cacher.fetch_timeouts = []
+
+    async def fetch_and_store_result(query_url, query_object, kp_curie, timeout=30, **kwargs):
+        fetch_number = len(cacher.fetches) + 1
+        go_ahead = asyncio.Event()
+        cacher.fetches.append(go_ahead)
+        cacher.fetch_timeouts.append(timeout)
+        await go_ahead.wait()
+        return {"fetch": fetch_number}, 200, 0.1, None
+
+    cacher._fetch_and_store_result = fetch_and_store_result
+    return cacher
+
+
+async def _wait_for_fetches(cacher, n_fetches):
+    for _ in range(500):
+        if len(cacher.fetches) >= n_fetches:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Expected {n_fetches} fetches, got {len(cacher.fetches)}")
+
+
+def test_identical_queries_are_sent_once(cacher):
+    async def run():
+        callers = [asyncio.create_task(cacher.get_result(QUERY_URL, QUERY_OBJECT, "infores:kp")) for _ in range(2)]
+        await _wait_for_fetches(cacher, 1)
+        await asyncio.sleep(0.05)
+        cacher.fetches[0].set()
+        return await asyncio.gather(*callers)
+
+    results = asyncio.run(run())
+    assert len(cacher.fetches) == 1
+    assert [result[0] for result in results] == [{"fetch": 1}, {"fetch": 1}]
+    assert results[0][0] is not results[1][0]  # (the follower gets its own copy)
+    assert os.listdir(cacher.lease_dir)  # (lease lock files are left in place)
+
+
+def test_cancelled_leader_does_not_cancel_followers(cacher):
+    async def run():
+        leader = asyncio.create_task(cacher.get_result(QUERY_URL, QUERY_OBJECT, "infores:kp"))
+        await _wait_for_fetches(cacher, 1)
+        follower = asyncio.create_task(cacher.get_result(QUERY_URL, QUERY_OBJECT, "infores:kp"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        # The follower sends the query itself, under its own lease
+        await _wait_for_fetches(cacher, 2)
+        cacher.fetches[1].set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    response_data, http_code, elapsed_time, error = asyncio.run(run())
+    assert response_data == {"fetch": 2} and http_code == 200
+
+
+def test_cached_timeout_is_retried_with_a_longer_timeout(cacher):
+    cacher.get_cached_result = lambda query_url, query_object: (None, CONNECTION_ERROR, 0.0, None)
+
+    async def run(timed_out_after, **kwargs):
+        cacher._get_cached_failure_elapsed = lambda query_url, query_object: timed_out_after
+        caller = asyncio.create_task(cacher.get_result(QUERY_URL, QUERY_OBJECT, "infores:kp", timeout=30, **kwargs))
+        await asyncio.sleep(0.05)
+        for go_ahead in cacher.fetches:
+            go_ahead.set()
+        return await caller
+
+    assert asyncio.run(run(30.0, retry_timeout=120))[0] == {"fetch": 1}
+    assert cacher.fetch_timeouts == [120]
+    # A timeout under the retry timeout (or with no retry timeout given) is final
+    assert asyncio.run(run(120.0, retry_timeout=120))[1] == CONNECTION_ERROR
+    assert asyncio.run(run(30.0))[1] == CONNECTION_ERROR
+    assert cacher.fetch_timeouts == [120]
+
+
+def test_remove_stale_leases(cacher):
+    for lease_filename, age in [("old.lock", 7200), ("new.lock", 60)]:
+        lease_filepath = os.path.join(cacher.lease_dir, lease_filename)
+        open(lease_filepath, "w").close()
+        os.utime(lease_filepath, (os.path.getatime(lease_filepath) - age,) * 2)
+    assert cacher.remove_stale_leases(max_age_seconds=3600) == 1
+    assert os.listdir(cacher.lease_dir) == ["new.lock"]
+
+
+def test_kp_latency_stats_count_timeouts(tmp_path):
+    cacher = KPQueryCacher.__new__(KPQueryCacher)
+    cacher.engine = create_engine(f"sqlite:///{tmp_path}/cache.sqlite")
+    cacher.Session = sessionmaker(bind=cacher.engine)
+    Base.metadata.create_all(cacher.engine)
+
+    def get_stats(kp_curie, queries):
+        with cacher._get_session() as session:
+            for query_number, (elapsed, http_code) in enumerate(queries):
+                session.add(KPQuery(status="OK", kp_curie=kp_curie, query_url=QUERY_URL,
+                                    query_hash=f"{kp_curie}-{query_number}", query_object={},
+                                    first_request_datetime="", last_request_datetime="",
+                                    first_query_elapsed=elapsed, first_query_http_code=http_code))
+        return cacher.get_kp_latency_stats(kp_curie)
+
+    # 90 fast answers, 2 connection errors (not timeouts), and 8 timeouts at 90 seconds
+    stats = get_stats("infores:slow-tail", [(5.0, 200)] * 90 + [(0.5, -1)] * 2 + [(90.0, -1)] * 8)
+    assert stats["n_samples"] == 98 and stats["n_timeouts"] == 8
+    assert stats["p50"] == 5.0 and stats["p95"] == 90.0 and stats["p95_is_timeout"]
+    # A timeout counts as at least as slow as an answer that took as long
+    stats = get_stats("infores:fast", [(5.0, 200)] * 95 + [(90.0, 200)] * 4 + [(90.0, -1)])
+    assert stats["p95"] == 5.0 and not stats["p95_is_timeout"] and stats["max"] == 90.0
+    assert get_stats("infores:no-history", []) is None
+
+
+if __name__ == "__main__":
+    pytest.main(['-v', 'test_ARAX_kp_query_cacher.py'])
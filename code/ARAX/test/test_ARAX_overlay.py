@@ -11,11 +11,19 @@ from collections import Counter
 import copy
 import json
 import ast
+import math
+import sqlite3
+import numpy as np
+import scipy.stats
 from typing import List, Union
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery")
 from ARAX_query import ARAXQuery
 from ARAX_response import ARAXResponse
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery/Overlay")
+from curie_pmid_index import CuriePMIDIndex, build_curie_pmid_index_from_sqlite
+from compute_ngd import ComputeNGD
+from Overlay.fisher_exact_test import fisher_exact_pvalues
 
 PACKAGE_PARENT = '../../UI/OpenAPI/python-flask-server'
 sys.path.append(os.path.normpath(os.path.join(os.getcwd(), PACKAGE_PARENT)))
@@ -347,6 +355,15 @@ def test_FET_ex2():
     #     assert query_edge.object in query_node_keys
 
 
+def test_fisher_exact_pvalues_match_scipy():
+    tables = [[0, 0, 0, 0], [3, 0, 0, 3], [2, 2, 2, 2], [1, 9, 11, 3], [5, 0, 5, 10], [0, 5, 10, 5],
+              [7, 20, 150, 2000], [12, 300, 988, 4000000], [1, 2000, 1499, 5000000]]
+    a, b, c, d = np.array(tables).T
+    for alternative in ["two-sided", "less", "greater"]:
+        expected_pvalues = [scipy.stats.fisher_exact([table[:2], table[2:]], alternative=alternative)[1] for table in tables]
+        assert np.allclose(fisher_exact_pvalues(a, b, c, d, alternative=alternative), expected_pvalues, rtol=1e-8, atol=0)
+
+
 @pytest.mark.slow
 def test_paired_concept_frequency_virtual():
     query = {"operations": {"actions": [
@@ -799,5 +816,83 @@ def test_ngd_sqlite_syntax_error():
     assert response.status == 'OK'
 
 
+def test_curie_pmid_index(tmp_path):
+    # A tiny database in the format written by Overlay/ngd/build_ngd_database.py
+    db_path = str(tmp_path / "curie_to_pmids_v1.0_KG2.10.0.sqlite")
+    curie_to_pmids = {"CHEBI:15365": [3, 1, 7, 7, 20], "MONDO:0005148": [1, 2, 7, 30], "UMLS:C0000'1": [], "NCBIGene:1": [20]}
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE curie_to_pmids (curie TEXT PRIMARY KEY, pmids TEXT)")
+    connection.executemany("INSERT INTO curie_to_pmids VALUES (?, ?)",
+                           [(curie, json.dumps(pmids)) for curie, pmids in curie_to_pmids.items()])
+    connection.commit()
+    connection.close()
+
+    assert CuriePMIDIndex.load_if_built(db_path) is None
+    assert build_curie_pmid_index_from_sqlite(db_path) == len(curie_to_pmids)
+    index = CuriePMIDIndex.load_if_built(db_path)
+    rows = index.get_rows(list(curie_to_pmids) + ["MONDO:0000000"])
+    assert set(rows) == set(curie_to_pmids)
+    for curie, pmids in curie_to_pmids.items():
+        assert index.get_pmids(rows[curie]).tolist() == sorted(set(pmids))
+    assert index.get_joint_pmids(rows["CHEBI:15365"], rows["MONDO:0005148"]).tolist() == [1, 7]
+    assert index.get_joint_pmids(rows["NCBIGene:1"], rows["CHEBI:15365"]).tolist() == [20]
+    assert index.get_joint_pmids(rows["UMLS:C0000'1"], rows["CHEBI:15365"]).tolist() == []
+
+
+@pytest.mark.parametrize("use_pmid_index", [False, True])
+def test_ngd_for_pairs_matches_per_pair_formula(tmp_path, use_pmid_index):
+    curie_to_pmids = {"CHEBI:15365": [3, 1, 7, 7, 20] + list(range(100, 140)),
+                      "MONDO:0005148": [1, 2, 7, 30] + list(range(100, 140)),
+                      "NCBIGene:1": [20], "NCBIGene:2": [5], "UMLS:C0000'1": []}
+    ngd = ComputeNGD.__new__(ComputeNGD)  # (no NGD database is needed: the PMID lists are given here)
+    ngd.response = ARAXResponse()
+    ngd.ngd_normalizer = 3.5e+7 * 20
+    ngd.first_ngd_log = True
+    ngd.curie_to_pmids_map = dict()
+    ngd.curie_to_pmid_index_row_map = dict()
+    if use_pmid_index:
+        db_path = str(tmp_path / "curie_to_pmids.sqlite")
+        connection = sqlite3.connect(db_path)
+        connection.execute("CREATE TABLE curie_to_pmids (curie TEXT PRIMARY KEY, pmids TEXT)")
+        connection.executemany("INSERT INTO curie_to_pmids VALUES (?, ?)",
+                               [(curie, json.dumps(pmids)) for curie, pmids in curie_to_pmids.items()])
+        connection.commit()
+        connection.close()
+        build_curie_pmid_index_from_sqlite(db_path)
+        ngd.curie_pmid_index = CuriePMIDIndex.load_if_built(db_path)
+        ngd.load_curie_to_pmids_data(list(curie_to_pmids))
+    else:
+        ngd.curie_to_pmids_map = copy.deepcopy(curie_to_pmids)
+
+    def get_per_pair_ngd(subject_curie, object_curie):
+        # The NGD formula, one pair at a time (NaN for unknown curies or any count of 0)
+        if subject_curie not in curie_to_pmids or object_curie not in curie_to_pmids:
+            return math.nan, set()
+        subject_pmids, object_pmids = set(curie_to_pmids[subject_curie]), set(curie_to_pmids[object_curie])
+        joint_pmids = subject_pmids & object_pmids
+        if not subject_pmids or not object_pmids or not joint_pmids:
+            return math.nan, joint_pmids
+        marginal_logs = [math.log(len(subject_pmids)), math.log(len(object_pmids))]
+        return (max(marginal_logs) - math.log(len(joint_pmids))) / \
+            (math.log(ngd.ngd_normalizer) - min(marginal_logs)), joint_pmids
+
+    curies = list(curie_to_pmids) + ["MONDO:0000000"]
+    curie_pairs = [(subject_curie, object_curie) for subject_curie in curies for object_curie in curies]
+    ngd_values, joint_pmids_of_pairs = ngd.calculate_ngd_for_pairs(curie_pairs)
+    assert len(ngd_values) == len(joint_pmids_of_pairs) == len(curie_pairs)
+    for curie_pair, ngd_value, joint_pmids in zip(curie_pairs, ngd_values, joint_pmids_of_pairs):
+        expected_ngd_value, expected_joint_pmids = get_per_pair_ngd(*curie_pair)
+        if math.isnan(expected_ngd_value):
+            assert math.isnan(ngd_value), curie_pair
+        else:
+            assert ngd_value == expected_ngd_value, curie_pair
+        assert list(joint_pmids) == sorted(expected_joint_pmids)[:30], curie_pair
+    assert math.isnan(ngd_values[curie_pairs.index(("CHEBI:15365", "NCBIGene:2"))])  # (no joint PMIDs)
+    assert math.isnan(ngd_values[curie_pairs.index(("UMLS:C0000'1", "CHEBI:15365"))])  # (no PMIDs)
+    assert math.isnan(ngd_values[curie_pairs.index(("MONDO:0000000", "CHEBI:15365"))])  # (unknown curie)
+    assert ngd.calculate_ngd_fast("CHEBI:15365", "MONDO:0005148") == \
+        (ngd_values[curie_pairs.index(("CHEBI:15365", "MONDO:0005148"))], {1, 7, *range(100, 128)})
+
+
 if __name__ == "__main__":
     pytest.main(['-v'])
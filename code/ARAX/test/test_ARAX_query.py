@@ -2,11 +2,23 @@
 
 import sys
 import os
+import json
+import time
 import pytest
 
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery")
+import ARAX_query
 from ARAX_query import ARAXQuery
+from trapi_json_encoder import iter_trapi_json_chunks
+from openapi_server.models.response import Response
+from openapi_server.models.message import Message
+from openapi_server.models.knowledge_graph import KnowledgeGraph
+from openapi_server.models.node import Node
+from openapi_server.models.edge import Edge
+from openapi_server.models.attribute import Attribute
+from openapi_server.models.result import Result
+from openapi_server.models.analysis import Analysis
 
 
 def test_query_by_query_graph_2():
@@ -28,4 +40,70 @@ def test_query_by_query_graph_2():
     assert response.envelope.schema_version == '1.6.0'
 
 
+def test_trapi_json_chunks_match_json_dumps():
+    nodes = {f"CHEBI:{i}": Node(name=f"node {i}", categories=["biolink:SmallMolecule"],
+                                attributes=[Attribute(attribute_type_id="biolink:score", value=i / 3)])
+             for i in range(100)}
+    edges = {f"e{i}": Edge(subject="CHEBI:1", object=f"CHEBI:{i}", predicate="biolink:related_to") for i in range(100)}
+    envelope = Response(message=Message(knowledge_graph=KnowledgeGraph(nodes=nodes, edges=edges), results=[]),
+                        status="Success", logs=[], query_options={'query_plan': {'qedge_keys': {}}})
+    expected_json = json.dumps(dict(envelope.to_dict(), http_status=200), sort_keys=True)
+    chunks = list(iter_trapi_json_chunks(envelope, extra_fields={'http_status': 200}, chunk_size=1000))
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected_json
+
+    # An attribute with a NaN is left out, any other NaN (e.g., a score) is sent as null, and nothing else changes
+    nodes["CHEBI:5"].attributes.append(Attribute(attribute_type_id="biolink:p_value", value=float("nan")))
+    envelope.message.results = [Result(node_bindings={}, analyses=[Analysis(resource_id="infores:arax", edge_bindings={},
+                                                                            score=float("inf"))])]
+    non_finite_float_paths = []
+    envelope_dict = json.loads("".join(iter_trapi_json_chunks(envelope, on_non_finite_float=non_finite_float_paths.append)))
+    assert non_finite_float_paths == ["message.knowledge_graph.nodes[CHEBI:5].attributes[1]",
+                                      "message.results[0].analyses[0].score"]
+    assert envelope_dict['message']['knowledge_graph']['nodes']['CHEBI:5']['attributes'] == [
+        {'attribute_source': None, 'attribute_type_id': "biolink:score", 'attributes': None, 'description': None,
+         'original_attribute_name': None, 'value': 5 / 3, 'value_type_id': None, 'value_url': None}]
+    assert envelope_dict['message']['results'][0]['analyses'][0]['score'] is None
+    assert envelope_dict['message']['knowledge_graph']['nodes']['CHEBI:6'] == json.loads(json.dumps(nodes["CHEBI:6"].to_dict()))
+
+
+def test_query_return_stream(monkeypatch):
+    monkeypatch.setattr(ARAX_query, "stream_keepalive_interval", 0.2)
+    araxq = ARAXQuery.__new__(ARAXQuery)  # (the query itself is faked below, so no configuration is needed)
+    araxq.response = None
+    araxq.message = None
+    araxq.track_query_finish = lambda: None
+
+    def query(query, mode='ARAX', origin='API'):
+        # Runs in the query thread, like ARAXQuery.query() would
+        araxq.response.envelope = Response(message=Message(), status="OK")
+        araxq.response.info("Expanding e00")
+        araxq.response.update_query_plan("e00", "infores:kp-a", "Waiting", "Query sent")
+        araxq.response.update_query_plan("e00", "infores:kp-b", "Waiting", "Query sent")
+        time.sleep(0.7)  # (long enough for the stream to send keepalives)
+        araxq.response.update_query_plan("e00", "infores:kp-a", "Done", "Query returned 3 results")
+        araxq.response.info("Expansion done")
+
+    araxq.query = query
+    stream_lines = [json.loads(line) for line in "".join(araxq.query_return_stream({})).split("\n") if line]
+
+    log_messages = [line["message"] for line in stream_lines if "level" in line]
+    assert log_messages.index("Expanding e00") < log_messages.index("Query is still progressing...") < \
+        log_messages.index("Expansion done")
+    assert len([line for line in stream_lines if "pid" in line]) == 1
+    # Each query plan update holds just the entries that changed since the last one, so merging them gives the plan
+    query_plan_updates = [line for line in stream_lines if "qedge_keys" in line]
+    query_plan = {}
+    for query_plan_update in query_plan_updates:
+        for qedge_key, entries in query_plan_update["qedge_keys"].items():
+            query_plan.setdefault(qedge_key, {}).update(entries)
+    assert query_plan == araxq.response.query_plan["qedge_keys"]
+    assert query_plan_updates[-1]["qedge_keys"] == {"e00": {"infores:kp-a": {"status": "Done", "query": None,
+                                                                           "description": "Query returned 3 results"}}}
+    assert query_plan_updates[-1]["counter"] == 3
+    # The stream ends with the TRAPI response, without the DONE flag the query thread set
+    assert stream_lines[-1]["status"] == "Success" and "message" in stream_lines[-1]
+    assert "DONE" not in araxq.response.status
+
+
 if __name__ == "__main__": pytest.main(['-v'])
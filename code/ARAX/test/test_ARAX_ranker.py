@@ -6,6 +6,7 @@
 
 import sys
 import os
+import random
 import numpy as np
 import scipy.stats
 import pytest
@@ -22,6 +23,7 @@ from ARAX_query import ARAXQuery
 from query_graph_info import QueryGraphInfo
 from actions_parser import ActionsParser
 from result_transformer import ResultTransformer
+import ARAX_ranker
 from ARAX_ranker import ARAXRanker
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../NodeSynonymizer")
@@ -40,6 +42,8 @@ from openapi_server.models.node_binding import NodeBinding
 from openapi_server.models.edge_binding import EdgeBinding
 from openapi_server.models.result import Result
 from openapi_server.models.message import Message
+from openapi_server.models.attribute import Attribute
+from openapi_server.models.analysis import Analysis
 
 def _extract_ARAX_online_results(response_id: str, api_link: str = 'https://arax.ncats.io/api/arax/v1.4/response/') -> List[Union[ARAXResponse, Message]]:
     # Extracts the ARAXResponse objects from the ARAX online results
@@ -958,5 +962,69 @@ def test_ARAXRanker_test23_asset378():
     assert (rank_right_answer < 0.1 * total_results) or (rank_right_answer < 0.3 * total_results)
 
 
+def test_vectorized_scoring_matches_networkx():
+    # Scoring all results at once must give the same max flow/longest path/Frobenius scores as the per-result networkx scorers
+    rng = random.Random(1234)
+    for _ in range(200):
+        num_qnodes = rng.randint(1, 6)
+        qedges = {f"e{i:02}": QEdge(subject=f"n{rng.randrange(i):02}", object=f"n{i:02}") if rng.random() < 0.5
+                  else QEdge(subject=f"n{i:02}", object=f"n{rng.randrange(i):02}") for i in range(1, num_qnodes)}
+        if num_qnodes > 1 and rng.random() < 0.5:  # Add a cycle or a parallel qedge
+            qedge_qnode_keys = rng.sample([f"n{i:02}" for i in range(num_qnodes)], 2)
+            qedges["e99"] = QEdge(subject=qedge_qnode_keys[0], object=qedge_qnode_keys[1])
+        query_graph = QueryGraph(nodes={f"n{i:02}": QNode() for i in range(num_qnodes)}, edges=qedges)
+        kg_edge_id_to_edge = dict()
+        results = []
+        for result_index in range(rng.randint(1, 20)):
+            edge_bindings = dict()
+            for qedge_key in qedges:
+                edge_bindings[qedge_key] = []
+                for _ in range(rng.randint(0, 3)):
+                    edge_key = f"{qedge_key}:{result_index}--infores:kp{rng.randint(0, 3)}"
+                    kg_edge_id_to_edge[edge_key] = Edge(subject="NODE:1", object="NODE:2")
+                    kg_edge_id_to_edge[edge_key].confidence = rng.random()
+                    edge_bindings[qedge_key].append(EdgeBinding(id=edge_key, attributes=[]))
+            results.append(Result(node_bindings={}, analyses=[Analysis(resource_id="infores:arax",
+                                                                       edge_bindings=edge_bindings)]))
+        qg_nx = ARAX_ranker._get_query_graph_networkx_from_query_graph(query_graph)
+        vectorized_scores = ARAX_ranker._score_result_graphs(kg_edge_id_to_edge, qg_nx, results)
+        networkx_scores = [ARAX_ranker._score_result_graphs_by_networkx_graph_scorer(kg_edge_id_to_edge, qg_nx, results,
+                                                                                     scorer_func)
+                           for scorer_func in [ARAX_ranker._score_networkx_graphs_by_max_flow,
+                                               ARAX_ranker._score_networkx_graphs_by_longest_path,
+                                               ARAX_ranker._score_networkx_graphs_by_frobenius_norm]]
+        for scores, expected_scores in zip(vectorized_scores, networkx_scores):
+            assert np.allclose(scores, expected_scores, rtol=0, atol=1e-9)
+
+
+
+def test_edge_confidences_match_per_edge_combiner():
+    # Scoring all KG edges at once must give the same confidences as combining each edge's attribute scores on its own
+    rng = random.Random(1234)
+    ranker = ARAXRanker()
+    attribute_names = list(ranker.known_attributes_to_trust) + ["biolink:publications", "some_other_attribute", None]
+    data_sources = ["infores:semmeddb", "infores:drugbank", "infores:some-kp", "ARAX"]
+    edges = dict()
+    for edge_index in range(2000):
+        attributes = []
+        for _ in range(rng.randint(0, 5)):
+            attribute_name = rng.choice(attribute_names)
+            if attribute_name == "biolink:publications":
+                value = [f"PMID:{rng.randint(1, 20)}" for _ in range(rng.randint(0, 12))]
+            else:
+                value = rng.choice([rng.random(), rng.uniform(-10, 10), 10 ** rng.uniform(-300, 0), "no value!", "0.3", None])
+            if rng.random() < 0.5:
+                attributes.append(Attribute(original_attribute_name=attribute_name, attribute_type_id="biolink:has_attribute", value=value))
+            else:
+                attributes.append(Attribute(attribute_type_id=attribute_name or "biolink:has_attribute", value=value))
+        edges[f"EDGE:{edge_index}--{rng.choice(data_sources)}"] = Edge(subject="NODE:1", object="NODE:2", attributes=attributes)
+    edge_attribute_columns = ranker.get_edge_attribute_columns(edges)
+    for attribute_name, values in edge_attribute_columns['stats_values'].items():
+        ARAX_ranker._update_score_stats(ranker.score_stats, attribute_name, values)
+    edge_confidences = ranker.get_edge_confidences(edge_attribute_columns)
+    expected_edge_confidences = [ranker.edge_attribute_score_combiner(edge_key, edge) for edge_key, edge in edges.items()]
+    assert np.allclose(edge_confidences, expected_edge_confidences, rtol=0, atol=1e-12)
+
+
 if __name__ == "__main__":
     pytest.main(['-v'])
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Tests of ResponseStore (how ResponseCache stores responses in S3), with a filesystem stand-in for S3
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ResponseCache")
+from response_store import FilesystemResponseStoreBackend, LocalObjectCache, ResponseStore
+
+
+def _get_envelope(description: str, n_nodes: int = 20) -> dict:
+    nodes = {f"CHEBI:{i}": {"name": f"node {i}", "categories": ["biolink:SmallMolecule"], "attributes": None}
+             for i in range(n_nodes)}
+    edges = {f"e{i}": {"subject": "CHEBI:0", "object": f"CHEBI:{i}", "predicate": "biolink:related_to"}
+             for i in range(1, n_nodes)}
+    return {"status": "Success", "description": description, "schema_version": "1.6.0",
+            "message": {"query_graph": None, "knowledge_graph": {"nodes": nodes, "edges": edges},
+                        "results": [{"node_bindings": {"n0": [{"id": "CHEBI:0"}]}, "analyses": []}]}}
+
+
+def test_responses_round_trip_with_deduplicated_knowledge_graphs(tmp_path):
+    backend = FilesystemResponseStoreBackend(str(tmp_path / "s3"))
+    response_store = ResponseStore(backend, LocalObjectCache(str(tmp_path / "cache")))
+    envelope_1 = _get_envelope("first run")
+    envelope_2 = _get_envelope("second run of the same query")
+    response_store.put_response("bucket", 1, envelope_1)
+    response_store.put_response("bucket", 2, envelope_2)
+    assert len(os.listdir(tmp_path / "s3" / "bucket" / "knowledge_graphs")) == 1
+
+    # Reads come from the local cache, or from the remote store if they aren't cached (anymore)
+    assert response_store.get_response("bucket", 1) == envelope_1
+    assert ResponseStore(backend).get_response("bucket", 2) == envelope_2
+
+    # Responses stored in the old plain JSON format can still be read
+    backend.put_object("bucket", "/responses/3.json", json.dumps(envelope_1).encode("utf-8"))
+    assert response_store.get_response("bucket", 3) == envelope_1
+    with pytest.raises(KeyError):
+        response_store.get_response("bucket", 4)
+
+
+def test_response_store_zstd_dictionary(tmp_path):
+    backend = FilesystemResponseStoreBackend(str(tmp_path / "s3"))
+    sample_envelopes = [_get_envelope(f"sample {i}", n_nodes=i) for i in range(2, 200)]
+    dictionary_id = ResponseStore(backend).train_dictionary(["bucket"], sample_envelopes, dict_size=8192)
+    envelope = _get_envelope("small response", n_nodes=5)
+    n_bytes_with_dictionary = ResponseStore(backend).put_response("bucket", 1, copy.deepcopy(envelope), dictionary_id)
+    n_bytes_without_dictionary = ResponseStore(backend).put_response("other_bucket", 1, copy.deepcopy(envelope))
+    assert n_bytes_with_dictionary < n_bytes_without_dictionary
+    # (a new ResponseStore has to fetch the dictionary from the bucket to read the response)
+    assert ResponseStore(backend).get_response("bucket", 1) == envelope
+
+
+class _CountingBackend(FilesystemResponseStoreBackend):
+    def __init__(self, root_dir: str):
+        super().__init__(root_dir)
+        self.requested_keys = []
+
+    def get_object(self, bucket_name: str, key: str) -> bytes:
+        self.requested_keys.append(key)
+        return super().get_object(bucket_name, key)
+
+    def has_object(self, bucket_name: str, key: str) -> bool:
+        self.requested_keys.append(key)
+        return super().has_object(bucket_name, key)
+
+
+def test_lookups_of_stored_objects(tmp_path):
+    backend = _CountingBackend(str(tmp_path / "s3"))
+    cache = LocalObjectCache(str(tmp_path / "cache"))
+    response_store = ResponseStore(backend, cache)
+    envelope = _get_envelope("first run")
+    response_store.put_response("bucket", 1, copy.deepcopy(envelope))
+
+    # Checking whether a cached KG is stored neither goes to the remote store nor counts as a use of the cached KG
+    knowledge_graph_key = "/knowledge_graphs/" + os.listdir(tmp_path / "s3" / "bucket" / "knowledge_graphs")[0]
+    os.utime(cache._get_path("bucket", knowledge_graph_key), (0, 0))
+    backend.requested_keys.clear()
+    response_store.put_response("bucket", 2, copy.deepcopy(envelope))
+    assert backend.requested_keys == []
+    assert os.path.getmtime(cache._get_path("bucket", knowledge_graph_key)) == 0
+
+    # A legacy response is read with one remote lookup if it's looked for first, and either format is still found
+    backend.put_object("bucket", "/responses/3.json", json.dumps(envelope).encode("utf-8"))
+    assert response_store.get_response("bucket", 3, legacy_first=True) == envelope
+    assert backend.requested_keys == ["/responses/3.json"]
+    assert ResponseStore(backend).get_response("bucket", 1, legacy_first=True) == envelope
+    with pytest.raises(KeyError):
+        response_store.get_response("bucket", 4, legacy_first=True)
+
+
+def test_local_object_cache_evicts_least_recently_used(tmp_path):
+    cache = LocalObjectCache(str(tmp_path), max_bytes=3500)
+    for key in ["a", "b", "c"]:
+        cache.put("bucket", key, b"x" * 1000)
+        os.utime(cache._get_path("bucket", key), (0, {"a": 1, "b": 2, "c": 3}[key]))
+    assert cache.get("bucket", "a") is not None  # ("a" is now the most recently used)
+    cache.put("bucket", "d", b"x" * 1000)
+    assert cache.get("bucket", "b") is None
+    assert all(cache.get("bucket", key) is not None for key in ["a", "c", "d"])
+
+
+if __name__ == "__main__":
+    pytest.main(['-v', 'test_ARAX_response_store.py'])
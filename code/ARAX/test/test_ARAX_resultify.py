@@ -3,6 +3,7 @@
 #         python3 ARAX_resultify_testcases.py test_issue692
 
 import os
+import random
 import sys
 import pytest
 
@@ -10,10 +11,12 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery")
 from ARAX_response import ARAXResponse
 from ARAX_messenger import ARAXMessenger
 from ARAX_expander import ARAXExpander
-from typing import List, Dict, Tuple, Set, Iterable
+from typing import List, Dict, Tuple, Set, Iterable, Optional
 import ARAX_resultify
 from ARAX_resultify import ARAXResultify
 from ARAX_query import ARAXQuery
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../Testing")
+import benchmark_resultify_join
 
 # is there a better way to import openapi_server?  Following SO posting 16981921
 PACKAGE_PARENT = '../../UI/OpenAPI/python-flask-server'
@@ -192,12 +195,18 @@ def _run_resultify_directly(query_graph: QueryGraph,
 
 def _convert_shorthand_to_qg(
         shorthand_qnodes: Dict[str, str],
-        shorthand_qedges: Dict[str, str]
+        shorthand_qedges: Dict[str, str],
+        option_group_ids: Optional[Dict[str, str]] = None
 ) -> QueryGraph:
-    return QueryGraph(nodes={qnode_key: QNode(is_set=bool(is_set)) \
+    # option_group_ids maps qnode/qedge keys to their option group; qedges with keys like the subclass_of self-qedges
+    # Expand adds ("subclass:n00--n00") are made subclass_of qedges
+    option_group_ids = option_group_ids if option_group_ids else dict()
+    return QueryGraph(nodes={qnode_key: QNode(is_set=bool(is_set), option_group_id=option_group_ids.get(qnode_key)) \
                              for qnode_key, is_set in shorthand_qnodes.items()},
                       edges={qedge_key: QEdge(subject=qnodes.split("--")[0],
-                                              object=qnodes.split("--")[1]) \
+                                              object=qnodes.split("--")[1],
+                                              predicates=["biolink:subclass_of"] if qedge_key.startswith("subclass:") else None,
+                                              option_group_id=option_group_ids.get(qedge_key)) \
                              for qedge_key, qnodes in shorthand_qedges.items()})
 
 
@@ -232,6 +241,55 @@ def _get_kg_edge_keys_using_node(node_key: str, kg: KnowledgeGraph) -> Set[str]:
     return {edge_key for edge_key, edge in kg.edges.items() if node_key in {edge.subject, edge.object}}
 
 
+def _get_random_shorthand_query(rng: random.Random, max_kg_nodes_per_qnode: int, max_kg_edges_per_qedge: int,
+                                add_cycles: bool = False, add_option_groups: bool = False,
+                                add_subclass_qnodes: bool = False) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, str],
+                                                                            Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    Builds a random connected QG of 2-5 qnodes and a random KG (drawn from eight nodes) for it, in shorthand form. The
+    QG can optionally get a cycle or parallel qedge, option groups (one with its own qnode, one with just a qedge),
+    and a subclass_of self-qedge whose KG edges point from a node to a lower-numbered 'parent' node for that qnode.
+    Returns the shorthand qnodes, qedges, option group IDs (by qnode/qedge key), KG nodes, and KG edges.
+    """
+    num_qnodes = rng.randint(2, 5)
+    qnode_keys = [f"n{i:02}" for i in range(num_qnodes)]
+    shorthand_qnodes = {qnode_key: "is_set" if rng.random() < 0.4 else "" for qnode_key in qnode_keys}
+    shorthand_qedges = {f"e{i:02}": f"{rng.choice(qnode_keys[:i])}--{qnode_keys[i]}" for i in range(1, num_qnodes)}
+    option_group_ids = dict()
+    if add_cycles and rng.random() < 0.5:  # Add a cycle or a parallel qedge
+        shorthand_qedges["e99"] = "--".join(rng.sample(qnode_keys, 2))
+    if add_option_groups and rng.random() < 0.5:  # Add an option group qnode connected to one or two required qnodes
+        shorthand_qnodes["o00"] = "is_set" if rng.random() < 0.4 else ""
+        option_group_ids["o00"] = "1"
+        for i, qnode_key in enumerate(rng.sample(qnode_keys, rng.randint(1, 2))):
+            shorthand_qedges[f"o{i:02}"] = f"{qnode_key}--o00"
+            option_group_ids[f"o{i:02}"] = "1"
+    if add_option_groups and rng.random() < 0.3:  # Add an option group that's just a qedge between required qnodes
+        shorthand_qedges["o99"] = "--".join(rng.sample(qnode_keys, 2))
+        option_group_ids["o99"] = "2"
+    if add_subclass_qnodes and rng.random() < 0.4:
+        qnode_key = rng.choice(qnode_keys)
+        subclass_qedge_key = f"subclass:{qnode_key}--{qnode_key}"
+        shorthand_qedges[subclass_qedge_key] = f"{qnode_key}--{qnode_key}"
+        option_group_ids[subclass_qedge_key] = f"option_group-{subclass_qedge_key}"  # Like Expand does
+
+    shorthand_kg_nodes = {qnode_key: rng.sample([f"NODE:{i}" for i in range(8)], rng.randint(1, max_kg_nodes_per_qnode))
+                          for qnode_key in shorthand_qnodes}
+    shorthand_kg_edges = dict()
+    for qedge_key, qnodes in shorthand_qedges.items():
+        subject_qnode_key, object_qnode_key = qnodes.split("--")
+        if subject_qnode_key == object_qnode_key:
+            node_keys = sorted(shorthand_kg_nodes[subject_qnode_key], key=lambda node_key: int(node_key.split(":")[1]))
+            edge_keys = {f"{child_node_key}--{rng.choice(node_keys[:i])}" for i, child_node_key in enumerate(node_keys)
+                         if i and rng.random() < 0.5}
+        else:
+            edge_keys = {f"{rng.choice(shorthand_kg_nodes[subject_qnode_key])}--"
+                         f"{rng.choice(shorthand_kg_nodes[object_qnode_key])}"
+                         for _ in range(rng.randint(1, max_kg_edges_per_qedge))}
+        shorthand_kg_edges[qedge_key] = sorted(edge_keys)
+    return shorthand_qnodes, shorthand_qedges, option_group_ids, shorthand_kg_nodes, shorthand_kg_edges
+
+
 def test01():
     kg_node_info = ({'node_key': 'UniProtKB:12345',
                      'categories': 'protein',
@@ -1407,6 +1465,92 @@ def test_multi_node_edgeless_qg():
     assert len(message.results) == 1
 
 
+def test_join_matches_qnode_walk(monkeypatch):
+    # The join Resultify uses to create result graphs must give the same results as the original qnode-by-qnode walk
+    def get_results(query_graph: QueryGraph, knowledge_graph: KnowledgeGraph, use_qnode_walk: bool) -> set:
+        monkeypatch.setattr(ARAX_resultify, "_create_result_graphs",
+                            benchmark_resultify_join.create_result_graphs_by_qnode_walk if use_qnode_walk
+                            else create_result_graphs)
+        results = ARAX_resultify._get_results_for_kg_by_qg(knowledge_graph, query_graph, log=ARAXResponse())
+        return {(frozenset((qnode_key, frozenset(node_keys)) for qnode_key, node_keys in _get_result_node_keys_by_qg_key(result).items()),
+                 frozenset((qedge_key, frozenset(edge_keys)) for qedge_key, edge_keys in _get_result_edge_keys_by_qg_key(result).items()))
+                for result in results}
+
+    create_result_graphs = ARAX_resultify._create_result_graphs
+    rng = random.Random(1234)
+    num_cases_with_results = 0
+    for _ in range(300):
+        shorthand_qnodes, shorthand_qedges, option_group_ids, shorthand_kg_nodes, shorthand_kg_edges = \
+            _get_random_shorthand_query(rng, max_kg_nodes_per_qnode=4, max_kg_edges_per_qedge=6, add_cycles=True)
+        query_graph = _convert_shorthand_to_qg(shorthand_qnodes, shorthand_qedges, option_group_ids)
+        knowledge_graph = _convert_shorthand_to_kg(shorthand_kg_nodes, shorthand_kg_edges)
+        join_results = get_results(query_graph, knowledge_graph, use_qnode_walk=False)
+        assert join_results == get_results(query_graph, knowledge_graph, use_qnode_walk=True)
+        num_cases_with_results += bool(join_results)
+    assert num_cases_with_results > 50
+
+
+def test_incremental_matches_full_recompute():
+    # Updating the last results for removed KG nodes/edges and an added (virtual) qedge must give the same results as
+    # resultifying the changed KG from scratch
+    def get_results(query_graph: QueryGraph, knowledge_graph: KnowledgeGraph, log: ARAXResponse,
+                    incremental: bool) -> set:
+        results = ARAX_resultify._get_results_for_kg_by_qg(knowledge_graph, query_graph, log=log, incremental=incremental)
+        return {(frozenset((qnode_key, frozenset(node_keys)) for qnode_key, node_keys in _get_result_node_keys_by_qg_key(result).items()),
+                 frozenset((qedge_key, frozenset(edge_keys)) for qedge_key, edge_keys in _get_result_edge_keys_by_qg_key(result).items()))
+                for result in results}
+
+    rng = random.Random(4321)
+    num_cases_updated_with_results = 0
+    num_option_group_cases_updated_with_results = 0
+    num_subclass_cases_updated_with_results = 0
+    for _ in range(600):
+        shorthand_qnodes, shorthand_qedges, option_group_ids, shorthand_kg_nodes, shorthand_kg_edges = \
+            _get_random_shorthand_query(rng, max_kg_nodes_per_qnode=5, max_kg_edges_per_qedge=8,
+                                        add_option_groups=True, add_subclass_qnodes=True)
+        response = ARAXResponse()
+        get_results(_convert_shorthand_to_qg(shorthand_qnodes, shorthand_qedges, option_group_ids),
+                    _convert_shorthand_to_kg(shorthand_kg_nodes, shorthand_kg_edges), response, incremental=True)
+
+        # Remove some KG nodes and edges, and add a virtual qedge (like Overlay and filter_kg would)
+        removed_node_keys = set(rng.sample([f"NODE:{i}" for i in range(8)], rng.randint(0, 2)))
+        shorthand_kg_nodes = {qnode_key: [node_key for node_key in node_keys if node_key not in removed_node_keys]
+                              for qnode_key, node_keys in shorthand_kg_nodes.items()}
+        shorthand_kg_edges = {qedge_key: [edge_key for edge_key in edge_keys if rng.random() < 0.8 and
+                                          not removed_node_keys.intersection(edge_key.split("--"))]
+                              for qedge_key, edge_keys in shorthand_kg_edges.items()}
+        virtual_qnode_keys = rng.sample(sorted(shorthand_qnodes), 2)
+        if all(shorthand_kg_nodes[qnode_key] for qnode_key in virtual_qnode_keys):
+            shorthand_qedges["v00"] = "--".join(virtual_qnode_keys)
+            shorthand_kg_edges["v00"] = sorted({f"{rng.choice(shorthand_kg_nodes[virtual_qnode_keys[0]])}--"
+                                                f"{rng.choice(shorthand_kg_nodes[virtual_qnode_keys[1]])}"
+                                                for _ in range(rng.randint(1, 12))})
+            # A virtual qedge touching an option group's qnode belongs to that option group
+            virtual_option_group_ids = {option_group_ids[qnode_key] for qnode_key in virtual_qnode_keys
+                                        if qnode_key in option_group_ids}
+            if virtual_option_group_ids:
+                option_group_ids["v00"] = virtual_option_group_ids.pop()
+        shorthand_kg_nodes = {qnode_key: node_keys for qnode_key, node_keys in shorthand_kg_nodes.items() if node_keys}
+        shorthand_kg_edges = {qedge_key: edge_keys for qedge_key, edge_keys in shorthand_kg_edges.items() if edge_keys}
+        query_graph = _convert_shorthand_to_qg(shorthand_qnodes, shorthand_qedges, option_group_ids)
+        num_messages_before = len(response.messages)
+        incremental_results = get_results(query_graph, _convert_shorthand_to_kg(shorthand_kg_nodes, shorthand_kg_edges),
+                                          response, incremental=True)
+        assert incremental_results == get_results(query_graph,
+                                                  _convert_shorthand_to_kg(shorthand_kg_nodes, shorthand_kg_edges),
+                                                  ARAXResponse(), incremental=False)
+        if incremental_results and any("Updating result graphs" in message["message"]
+                                       for message in response.messages[num_messages_before:]):
+            num_cases_updated_with_results += 1
+            num_option_group_cases_updated_with_results += any(not qg_key.startswith("subclass:")
+                                                                for qg_key in option_group_ids)
+            num_subclass_cases_updated_with_results += any(qedge_key.startswith("subclass:")
+                                                           for qedge_key in shorthand_kg_edges)
+    assert num_cases_updated_with_results > 100
+    assert num_option_group_cases_updated_with_results > 30
+    assert num_subclass_cases_updated_with_results > 30
+
+
 @pytest.mark.slow
 def test_issue1446():
     # Test multiple single-edge option groups
@@ -4,15 +4,22 @@ Usage:
     Run all tests: pytest -v test_ARAX_synonymizer.py
     Run a single test: pytest -v test_ARAX_synonymizer.py -k test_example_9
 """
+import asyncio
 import copy
 import json
 import os
 import sys
+import threading
 import timeit
+import sqlite3
+import logging
 import pytest
+import requests
+from aiohttp import web
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../NodeSynonymizer/")
-from node_synonymizer import NodeSynonymizer
+from node_synonymizer import NodeSynonymizer, NormalizerCache
+from local_node_synonymizer import LocalNodeSynonymizer
 
 # ==============================================================================================================
 # TEST DATA EVIDENCE & TRUTH REFERENCE
@@ -449,5 +456,168 @@ def test_truncate_cluster():
     assert "biolink:Drug" not in results[PARKINSONS_CURIE]["categories"]
 
 
+def test_persistent_cache(tmp_path):
+    cache = NormalizerCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("nodenorm", {SNCA_CURIE: {"id": {"identifier": SNCA_CURIE}}, FAKE_CURIE: None})
+    cache.put_many("nodenorm", {"EXPIRED:1": {}}, ttl_seconds=-1)
+    assert cache.get_many("nodenorm", [SNCA_CURIE, FAKE_CURIE, "EXPIRED:1", "UNCACHED:1"]) == \
+        {SNCA_CURIE: {"id": {"identifier": SNCA_CURIE}}, FAKE_CURIE: None}
+    assert cache.get_many("nameres:exact", [SNCA_CURIE]) == {}
+    stats = cache.get_stats()
+    assert stats["hits"] == 2 and stats["misses"] == 3 and stats["expired"] == 1
+    assert stats["n_entries"] == 2
+
+
+class StubNodeNormalizer:
+    """A local stand-in for the Node Normalizer's /get_normalized_nodes, which answers with get_status(batch)"""
+
+    def __init__(self):
+        self.url = None
+        self.batches = []
+        self.get_status = lambda batch: 200
+
+    async def get_normalized_nodes(self, request):
+        batch = (await request.json())["curies"]
+        self.batches.append(batch)
+        status = self.get_status(batch)
+        if status != 200:
+            return web.Response(status=status)
+        return web.json_response({curie: {"id": {"identifier": curie}} for curie in batch})
+
+
+@pytest.fixture
+def node_normalizer():
+    stub = StubNodeNormalizer()
+    app = web.Application()
+    app.router.add_post("/get_normalized_nodes", stub.get_normalized_nodes)
+    runner = web.AppRunner(app)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", 0).start())
+    stub.url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield stub
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _get_offline_synonymizer(node_normalizer, persistent_cache=None):
+    # (skips __init__, which loads the Biolink model; only what the Node Normalizer calls need is set up)
+    synonymizer = NodeSynonymizer.__new__(NodeSynonymizer)
+    synonymizer.api_base_url = node_normalizer.url
+    synonymizer._session = requests.Session()
+    synonymizer._session.trust_env = False
+    synonymizer._normalizer_cache = {}
+    synonymizer._cache_hits = 0
+    synonymizer._cache_misses = 0
+    synonymizer._persistent_cache = persistent_cache
+    synonymizer.logger = logging.getLogger(__name__)
+    synonymizer._NN_RETRY_WAIT = 0.0
+    synonymizer._NN_MIN_BATCH_SIZE = 2
+    return synonymizer
+
+
+def _call_normalizer(synonymizer, mode, batches):
+    if mode == "sync":
+        return synonymizer._call_normalizer_api_sync(batches)
+    return synonymizer._call_normalizer_api_async(batches)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_normalizer_retries_server_errors(node_normalizer, mode):
+    n_requests = iter(range(100))
+    node_normalizer.get_status = lambda batch: 503 if next(n_requests) == 0 else 200
+    results, failed, last_error = _call_normalizer(_get_offline_synonymizer(node_normalizer), mode, [["A:1", "A:2"]])
+    assert set(results) == {"A:1", "A:2"} and failed == []
+    assert len(node_normalizer.batches) == 2
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_normalizer_splits_batches_only_on_413(node_normalizer, mode):
+    curies = [f"A:{i}" for i in range(8)]
+    node_normalizer.get_status = lambda batch: 413 if len(batch) > 2 else 200
+    results, failed, last_error = _call_normalizer(_get_offline_synonymizer(node_normalizer), mode, [curies])
+    assert set(results) == set(curies) and failed == []
+    assert sorted(len(batch) for batch in node_normalizer.batches) == [2, 2, 2, 2, 4, 4, 8]
+
+    # A batch that is still too large at _NN_MIN_BATCH_SIZE fails, as does any other 4xx (without a retry)
+    for status in [413, 400]:
+        node_normalizer.batches.clear()
+        node_normalizer.get_status = lambda batch: status
+        results, failed, last_error = _call_normalizer(_get_offline_synonymizer(node_normalizer), mode, [curies[:2]])
+        assert results == {} and failed == curies[:2] and str(status) in last_error
+        assert len(node_normalizer.batches) == 1
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_normalizer_retry_budget(node_normalizer, mode):
+    node_normalizer.get_status = lambda batch: 503
+    synonymizer = _get_offline_synonymizer(node_normalizer)
+    synonymizer._NN_MAX_CALL_RETRIES = 2
+    batches = [["A:1"], ["A:2"], ["A:3"]]
+    results, failed, last_error = _call_normalizer(synonymizer, mode, batches)
+    assert results == {} and sorted(failed) == ["A:1", "A:2", "A:3"]
+    # (each batch gets its first attempt, but only two retries are shared among them)
+    assert len(node_normalizer.batches) == len(batches) + 2
+
+    node_normalizer.batches.clear()
+    synonymizer._NN_MAX_CALL_SECONDS = 0.0
+    results, failed, last_error = _call_normalizer(synonymizer, mode, batches)
+    assert sorted(failed) == ["A:1", "A:2", "A:3"] and "budget exhausted" in last_error
+    assert node_normalizer.batches == []
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_normalizer_failures_are_not_cached(node_normalizer, tmp_path, mode):
+    persistent_cache = NormalizerCache(str(tmp_path / "cache.sqlite"))
+    synonymizer = _get_offline_synonymizer(node_normalizer, persistent_cache)
+    synonymizer._NN_BATCH_SIZE = 2
+    if mode == "sync":
+        synonymizer._in_event_loop = lambda: True  # (which sends several batches one after another)
+    node_normalizer.get_status = lambda batch: 400 if "C:1" in batch else 200
+    results = synonymizer._call_normalizer_api(["A:1", "B:1", "C:1", "D:1"])
+    assert results == {"A:1": {"id": {"identifier": "A:1"}}, "B:1": {"id": {"identifier": "B:1"}},
+                       "C:1": None, "D:1": None}
+    assert set(synonymizer._normalizer_cache) == {"A:1", "B:1"}
+    assert set(persistent_cache.get_many("nodenorm", ["A:1", "B:1", "C:1", "D:1"])) == {"A:1", "B:1"}
+
+    # The next call asks the Node Normalizer again for just the CURIEs that failed
+    node_normalizer.batches.clear()
+    node_normalizer.get_status = lambda batch: 200
+    assert synonymizer._call_normalizer_api(["A:1", "C:1", "D:1"])["C:1"] == {"id": {"identifier": "C:1"}}
+    assert node_normalizer.batches == [["C:1", "D:1"]]
+
+
+def test_local_synonymizer(tmp_path):
+    # A tiny database in the format written by kg2c/synonymizer_build/5_create_synonymizer_sqlite.py
+    db_path = str(tmp_path / "node_synonymizer_v1.0_KG2.10.0.sqlite")
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE nodes (id TEXT, cluster_id TEXT, category TEXT, name TEXT, "
+                       "name_simplified TEXT, id_simplified TEXT)")
+    connection.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)",
+                           [(PARKINSONS_CURIE_2, PARKINSONS_CURIE_2, "Disease", "Parkinson disease",
+                             "parkinsondisease", PARKINSONS_CURIE_2),
+                            (PARKINSONS_CURIE, PARKINSONS_CURIE_2, "Disease", "Parkinson's disease",
+                             "parkinsonsdisease", PARKINSONS_CURIE)])
+    connection.execute("CREATE TABLE clusters (cluster_id TEXT, category TEXT, name TEXT, member_ids TEXT)")
+    connection.execute("INSERT INTO clusters VALUES (?, ?, ?, ?)",
+                       (PARKINSONS_CURIE_2, "Disease", "Parkinson disease",
+                        str([PARKINSONS_CURIE_2, PARKINSONS_CURIE])))
+    connection.commit()
+    connection.close()
+
+    synonymizer = LocalNodeSynonymizer(db_path)
+    results = synonymizer.get_canonical_curies(curies=[PARKINSONS_CURIE.lower(), FAKE_CURIE], names=PARKINSONS_NAME)
+    assert results[PARKINSONS_CURIE.lower()]["preferred_curie"] == PARKINSONS_CURIE_2
+    assert results[PARKINSONS_CURIE.lower()]["preferred_category"] == "biolink:Disease"
+    assert results[PARKINSONS_NAME]["preferred_curie"] == PARKINSONS_CURIE_2
+    assert results[FAKE_CURIE] is None
+    assert set(synonymizer.get_equivalent_nodes(PARKINSONS_CURIE)[PARKINSONS_CURIE]) == {PARKINSONS_CURIE, PARKINSONS_CURIE_2}
+    assert synonymizer.get_normalizer_results(PARKINSONS_CURIE)[PARKINSONS_CURIE]["total_synonyms"] == 2
+
+
 if __name__ == "__main__":
     pytest.main(['-v', 'test_ARAX_synonymizer.py'])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Tests of the batched node/edge lookups of the xDTD mapping database (xDTDMappingDB), on a small database built here
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery/Infer/scripts")
+from build_mapping_db import xDTDMappingDB
+
+
+@pytest.fixture
+def mapping_db_dir(tmp_path):
+    nodes = [{"id": "CHEBI:1", "name": "drug", "category": ["biolink:SmallMolecule"]},
+             {"id": "NCBIGene:1", "name": "gene", "category": ["biolink:Gene"]},
+             {"id": "MONDO:1", "name": "disease", "category": ["biolink:Disease"]},
+             {"id": "CHEBI:1", "name": "duplicate of drug", "category": ["biolink:Drug"]}]
+    edges = [{"subject": "CHEBI:1", "predicate": "biolink:affects", "object": "NCBIGene:1", "id": "e1",
+              "sources": [{"resource_id": "infores:a", "resource_role": "primary_knowledge_source"}]},
+             {"subject": "CHEBI:1", "predicate": "biolink:affects", "object": "NCBIGene:1", "id": "e2",
+              "sources": [{"resource_id": "infores:b", "resource_role": "primary_knowledge_source"}]},
+             {"subject": "NCBIGene:1", "predicate": "biolink:related_to", "object": "MONDO:1", "id": "e3",
+              "object_direction_qualifier": "increased"}]
+    for file_name, records in [("nodes.jsonl", nodes), ("edges.jsonl", edges)]:
+        with open(tmp_path / file_name, "w") as jsonl_file:
+            jsonl_file.writelines(json.dumps(record) + "\n" for record in records)
+    build_db = xDTDMappingDB(database_name="mapping.db", outdir=str(tmp_path), mode="build")
+    build_db.create_tables()
+    build_db.populate_tables(str(tmp_path / "nodes.jsonl"), str(tmp_path / "edges.jsonl"))
+    build_db.create_indexes()
+    del build_db
+    return str(tmp_path)
+
+
+def test_batched_lookups_match_single_lookups(mapping_db_dir):
+    mapping_db = xDTDMappingDB(database_name="mapping.db", mode="run", db_loc=mapping_db_dir)
+    node_ids = ["CHEBI:1", "NCBIGene:1", "MONDO:1", "UMLS:unknown"]
+    node_infos = mapping_db.get_node_infos(node_ids)
+    assert set(node_infos) == {"CHEBI:1", "NCBIGene:1", "MONDO:1"}
+    assert all(node_infos[node_id] == mapping_db.get_node_info(node_id=node_id) for node_id in node_infos)
+    assert node_infos["CHEBI:1"].name == "drug" and node_infos["CHEBI:1"].category == ["biolink:SmallMolecule"]
+
+    triples = [("CHEBI:1", "biolink:affects", "NCBIGene:1"), ("NCBIGene:1", "biolink:related_to", "MONDO:1"),
+               ("CHEBI:1", "SELF_LOOP_RELATION", "CHEBI:1"), ("CHEBI:1", "biolink:treats", "MONDO:1")]
+    edge_infos = mapping_db.get_edge_infos(triples)
+    assert all(edge_infos[triple] == mapping_db.get_edge_info(triple_id=triple) for triple in triples)
+    assert [edge_info.id for edge_info in edge_infos[triples[0]]] == ["e1", "e2"]
+    assert edge_infos[triples[3]] == []
+
+
+def test_run_mode_connection_is_shared_and_read_only(mapping_db_dir):
+    mapping_db_1 = xDTDMappingDB(database_name="mapping.db", mode="run", db_loc=mapping_db_dir)
+    mapping_db_2 = xDTDMappingDB(database_name="mapping.db", mode="run", db_loc=mapping_db_dir)
+    assert mapping_db_1.conn is mapping_db_2.conn
+    del mapping_db_1  # (must not close the shared connection)
+    assert mapping_db_2.get_node_info(node_id="MONDO:1").name == "disease"
+    with pytest.raises(Exception):
+        mapping_db_2.conn.execute("DELETE FROM NODE_MAPPING_TABLE")
+
+
+if __name__ == "__main__":
+    pytest.main(['-v', 'test_ARAX_xdtd_mapping_db.py'])
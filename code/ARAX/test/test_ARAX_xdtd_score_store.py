@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Tests of the columnar xDTD prediction score store (top N drugs/diseases as slice reads), on a small store built here
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/../ARAXQuery/Infer/scripts")
+from xdtd_score_store import XDTDScoreStore, build_score_store, build_score_store_from_db, get_score_store_dir
+
+
+SCORE_ROWS = [("CHEBI:1", "drug 1", "MONDO:1", "disease 1", 0.1, 0.7, 0.2),
+              ("CHEBI:2", "drug 2", "MONDO:1", "disease 1", 0.1, 0.9, 0.0),
+              ("CHEBI:3", "drug 3", "MONDO:1", "disease 1", 0.3, 0.4, 0.3),
+              ("CHEBI:1", "drug 1", "MONDO:2", "disease 2", 0.0, 0.8, 0.2),
+              ("CHEBI:4", "drug 4", "MONDO:1", "disease 1", 0.2, 0.7, 0.1)]
+
+
+@pytest.fixture
+def score_store(tmp_path):
+    os.makedirs(tmp_path / "scores")
+    for file_name, rows in [("part_1.txt", SCORE_ROWS[:3]), ("part_2.txt", SCORE_ROWS[3:])]:
+        with open(tmp_path / "scores" / file_name, "w") as score_file:
+            score_file.write("drug_id\tdrug_name\tdisease_id\tdisease_name\ttn_score\ttp_score\tunknown_score\n")
+            score_file.writelines("\t".join(map(str, row)) + "\n" for row in rows)
+    store_dir = get_score_store_dir(str(tmp_path / "ExplainableDTD.db"))
+    build_score_store(str(tmp_path / "scores"), store_dir, top_k=2)
+    return XDTDScoreStore(store_dir)
+
+
+def _get_rows(top_scores):
+    return [tuple(row) for row in top_scores.itertuples(index=False)]
+
+
+def test_top_scores_by_disease(score_store):
+    # (ties keep the order of the score files)
+    expected_rows = [SCORE_ROWS[1], SCORE_ROWS[0], SCORE_ROWS[4], SCORE_ROWS[2]]
+    assert _get_rows(score_store.get_top_scores(disease_curie_id="MONDO:1")) == expected_rows
+    for n in range(1, 6):  # (both within and beyond the precomputed top 2)
+        assert _get_rows(score_store.get_top_scores(disease_curie_id="MONDO:1", n=n)) == expected_rows[:n]
+    assert _get_rows(score_store.get_top_scores(disease_curie_id="MONDO:1", threshold=0.7)) == expected_rows[:3]
+    assert _get_rows(score_store.get_top_scores(disease_curie_id="MONDO:1", n=2, threshold=0.8)) == expected_rows[:1]
+
+
+def test_top_scores_by_drug_and_pair(score_store):
+    assert _get_rows(score_store.get_top_scores(drug_curie_id="CHEBI:1")) == [SCORE_ROWS[3], SCORE_ROWS[0]]
+    assert _get_rows(score_store.get_top_scores(drug_curie_id="CHEBI:1", n=1)) == [SCORE_ROWS[3]]
+    assert _get_rows(score_store.get_top_scores(drug_curie_id="CHEBI:1", disease_curie_id="MONDO:1")) == [SCORE_ROWS[0]]
+    assert len(score_store.get_top_scores(drug_curie_id="CHEBI:2", disease_curie_id="MONDO:2")) == 0
+    assert len(score_store.get_top_scores(drug_curie_id="CHEBI:9")) == 0
+    assert len(score_store.get_top_scores(drug_curie_id="CHEBI:9", disease_curie_id="MONDO:1")) == 0
+    assert list(score_store.get_top_scores().columns) == ["drug_id", "drug_name", "disease_id", "disease_name",
+                                                          "tn_score", "tp_score", "unknown_score"]
+
+
+def test_store_built_from_database_matches_store_built_from_files(score_store, tmp_path):
+    db_path = str(tmp_path / "from_db" / "ExplainableDTD.db")
+    os.makedirs(os.path.dirname(db_path))
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE PREDICTION_SCORE_TABLE (drug_id TEXT, drug_name TEXT, disease_id TEXT, "
+                 "disease_name TEXT, tn_score REAL, tp_score REAL, unknown_score REAL)")
+    conn.executemany("INSERT INTO PREDICTION_SCORE_TABLE VALUES (?,?,?,?,?,?,?)", SCORE_ROWS)
+    conn.commit()
+    conn.close()
+    store_dir = get_score_store_dir(db_path)
+    assert not XDTDScoreStore.exists(store_dir)
+    assert build_score_store_from_db(db_path, store_dir, top_k=2) == len(SCORE_ROWS)
+    db_score_store = XDTDScoreStore(store_dir)
+    for curies in [("CHEBI:1", None), (None, "MONDO:1"), ("CHEBI:4", "MONDO:1")]:
+        assert db_score_store.get_top_scores(*curies).equals(score_store.get_top_scores(*curies))
+
+
+if __name__ == "__main__":
+    pytest.main(['-v', 'test_ARAX_xdtd_score_store.py'])
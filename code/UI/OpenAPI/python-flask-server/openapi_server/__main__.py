@@ -27,6 +27,8 @@ Configuration:
     - `check_databases` (bool): Whether to verify/update databases at startup
     - `run_background_tasker` (bool): Whether to launch the background tasker
     - `force_disable_telemetry` (bool): Override to disable OpenTelemetry
+    - `warm_kp_query_cache` (bool): Whether to preload the most-requested cached
+      KP responses into memory at startup (default: True)
 
 Caveats:
 - Relies on Unix-specific features (e.g., `os.fork()`); not compatible with Windows.
@@ -152,6 +154,7 @@ def main():
     check_databases = local_config.get('check_databases', True)
     run_background_tasker = local_config.get('run_background_tasker', True)
     force_disable_telemetry = local_config.get('force_disable_telemetry', False)
+    warm_kp_query_cache = local_config.get('warm_kp_query_cache', True)
     query_fork_mode = local_config.get('query_fork_mode', True)
     child_process_rlimit = local_config.get('child_process_rlimit', 34359738368)
 
@@ -237,6 +240,26 @@ def main():
     from Filter_KG.remove_nodes import RemoveNodes  # pylint: disable=import-outside-toplevel, import-error
     RemoveNodes.load_block_list_file()
 
+    # Preload the most-requested cached KP responses into the KP query cache's
+    # in-memory tier once in the parent, so that every forked query process
+    # inherits them instead of decompressing them from disk on each query.
+    if warm_kp_query_cache:
+        try:
+            from trapi_query_cacher import KPQueryCacher  # pylint: disable=import-outside-toplevel, import-error
+            KPQueryCacher().warm_memory_cache()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            eprint(f"WARNING: unable to warm the KP query cache: {exc}")
+
+    # Load the BiolinkHelper (and its ancestor/descendant closures) once in the
+    # parent, so that the first query of every forked query process doesn't pay
+    # for reading the OpenAPI spec and loading the Biolink lookup map.
+    add_to_syspath(rtx_root_dir / "code/ARAX/BiolinkHelper")
+    try:
+        from biolink_helper import get_biolink_helper  # pylint: disable=import-outside-toplevel, import-error
+        get_biolink_helper()
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        eprint(f"WARNING: unable to preload the BiolinkHelper: {exc}")
+
     # Import web framework components only in parent process
     import connexion  # pylint: disable=import-outside-toplevel
     import flask_cors  # pylint: disable=import-outside-toplevel
@@ -27,11 +27,13 @@ Design notes:
 - Generators are used to stream JSON responses incrementally, minimizing memory
   overhead for large results.
 - The first yielded line in non-streaming mode encodes the HTTP status, followed
-  by the serialized response payload.
+  by the serialized response payload (in chunks, which are passed on to the
+  client as they come).
 
 This module assumes that all incoming requests have already passed OpenAPI
 schema validation via Connexion.
 """
+import itertools
 import json
 import os
 import sys
@@ -45,6 +47,7 @@ import setproctitle
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../../../../../ARAX/ARAXQuery")
 import ARAX_query  # pylint: disable=import-outside-toplevel,import-error,wrong-import-position
+import trapi_json_encoder  # pylint: disable=import-error,wrong-import-position
 
 
 def eprint(*args, **kwargs):
@@ -59,7 +62,7 @@ def child_receive_sigpipe(signal_number, _):
 
 def run_query_dict_in_child_process(query_dict: dict,
                                     query_runner: Callable,
-                                    child_rlimit: int | None = None) -> Iterator[str]:
+                                    child_rlimit: int | None = None) -> Iterator[bytes]:
     eprint("[query_controller]: Creating pipe and "
            "forking a child to handle the query")
     read_fd, write_fd = os.pipe()
@@ -114,20 +117,45 @@ def run_query_dict_in_child_process(query_dict: dict,
     elif pid > 0:  # I am the parent process
         os.close(write_fd)  # the parent does not write to the pipe, it reads from it
         eprint(f"[query_controller]: child process pid={pid}")
-        read_fo = os.fdopen(read_fd, "r")
     else:
         eprint("[query_controller]: fork() unsuccessful")
         assert False, "********** fork() unsuccessful; something went very wrong *********"
-    return read_fo
+    return _relay_pipe(read_fd)
+
+
+def _relay_pipe(read_fd: int, block_size: int = 1 << 20) -> Iterator[bytes]:
+    # os.read() returns whatever the child has written so far (up to block_size), so progress
+    # messages are passed on as soon as they come, and a long line of JSON (the final envelope)
+    # is passed on a block at a time instead of being read in full first
+    try:
+        yield from iter(lambda: os.read(read_fd, block_size), b'')
+    finally:
+        os.close(read_fd)
+
+
+def _split_status_line(json_generator: Iterator) -> tuple:
+    # (in fork mode, the output comes in arbitrary blocks, so the status line may
+    # be split across blocks or share a block with the start of the response)
+    head = None
+    for chunk in json_generator:
+        head = chunk if head is None else head + chunk
+        newline = b"\n" if isinstance(head, bytes) else "\n"
+        if newline in head:
+            status_line, rest = head.split(newline, 1)
+            return status_line, itertools.chain([rest] if rest else [], json_generator)
+    raise RuntimeError("The query ended without sending its HTTP status")
 
 
 def _run_query_and_return_json_generator_nonstream(query_dict: dict) -> Iterator[str]:
     envelope = ARAX_query.ARAXQuery().query_return_message(query_dict)
-    envelope_dict = envelope.to_dict()
     http_status = getattr(envelope, 'http_status', 200)
-    envelope_dict['http_status'] = http_status
     yield json.dumps({"__http_status__": http_status}) + "\n"
-    yield json.dumps(envelope_dict, sort_keys=True, allow_nan=False) + "\n"
+    # the envelope is encoded straight from the model objects, a chunk at a
+    # time, instead of as one giant dict and string
+    yield from trapi_json_encoder.iter_trapi_json_chunks(
+        envelope, extra_fields={'http_status': http_status}
+    )
+    yield "\n"
 
 
 def _run_query_and_return_json_generator_stream(query_dict: dict) -> Iterator[str]:
@@ -183,9 +211,8 @@ def query(request_body: dict) -> tuple[flask.Response, int | None]:  # noqa: E50
                 _run_query_and_return_json_generator_nonstream,
                 child_rlimit
             )
-        status_line = next(json_generator)
+        status_line, json_generator = _split_status_line(json_generator)
         status_dict = json.loads(status_line)
         http_status = status_dict['__http_status__']
-        response_serialized_str = next(json_generator)
-        resp_obj = flask.Response(response_serialized_str, mimetype="application/json")
+        resp_obj = flask.Response(json_generator, mimetype="application/json")
     return resp_obj, http_status
@@ -674,6 +674,7 @@ function postQuery_ARAX(qtype,queryObj) {
 	var finishedSteps = 0;
 	var decoder = new TextDecoder();
 	var respjson = '';
+	var queryplan = { 'qedge_keys': {} };
 
 	function scan() {
 	    return reader.read().then(function(result) {
@@ -778,9 +779,24 @@ function postQuery_ARAX(qtype,queryObj) {
                     document.getElementById("status_container").before(div);
                 }
 
+                // the stream only sends the query plan entries that changed, so merge them in
+                for (let edge in jsonMsg.qedge_keys) {
+                    if (!queryplan.qedge_keys[edge])
+                        queryplan.qedge_keys[edge] = {};
+                    for (let provider in jsonMsg.qedge_keys[edge])
+                        queryplan.qedge_keys[edge][provider] = jsonMsg.qedge_keys[edge][provider];
+                }
+                // (render_queryplan_table modifies what it is given, so give it a copy, sorted like a full plan)
+                var qp = { 'qedge_keys': {} };
+                for (let edge of Object.keys(queryplan.qedge_keys).sort()) {
+                    qp.qedge_keys[edge] = {};
+                    for (let provider of Object.keys(queryplan.qedge_keys[edge]).sort())
+                        qp.qedge_keys[edge][provider] = JSON.parse(JSON.stringify(queryplan.qedge_keys[edge][provider]));
+                }
+
                 div.innerHTML = '';
                 div.append(document.createElement("br"));
-                div.append(render_queryplan_table(jsonMsg));
+                div.append(render_queryplan_table(qp));
                 div.append(document.createElement("br"));
             } else if (jsonMsg.pid) {
                 UIstate["pid"] = jsonMsg;